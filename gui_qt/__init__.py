@@ -1 +1,3 @@
 """PySide6-based GUI for Peptide Management System."""
+
+__version__ = "1.0.0"
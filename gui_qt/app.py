@@ -5,6 +5,7 @@ Task-oriented redesign: 5 sections instead of 11 entity-based views.
 """
 
 import sys
+from functools import partial
 from pathlib import Path
 
 # Add parent directory to path for imports when running directly
@@ -13,6 +14,9 @@ _project_root = _current_dir.parent
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
+from gui_qt import startup  # first: start of the startup timing report
+from gui_qt import instrumentation
+
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -29,9 +33,8 @@ from PySide6.QtWidgets import (
     QCheckBox,
     QSizePolicy,
 )
-from PySide6.QtCore import Qt, QSize
+from PySide6.QtCore import Qt, QSize, QTimer
 from PySide6.QtGui import QIcon
-import qtawesome as qta
 
 from peptide_manager import PeptideManager
 from peptide_manager.database import init_database
@@ -42,6 +45,8 @@ from peptide_manager.paths import (
     ensure_db_parent,
 )
 
+startup.mark("imports")
+
 
 # --- Section definitions ---
 
@@ -56,7 +61,7 @@ SECTIONS = [
         "key": "inventory",
         "label": "Inventario",
         "icon": "mdi6.package-variant-closed",
-        "tabs": ["Lotti", "Preparazioni"],
+        "tabs": ["Lotti", "Preparazioni", "Spedizioni", "Storico Acquisti"],
     },
     {
         "key": "treatment",
@@ -79,9 +84,36 @@ SECTIONS = [
 ]
 
 
+class _LazyPage(QWidget):
+    """Stack/tab page that builds its view on first ``ensure_view()``."""
+
+    def __init__(self, factory):
+        super().__init__()
+        self._factory = factory
+        self.view = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_view(self):
+        if self.view is None:
+            self.view = self._factory()
+            self.layout().addWidget(self.view)
+            # The section's modules are loaded now: cover their dialogs too
+            instrumentation.instrument_dialogs()
+        return self.view
+
+
+def _page_view(widget):
+    """View shown by a stack/tab page, building it if still lazy."""
+    return widget.ensure_view() if isinstance(widget, _LazyPage) else widget
+
+
 class PeptideQtApp(QMainWindow):
     """Main application window — task-oriented layout."""
 
+    # Interval for detecting writes by other processes (PRAGMA data_version)
+    _EXTERNAL_POLL_MS = 2000
+
     def __init__(
         self,
         db_path,
@@ -99,16 +131,29 @@ class PeptideQtApp(QMainWindow):
         self.edit_mode = False
         self._backup_done = False
 
-        # Backend — direct PeptideManager (Qt is single-threaded)
+        # Backend — PeptideManager for writes on the main thread; view
+        # refreshes read through per-thread read-only managers (views/base.py)
         self._manager = PeptideManager(db_path)
+        instrumentation.trace_connection(self._manager.conn)
 
         self._init_window()
         self._init_toolbar()
         self._init_central()
         self._init_statusbar()
 
+        # Change bus: commits on the main manager reach the views that read
+        # the touched tables; data_version polling catches other processes
+        # (scripts, a second instance)
+        self._manager.changes.subscribe(self._on_data_changed)
+        self._external_timer = QTimer(self)
+        self._external_timer.setInterval(self._EXTERNAL_POLL_MS)
+        self._external_timer.timeout.connect(self._manager.changes.poll_external)
+        self._external_timer.start()
+
         # Select first section
         self.sidebar.setCurrentRow(0)
+        self._painted = False
+        startup.mark("window")
 
     # --- public API --------------------------------------------------
 
@@ -184,10 +229,9 @@ class PeptideQtApp(QMainWindow):
         self.sidebar.setFixedWidth(180)
         self.sidebar.setIconSize(QSize(22, 22))
         for sec in SECTIONS:
-            item = QListWidgetItem(
-                qta.icon(sec["icon"], color="#aeaeae", color_active="#ffffff"),
-                sec["label"],
-            )
+            # Icons are set after the first paint (_load_sidebar_icons):
+            # qtawesome loads its icon fonts on import
+            item = QListWidgetItem(sec["label"])
             item.setSizeHint(QSize(180, 48))
             self.sidebar.addItem(item)
         self.sidebar.currentRowChanged.connect(self._on_section_changed)
@@ -200,6 +244,14 @@ class PeptideQtApp(QMainWindow):
             self.stack.addWidget(widget)
         layout.addWidget(self.stack)
 
+    def _load_sidebar_icons(self):
+        import qtawesome as qta
+
+        for i, sec in enumerate(SECTIONS):
+            self.sidebar.item(i).setIcon(
+                qta.icon(sec["icon"], color="#aeaeae", color_active="#ffffff")
+            )
+
     def _init_statusbar(self):
         sb = QStatusBar()
         self.setStatusBar(sb)
@@ -209,15 +261,40 @@ class PeptideQtApp(QMainWindow):
         env_label.setObjectName(f"env_badge_{self.environment}")
         sb.addPermanentWidget(env_label)
 
+        # Profiling overlay (--profile / PEPTIDE_PROFILE=1)
+        self._profile_label = None
+        self._profile_unsubscribe = None
+        if instrumentation.is_enabled():
+            self._profile_label = QLabel("")
+            self._profile_label.setObjectName("profile_overlay")
+            self._profile_label.setStyleSheet(
+                "color: #ffcc80; font-family: monospace; font-size: 11px;"
+            )
+            sb.addPermanentWidget(self._profile_label)
+            self._profile_unsubscribe = instrumentation.subscribe(
+                self._on_profile_record
+            )
+
+    def _on_profile_record(self, record):
+        self._profile_label.setText(instrumentation.summary(record))
+
     def _build_section_widget(self, section):
-        """Build a QTabWidget (or single placeholder) for a section."""
+        """Build a QTabWidget (or single page) for a section.
+
+        Views are not constructed here: each page is a ``_LazyPage`` that
+        imports and builds its view the first time it is shown, so startup
+        only pays for the Today section.
+        """
         tabs = section.get("tabs", [])
         if not tabs:
             # Single-view section — use real view if available
             if section["key"] == "today":
-                from gui_qt.views.today import TodayView
+                def build_today():
+                    from gui_qt.views.today import TodayView
 
-                return TodayView(self)
+                    return TodayView(self)
+
+                return _LazyPage(build_today)
             container = QWidget()
             layout = QVBoxLayout(container)
             layout.setContentsMargins(20, 20, 20, 20)
@@ -229,60 +306,44 @@ class PeptideQtApp(QMainWindow):
 
         # Inventory section — real tabs
         if section["key"] == "inventory":
-            from gui_qt.views.inventory import BatchesTab, PreparationsTab, ShipmentsTab
-            from gui_qt.views.purchase_history import PurchaseHistoryTab
-
-            tab_widget = QTabWidget()
-            tab_widget.addTab(BatchesTab(self), "Lotti")
-            tab_widget.addTab(PreparationsTab(self), "Preparazioni")
-            tab_widget.addTab(ShipmentsTab(self), "Spedizioni")
-            tab_widget.addTab(PurchaseHistoryTab(self), "Storico Acquisti")
-            tab_widget.currentChanged.connect(
-                lambda idx: self._refresh_tab(tab_widget, idx)
-            )
-            return tab_widget
+            def load_inventory():
+                from gui_qt.views.inventory import BatchesTab, PreparationsTab, ShipmentsTab
+                from gui_qt.views.purchase_history import PurchaseHistoryTab
+
+                return [BatchesTab, PreparationsTab, ShipmentsTab, PurchaseHistoryTab]
+
+            return self._lazy_tabs(tabs, load_inventory)
 
         # Treatment section — Cycles, Protocols, Plans
         if section["key"] == "treatment":
-            from gui_qt.views.treatment import (
-                CyclesTab, ProtocolsTab, PlansTab, TemplatesTab,
-            )
+            def load_treatment():
+                from gui_qt.views.treatment import (
+                    CyclesTab, ProtocolsTab, PlansTab, TemplatesTab,
+                )
 
-            tab_widget = QTabWidget()
-            tab_widget.addTab(CyclesTab(self), "Cicli")
-            tab_widget.addTab(ProtocolsTab(self), "Protocolli")
-            tab_widget.addTab(PlansTab(self), "Piani")
-            tab_widget.addTab(TemplatesTab(self), "Template")
-            tab_widget.currentChanged.connect(
-                lambda idx: self._refresh_tab(tab_widget, idx)
-            )
-            return tab_widget
+                return [CyclesTab, ProtocolsTab, PlansTab, TemplatesTab]
+
+            return self._lazy_tabs(tabs, load_treatment)
 
         # History section
         if section["key"] == "history":
-            from gui_qt.views.history import AdministrationsTab, StatisticsTab
+            def load_history():
+                from gui_qt.views.history import AdministrationsTab, StatisticsTab
 
-            tab_widget = QTabWidget()
-            tab_widget.addTab(AdministrationsTab(self), "Somministrazioni")
-            tab_widget.addTab(StatisticsTab(self), "Statistiche")
-            tab_widget.currentChanged.connect(
-                lambda idx: self._refresh_tab(tab_widget, idx)
-            )
-            return tab_widget
+                return [AdministrationsTab, StatisticsTab]
+
+            return self._lazy_tabs(tabs, load_history)
 
         # Archive section
         if section["key"] == "archive":
-            from gui_qt.views.archive import (
-                PeptidiTab, FornitoriTab, CalcolatoreTab,
-            )
-            tab_widget = QTabWidget()
-            tab_widget.addTab(PeptidiTab(self),     "Peptidi")
-            tab_widget.addTab(FornitoriTab(self),   "Fornitori")
-            tab_widget.addTab(CalcolatoreTab(self), "Calcolatore")
-            tab_widget.currentChanged.connect(
-                lambda idx: self._refresh_tab(tab_widget, idx)
-            )
-            return tab_widget
+            def load_archive():
+                from gui_qt.views.archive import (
+                    PeptidiTab, FornitoriTab, CalcolatoreTab,
+                )
+
+                return [PeptidiTab, FornitoriTab, CalcolatoreTab]
+
+            return self._lazy_tabs(tabs, load_archive)
 
         tab_widget = QTabWidget()
         for tab_name in tabs:
@@ -296,42 +357,83 @@ class PeptideQtApp(QMainWindow):
             tab_widget.addTab(page, tab_name)
         return tab_widget
 
+    def _lazy_tabs(self, labels, load_classes):
+        """QTabWidget of lazy pages; ``load_classes()`` imports the view
+        classes (one per label) when the first tab of the section is shown."""
+        classes = []
+
+        def build(index):
+            if not classes:
+                classes.extend(load_classes())
+            return classes[index](self)
+
+        tab_widget = QTabWidget()
+        for i, label in enumerate(labels):
+            tab_widget.addTab(_LazyPage(partial(build, i)), label)
+        # Connected after addTab: adding the first page must not build it
+        tab_widget.currentChanged.connect(
+            lambda idx: self._refresh_tab(tab_widget, idx)
+        )
+        return tab_widget
+
     @staticmethod
-    def _refresh_tab(tab_widget, index):
-        """Call refresh() on the newly visible tab if it supports it."""
-        widget = tab_widget.widget(index)
-        if hasattr(widget, "refresh"):
+    def _show_refresh(widget):
+        """Refresh a view being shown: only if its data changed meanwhile."""
+        if hasattr(widget, "refresh_if_stale"):
+            widget.refresh_if_stale()
+        elif hasattr(widget, "refresh"):
             widget.refresh()
 
-    def refresh_all_views(self):
-        """Refresh every view that supports refresh().
+    @classmethod
+    def _refresh_tab(cls, tab_widget, index):
+        """Build (first time) and refresh the newly visible tab if stale."""
+        cls._show_refresh(_page_view(tab_widget.widget(index)))
 
-        Used after a data mutation that affects multiple sections — e.g.
-        registering or editing an administration changes both preparation
-        volumes (Inventario) and the history/today lists. Tabbed views
-        otherwise only refresh on tab change, so the new state would not be
-        visible until the user happened to switch tab.
+    def iter_views(self):
+        """Yield every section view and tab already built, visible or not.
+
+        Pages never shown have no view yet: they load fresh data when built,
+        so they need neither change notifications nor a reload.
         """
         for i in range(self.stack.count()):
             widget = self.stack.widget(i)
             if isinstance(widget, QTabWidget):
-                for t in range(widget.count()):
-                    child = widget.widget(t)
-                    if hasattr(child, "refresh"):
-                        child.refresh()
-            elif hasattr(widget, "refresh"):
+                pages = [widget.widget(t) for t in range(widget.count())]
+            else:
+                pages = [widget]
+            for page in pages:
+                view = page.view if isinstance(page, _LazyPage) else page
+                if view is not None:
+                    yield view
+
+    def refresh_all_views(self):
+        """Unconditionally reload every view that supports refresh().
+
+        Data mutations no longer need this: the change bus already marks the
+        affected views stale (see ``_on_data_changed``). Kept for a full
+        reload, e.g. after replacing the database file.
+        """
+        for widget in self.iter_views():
+            if hasattr(widget, "refresh"):
                 widget.refresh()
 
+    def _on_data_changed(self, events):
+        """Forward committed changes to the views (they filter by table)."""
+        for widget in self.iter_views():
+            if hasattr(widget, "notify_changes"):
+                widget.notify_changes(events)
+
     # --- slots -------------------------------------------------------
 
     def _on_section_changed(self, index):
         if 0 <= index < self.stack.count():
             self.stack.setCurrentIndex(index)
             self.show_message(f"Sezione: {SECTIONS[index]['label']}")
-            # Refresh the active widget so data is always up to date
+            # Refresh the active widget if data changed while it was hidden
             widget = self.stack.widget(index)
-            if hasattr(widget, "refresh"):
-                widget.refresh()
+            if isinstance(widget, QTabWidget):
+                widget = widget.currentWidget()
+            self._show_refresh(_page_view(widget))
 
     def _on_edit_mode_changed(self, state):
         self.edit_mode = state == Qt.CheckState.Checked.value
@@ -342,14 +444,33 @@ class PeptideQtApp(QMainWindow):
 
     # --- lifecycle ---------------------------------------------------
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            startup.mark("first_paint")
+            QTimer.singleShot(0, self, self._load_sidebar_icons)
+
     def closeEvent(self, event):
+        from gui_qt.views.base import shutdown_loaders
+
+        self._external_timer.stop()
+        if self._profile_unsubscribe is not None:
+            self._profile_unsubscribe()
+        shutdown_loaders()
         self.backup_on_exit()
         event.accept()
 
     def backup_on_exit(self):
-        """Create a database backup. Safe to call multiple times."""
+        """Start the exit backup on a worker thread. Safe to call multiple times.
+
+        The window closes at once: the online backup (SQLite backup API,
+        consistent even while the database is open) and the cleanup run on
+        a non-daemon thread, which the interpreter waits for before exiting.
+        Returns the BackupJob (None if already started or not possible).
+        """
         if self._backup_done:
-            return
+            return None
         self._backup_done = True
         try:
             from peptide_manager.backup import DatabaseBackupManager
@@ -361,17 +482,16 @@ class PeptideQtApp(QMainWindow):
             else:
                 backup_dir = f"data/backups/{self.environment}"
 
-            backup_mgr = DatabaseBackupManager(self.db_path, backup_dir=backup_dir)
-            backup_path = backup_mgr.create_backup(
-                label=f"auto_exit_{self.environment}"
+            # Archivio deduplicato: un backup giornaliero costa le sole pagine cambiate
+            backup_mgr = DatabaseBackupManager(
+                self.db_path, backup_dir=backup_dir, store=True
+            )
+            return backup_mgr.start_backup(
+                label=f"auto_exit_{self.environment}", cleanup=True
             )
-            print(f"Backup saved: {backup_path}")
-
-            stats = backup_mgr.cleanup_old_backups(dry_run=False)
-            if stats["deleted"] > 0:
-                print(f"Cleanup: {stats['deleted']} backup eliminati")
         except Exception as e:
             print(f"Backup failed: {e}")
+            return None
 
 
 # ---- Frozen-mode logging (same as gui_modular/app.py) ---------------
@@ -401,10 +521,13 @@ def _setup_frozen_logging(data_dir):
 def main():
     import argparse
     import atexit
+    import os
+    from datetime import datetime
 
     backup_dir = None
     export_dir = None
     first_run = False
+    profile = os.environ.get("PEPTIDE_PROFILE") == "1"
 
     if is_frozen():
         data_dir = get_data_dir()
@@ -427,7 +550,13 @@ def main():
             default="development",
             help="Environment (default: development)",
         )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="Measure view refreshes and dialogs (status bar + CSV)",
+        )
         args = parser.parse_args()
+        profile = profile or args.profile
 
         try:
             from scripts.environment import get_environment
@@ -450,6 +579,19 @@ def main():
     print(f"Environment: {environment}")
     print(f"Database: {db_path}")
 
+    from gui_qt import __version__
+
+    log_dir = Path(db_path).resolve().parent
+    startup.configure(
+        log_path=log_dir / "startup_times.jsonl",
+        version=__version__,
+        environment=environment,
+    )
+    if profile:
+        csv_path = log_dir / f"profile_{datetime.now():%Y%m%d_%H%M%S}.csv"
+        instrumentation.enable(csv_path)
+        print(f"Profiling: {csv_path}")
+
     app = QApplication(sys.argv)
     window = PeptideQtApp(
         db_path,
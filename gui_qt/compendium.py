@@ -0,0 +1,323 @@
+"""Peptide compendium index: reference sections from ``docs/COMPENDIO_*.md``.
+
+The markdown is parsed once into sections, a normalised-name index and the
+HTML shown by the Archive details dialog, and stored in a cache file next
+to the docs. The cache records each source's mtime, size and SHA-256: a
+mismatching mtime/size falls back to comparing the hash, so a fresh checkout
+(new mtimes, same content) still hits the cache. At runtime opening a
+peptide's details is a dict lookup, without parsing or rendering.
+
+Build step (also run by ``scripts/build.py`` so the bundle ships a valid
+cache)::
+
+    python -m gui_qt.compendium
+
+Usage:
+    compendium = Compendium.get()
+    html = compendium.html("TB-500", aliases=["Thymosin Beta-4"])
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+DOCS_DIR = Path(__file__).parent.parent / "docs"
+COMPENDIUM_FILES = [
+    DOCS_DIR / "COMPENDIO_PEPTIDI.md",
+    DOCS_DIR / "COMPENDIO_AAS_FARMACI.md",
+]
+CACHE_PATH = DOCS_DIR / ".compendium_cache.json"
+
+# Bump when parsing or HTML rendering changes: invalidates existing caches
+_CACHE_VERSION = 1
+
+
+def _norm(name: str) -> str:
+    """Normalise a name for matching: lowercase, strip non-alphanumeric."""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+# ── Parsing ───────────────────────────────────────────────────────────────
+
+
+def parse_sections(text: str) -> list[tuple[str, str]]:
+    """Split on ### headers → [(header, markdown)] in document order."""
+    sections = []
+    current_header = None
+    current_lines: list[str] = []
+
+    for line in text.splitlines():
+        if line.startswith("### "):
+            if current_header:
+                sections.append((current_header, "\n".join(current_lines)))
+            current_header = line[4:].strip()
+            current_lines = []
+        else:
+            # ## and --- don't close a section (--- separators between
+            # sections in the same ## group are ok)
+            current_lines.append(line)
+
+    if current_header:
+        sections.append((current_header, "\n".join(current_lines)))
+    return sections
+
+
+def header_names(header: str) -> list[str]:
+    """Main name and parenthetical aliases of a section header."""
+    # header examples: "BPC-157", "TB-500 (Thymosin Beta-4)", "PT-141 (Bremelanotide)"
+    parts = re.split(r"[(/]", header)
+    return [p.strip().rstrip(")") for p in parts if p.strip()]
+
+
+# ── HTML rendering ────────────────────────────────────────────────────────
+
+
+def md_to_html(md: str) -> str:
+    """Convert structured markdown to HTML for QTextBrowser."""
+    lines = md.splitlines()
+    html_parts = ["<style>"
+                  "body{font-family:sans-serif;font-size:13px;color:#e0e0e0;"
+                  "background:#1e1e1e;padding:8px}"
+                  "h2{color:#90caf9;margin:12px 0 4px}"
+                  "h3{color:#80cbc4;margin:10px 0 4px}"
+                  "h4{color:#ce93d8;margin:8px 0 2px}"
+                  "table{border-collapse:collapse;width:100%;margin:6px 0}"
+                  "td,th{border:1px solid #424242;padding:4px 8px;text-align:left}"
+                  "th{background:#2d2d2d;color:#90caf9}"
+                  "tr:nth-child(even){background:#252525}"
+                  "ul{margin:4px 0;padding-left:20px}"
+                  "li{margin:2px 0}"
+                  "b{color:#ffcc02}"
+                  "hr{border:none;border-top:1px solid #424242;margin:10px 0}"
+                  "</style><body>"]
+
+    in_table = False
+    in_list = False
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        # Close open lists before non-list content
+        if in_list and not line.strip().startswith("- "):
+            html_parts.append("</ul>")
+            in_list = False
+
+        if line.startswith("### "):
+            if in_table:
+                html_parts.append("</table>"); in_table = False
+            html_parts.append(f"<h3>{line[4:].strip()}</h3>")
+        elif line.startswith("## "):
+            if in_table:
+                html_parts.append("</table>"); in_table = False
+            html_parts.append(f"<h2>{line[3:].strip()}</h2>")
+        elif line.startswith("#### "):
+            html_parts.append(f"<h4>{line[5:].strip()}</h4>")
+        elif line.strip() == "---":
+            if in_table:
+                html_parts.append("</table>"); in_table = False
+            html_parts.append("<hr>")
+        elif line.startswith("|"):
+            # Markdown table row
+            cells = [c.strip() for c in line.strip("|").split("|")]
+            # Skip separator rows like |---|---|
+            if all(re.match(r"^[-: ]+$", c) for c in cells):
+                i += 1
+                continue
+            if not in_table:
+                html_parts.append("<table>")
+                in_table = True
+                # First row → header
+                row = "".join(f"<th>{_inline(c)}</th>" for c in cells)
+                html_parts.append(f"<tr>{row}</tr>")
+            else:
+                row = "".join(f"<td>{_inline(c)}</td>" for c in cells)
+                html_parts.append(f"<tr>{row}</tr>")
+        else:
+            if in_table:
+                html_parts.append("</table>"); in_table = False
+            stripped = line.strip()
+            if stripped.startswith("- ") or stripped.startswith("* "):
+                if not in_list:
+                    html_parts.append("<ul>"); in_list = True
+                html_parts.append(f"<li>{_inline(stripped[2:])}</li>")
+            elif stripped:
+                html_parts.append(f"<p>{_inline(stripped)}</p>")
+
+        i += 1
+
+    if in_table:
+        html_parts.append("</table>")
+    if in_list:
+        html_parts.append("</ul>")
+    html_parts.append("</body>")
+    return "\n".join(html_parts)
+
+
+def _inline(text: str) -> str:
+    """Convert inline markdown (bold, italic, code) to HTML."""
+    # **bold**
+    text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
+    # *italic*
+    text = re.sub(r"\*(.+?)\*", r"<i>\1</i>", text)
+    # `code`
+    text = re.sub(r"`(.+?)`", r"<code>\1</code>", text)
+    return text
+
+
+# ── Index + cache ─────────────────────────────────────────────────────────
+
+
+def _source_stamp(path: Path, with_hash: bool = True) -> dict:
+    st = path.stat()
+    stamp = {"name": path.name, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if with_hash:
+        stamp["sha256"] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return stamp
+
+
+def build_index(files=None) -> dict:
+    """Parse the compendium files into the cacheable index.
+
+    Returns:
+        dict with ``sections`` ([markdown, html] per section), ``index``
+        (normalised name → section position) and ``sources`` (stamps).
+    """
+    files = COMPENDIUM_FILES if files is None else files
+    sections: list[list[str]] = []
+    index: dict[str, int] = {}
+    sources = []
+    for path in files:
+        if not path.exists():
+            continue
+        sources.append(_source_stamp(path))
+        for header, content in parse_sections(path.read_text(encoding="utf-8")):
+            md = f"### {header}\n{content}"
+            position = len(sections)
+            sections.append([md, md_to_html(md)])
+            for name in header_names(header):
+                key = _norm(name)
+                # First file/section wins, as in the document order
+                if key and key not in index:
+                    index[key] = position
+    return {
+        "version": _CACHE_VERSION,
+        "sources": sources,
+        "sections": sections,
+        "index": index,
+    }
+
+
+def _cache_matches(data: dict, files) -> bool:
+    """True if the cached index was built from the current ``files``.
+
+    Stamps of files touched without content changes are refreshed in ``data``.
+    """
+    if data.get("version") != _CACHE_VERSION:
+        return False
+    present = [p for p in files if p.exists()]
+    stamps = data.get("sources", [])
+    if [s.get("name") for s in stamps] != [p.name for p in present]:
+        return False
+    for stamp, path in zip(stamps, present):
+        current = _source_stamp(path, with_hash=False)
+        if (current["mtime_ns"], current["size"]) == (stamp.get("mtime_ns"), stamp.get("size")):
+            continue
+        # Touched (checkout, copy): still valid if the content is the same
+        if hashlib.sha256(path.read_bytes()).hexdigest() != stamp.get("sha256"):
+            return False
+        stamp.update(current)
+    return True
+
+
+def load_index(files=None, cache_path=None) -> dict:
+    """Cached index if still valid, else rebuild it and try to save it."""
+    files = COMPENDIUM_FILES if files is None else files
+    cache_path = CACHE_PATH if cache_path is None else cache_path
+    try:
+        data = json.loads(Path(cache_path).read_text(encoding="utf-8"))
+        stamps = [dict(s) for s in data.get("sources", [])]
+        if _cache_matches(data, files):
+            if data["sources"] != stamps:
+                # Persist the new mtimes, or every launch re-hashes the files
+                save_index(data, cache_path)
+            return data
+    except (OSError, ValueError, AttributeError):
+        pass
+    data = build_index(files)
+    save_index(data, cache_path)
+    return data
+
+
+def save_index(data: dict, cache_path=None) -> bool:
+    """Write the index; False if the location is read-only (installed app)."""
+    cache_path = Path(CACHE_PATH if cache_path is None else cache_path)
+    tmp = cache_path.with_suffix(".tmp")
+    try:
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(cache_path)
+    except OSError:
+        return False
+    return True
+
+
+class Compendium:
+    """Lazy singleton over the cached index: O(1) lookups by name or alias."""
+
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls(load_index())
+        return cls._instance
+
+    def __init__(self, data: dict):
+        self._sections = data["sections"]
+        self._index = data["index"]
+        self._fallback: dict[str, int | None] = {}  # memoised partial matches
+
+    def __len__(self):
+        return len(self._sections)
+
+    def _position(self, names) -> int | None:
+        keys = [k for k in (_norm(n) for n in names if n) if k]
+        for key in keys:
+            position = self._index.get(key)
+            if position is not None:
+                return position
+        # Partial match fallback (e.g. "BPC-157 Arginate"): one scan per
+        # name, then remembered
+        for key in keys:
+            if key not in self._fallback:
+                self._fallback[key] = next(
+                    (p for k, p in self._index.items() if key in k or k in key),
+                    None,
+                )
+            if self._fallback[key] is not None:
+                return self._fallback[key]
+        return None
+
+    def lookup(self, peptide_name: str, aliases=()) -> str | None:
+        """Return raw markdown for peptide_name (or one of its aliases)."""
+        position = self._position([peptide_name, *aliases])
+        return None if position is None else self._sections[position][0]
+
+    def html(self, peptide_name: str, aliases=()) -> str | None:
+        """Pre-rendered HTML for peptide_name (or one of its aliases)."""
+        position = self._position([peptide_name, *aliases])
+        return None if position is None else self._sections[position][1]
+
+
+def main():
+    data = build_index()
+    if not save_index(data):
+        raise SystemExit(f"Cannot write {CACHE_PATH}")
+    print(
+        f"Compendium index: {len(data['sections'])} sections, "
+        f"{len(data['index'])} names → {CACHE_PATH}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,291 @@ Usage
     table = DataTable([
         {"key": "id",   "label": "ID",   "width": 60},
         {"key": "name", "label": "Nome", "stretch": True},
+        {"key": "dose", "label": "ml",   "format": lambda v: f"{v:.2f}"},
     ])
-    table.load_data([{"id": 1, "name": "BPC-157"}])
+    table.load_data([{"id": 1, "name": "BPC-157", "dose": 0.25}])
     table.set_context_menu([
         {"label": "Dettagli", "callback": on_details},
         {"label": "Elimina",  "callback": on_delete, "enabled_when": lambda: app.edit_mode},
     ])
+
+Model/view: rows are kept as given (list of dicts or a pandas DataFrame) and
+cells are formatted only when the view paints them, so large datasets load
+in constant time. Clicking a header sorts on the raw values and
+``set_filter_text()`` hides non-matching rows; both are computed per column
+in bulk (vectorized for DataFrames) without reloading the rows.
+``set_row_subset()`` restricts the table to given source row positions
+(e.g. from precomputed boolean masks), again without copying the rows.
 """
 
+import math
+
 from PySide6.QtWidgets import (
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QHeaderView,
     QMenu,
     QAbstractItemView,
 )
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import (
+    Qt,
+    Signal,
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+)
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _default_format(value):
+    return "" if _is_missing(value) else str(value)
+
+
+def _sort_key(value):
+    """Key for sorting raw values of mixed type (numbers before text)."""
+    if _is_missing(value):
+        return (2, "")
+    if hasattr(value, "item"):          # numpy scalar
+        value = value.item()
+    if isinstance(value, (bool, int, float)):
+        return (0, value)
+    return (1, str(value).lower())
+
+
+class _DictRows:
+    """Row source over a list of dicts (no copy)."""
+
+    def __init__(self, rows):
+        self._rows = rows if isinstance(rows, list) else list(rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def value(self, r, key):
+        return self._rows[r].get(key, "")
+
+    def row(self, r):
+        return self._rows[r]
+
+    def order_by(self, key, descending):
+        rows = self._rows
+        return sorted(
+            range(len(rows)),
+            key=lambda r: _sort_key(rows[r].get(key, "")),
+            reverse=descending,
+        )
+
+    def texts(self, key):
+        """Lowercase default-formatted column, or None to format per cell."""
+        return None
+
+
+class _FrameRows:
+    """Row source over a DataFrame: one array per displayed column, no copy."""
+
+    def __init__(self, df):
+        self._df = df
+        self._arrays = {}
+
+    def __len__(self):
+        return len(self._df)
+
+    def value(self, r, key):
+        arr = self._arrays.get(key)
+        if arr is None:
+            if key not in self._df.columns:
+                return ""
+            arr = self._arrays[key] = self._df[key].to_numpy()
+        return arr[r]
+
+    def row(self, r):
+        return self._df.iloc[r].to_dict()
+
+    def order_by(self, key, descending):
+        if key not in self._df.columns:
+            return list(range(len(self._df)))
+        col = self._df[key]
+        if col.dtype.kind in "biuf":
+            # Vectorized: NaN last in both directions, stable like sorted()
+            import numpy as np  # only with DataFrames: pandas already loaded it
+
+            values = col.to_numpy(dtype=float)
+            return np.argsort(-values if descending else values, kind="stable").tolist()
+        arr = self.value
+        return sorted(
+            range(len(self._df)),
+            key=lambda r: _sort_key(arr(r, key)),
+            reverse=descending,
+        )
+
+    def texts(self, key):
+        if key not in self._df.columns:
+            return [""] * len(self._df)
+        col = self._df[key]
+        return col.astype(str).str.lower().where(col.notna(), "").tolist()
+
+
+def _row_source(rows):
+    if hasattr(rows, "iloc") and hasattr(rows, "columns"):
+        return _FrameRows(rows)
+    return _DictRows(rows)
+
+
+class _TableModel(QAbstractTableModel):
+    """Lazy model: formats a cell only when Qt asks for it.
+
+    Sorting and filtering are resolved here into a list of visible source
+    rows, computed per column in bulk; no Python callback runs per row or
+    per comparison when the view lays out or repaints.
+    """
+
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self._columns = columns
+        self._formatters = [c.get("format") for c in columns]
+        self._source = _DictRows([])
+        self._order = None          # sorted source rows (None = source order)
+        self._mask = None           # source row → bool (None = all visible)
+        self._subset = None         # allowed source rows, ascending (None = all)
+        self._visible = None        # model row → source row (None = identity)
+        self._text_cache = {}       # column → lowercase display strings
 
+    def set_source(self, source):
+        self.beginResetModel()
+        self._source = source
+        self._order = None
+        self._mask = None
+        self._subset = None
+        self._visible = None
+        self._text_cache = {}
+        self.endResetModel()
 
-class DataTable(QTableWidget):
+    def _source_row(self, r):
+        return r if self._visible is None else self._visible[r]
+
+    def _rebuild_visible(self):
+        order, mask, subset = self._order, self._mask, self._subset
+        if subset is not None:
+            if order is not None:
+                allowed = bytearray(len(self._source))
+                for r in subset:
+                    allowed[r] = 1
+                subset = [r for r in order if allowed[r]]
+            self._visible = subset if mask is None else [r for r in subset if mask[r]]
+        elif mask is None:
+            self._visible = order
+        else:
+            rows = range(len(self._source)) if order is None else order
+            self._visible = [r for r in rows if mask[r]]
+
+    def row_dict(self, r):
+        return self._source.row(self._source_row(r))
+
+    def _display(self, r, column):
+        value = self._source.value(r, self._columns[column]["key"])
+        fmt = self._formatters[column]
+        if fmt is None:
+            return _default_format(value)
+        try:
+            return fmt(value)
+        except (TypeError, ValueError):
+            return _default_format(value)
+
+    def _column_texts(self, column):
+        texts = self._text_cache.get(column)
+        if texts is None:
+            if self._formatters[column] is None:
+                texts = self._source.texts(self._columns[column]["key"])
+            if texts is None:
+                texts = [self._display(r, column).lower() for r in range(len(self._source))]
+            self._text_cache[column] = texts
+        return texts
+
+    def set_filter_text(self, text):
+        """Keep only rows whose displayed text contains ``text`` in any column."""
+        needle = (text or "").lower()
+        self.beginResetModel()
+        if not needle:
+            self._mask = None
+        else:
+            mask = [False] * len(self._source)
+            for c in range(len(self._columns)):
+                for r, t in enumerate(self._column_texts(c)):
+                    if not mask[r] and needle in t:
+                        mask[r] = True
+            self._mask = mask
+        self._rebuild_visible()
+        self.endResetModel()
+
+    def set_row_subset(self, rows):
+        """Keep only source rows ``rows`` (ascending positions; None = all)."""
+        self.beginResetModel()
+        if rows is not None:
+            rows = rows.tolist() if hasattr(rows, "tolist") else list(rows)
+        self._subset = rows
+        self._rebuild_visible()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._source) if self._visible is None else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self._display(self._source_row(index.row()), index.column())
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._columns[section]["label"]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Reorder rows by the raw values of ``column`` (-1 = source order)."""
+        if column < 0 and self._order is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self._source_row(i.row()) for i in persistent]
+
+        if column < 0:
+            self._order = None
+        else:
+            self._order = self._source.order_by(
+                self._columns[column]["key"], order == Qt.DescendingOrder
+            )
+        self._rebuild_visible()
+
+        if persistent:
+            if self._visible is None:
+                position = {r: r for r in sources}
+            else:
+                position = {src: row for row, src in enumerate(self._visible)}
+            self.changePersistentIndexList(
+                persistent,
+                [self.index(position[src], i.column()) for src, i in zip(sources, persistent)],
+            )
+        self.layoutChanged.emit()
+
+
+class _ProxyModel(QSortFilterProxyModel):
+    """View-facing proxy: header sorts go to ``_TableModel`` in bulk.
+
+    Rows arrive already filtered and ordered, so the proxy mapping stays an
+    identity built in C++ without per-row Python callbacks.
+    """
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+
+class DataTable(QTableView):
     """Configurable table with row-dict access and context menu."""
 
     row_double_clicked = Signal(dict)
@@ -34,15 +300,20 @@ class DataTable(QTableWidget):
         ----------
         columns : list[dict]
             Each dict must have ``key`` and ``label``.
-            Optional: ``width`` (int, fixed px), ``stretch`` (bool).
+            Optional: ``width`` (int, fixed px), ``stretch`` (bool),
+            ``format`` (callable value -> str, applied lazily on paint).
         """
-        super().__init__(0, len(columns), parent)
+        super().__init__(parent)
         self._columns = columns
-        self._rows: list[dict] = []
         self._menu_actions: list[dict] = []
+        self._filter_text = ""
+
+        self._model = _TableModel(columns, self)
+        self._proxy = _ProxyModel(self)
+        self._proxy.setSourceModel(self._model)
+        self.setModel(self._proxy)
 
         # Header
-        self.setHorizontalHeaderLabels([c["label"] for c in columns])
         header = self.horizontalHeader()
         for i, c in enumerate(columns):
             if c.get("stretch"):
@@ -51,40 +322,49 @@ class DataTable(QTableWidget):
                 self.setColumnWidth(i, c["width"])
                 header.setSectionResizeMode(i, QHeaderView.Fixed)
             else:
-                header.setSectionResizeMode(i, QHeaderView.ResizeToContents)
+                # ResizeToContents would measure every row: size on the
+                # visible rows only, on each load
+                header.setSectionResizeMode(i, QHeaderView.Interactive)
+        self._auto_columns = [
+            i for i, c in enumerate(columns) if not c.get("stretch") and "width" not in c
+        ]
+        header.setResizeContentsPrecision(50)
 
         # Behaviour
         self.setAlternatingRowColors(True)
         self.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.setSelectionMode(QAbstractItemView.SingleSelection)
         self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setWordWrap(False)
         self.verticalHeader().setVisible(False)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.setSortingEnabled(True)
+        self._unsort()
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self._show_context_menu)
-        self.cellDoubleClicked.connect(self._on_double_click)
+        self.doubleClicked.connect(self._on_double_click)
 
     # --- public API -------------------------------------------------------
 
     def load_data(self, rows):
-        """Clear and repopulate the table from a list of dicts."""
-        self._rows = list(rows)
-        self.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            for c, col in enumerate(self._columns):
-                val = row.get(col["key"], "")
-                item = QTableWidgetItem(str(val) if val is not None else "")
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.setItem(r, c, item)
+        """Replace the table contents.
+
+        ``rows`` is a list of dicts or a pandas DataFrame; it is referenced,
+        not copied, and the original order is kept until a header is clicked.
+        """
+        self._model.set_source(_row_source(rows))
+        self._unsort()
+        if self._filter_text:
+            self._model.set_filter_text(self._filter_text)
+        for i in self._auto_columns:
+            self.resizeColumnToContents(i)
 
     def selected_row(self):
         """Return the dict for the currently selected row, or None."""
         indexes = self.selectionModel().selectedRows()
         if not indexes:
             return None
-        r = indexes[0].row()
-        if 0 <= r < len(self._rows):
-            return self._rows[r]
-        return None
+        return self._row_at(indexes[0])
 
     def set_context_menu(self, actions):
         """Configure right-click menu.
@@ -98,11 +378,40 @@ class DataTable(QTableWidget):
         """
         self._menu_actions = actions
 
+    def set_filter_text(self, text):
+        """Show only rows where any column contains ``text`` (case-insensitive)."""
+        self._filter_text = text or ""
+        self._model.set_filter_text(text)
+
+    def set_row_subset(self, rows):
+        """Show only the source rows at positions ``rows`` (None = all).
+
+        ``rows`` must be ascending (e.g. ``np.flatnonzero(mask)``); header
+        sort and ``set_filter_text()`` still apply on top of it.
+        """
+        self._model.set_row_subset(rows)
+
+    def rowCount(self):
+        """Number of visible rows (after filtering)."""
+        return self._proxy.rowCount()
+
     # --- private ----------------------------------------------------------
 
-    def _on_double_click(self, row, _col):
-        if 0 <= row < len(self._rows):
-            self.row_double_clicked.emit(self._rows[row])
+    def _unsort(self):
+        """Back to source order (no sort indicator)."""
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self._model.sort(-1)
+
+    def _row_at(self, proxy_index):
+        source = self._proxy.mapToSource(proxy_index)
+        if not source.isValid():
+            return None
+        return self._model.row_dict(source.row())
+
+    def _on_double_click(self, index):
+        row = self._row_at(index)
+        if row is not None:
+            self.row_double_clicked.emit(row)
 
     def _show_context_menu(self, pos):
         row = self.selected_row()
@@ -0,0 +1,209 @@
+"""Opt-in instrumentation of view refreshes and dialogs.
+
+Enable with ``python gui_qt/app.py --profile`` or ``PEPTIDE_PROFILE=1``
+(also for the installed app). Each measured operation records:
+
+- wall time (ms)
+- SQL statements executed (``sqlite3`` trace callback on the main and the
+  per-thread read-only connections; background fetches included)
+- net Python allocations (``tracemalloc`` traced-memory delta, KB)
+
+Measured operations are ``BaseView.refresh`` (from the call to the end of
+``render()``) and ``_build_ui`` / ``_submit`` of the dialogs. The main
+window shows a rolling summary in the status bar, and every record is
+appended to a per-session CSV (``profile_<timestamp>.csv`` next to the
+database). When disabled every hook is a no-op.
+"""
+
+import csv
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import NamedTuple
+
+# Records kept for the rolling summary
+_WINDOW = 50
+
+_DIALOG_METHODS = ("_build_ui", "_submit")
+
+_enabled = False
+_csv_path = None
+_records: deque = deque(maxlen=_WINDOW)
+_listeners: list = []
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Record(NamedTuple):
+    """One measured operation."""
+    timestamp: str
+    name: str
+    wall_ms: float
+    sql: int
+    alloc_kb: float
+
+
+class _Probe:
+    __slots__ = ("name", "t0", "sql0", "mem0")
+
+    def __init__(self, name):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.sql0 = sql_count()
+        self.mem0 = tracemalloc.get_traced_memory()[0]
+
+
+def enable(csv_path=None):
+    """Start measuring; ``csv_path`` receives one row per record."""
+    global _enabled, _csv_path
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _csv_path = csv_path
+    if csv_path:
+        try:
+            with open(csv_path, "w", newline="", encoding="utf-8") as fh:
+                csv.writer(fh).writerow(Record._fields)
+        except OSError as e:
+            print(f"Profile CSV not available: {e}")
+            _csv_path = None
+    _enabled = True
+    instrument_dialogs()
+
+
+def disable():
+    global _enabled, _csv_path
+    _enabled = False
+    _csv_path = None
+    _records.clear()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _enabled
+
+
+# ── SQL statement count ──────────────────────────────────────────────────
+
+
+def _count_statement(_statement):
+    _local.sql = getattr(_local, "sql", 0) + 1
+
+
+def trace_connection(conn):
+    """Count the statements of ``conn`` (on the thread that runs them)."""
+    if _enabled:
+        conn.set_trace_callback(_count_statement)
+
+
+def sql_count():
+    """Statements executed so far by the current thread."""
+    return getattr(_local, "sql", 0)
+
+
+# ── Measuring ────────────────────────────────────────────────────────────
+
+
+def start(name):
+    """Begin measuring ``name``; None when disabled (pass it to ``finish``)."""
+    return _Probe(name) if _enabled else None
+
+
+def finish(probe, extra_sql=0):
+    """Close ``probe`` and record it. ``extra_sql``: statements run by a
+    worker thread on behalf of this operation."""
+    if probe is None or not _enabled:
+        return None
+    record = Record(
+        timestamp=datetime.now().isoformat(timespec="seconds"),
+        name=probe.name,
+        wall_ms=round((time.perf_counter() - probe.t0) * 1000.0, 1),
+        sql=sql_count() - probe.sql0 + extra_sql,
+        alloc_kb=round((tracemalloc.get_traced_memory()[0] - probe.mem0) / 1024.0, 1),
+    )
+    with _lock:
+        _records.append(record)
+        if _csv_path:
+            try:
+                with open(_csv_path, "a", newline="", encoding="utf-8") as fh:
+                    csv.writer(fh).writerow(record)
+            except OSError:
+                pass
+    for listener in list(_listeners):
+        listener(record)
+    return record
+
+
+@contextmanager
+def measure(name):
+    probe = start(name)
+    try:
+        yield
+    finally:
+        finish(probe)
+
+
+def subscribe(callback):
+    """``callback(record)`` after every record (main window status bar)."""
+    _listeners.append(callback)
+    return lambda: _listeners.remove(callback) if callback in _listeners else None
+
+
+def records():
+    return list(_records)
+
+
+def summary(record):
+    """Status-bar text: latest record + slowest of the rolling window."""
+    text = (
+        f"{record.name} {record.wall_ms:.0f} ms · {record.sql} SQL"
+        f" · {record.alloc_kb:+.0f} KB"
+    )
+    slowest = max(_records, key=lambda r: r.wall_ms, default=None)
+    if slowest is not None and slowest is not record:
+        text += f"  |  max: {slowest.name} {slowest.wall_ms:.0f} ms"
+    return text
+
+
+# ── Dialogs ──────────────────────────────────────────────────────────────
+
+
+def _wrap(cls, method_name):
+    method = cls.__dict__[method_name]
+    if getattr(method, "_instrumented", False):
+        return
+    label = f"{cls.__name__}.{method_name}"
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        probe = start(label)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            finish(probe)
+
+    wrapper._instrumented = True
+    setattr(cls, method_name, wrapper)
+
+
+def instrument_dialogs():
+    """Wrap ``_build_ui`` / ``_submit`` of every loaded QDialog subclass.
+
+    Views are imported lazily: the main window calls this again after
+    building a section, so dialogs of newly imported modules are covered.
+    """
+    if not _enabled:
+        return
+    from PySide6.QtWidgets import QDialog
+
+    pending = list(QDialog.__subclasses__())
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        for name in _DIALOG_METHODS:
+            if name in cls.__dict__:
+                _wrap(cls, name)
@@ -0,0 +1,68 @@
+"""Startup timing report: time-to-interactive per launch.
+
+Milestones are measured from the first import of this module (the first
+thing ``gui_qt/app.py`` does), so interpreter start-up is not included:
+
+- ``imports``     — gui_qt.app and its module-level imports loaded
+- ``window``      — main window constructed (only the Today section is built)
+- ``first_paint`` — main window painted for the first time
+- ``today_data``  — Today view rendered its first data
+
+When all four are recorded, one JSON line is appended to the log configured
+by ``configure()`` (``startup_times.jsonl`` next to the database) and a
+summary is printed, so releases can be compared over time.
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+
+_T0 = time.perf_counter()
+
+MILESTONES = ("imports", "window", "first_paint", "today_data")
+
+_marks: dict = {}
+_config: dict = {}
+
+
+def configure(log_path=None, **info):
+    """Enable the report: ``log_path`` (JSONL) and extra fields (version, env)."""
+    _config["log_path"] = log_path
+    _config["info"] = info
+    _config["enabled"] = True
+
+
+def mark(name):
+    """Record milestone ``name`` (first occurrence only)."""
+    if name in _marks:
+        return
+    _marks[name] = (time.perf_counter() - _T0) * 1000.0
+    if _config.get("enabled") and all(m in _marks for m in MILESTONES):
+        _report()
+
+
+def elapsed_ms():
+    """Milestones recorded so far → ms since startup."""
+    return dict(_marks)
+
+
+def _report():
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        **_config.get("info", {}),
+        **{f"{m}_ms": round(_marks[m], 1) for m in MILESTONES},
+    }
+    print(
+        "Startup: "
+        + "  ".join(f"{m} {_marks[m]:.0f} ms" for m in MILESTONES)
+    )
+    log_path = _config.get("log_path")
+    if not log_path:
+        return
+    try:
+        with open(log_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Startup report not saved: {e}")
@@ -1,8 +1,5 @@
 """Archive section — Peptidi, Fornitori, Calcolatore tabs."""
 
-import re
-from pathlib import Path
-
 from PySide6.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -29,174 +26,6 @@ from .base import BaseView
 from ..components.data_table import DataTable
 from ..components.dialogs import confirm_dialog, error_dialog
 
-# ── Compendium parser ─────────────────────────────────────────────────────
-
-_DOCS_DIR = Path(__file__).parent.parent.parent / "docs"
-_COMPENDIUM_FILES = [
-    _DOCS_DIR / "COMPENDIO_PEPTIDI.md",
-    _DOCS_DIR / "COMPENDIO_AAS_FARMACI.md",
-]
-
-
-def _norm(name: str) -> str:
-    """Normalise a name for matching: lowercase, strip non-alphanumeric."""
-    return re.sub(r"[^a-z0-9]", "", name.lower())
-
-
-class _CompendiumParser:
-    """Lazy singleton: parses both compendium docs and exposes lookup()."""
-
-    _instance = None
-
-    @classmethod
-    def get(cls):
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
-
-    def __init__(self):
-        self._sections: dict[str, str] = {}  # norm_key → raw markdown text
-        for path in _COMPENDIUM_FILES:
-            if path.exists():
-                self._parse(path.read_text(encoding="utf-8"))
-
-    def _parse(self, text: str):
-        """Split on ### headers; register each section under all name variants."""
-        lines = text.splitlines()
-        current_header = None
-        current_lines: list[str] = []
-
-        def _flush():
-            if current_header:
-                self._register(current_header, "\n".join(current_lines))
-
-        for line in lines:
-            if line.startswith("### "):
-                _flush()
-                current_header = line[4:].strip()
-                current_lines = []
-            elif line.startswith("## ") or line.strip() == "---":
-                # Don't flush on ## or --- — keep accumulating inside section
-                # (--- separators between sections in the same ## group are ok)
-                current_lines.append(line)
-            else:
-                current_lines.append(line)
-
-        _flush()
-
-    def _register(self, header: str, content: str):
-        """Register a section under the main name and any parenthetical aliases."""
-        # header examples: "BPC-157", "TB-500 (Thymosin Beta-4)", "PT-141 (Bremelanotide)"
-        parts = re.split(r"[(/]", header)
-        names = [p.strip().rstrip(")") for p in parts if p.strip()]
-        for name in names:
-            key = _norm(name)
-            if key and key not in self._sections:
-                self._sections[key] = f"### {header}\n{content}"
-
-    def lookup(self, peptide_name: str) -> str | None:
-        """Return raw markdown for peptide_name, or None if not found."""
-        key = _norm(peptide_name)
-        if key in self._sections:
-            return self._sections[key]
-        # partial match fallback: check if key is a substring of any registered key
-        for k, v in self._sections.items():
-            if key in k or k in key:
-                return v
-        return None
-
-
-def _md_to_html(md: str) -> str:
-    """Convert structured markdown to HTML for QTextBrowser."""
-    lines = md.splitlines()
-    html_parts = ["<style>"
-                  "body{font-family:sans-serif;font-size:13px;color:#e0e0e0;"
-                  "background:#1e1e1e;padding:8px}"
-                  "h2{color:#90caf9;margin:12px 0 4px}"
-                  "h3{color:#80cbc4;margin:10px 0 4px}"
-                  "h4{color:#ce93d8;margin:8px 0 2px}"
-                  "table{border-collapse:collapse;width:100%;margin:6px 0}"
-                  "td,th{border:1px solid #424242;padding:4px 8px;text-align:left}"
-                  "th{background:#2d2d2d;color:#90caf9}"
-                  "tr:nth-child(even){background:#252525}"
-                  "ul{margin:4px 0;padding-left:20px}"
-                  "li{margin:2px 0}"
-                  "b{color:#ffcc02}"
-                  "hr{border:none;border-top:1px solid #424242;margin:10px 0}"
-                  "</style><body>"]
-
-    in_table = False
-    in_list = False
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-
-        # Close open lists before non-list content
-        if in_list and not line.strip().startswith("- "):
-            html_parts.append("</ul>")
-            in_list = False
-
-        if line.startswith("### "):
-            if in_table:
-                html_parts.append("</table>"); in_table = False
-            html_parts.append(f"<h3>{line[4:].strip()}</h3>")
-        elif line.startswith("## "):
-            if in_table:
-                html_parts.append("</table>"); in_table = False
-            html_parts.append(f"<h2>{line[3:].strip()}</h2>")
-        elif line.startswith("#### "):
-            html_parts.append(f"<h4>{line[5:].strip()}</h4>")
-        elif line.strip() == "---":
-            if in_table:
-                html_parts.append("</table>"); in_table = False
-            html_parts.append("<hr>")
-        elif line.startswith("|"):
-            # Markdown table row
-            cells = [c.strip() for c in line.strip("|").split("|")]
-            # Skip separator rows like |---|---|
-            if all(re.match(r"^[-: ]+$", c) for c in cells):
-                i += 1
-                continue
-            if not in_table:
-                html_parts.append("<table>")
-                in_table = True
-                # First row → header
-                row = "".join(f"<th>{_inline(c)}</th>" for c in cells)
-                html_parts.append(f"<tr>{row}</tr>")
-            else:
-                row = "".join(f"<td>{_inline(c)}</td>" for c in cells)
-                html_parts.append(f"<tr>{row}</tr>")
-        else:
-            if in_table:
-                html_parts.append("</table>"); in_table = False
-            stripped = line.strip()
-            if stripped.startswith("- ") or stripped.startswith("* "):
-                if not in_list:
-                    html_parts.append("<ul>"); in_list = True
-                html_parts.append(f"<li>{_inline(stripped[2:])}</li>")
-            elif stripped:
-                html_parts.append(f"<p>{_inline(stripped)}</p>")
-
-        i += 1
-
-    if in_table:
-        html_parts.append("</table>")
-    if in_list:
-        html_parts.append("</ul>")
-    html_parts.append("</body>")
-    return "\n".join(html_parts)
-
-
-def _inline(text: str) -> str:
-    """Convert inline markdown (bold, italic, code) to HTML."""
-    # **bold**
-    text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
-    # *italic*
-    text = re.sub(r"\*(.+?)\*", r"<i>\1</i>", text)
-    # `code`
-    text = re.sub(r"`(.+?)`", r"<code>\1</code>", text)
-    return text
-
 
 # ── Shared dialog style ───────────────────────────────────────────────────
 
@@ -230,6 +59,8 @@ def _section_label(text):
 class PeptidiTab(BaseView):
     """Peptide catalog: search, add, edit, delete."""
 
+    watch_tables = ('peptides',)
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -271,14 +102,15 @@ class PeptidiTab(BaseView):
         self._table.row_double_clicked.connect(self._on_details)
         lay.addWidget(self._table, 1)
 
-    def refresh(self):
-        search = self._search.text().strip() or None
-        try:
-            rows = self.manager.get_peptides(search=search)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
-        self._table.load_data(sorted(rows, key=lambda r: r.get("id", 0)))
+    def fetch_params(self):
+        return {"search": self._search.text().strip() or None}
+
+    def fetch(self, manager, params):
+        rows = manager.get_peptides(search=params["search"])
+        return sorted(rows, key=lambda r: r.get("id", 0))
+
+    def render(self, rows):
+        self._table.load_data(rows)
 
     def _on_add(self):
         dlg = _PeptideDialog(self.app, parent=self)
@@ -435,7 +267,9 @@ class _PeptideDetailsDialog(QDialog):
             lay.addWidget(db_frame)
 
         # ── Compendium section ────────────────────────────────────────────
-        compendium_md = _CompendiumParser.get().lookup(name)
+        from ..compendium import Compendium
+
+        compendium_html = Compendium.get().html(name, aliases)
 
         sep = QLabel("Scheda di riferimento scientifica")
         sep.setStyleSheet(
@@ -451,8 +285,8 @@ class _PeptideDetailsDialog(QDialog):
             " border-radius: 4px; padding: 4px; }"
         )
 
-        if compendium_md:
-            browser.setHtml(_md_to_html(compendium_md))
+        if compendium_html:
+            browser.setHtml(compendium_html)
         else:
             browser.setHtml(
                 "<body style='color:#757575;font-family:sans-serif;padding:16px'>"
@@ -477,6 +311,8 @@ class _PeptideDetailsDialog(QDialog):
 class FornitoriTab(BaseView):
     """Supplier catalog: search, add, edit, delete."""
 
+    watch_tables = ('suppliers',)
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -519,17 +355,18 @@ class FornitoriTab(BaseView):
         self._table.row_double_clicked.connect(self._on_details)
         lay.addWidget(self._table, 1)
 
-    def refresh(self):
-        search = self._search.text().strip() or None
-        try:
-            rows = self.manager.get_suppliers(search=search)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch_params(self):
+        return {"search": self._search.text().strip() or None}
+
+    def fetch(self, manager, params):
+        rows = manager.get_suppliers(search=params["search"])
         for r in rows:
             if r.get("rating"):
                 r["rating"] = f"{'★' * int(r['rating'])}{'☆' * (5 - int(r['rating']))}"
-        self._table.load_data(sorted(rows, key=lambda r: r.get("id", 0)))
+        return sorted(rows, key=lambda r: r.get("id", 0))
+
+    def render(self, rows):
+        self._table.load_data(rows)
 
     def _on_add(self):
         dlg = _SupplierDialog(self.app, parent=self)
@@ -685,6 +522,8 @@ class _SupplierDetailsDialog(QDialog):
 class CalcolatoreTab(BaseView):
     """Dose calculator: mcg ↔ ml with active-prep or simulation mode."""
 
+    watch_tables = ('preparations', 'batches', 'batch_composition', 'peptides')
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._concentration_mcg_ml = 0.0
@@ -805,13 +644,14 @@ class CalcolatoreTab(BaseView):
         # Initial mode
         self._on_mode_changed()
 
-    def refresh(self):
-        """Reload active preparations list."""
+    def fetch(self, manager, params):
+        """Active preparations list."""
         try:
-            preps = self.manager.get_preparations(only_active=True)
+            return manager.get_preparations(only_active=True)
         except Exception:
-            preps = []
+            return []
 
+    def render(self, preps):
         self._prep_combo.blockSignals(True)
         self._prep_combo.clear()
         self._prep_combo.addItem("— seleziona —", None)
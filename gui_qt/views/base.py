@@ -1,6 +1,165 @@
-"""Base view widget for all PySide6 views."""
+"""Base view widget for all PySide6 views.
 
-from PySide6.QtWidgets import QWidget, QVBoxLayout
+Data loading
+------------
+Views split their ``refresh()`` into three steps:
+
+- ``fetch_params()`` — main thread: read filters/search text from widgets
+- ``fetch(manager, params)`` — worker thread: pure data fetch, no widgets
+- ``render(data)`` — main thread: fill tables/labels with the fetched data
+
+Fetches run on a dedicated ``QThreadPool``; each worker thread owns a
+read-only ``PeptideManager`` (``PRAGMA query_only``), so a slow query never
+blocks the window. Writes stay on the main-thread ``app.manager``. A newer
+refresh cancels the previous one: its SQL is interrupted and its result is
+dropped.
+
+Change notifications
+--------------------
+Every commit on ``app.manager`` publishes ``ChangeEvent(table, ids, op)`` on
+the manager's change bus (``peptide_manager/events.py``); the main window
+forwards them to ``notify_changes()``. A view lists the tables it reads in
+``watch_tables``: unrelated commits leave it alone, related ones mark it
+stale and refresh it if visible (hidden views wait until shown, see
+``refresh_if_stale()``). Events not yet rendered are in ``pending_changes``,
+so ``fetch_params()`` can narrow what gets re-queried.
+"""
+
+import sqlite3
+import threading
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Qt, Signal
+from PySide6.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+from .. import instrumentation
+from ..components.dialogs import error_dialog
+
+
+# Delay before the loading indicator appears (avoids flicker on fast loads)
+_LOADING_DELAY_MS = 150
+
+_pool = None
+_managers: dict = {}          # (thread ident, db_path) → read-only PeptideManager
+_managers_lock = threading.Lock()
+
+
+def _loader_pool():
+    """Thread pool dedicated to view fetches (threads never expire)."""
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(2)
+        # Threads stay alive so their read-only connections are reused
+        _pool.setExpiryTimeout(-1)
+    return _pool
+
+
+def _thread_manager(db_path):
+    """Read-only PeptideManager owned by the current worker thread."""
+    key = (threading.get_ident(), db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+    if manager is None:
+        from peptide_manager import PeptideManager
+
+        manager = PeptideManager(db_path, read_only=True)
+        instrumentation.trace_connection(manager.conn)
+        with _managers_lock:
+            _managers[key] = manager
+    return manager
+
+
+def shutdown_loaders(timeout_ms=5000):
+    """Wait for running fetches and close the per-thread connections.
+
+    Called by the main window on close, before the exit backup.
+    """
+    if _pool is not None:
+        _pool.waitForDone(timeout_ms)
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        try:
+            manager.close()
+        except sqlite3.Error:
+            pass
+
+
+class _LoadTicket:
+    """Cancellation handle shared between a view and its running fetch."""
+
+    __slots__ = ("generation", "cancelled", "conn", "sql")
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.cancelled = False
+        self.conn = None
+        self.sql = 0                # statements run by the fetch (profiling)
+
+    def cancel(self):
+        self.cancelled = True
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+class _LoaderSignals(QObject):
+    loaded = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class _FetchTask(QRunnable):
+    """Runs ``fetch(manager, params)`` on a pool thread."""
+
+    def __init__(self, fetch, params, db_path, ticket, signals):
+        super().__init__()
+        self._fetch = fetch
+        self._params = params
+        self._db_path = db_path
+        self._ticket = ticket
+        self._signals = signals
+
+    def run(self):
+        ticket = self._ticket
+        if ticket.cancelled:
+            return
+        try:
+            manager = _thread_manager(self._db_path)
+            ticket.conn = manager.conn
+            if ticket.cancelled:
+                return
+            sql0 = instrumentation.sql_count()
+            data = self._fetch(manager, self._params)
+            ticket.sql = instrumentation.sql_count() - sql0
+        except Exception as exc:  # reported to the view
+            if not ticket.cancelled:
+                self._emit(self._signals.failed, str(exc))
+            return
+        finally:
+            ticket.conn = None
+        if not ticket.cancelled:
+            self._emit(self._signals.loaded, data)
+
+    def _emit(self, signal, payload):
+        try:
+            signal.emit(self._ticket.generation, payload)
+        except RuntimeError:
+            pass  # view destroyed while fetching
+
+
+def changed_tables(events):
+    """Tables touched by ``events``, or None if any change is unlocalized."""
+    tables = set()
+    for event in events:
+        if event.table is None:
+            return None
+        tables.add(event.table)
+    return tables
 
 
 class BaseView(QWidget):
@@ -10,16 +169,41 @@ class BaseView(QWidget):
     - Reference to the main application window (``self.app``)
     - Shortcut to ``self.manager`` (PeptideManager)
     - ``self.edit_mode`` property
-    - ``refresh()`` hook for subclass data reload
+    - ``refresh()`` → background ``fetch()`` + main-thread ``render()``
+    - ``notify_changes()`` → refresh only when ``watch_tables`` changed
     - Pre-configured QVBoxLayout with 20 px margins
     """
 
+    # Tables the view reads; empty = any committed change marks it stale
+    watch_tables: tuple = ()
+
     def __init__(self, app, parent=None):
         super().__init__(parent)
         self.app = app
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
 
+        self._load_generation = 0
+        self._ticket = None
+        self._loader_signals = _LoaderSignals(self)
+        self._loader_signals.loaded.connect(self._on_loaded)
+        self._loader_signals.failed.connect(self._on_load_failed)
+
+        self._stale = True
+        self._pending_changes = []
+        self._consumed_changes = 0
+        self._refresh_scheduled = False
+        self._probe = None
+
+        self._loading_label = QLabel("Caricamento…", self)
+        self._loading_label.setObjectName("loading_indicator")
+        self._loading_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self._loading_label.setStyleSheet(
+            "background: #333; color: #e0e0e0; border-radius: 4px;"
+            " padding: 4px 10px; font-size: 12px;"
+        )
+        self._loading_label.hide()
+
     @property
     def manager(self):
         """Shortcut to PeptideManager instance."""
@@ -30,5 +214,139 @@ class BaseView(QWidget):
         """Current edit-mode state from the main window."""
         return self.app.edit_mode
 
+    @property
+    def is_loading(self):
+        """True while a fetch for this view is in flight."""
+        return self._ticket is not None
+
+    @property
+    def is_stale(self):
+        """True if data changed since the last load (or never loaded)."""
+        return self._stale
+
+    @property
+    def pending_changes(self):
+        """Change events received since the last successful render."""
+        return tuple(self._pending_changes)
+
+    # ── Change notifications ─────────────────────────────────────────
+
+    def notify_changes(self, events):
+        """Receive committed changes; refresh now if visible, else on show."""
+        if self.watch_tables:
+            events = [e for e in events if e.touches(self.watch_tables)]
+        if not events:
+            return
+        self._pending_changes.extend(events)
+        self._stale = True
+        if self.isVisible() and not self._refresh_scheduled:
+            # Coalesce the commits of one operation into a single refresh
+            self._refresh_scheduled = True
+            QTimer.singleShot(0, self, self._run_scheduled_refresh)
+
+    def _run_scheduled_refresh(self):
+        self._refresh_scheduled = False
+        if self._stale and self.isVisible():
+            self.refresh()
+
+    def refresh_if_stale(self):
+        """Refresh only if watched data changed since the last load."""
+        if self._stale:
+            self.refresh()
+
+    # ── Data loading ─────────────────────────────────────────────────
+
+    def fetch_params(self):
+        """Snapshot of widget state needed by ``fetch()`` (main thread)."""
+        return {}
+
+    def fetch(self, manager, params):
+        """Load the view data (worker thread). Must not touch widgets.
+
+        Override in subclasses; ``manager`` is a read-only PeptideManager.
+        The default loads nothing: ``refresh()`` skips views that keep it.
+        """
+        return None
+
+    def render(self, data):
+        """Show the data returned by ``fetch()`` (main thread)."""
+
+    def on_load_error(self, message):
+        """Report a failed fetch. Override for silent views."""
+        error_dialog(self, "Errore", message)
+
     def refresh(self):
-        """Reload data from the database. Override in subclasses."""
+        """Reload data from the database.
+
+        Runs ``fetch()`` in the background and ``render()`` when it returns.
+        Views without a ``fetch()`` keep the old no-op behaviour.
+        """
+        if type(self).fetch is BaseView.fetch:
+            return
+        self._probe = instrumentation.start(f"{type(self).__name__}.refresh")
+        params = self.fetch_params()
+        self._consumed_changes = len(self._pending_changes)
+        self._stale = False
+        if self._ticket is not None:
+            self._ticket.cancel()
+        self._load_generation += 1
+        ticket = _LoadTicket(self._load_generation)
+
+        db_path = getattr(self.app, "db_path", None)
+        if not db_path or db_path == ":memory:":
+            # No file to open per thread (e.g. embedded/test app): load inline
+            self._ticket = None
+            try:
+                data = self.fetch(self.manager, params)
+            except Exception as exc:
+                self._stale = True
+                self._probe = None
+                self.on_load_error(str(exc))
+                return
+            self._render_loaded(data)
+            return
+
+        self._ticket = ticket
+        QTimer.singleShot(
+            _LOADING_DELAY_MS, self, partial(self._show_loading, ticket.generation)
+        )
+        _loader_pool().start(
+            _FetchTask(self.fetch, params, db_path, ticket, self._loader_signals)
+        )
+
+    def _on_loaded(self, generation, data):
+        if generation != self._load_generation:
+            return  # stale: a newer refresh is pending
+        fetch_sql = self._ticket.sql if self._ticket is not None else 0
+        self._finish_loading()
+        self._render_loaded(data, fetch_sql)
+
+    def _on_load_failed(self, generation, message):
+        if generation != self._load_generation:
+            return
+        self._finish_loading()
+        self._stale = True
+        self._probe = None
+        self.on_load_error(message)
+
+    def _render_loaded(self, data, fetch_sql=0):
+        # Events seen by fetch_params() are now on screen; later ones stay
+        del self._pending_changes[:self._consumed_changes]
+        self._consumed_changes = 0
+        self.render(data)
+        probe, self._probe = self._probe, None
+        instrumentation.finish(probe, extra_sql=fetch_sql)
+
+    def _finish_loading(self):
+        self._ticket = None
+        self._loading_label.hide()
+
+    def _show_loading(self, generation):
+        if self._ticket is None or self._ticket.generation != generation:
+            return
+        self._loading_label.adjustSize()
+        self._loading_label.move(
+            max(0, self.width() - self._loading_label.width() - 24), 8
+        )
+        self._loading_label.raise_()
+        self._loading_label.show()
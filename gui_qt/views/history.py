@@ -1,9 +1,5 @@
 """History section — Administrations list and Statistics."""
 
-import io
-import base64
-from datetime import date, timedelta
-
 from PySide6.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -23,22 +19,29 @@ from PySide6.QtWidgets import (
     QTableWidgetItem,
     QHeaderView,
     QAbstractItemView,
-    QSizePolicy,
     QFileDialog,
     QScrollArea,
 )
-from PySide6.QtCore import Qt, QDate
+from PySide6.QtCore import Qt, QDate, QTimer
 
+from . import history_charts
 from .base import BaseView
 from ..components.data_table import DataTable
 from ..components.dialogs import confirm_dialog, error_dialog
 
-try:
-    import pandas as pd
+pd = None  # pandas, imported on first use by _has_pandas()
 
-    _HAS_PANDAS = True
-except ImportError:
-    _HAS_PANDAS = False
+
+def _has_pandas():
+    """Import pandas on first use: it is not needed to open the window."""
+    global pd
+    if pd is None:
+        try:
+            import pandas
+        except ImportError:
+            return False
+        pd = pandas
+    return True
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -290,47 +293,6 @@ class _EditDialog(QDialog):
 #  PEPTIDE REPORT
 # ═══════════════════════════════════════════════════════════════════════════════
 
-_CYCLE_COLORS = ['#42a5f5', '#66bb6a', '#ffa726', '#ab47bc', '#26c6da', '#ef9a9a']
-
-
-def _compute_off_spans(cycle, today):
-    """Yield (start_date, end_date) pairs for consecutive OFF days in a cycle."""
-    start_str = cycle.get('start_date')
-    if not start_str:
-        return
-    start = date.fromisoformat(start_str)
-    end_str = cycle.get('end_date')
-    end = date.fromisoformat(end_str) if end_str else today
-
-    weekdays = cycle.get('weekdays')
-    days_on = cycle.get('days_on')
-    days_off = cycle.get('days_off') or 0
-
-    off_start = None
-    d = start
-    while d <= end:
-        if weekdays is not None:
-            is_off = d.weekday() not in weekdays
-        elif days_on and days_on > 0:
-            elapsed = (d - start).days
-            cycle_len = days_on + days_off
-            is_off = (elapsed % cycle_len) >= days_on if cycle_len > 0 else False
-        else:
-            is_off = False  # giornaliero: nessun OFF
-
-        if is_off:
-            if off_start is None:
-                off_start = d
-        else:
-            if off_start is not None:
-                yield (off_start, d - timedelta(days=1))
-                off_start = None
-        d += timedelta(days=1)
-
-    if off_start is not None:
-        yield (off_start, end)
-
-
 def _build_report_html(data, b64_img=None):
     """Generate a self-contained HTML report for the peptide."""
     pep = data['peptide']['name']
@@ -406,7 +368,10 @@ class _PeptideReportDialog(QDialog):
         super().__init__(parent)
         self._app = app
         self._data = None
-        self._fig = None
+        self._range = None           # (peptide_id, dal, al) dei dati caricati
+        self._chart = None           # ReportChart mostrato (PNG + base64)
+        self._chart_key = None
+        self._chart_task = None
         self.setWindowTitle("Report Peptide")
         self.setMinimumWidth(900)
         self.setMinimumHeight(700)
@@ -526,6 +491,7 @@ class _PeptideReportDialog(QDialog):
             from ..components.dialogs import error_dialog
             error_dialog(self, "Errore", str(e))
             return
+        self._range = (pid, df, dt)
         self._refresh_summary()
         self._refresh_charts()
         self._html_btn.setEnabled(True)
@@ -626,140 +592,78 @@ class _PeptideReportDialog(QDialog):
     # ── Charts tab ──────────────────────────────────────────────────────
 
     def _refresh_charts(self):
-        while self._chart_lay.count():
-            item = self._chart_lay.takeAt(0)
-            w = item.widget()
-            if w:
-                w.deleteLater()
-        self._fig = None
+        self._clear_charts()
+        self._chart = None
+        self._chart_key = None
 
-        if not _HAS_PANDAS:
+        if not _has_pandas():
             self._chart_lay.addWidget(QLabel("Pandas non disponibile."))
             return
-
         try:
-            from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-            from matplotlib.figure import Figure
-            import matplotlib.dates as mdates
-            import pandas as pd
+            import matplotlib  # noqa: F401
         except ImportError:
             self._chart_lay.addWidget(QLabel("Matplotlib non disponibile."))
             return
 
-        admins = self._data['administrations']
-        cycles = self._data['cycles']
-        if not admins:
+        if not self._data['administrations']:
             self._chart_lay.addWidget(
                 QLabel("Nessuna somministrazione nel periodo selezionato."))
             return
 
-        df = pd.DataFrame(admins)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-
-        today = date.today()
-
-        fig = Figure(figsize=(11, 7), facecolor='#1e1e1e')
-        fig.subplots_adjust(hspace=0.42, left=0.08, right=0.97, top=0.94, bottom=0.10)
-        ax1 = fig.add_subplot(2, 1, 1)
-        ax2 = fig.add_subplot(2, 1, 2)
-
-        for ax in (ax1, ax2):
-            ax.set_facecolor('#252525')
-            for sp in ax.spines.values():
-                sp.set_color('#424242')
-            ax.tick_params(colors='#aeaeae', labelsize=8)
-            ax.yaxis.label.set_color('#aeaeae')
-            ax.title.set_color('#e0e0e0')
-            ax.grid(True, color='#333', linewidth=0.5, alpha=0.6)
-
-        import matplotlib.patches as mpatches
-        legend_handles = []
-
-        # ── Background: cycle spans + OFF spans ──────────────────────
-        off_patch_added = False
-        for i, cycle in enumerate(cycles):
-            if not cycle.get('start_date'):
-                continue
-            ts = pd.Timestamp(cycle['start_date'])
-            end_raw = cycle.get('end_date')
-            te = pd.Timestamp(end_raw) if end_raw else pd.Timestamp(today)
-            color = _CYCLE_COLORS[i % len(_CYCLE_COLORS)]
-
-            for ax in (ax1, ax2):
-                ax.axvspan(ts, te, alpha=0.06, color=color, zorder=0)
-
-            for off_s, off_e in _compute_off_spans(cycle, today):
-                ts_off = pd.Timestamp(off_s)
-                te_off = pd.Timestamp(off_e) + pd.Timedelta(days=1)
-                for ax in (ax1, ax2):
-                    ax.axvspan(ts_off, te_off, alpha=0.18,
-                               color='#ef5350', zorder=1)
-            if not off_patch_added and list(_compute_off_spans(cycle, today)):
-                legend_handles.append(
-                    mpatches.Patch(color='#ef5350', alpha=0.4, label='Giorni OFF'))
-                off_patch_added = True
-
-        # ── Administrations per cycle ─────────────────────────────────
-        for i, cycle in enumerate(cycles):
-            color = _CYCLE_COLORS[i % len(_CYCLE_COLORS)]
-            cdf = df[df['cycle_id'] == cycle['id']]
-            if cdf.empty:
-                continue
-            ax1.vlines(cdf['date'], 0, cdf['dose_ml'],
-                       color=color, linewidth=1.5, alpha=0.85, zorder=3)
-            sc = ax1.scatter(cdf['date'], cdf['dose_ml'],
-                             color=color, s=28, zorder=4,
-                             label=cycle['name'])
-            legend_handles.append(sc)
-
-        # Admins without cycle
-        no_cyc = df[df['cycle_id'].isna()]
-        if not no_cyc.empty:
-            ax1.vlines(no_cyc['date'], 0, no_cyc['dose_ml'],
-                       color='#9e9e9e', linewidth=1.5, alpha=0.8, zorder=3)
-            sc = ax1.scatter(no_cyc['date'], no_cyc['dose_ml'],
-                             color='#9e9e9e', s=28, zorder=4, label='Senza ciclo')
-            legend_handles.append(sc)
-
-        ax1.set_title("Somministrazioni nel tempo  "
-                      "(sfondo rosso = giorni OFF)", fontsize=10)
-        ax1.set_ylabel("Dose (ml)", fontsize=9)
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-        ax1.xaxis.set_major_locator(mdates.AutoDateLocator())
-        if legend_handles:
-            ax1.legend(handles=legend_handles, fontsize=8,
-                       facecolor='#2d2d2d', edgecolor='#424242',
-                       labelcolor='#e0e0e0', loc='upper left')
-
-        # ── Cumulative ───────────────────────────────────────────────
-        df['cum_ml'] = df['dose_ml'].cumsum()
-        ax2.step(df['date'], df['cum_ml'], color='#42a5f5',
-                 linewidth=1.8, where='post', zorder=3)
-        ax2.fill_between(df['date'], df['cum_ml'], alpha=0.15,
-                         color='#42a5f5', step='post', zorder=2)
-        ax2.set_title("Dose cumulativa (ml)", fontsize=10)
-        ax2.set_ylabel("ml cumulativi", fontsize=9)
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-        ax2.xaxis.set_major_locator(mdates.AutoDateLocator())
-
-        fig.autofmt_xdate(rotation=30)
-
-        canvas = FigureCanvasQTAgg(fig)
-        canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self._chart_lay.addWidget(canvas)
-        self._fig = fig
+        # Rendering Agg in background; stesso peptide/periodo/dati = cache
+        key = history_charts.chart_key(*self._range, self._data)
+        self._chart_key = key
+        chart = history_charts.cached_chart(key)
+        if chart is not None:
+            self._show_chart(chart)
+            return
+        waiting = QLabel("Rendering grafici…")
+        waiting.setAlignment(Qt.AlignCenter)
+        waiting.setStyleSheet("color:#9e9e9e")
+        self._chart_lay.addWidget(waiting)
+        self._chart_task = history_charts.start_chart(
+            key, self._data, self._on_chart_done, self._on_chart_failed)
+
+    def _clear_charts(self):
+        while self._chart_lay.count():
+            item = self._chart_lay.takeAt(0)
+            w = item.widget()
+            if w:
+                w.deleteLater()
+
+    def _show_chart(self, chart):
+        self._clear_charts()
+        self._chart = chart
+        self._chart_lay.addWidget(history_charts.ChartImage(chart.png))
+
+    def _on_chart_done(self, key, chart):
+        if key != self._chart_key:
+            return  # risultato di un caricamento precedente
+        self._chart_task = None
+        self._show_chart(chart)
+
+    def _on_chart_failed(self, key, message):
+        if key != self._chart_key:
+            return
+        self._chart_task = None
+        self._clear_charts()
+        self._chart_lay.addWidget(QLabel(f"Errore grafici: {message}"))
 
     # ── Export ──────────────────────────────────────────────────────────
 
-    def _figure_to_b64(self):
-        if self._fig is None:
+    def _chart_b64(self):
+        """Base64 del grafico già disegnato (in attesa: dalla cache o subito)."""
+        if self._chart is not None:
+            return self._chart.b64
+        if self._chart_key is None:
             return None
-        buf = io.BytesIO()
-        self._fig.savefig(buf, format='png', dpi=150,
-                          facecolor='#1e1e1e', bbox_inches='tight')
-        buf.seek(0)
-        return base64.b64encode(buf.read()).decode()
+        chart = history_charts.cached_chart(self._chart_key)
+        if chart is None:
+            try:
+                chart = history_charts.render_report_chart(self._data)
+            except Exception:
+                return None
+        return chart.b64
 
     def _save_html(self):
         if not self._data:
@@ -771,7 +675,7 @@ class _PeptideReportDialog(QDialog):
         )
         if not path:
             return
-        html = _build_report_html(self._data, self._figure_to_b64())
+        html = _build_report_html(self._data, self._chart_b64())
         try:
             with open(path, 'w', encoding='utf-8') as f:
                 f.write(html)
@@ -786,26 +690,141 @@ class _PeptideReportDialog(QDialog):
 # ═══════════════════════════════════════════════════════════════════════════════
 
 
+class _AdminFilterIndex:
+    """Colonne pre-elaborate per filtrare lo storico senza copiare il DataFrame.
+
+    Costruito una volta per caricamento (nel worker): le colonne testuali
+    diventano codici categoriali + valori distinti in minuscolo, le date un
+    array ``datetime64[D]``. Ogni filtro è una maschera booleana calcolata
+    sui valori distinti e memorizzata per (colonna, valore); ``rows()``
+    combina le maschere attive in AND e restituisce le posizioni da passare
+    a ``DataTable.set_row_subset()``.
+    """
+
+    _TEXT_COLUMNS = (
+        "peptide_names", "injection_site", "injection_method",
+        "protocol_name", "notes",
+    )
+
+    def __init__(self, df):
+        import numpy as np
+
+        self.df = df
+        self._np = np
+        self._codes = {}
+        self._values = {}
+        self._lowered = {}
+        for col in self._TEXT_COLUMNS:
+            codes, uniques = pd.factorize(df[col]) if col in df.columns else (
+                np.full(len(df), -1), []
+            )
+            self._codes[col] = codes
+            self._values[col] = list(uniques)
+            self._lowered[col] = [str(v).lower() for v in uniques]
+        self._days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]")
+        self._ml = pd.to_numeric(df["dose_ml"], errors="coerce").to_numpy(dtype=float)
+        self._mcg = (
+            pd.to_numeric(df["dose_mcg"], errors="coerce").to_numpy(dtype=float)
+            if "dose_mcg" in df.columns else None
+        )
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def values(self, column):
+        """Valori distinti non nulli di una colonna testuale."""
+        return self._values[column]
+
+    def _cached(self, key, build):
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = build()
+        return mask
+
+    def equals(self, column, value):
+        def build():
+            try:
+                code = self._values[column].index(value)
+            except ValueError:
+                return self._np.zeros(len(self.df), dtype=bool)
+            return self._codes[column] == code
+        return self._cached(("eq", column, value), build)
+
+    def contains(self, column, text):
+        """Sottostringa senza distinzione maiuscole (non regex)."""
+        needle = text.lower()
+
+        def build():
+            hits = [i for i, v in enumerate(self._lowered[column]) if needle in v]
+            return self._np.isin(self._codes[column], hits)
+        return self._cached(("in", column, needle), build)
+
+    def date_from(self, day):
+        return self._cached(
+            ("from", day), lambda: self._days >= self._np.datetime64(day, "D"))
+
+    def date_to(self, day):
+        return self._cached(
+            ("to", day), lambda: self._days <= self._np.datetime64(day, "D"))
+
+    def rows(self, masks):
+        """Posizioni (crescenti) delle righe che soddisfano tutte le maschere."""
+        np = self._np
+        if not masks:
+            return np.arange(len(self.df))
+        return np.flatnonzero(np.logical_and.reduce(masks))
+
+    def kpis(self, rows):
+        """Conteggio, ml/mcg totali, giorni distinti, prima/ultima data."""
+        np = self._np
+        count = len(rows)
+        days = self._days[rows]
+        days = days[~np.isnat(days)]
+        mcg = self._mcg[rows] if self._mcg is not None else None
+        return {
+            "count": count,
+            "total_ml": float(np.nansum(self._ml[rows])) if count else 0.0,
+            "total_mcg": float(np.nansum(mcg)) if count and mcg is not None else 0.0,
+            "days": int(np.unique(days).size),
+            "first": str(days.min()) if days.size else None,
+            "last": str(days.max()) if days.size else None,
+        }
+
+
 class AdministrationsTab(BaseView):
     """Storico somministrazioni con filtri lato client (pandas)."""
 
+    watch_tables = (
+        'administrations', 'preparations', 'batches', 'batch_composition',
+        'peptides', 'protocols', 'cycles',
+    )
+
+    # Colonne sui campi grezzi del DataFrame: formattate solo quando visibili
     _COLS = [
         {"key": "id",                  "label": "ID",         "width": 50},
-        {"key": "_date",               "label": "Data",       "width": 100},
-        {"key": "_time",               "label": "Ora",        "width": 58},
+        {"key": "administration_datetime", "label": "Data",   "width": 100,
+         "format": lambda v: str(v or "")[:10]},
+        {"key": "administration_datetime", "label": "Ora",    "width": 58,
+         "format": lambda v: str(v or "")[11:16]},
         {"key": "peptide_names",       "label": "Peptide",    "stretch": True},
         {"key": "batch_product",       "label": "Prodotto",   "width": 130},
         {"key": "preparation_display", "label": "Prep",       "width": 80},
-        {"key": "_dose_ml",            "label": "ml",         "width": 60},
-        {"key": "_dose_mcg",           "label": "mcg",        "width": 70},
+        {"key": "dose_ml",             "label": "ml",         "width": 60,
+         "format": lambda v: f"{float(v or 0):.2f}"},
+        {"key": "dose_mcg",            "label": "mcg",        "width": 70,
+         "format": lambda v: f"{float(v):.0f}" if v == v and v else "—"},
         {"key": "injection_site",      "label": "Sito",       "width": 100},
         {"key": "injection_method",    "label": "Metodo",     "width": 120},
         {"key": "protocol_name",       "label": "Protocollo", "width": 110},
     ]
 
+    # Attesa dopo l'ultimo tasto prima di filtrare sulle note
+    _SEARCH_DEBOUNCE_MS = 200
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
-        self._df_all = None
+        self._index = None
         self._build_ui()
         self.refresh()
 
@@ -825,7 +844,11 @@ class AdministrationsTab(BaseView):
         self._f_notes = QLineEdit()
         self._f_notes.setPlaceholderText("Cerca note...")
         self._f_notes.setFixedWidth(170)
-        self._f_notes.textChanged.connect(self._apply_filters)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self._SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._apply_filters)
+        self._f_notes.textChanged.connect(self._search_timer.start)
         fbar.addWidget(self._f_notes)
 
         self._f_from_cb = QCheckBox("Da:")
@@ -920,26 +943,33 @@ class AdministrationsTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        """Reload from DB, then apply current filters."""
-        if not _HAS_PANDAS:
+    def fetch(self, manager, params):
+        """Administrations DataFrame + filter index (None without pandas)."""
+        if not _has_pandas():
+            return None
+        return _AdminFilterIndex(manager.get_all_administrations_df())
+
+    def render(self, index):
+        """Load the dataset once, then apply current filters as row subsets."""
+        if index is None:
+            self._index = None
             self._table.load_data([])
             self._kpi_count.setText("N/A")
             return
-        try:
-            self._df_all = self.manager.get_all_administrations_df()
-        except Exception as exc:
-            error_dialog(self, "Errore caricamento", str(exc))
-            self._df_all = None
-            return
+        self._index = index
+        self._table.load_data(index.df)
         self._populate_combos()
         self._apply_filters()
 
+    def on_load_error(self, message):
+        self._index = None
+        error_dialog(self, "Errore caricamento", message)
+
     def _populate_combos(self):
         """Fill filter combos from the full dataset (block signals while doing so)."""
-        if self._df_all is None:
+        if self._index is None:
             return
-        df = self._df_all
+        index = self._index
 
         def _fill(combo, values, placeholder):
             combo.blockSignals(True)
@@ -953,14 +983,14 @@ class AdministrationsTab(BaseView):
             combo.setCurrentIndex(idx if idx >= 0 else 0)
             combo.blockSignals(False)
 
-        peptides = sorted({
-            p for cell in df["peptide_names"].dropna() for p in [cell] if cell and cell != "N/A"
-        })
-        sites = sorted(df["injection_site"].dropna().unique())
-        methods = sorted(df["injection_method"].dropna().unique())
-        protocols = sorted({
-            p for p in df["protocol_name"].dropna().unique() if p and p != "Nessuno"
-        })
+        peptides = sorted(
+            p for p in index.values("peptide_names") if p and p != "N/A"
+        )
+        sites = sorted(index.values("injection_site"))
+        methods = sorted(index.values("injection_method"))
+        protocols = sorted(
+            p for p in index.values("protocol_name") if p and p != "Nessuno"
+        )
 
         _fill(self._f_peptide, peptides, "Peptide (tutti)")
         _fill(self._f_site,    sites,    "Sito (tutti)")
@@ -968,86 +998,70 @@ class AdministrationsTab(BaseView):
         _fill(self._f_protocol,protocols,"Protocollo (tutti)")
 
     def _apply_filters(self):
-        if self._df_all is None:
+        self._search_timer.stop()
+        index = self._index
+        if index is None:
             return
-        df = self._df_all.copy()
+        masks = []
 
         # Notes search
         q = self._f_notes.text().strip()
         if q:
-            df = df[df["notes"].str.contains(q, case=False, na=False)]
+            masks.append(index.contains("notes", q))
 
         # Date range
         if self._f_from_cb.isChecked():
-            date_from = pd.to_datetime(self._f_from.date().toString("yyyy-MM-dd")).date()
-            df = df[df["date"] >= date_from]
+            masks.append(index.date_from(self._f_from.date().toString("yyyy-MM-dd")))
         if self._f_to_cb.isChecked():
-            date_to = pd.to_datetime(self._f_to.date().toString("yyyy-MM-dd")).date()
-            df = df[df["date"] <= date_to]
+            masks.append(index.date_to(self._f_to.date().toString("yyyy-MM-dd")))
 
         # Combo filters
         if self._f_peptide.currentData():
-            val = self._f_peptide.currentData()
-            df = df[df["peptide_names"].str.contains(val, case=False, na=False)]
+            masks.append(index.contains("peptide_names", self._f_peptide.currentData()))
         if self._f_site.currentData():
-            df = df[df["injection_site"] == self._f_site.currentData()]
+            masks.append(index.equals("injection_site", self._f_site.currentData()))
         if self._f_method.currentData():
-            df = df[df["injection_method"] == self._f_method.currentData()]
+            masks.append(index.equals("injection_method", self._f_method.currentData()))
         if self._f_protocol.currentData():
-            df = df[df["protocol_name"] == self._f_protocol.currentData()]
-
-        self._update_kpis(df)
-        self._load_table(df)
-
-    def _update_kpis(self, df):
-        count = len(df)
-        total_ml = df["dose_ml"].sum() if count else 0.0
-        total_mcg = df["dose_mcg"].sum() if (count and "dose_mcg" in df.columns) else 0.0
-        days = df["date"].nunique() if count else 0
-
-        self._kpi_count.setText(str(count))
-        self._kpi_ml.setText(f"{float(total_ml):.1f}")
-        self._kpi_mcg.setText(f"{float(total_mcg):.0f}" if total_mcg else "—")
-        self._kpi_days.setText(str(days))
-
-        if count:
-            first = str(df["date"].min())
-            last = str(df["date"].max())
-            self._lbl_range.setText(f"Prima: {first}  •  Ultima: {last}")
+            masks.append(index.equals("protocol_name", self._f_protocol.currentData()))
+
+        rows = index.rows(masks)
+        self._update_kpis(index.kpis(rows))
+        # Posizioni nel DataFrame caricato: nessuna copia né ricaricamento
+        self._table.set_row_subset(rows if masks else None)
+
+    def _update_kpis(self, kpis):
+        total_mcg = kpis["total_mcg"]
+        self._kpi_count.setText(str(kpis["count"]))
+        self._kpi_ml.setText(f"{kpis['total_ml']:.1f}")
+        self._kpi_mcg.setText(f"{total_mcg:.0f}" if total_mcg else "—")
+        self._kpi_days.setText(str(kpis["days"]))
+
+        if kpis["first"]:
+            self._lbl_range.setText(f"Prima: {kpis['first']}  •  Ultima: {kpis['last']}")
         else:
             self._lbl_range.setText("")
 
-    def _load_table(self, df):
-        rows = []
-        for _, r in df.iterrows():
-            dt = str(r.get("administration_datetime", "") or "")
-            dose_ml = r.get("dose_ml", 0) or 0
-            dose_mcg = r.get("dose_mcg")
-            rows.append({
-                **r.to_dict(),
-                "_date":     dt[:10] if len(dt) >= 10 else dt,
-                "_time":     dt[11:16] if len(dt) >= 16 else "",
-                "_dose_ml":  f"{float(dose_ml):.2f}",
-                "_dose_mcg": f"{float(dose_mcg):.0f}" if dose_mcg else "—",
-            })
-        self._table.load_data(rows)
-
     # ── Actions ──────────────────────────────────────────────────────────────
 
     def _reset_filters(self):
-        self._f_notes.blockSignals(True)
-        self._f_from_cb.blockSignals(True)
-        self._f_to_cb.blockSignals(True)
+        widgets = (
+            self._f_notes, self._f_from_cb, self._f_to_cb, self._f_peptide,
+            self._f_site, self._f_method, self._f_protocol,
+        )
+        for w in widgets:
+            w.blockSignals(True)
         self._f_notes.clear()
         self._f_from_cb.setChecked(False)
         self._f_to_cb.setChecked(False)
-        self._f_notes.blockSignals(False)
-        self._f_from_cb.blockSignals(False)
-        self._f_to_cb.blockSignals(False)
-        self._f_peptide.setCurrentIndex(0)   # triggers _apply_filters via signal
-        self._f_site.setCurrentIndex(0)
-        self._f_method.setCurrentIndex(0)
-        self._f_protocol.setCurrentIndex(0)
+        self._f_from.setEnabled(False)
+        self._f_to.setEnabled(False)
+        for combo in widgets[3:]:
+            combo.setCurrentIndex(0)
+        for w in widgets:
+            w.blockSignals(False)
+        # Una sola applicazione invece di una per widget
+        self._apply_filters()
 
     def _on_report(self):
         dlg = _PeptideReportDialog(self.app, parent=self)
@@ -1059,9 +1073,9 @@ class AdministrationsTab(BaseView):
 
     def _on_edit(self, row: dict):
         dlg = _EditDialog(self.app, row, self)
-        if dlg.exec() == QDialog.Accepted:
-            # Editing a dose adjusts a preparation volume too → refresh all.
-            self.app.refresh_all_views()
+        # Editing a dose adjusts a preparation volume too: the change bus
+        # refreshes this tab and the Inventario/Oggi views that read them
+        dlg.exec()
 
     def _on_delete(self, row: dict):
         admin_id = row.get("id")
@@ -1091,6 +1105,11 @@ class AdministrationsTab(BaseView):
 class StatisticsTab(BaseView):
     """Statistiche aggregate: globali, per peptide, per mese."""
 
+    watch_tables = (
+        'administrations', 'preparations', 'batches', 'batch_composition',
+        'peptides', 'protocols', 'cycles',
+    )
+
     _PEPTIDE_COLS = [
         {"key": "peptide",    "label": "Peptide",   "stretch": True},
         {"key": "count",      "label": "N",          "width": 60},
@@ -1164,20 +1183,22 @@ class StatisticsTab(BaseView):
 
         lay.addLayout(tables_row, 1)
 
-    def refresh(self):
-        if not _HAS_PANDAS:
+    def fetch(self, manager, params):
+        if not _has_pandas():
+            return None
+        return manager.get_all_administrations_df()
+
+    def render(self, df):
+        if df is None:
             self._k_total.setText("N/A")
             return
-        try:
-            df = self.manager.get_all_administrations_df()
-        except Exception as exc:
-            error_dialog(self, "Errore caricamento", str(exc))
-            return
-
         self._update_kpis(df)
         self._update_by_peptide(df)
         self._update_by_month(df)
 
+    def on_load_error(self, message):
+        error_dialog(self, "Errore caricamento", message)
+
     def _update_kpis(self, df):
         if df.empty:
             for lbl in (self._k_total, self._k_ml, self._k_avg, self._k_days, self._k_peptid):
@@ -0,0 +1,351 @@
+"""Grafici del Report Peptide: rendering Agg fuori dal thread GUI, con cache.
+
+Il grafico (dosi nel tempo + dose cumulativa) viene disegnato da un
+``QRunnable`` sul thread pool globale con il backend Agg (nessun widget
+matplotlib): il worker produce una sola volta il PNG, usato sia per la
+visualizzazione sia, in base64, per l'export HTML. Le serie più lunghe di
+``_MAX_POINTS`` vengono ridotte con LTTB (Largest-Triangle-Three-Buckets),
+che mantiene picchi e forma della curva.
+
+I risultati sono in cache per (peptide, intervallo date, versione dati):
+la versione è un'impronta dei dati del report, quindi una somministrazione
+nuova o modificata invalida il grafico senza bisogno di notifiche.
+"""
+
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QPixmap
+from PySide6.QtWidgets import QLabel, QSizePolicy
+
+_CYCLE_COLORS = ['#42a5f5', '#66bb6a', '#ffa726', '#ab47bc', '#26c6da', '#ef9a9a']
+
+# Punti per serie oltre i quali si applica LTTB
+_MAX_POINTS = 1000
+
+# Grafici tenuti in memoria (LRU)
+_CACHE_SIZE = 16
+_cache: "OrderedDict[tuple, ReportChart]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ReportChart(NamedTuple):
+    """PNG del grafico (dpi 150) e la sua codifica base64 per l'HTML."""
+    png: bytes
+    b64: str
+
+
+def _compute_off_spans(cycle, today):
+    """Yield (start_date, end_date) pairs for consecutive OFF days in a cycle."""
+    start_str = cycle.get('start_date')
+    if not start_str:
+        return
+    start = date.fromisoformat(start_str)
+    end_str = cycle.get('end_date')
+    end = date.fromisoformat(end_str) if end_str else today
+
+    weekdays = cycle.get('weekdays')
+    days_on = cycle.get('days_on')
+    days_off = cycle.get('days_off') or 0
+
+    off_start = None
+    d = start
+    while d <= end:
+        if weekdays is not None:
+            is_off = d.weekday() not in weekdays
+        elif days_on and days_on > 0:
+            elapsed = (d - start).days
+            cycle_len = days_on + days_off
+            is_off = (elapsed % cycle_len) >= days_on if cycle_len > 0 else False
+        else:
+            is_off = False  # giornaliero: nessun OFF
+
+        if is_off:
+            if off_start is None:
+                off_start = d
+        else:
+            if off_start is not None:
+                yield (off_start, d - timedelta(days=1))
+                off_start = None
+        d += timedelta(days=1)
+
+    if off_start is not None:
+        yield (off_start, end)
+
+
+# ── Downsampling ─────────────────────────────────────────────────────────────
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Indici dei punti scelti da LTTB (Largest-Triangle-Three-Buckets).
+
+    Mantiene primo e ultimo punto; per ogni bucket intermedio sceglie il
+    punto che forma il triangolo di area massima con il punto scelto prima
+    e la media del bucket successivo.
+
+    Args:
+        x, y: Sequenze numeriche della stessa lunghezza (x crescente)
+        threshold: Numero di punti desiderato (>= 3)
+
+    Returns:
+        numpy array di indici crescenti (tutti se len(x) <= threshold)
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket intermedi: n - 2 punti divisi in threshold - 2 gruppi
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    chosen = np.empty(threshold, dtype=int)
+    chosen[0] = 0
+    chosen[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo = hi
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        chosen[i + 1] = a
+    return chosen
+
+
+def _downsample(frame, x_col, y_col, threshold=_MAX_POINTS):
+    """Righe di ``frame`` ridotte con LTTB su (x_col, y_col)."""
+    if len(frame) <= threshold:
+        return frame
+    x = frame[x_col].to_numpy().astype('datetime64[ns]').astype('int64')
+    idx = lttb_indices(x, frame[y_col].to_numpy(dtype=float), threshold)
+    return frame.iloc[idx]
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+
+def chart_key(peptide_id, date_from, date_to, data):
+    """Chiave cache: (peptide, intervallo, impronta dei dati disegnati)."""
+    digest = hashlib.sha1(repr([
+        (a['date'], a['dose_ml'], a['cycle_id']) for a in data['administrations']
+    ]).encode())
+    digest.update(repr([
+        (c['id'], c['name'], c.get('start_date'), c.get('end_date'),
+         c.get('weekdays'), c.get('days_on'), c.get('days_off'))
+        for c in data['cycles']
+    ]).encode())
+    # Senza data di fine il ciclo arriva a oggi: il grafico cambia col giorno
+    digest.update(date.today().isoformat().encode())
+    return (peptide_id, date_from, date_to, digest.hexdigest())
+
+
+def cached_chart(key):
+    """Grafico già disegnato per ``key``, o None."""
+    with _cache_lock:
+        chart = _cache.get(key)
+        if chart is not None:
+            _cache.move_to_end(key)
+    return chart
+
+
+def _store_chart(key, chart):
+    with _cache_lock:
+        _cache[key] = chart
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+
+
+def build_report_figure(data, today):
+    """Figure matplotlib (senza pyplot né canvas Qt) per il report."""
+    import matplotlib.dates as mdates
+    import matplotlib.patches as mpatches
+    import pandas as pd
+    from matplotlib.figure import Figure
+
+    admins = data['administrations']
+    cycles = data['cycles']
+
+    df = pd.DataFrame(admins)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values('date')
+
+    fig = Figure(figsize=(11, 7), facecolor='#1e1e1e')
+    fig.subplots_adjust(hspace=0.42, left=0.08, right=0.97, top=0.94, bottom=0.10)
+    ax1 = fig.add_subplot(2, 1, 1)
+    ax2 = fig.add_subplot(2, 1, 2)
+
+    for ax in (ax1, ax2):
+        ax.set_facecolor('#252525')
+        for sp in ax.spines.values():
+            sp.set_color('#424242')
+        ax.tick_params(colors='#aeaeae', labelsize=8)
+        ax.yaxis.label.set_color('#aeaeae')
+        ax.title.set_color('#e0e0e0')
+        ax.grid(True, color='#333', linewidth=0.5, alpha=0.6)
+
+    legend_handles = []
+
+    # ── Background: cycle spans + OFF spans ──────────────────────
+    off_patch_added = False
+    for i, cycle in enumerate(cycles):
+        if not cycle.get('start_date'):
+            continue
+        ts = pd.Timestamp(cycle['start_date'])
+        end_raw = cycle.get('end_date')
+        te = pd.Timestamp(end_raw) if end_raw else pd.Timestamp(today)
+        color = _CYCLE_COLORS[i % len(_CYCLE_COLORS)]
+
+        for ax in (ax1, ax2):
+            ax.axvspan(ts, te, alpha=0.06, color=color, zorder=0)
+
+        off_spans = list(_compute_off_spans(cycle, today))
+        for off_s, off_e in off_spans:
+            ts_off = pd.Timestamp(off_s)
+            te_off = pd.Timestamp(off_e) + pd.Timedelta(days=1)
+            for ax in (ax1, ax2):
+                ax.axvspan(ts_off, te_off, alpha=0.18,
+                           color='#ef5350', zorder=1)
+        if not off_patch_added and off_spans:
+            legend_handles.append(
+                mpatches.Patch(color='#ef5350', alpha=0.4, label='Giorni OFF'))
+            off_patch_added = True
+
+    # ── Administrations per cycle ─────────────────────────────────
+    for i, cycle in enumerate(cycles):
+        color = _CYCLE_COLORS[i % len(_CYCLE_COLORS)]
+        cdf = _downsample(df[df['cycle_id'] == cycle['id']], 'date', 'dose_ml')
+        if cdf.empty:
+            continue
+        ax1.vlines(cdf['date'], 0, cdf['dose_ml'],
+                   color=color, linewidth=1.5, alpha=0.85, zorder=3)
+        sc = ax1.scatter(cdf['date'], cdf['dose_ml'],
+                         color=color, s=28, zorder=4,
+                         label=cycle['name'])
+        legend_handles.append(sc)
+
+    # Admins without cycle
+    no_cyc = _downsample(df[df['cycle_id'].isna()], 'date', 'dose_ml')
+    if not no_cyc.empty:
+        ax1.vlines(no_cyc['date'], 0, no_cyc['dose_ml'],
+                   color='#9e9e9e', linewidth=1.5, alpha=0.8, zorder=3)
+        sc = ax1.scatter(no_cyc['date'], no_cyc['dose_ml'],
+                         color='#9e9e9e', s=28, zorder=4, label='Senza ciclo')
+        legend_handles.append(sc)
+
+    ax1.set_title("Somministrazioni nel tempo  "
+                  "(sfondo rosso = giorni OFF)", fontsize=10)
+    ax1.set_ylabel("Dose (ml)", fontsize=9)
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax1.xaxis.set_major_locator(mdates.AutoDateLocator())
+    if legend_handles:
+        ax1.legend(handles=legend_handles, fontsize=8,
+                   facecolor='#2d2d2d', edgecolor='#424242',
+                   labelcolor='#e0e0e0', loc='upper left')
+
+    # ── Cumulative ───────────────────────────────────────────────
+    df['cum_ml'] = df['dose_ml'].cumsum()
+    cum = _downsample(df, 'date', 'cum_ml')
+    ax2.step(cum['date'], cum['cum_ml'], color='#42a5f5',
+             linewidth=1.8, where='post', zorder=3)
+    ax2.fill_between(cum['date'], cum['cum_ml'], alpha=0.15,
+                     color='#42a5f5', step='post', zorder=2)
+    ax2.set_title("Dose cumulativa (ml)", fontsize=10)
+    ax2.set_ylabel("ml cumulativi", fontsize=9)
+    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax2.xaxis.set_major_locator(mdates.AutoDateLocator())
+
+    fig.autofmt_xdate(rotation=30)
+    return fig
+
+
+def render_report_chart(data, today=None):
+    """Disegna il report con Agg e restituisce PNG + base64 (thread-safe)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = build_report_figure(data, today or date.today())
+    FigureCanvasAgg(fig)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150,
+                facecolor='#1e1e1e', bbox_inches='tight')
+    png = buf.getvalue()
+    return ReportChart(png, base64.b64encode(png).decode())
+
+
+class _ChartSignals(QObject):
+    done = Signal(object, object)      # key, ReportChart
+    failed = Signal(object, str)       # key, messaggio
+
+
+class ChartTask(QRunnable):
+    """Rende il grafico sul thread pool globale e lo mette in cache."""
+
+    def __init__(self, key, data):
+        super().__init__()
+        self.signals = _ChartSignals()
+        self._key = key
+        self._data = data
+
+    def run(self):
+        try:
+            chart = render_report_chart(self._data)
+        except Exception as exc:  # riportato al dialog
+            self._emit(self.signals.failed, str(exc))
+            return
+        _store_chart(self._key, chart)
+        self._emit(self.signals.done, chart)
+
+    def _emit(self, signal, payload):
+        try:
+            signal.emit(self._key, payload)
+        except RuntimeError:
+            pass  # dialog chiuso durante il rendering
+
+
+def start_chart(key, data, on_done, on_failed):
+    """
+    Avvia il rendering in background.
+
+    ``on_done(key, chart)`` / ``on_failed(key, message)`` vengono chiamati
+    nel thread GUI; tenere il task restituito finché non arrivano.
+    """
+    task = ChartTask(key, data)
+    task.signals.done.connect(on_done)
+    task.signals.failed.connect(on_failed)
+    QThreadPool.globalInstance().start(task)
+    return task
+
+
+class ChartImage(QLabel):
+    """PNG del grafico scalato alla larghezza disponibile (aspetto fisso)."""
+
+    def __init__(self, png, parent=None):
+        super().__init__(parent)
+        self._pixmap = QPixmap()
+        self._pixmap.loadFromData(png, "PNG")
+        self.setAlignment(Qt.AlignCenter)
+        self.setMinimumSize(200, 150)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if not self._pixmap.isNull():
+            self.setPixmap(self._pixmap.scaled(
+                self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
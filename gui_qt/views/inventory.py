@@ -98,6 +98,11 @@ def _make_buttons(dialog, submit_label="Salva"):
 class BatchesTab(BaseView):
     """Batches list with search, add/edit/delete via context menu."""
 
+    watch_tables = (
+        'batches', 'batch_composition', 'peptides', 'suppliers',
+        'preparations', 'shipments',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -146,27 +151,20 @@ class BatchesTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        search = self._search.text().strip() or None
-        try:
-            batches = self.manager.get_batches(search=search, only_available=True)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch_params(self):
+        return {"search": self._search.text().strip() or None}
+
+    def fetch(self, manager, params):
+        # Una sola query: fornitore, composizione e preparazioni per insiemi
+        batches = manager.get_batch_summaries(search=params["search"], only_available=True)
 
         rows = []
         for b in batches:
-            # Build composition summary
-            try:
-                details = self.manager.get_batch_details(b["id"])
-                comp = details.get("composition", [])
-                names = [c.get("name", "?") for c in comp]
-                if len(names) > 2:
-                    summary = ", ".join(names[:2]) + f" +{len(names) - 2}"
-                else:
-                    summary = ", ".join(names) if names else "-"
-            except Exception:
-                summary = "-"
+            names = b["peptide_names"]
+            if len(names) > 2:
+                summary = ", ".join(names[:2]) + f" +{len(names) - 2}"
+            else:
+                summary = ", ".join(names) if names else "-"
 
             rows.append({
                 "id": b["id"],
@@ -176,6 +174,9 @@ class BatchesTab(BaseView):
                 "vials_status": f"{b.get('vials_remaining', 0)}/{b.get('vials_count', 0)}",
                 "_vials_remaining": b.get("vials_remaining", 0),
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     def _has_vials(self):
@@ -644,6 +645,11 @@ class _BatchEditDialog(QDialog):
 class PreparationsTab(BaseView):
     """Preparations list with search, add/edit/delete and administer."""
 
+    watch_tables = (
+        'preparations', 'preparation_events', 'administrations',
+        'batches', 'batch_composition', 'peptides',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -700,13 +706,13 @@ class PreparationsTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────
 
-    def refresh(self):
+    def fetch_params(self):
         search = self._search.text().strip().lower() if hasattr(self, "_search") else ""
-        try:
-            preps = self.manager.get_preparations(only_active=True)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+        return {"search": search}
+
+    def fetch(self, manager, params):
+        search = params["search"]
+        preps = manager.get_preparations(only_active=True)
 
         rows = []
         for p in preps:
@@ -733,6 +739,9 @@ class PreparationsTab(BaseView):
                 "_volume_remaining": vol_rem,
                 "_prep_id": p["id"],
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     # ── Actions ──────────────────────────────────────────────────────────
@@ -1648,6 +1657,8 @@ class _BatchDiscardVialsDialog(QDialog):
 class ShipmentsTab(BaseView):
     """Tab per la gestione delle spedizioni."""
 
+    watch_tables = ('shipments', 'batches', 'suppliers')
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -1684,12 +1695,8 @@ class ShipmentsTab(BaseView):
         self._table.row_double_clicked.connect(self._on_details)
         lay.addWidget(self._table, 1)
 
-    def refresh(self):
-        try:
-            shipments = self.manager.get_shipments()
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch(self, manager, params):
+        shipments = manager.get_shipments()
 
         rows = []
         for s in shipments:
@@ -1703,6 +1710,9 @@ class ShipmentsTab(BaseView):
                 "cost_display": cost_display,
                 "batch_count": s.get("batch_count", 0),
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     def _on_add(self):
@@ -136,7 +136,9 @@ class _DetailDialog(QDialog):
         ))
         add_row(11, "Ubicazione",     row.get("storage_location", ""))
         add_row(12, "Stato",          _status_label(row))
-        add_row(13, "Note",           row.get("notes", ""))
+        add_row(13, "Composizione",   ", ".join(row.get("peptide_names") or []))
+        add_row(14, "Preparazioni",   row.get("preparations_count", ""))
+        add_row(15, "Note",           row.get("notes", ""))
 
         lay.addLayout(grid)
         lay.addWidget(_sep())
@@ -170,6 +172,10 @@ _COLUMNS = [
 class PurchaseHistoryTab(BaseView):
     """Storico di tutti i lotti acquistati."""
 
+    watch_tables = (
+        'batches', 'batch_composition', 'peptides', 'suppliers', 'shipments',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._all_batches: list[dict] = []
@@ -238,13 +244,9 @@ class PurchaseHistoryTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        try:
-            # All non-deleted batches (available + depleted + expired)
-            raw = self.manager.get_batches()
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch(self, manager, params):
+        # All non-deleted batches (available + depleted + expired)
+        raw = manager.get_batch_summaries()
 
         # Enrich with display fields
         for b in raw:
@@ -254,6 +256,9 @@ class PurchaseHistoryTab(BaseView):
             b["_price"]         = _fmt_price(b)
             b["_status"]        = _status_label(b)
 
+        return raw
+
+    def render(self, raw):
         self._all_batches = sorted(
             raw,
             key=lambda b: str(b.get("purchase_date") or ""),
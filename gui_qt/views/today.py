@@ -2,6 +2,7 @@
 
 from datetime import date, timedelta, datetime
 from functools import partial
+from typing import NamedTuple, Optional
 
 from PySide6.QtWidgets import (
     QVBoxLayout,
@@ -22,6 +23,7 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, Signal, QDate, QTimer
 
+from .. import startup
 from .base import BaseView
 
 
@@ -135,6 +137,147 @@ class _DayCard(QFrame):
         self._lbl_num.setStyleSheet(f"font-size: 20px; font-weight: bold; color: {dc}; {t}")
 
 
+# ═══════════════════════════════════════════════════════════════════════
+# Keyed schedule rows
+# ═══════════════════════════════════════════════════════════════════════
+
+
+class _RowSpec(NamedTuple):
+    """Contenuto di una riga del programma (confrontabile con la precedente)."""
+    text: str
+    style: str = ""
+    rich: bool = False
+    margins: tuple = (0, 0, 0, 0)
+    button: Optional[str] = None     # None | "ready" | "partial"
+    payload: object = None           # gruppo passato a "Registra"
+
+
+_BUTTONS = {
+    "ready": ("Registra", 90, _BTN_REGISTER, ""),
+    "partial": (
+        "Registra ⚠", 100, _BTN_REGISTER_PARTIAL,
+        "Volume insufficiente — verrà registrata la dose disponibile",
+    ),
+}
+
+
+class _ScheduleRow(QWidget):
+    """One schedule line (label + optional button), patched in place."""
+
+    def __init__(self, on_register):
+        super().__init__()
+        self._on_register = on_register
+        self._spec = None
+        self._lay = QHBoxLayout(self)
+        self._lay.setContentsMargins(0, 0, 0, 0)
+        self._lay.setSpacing(8)
+        self._info = QLabel()
+        self._lay.addWidget(self._info, 1)
+        self._btn = None
+
+    def apply(self, spec):
+        """Update only what differs from the current content."""
+        old = self._spec
+        self._spec = spec
+        if old is not None and old[:5] == spec[:5]:
+            return
+        if old is None or old.rich != spec.rich:
+            self._info.setTextFormat(Qt.RichText if spec.rich else Qt.PlainText)
+        if old is None or old.text != spec.text:
+            self._info.setText(spec.text)
+        if old is None or old.style != spec.style:
+            self._info.setStyleSheet(spec.style)
+        if old is None or old.margins != spec.margins:
+            self._lay.setContentsMargins(*spec.margins)
+        if old is None or old.button != spec.button:
+            self._set_button(spec.button)
+
+    def _set_button(self, kind):
+        if kind is None:
+            if self._btn is not None:
+                self._btn.hide()
+            return
+        if self._btn is None:
+            self._btn = QPushButton()
+            self._btn.clicked.connect(self._clicked)
+            self._lay.addWidget(self._btn)
+        text, width, style, tip = _BUTTONS[kind]
+        self._btn.setText(text)
+        self._btn.setFixedWidth(width)
+        self._btn.setStyleSheet(style)
+        self._btn.setToolTip(tip)
+        self._btn.show()
+
+    def _clicked(self):
+        if self._spec is not None:
+            self._on_register(self._spec.payload)
+
+
+class _DaySection(QFrame):
+    """Frame of one day: header + rows keyed by (cycle, prep group)."""
+
+    def __init__(self, on_register):
+        super().__init__()
+        self._on_register = on_register
+        self._header_key = None
+        self._rows: dict = {}            # key → _ScheduleRow, in display order
+        self.setFrameShape(QFrame.StyledPanel)
+        self._lay = QVBoxLayout(self)
+        self._lay.setContentsMargins(12, 8, 12, 8)
+        self._hdr = QLabel()
+        self._lay.addWidget(self._hdr)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def set_day(self, d, today):
+        key = (d, today)
+        if key == self._header_key:
+            return
+        self._header_key = key
+        border = _BLUE if d == today else "#424242"
+        self.setStyleSheet(
+            "QFrame { background: #252525; border-radius: 6px;"
+            " border-left: 3px solid %s; margin: 2px 0; padding: 8px; }" % border
+        )
+        if d == today:
+            txt = f"OGGI \u2014 {_fmt_date(d)}"
+        elif d == today + timedelta(days=1):
+            txt = f"DOMANI \u2014 {_fmt_date(d)}"
+        else:
+            txt = _fmt_date(d)
+        self._hdr.setText(txt)
+        self._hdr.setStyleSheet(
+            "font-weight: bold; font-size: 14px; color: %s; padding-bottom: 4px;"
+            % (_BLUE if d == today else "#e0e0e0")
+        )
+
+    def sync(self, specs):
+        """Show ``specs`` [(key, _RowSpec)]: reuse rows by key, create or drop the rest."""
+        old = self._rows
+        rows = {}
+        for key, spec in specs:
+            row = old.pop(key, None)
+            if row is None:
+                row = _ScheduleRow(self._on_register)
+            row.apply(spec)
+            rows[key] = row
+        for row in old.values():
+            self._lay.removeWidget(row)
+            row.deleteLater()
+        self._rows = rows
+        _place_in_order(self._lay, rows.values(), first=1)
+
+
+def _place_in_order(layout, widgets, first=0):
+    """Move ``widgets`` to consecutive layout positions from ``first`` (if needed)."""
+    for pos, widget in enumerate(widgets, start=first):
+        if layout.indexOf(widget) != pos:
+            layout.removeWidget(widget)
+            layout.insertWidget(pos, widget)
+
+
 # ═══════════════════════════════════════════════════════════════════════
 # Registration dialog
 # ═══════════════════════════════════════════════════════════════════════
@@ -411,6 +554,13 @@ class TodayView(BaseView):
 
     _DAYS_OPTIONS = [3, 7, 14]
 
+    watch_tables = (
+        'administrations', 'preparations', 'preparation_events',
+        'cycles', 'protocols', 'protocol_peptides', 'peptides',
+        'batches', 'batch_composition', 'treatment_plans', 'plan_phases',
+        'vendor_products',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._selected_date = date.today()
@@ -418,7 +568,10 @@ class TodayView(BaseView):
         self._days_ahead = 7
         self._day_cards: list[tuple[date, _DayCard]] = []
         self._conc_map: dict[int, float] = {}
+        self._prep_map: dict[tuple, int] = {}
         self._shortfall: set = set()   # {(date, peptide_id)} previsione esaurimento prep
+        self._forecast: dict[date, list] = {}   # giorni futuri da schedule_cache
+        self._sections: dict[date, _DaySection] = {}
         self._build_ui()
         self.refresh()
 
@@ -476,6 +629,7 @@ class TodayView(BaseView):
         self._container = QWidget()
         self._clayout = QVBoxLayout(self._container)
         self._clayout.setAlignment(Qt.AlignTop)
+        self._clayout.addStretch()       # sections are inserted before it
         self._scroll.setWidget(self._container)
         lay.addWidget(self._scroll, 1)
 
@@ -523,59 +677,64 @@ class TodayView(BaseView):
     # ── Data & refresh ───────────────────────────────────────────────
 
     def refresh(self):
-        while self._clayout.count():
-            w = self._clayout.takeAt(0).widget()
-            if w:
-                w.deleteLater()
-
-        today = date.today()
-
-        # Auto-complete cycles whose planned_end_date has passed
+        # Auto-complete cycles whose planned_end_date has passed and move the
+        # schedule cache to today (scritture: restano sul manager principale,
+        # prima del caricamento in background)
         try:
             self.manager.check_and_complete_expired_cycles()
+            self.manager.sync_schedule_cache()
         except Exception:
             pass
+        super().refresh()
+
+    def fetch_params(self):
+        return {"selected_date": self._selected_date, "days_ahead": self._days_ahead}
 
-        # Today's pending / overdue items
+    def fetch(self, manager, params):
+        today = date.today()
+        days_ahead = params["days_ahead"]
+
+        # Today's pending / overdue items (also keeps the headless "today"
+        # CLI snapshot current, see peptide_manager/today.py)
         try:
-            today_pending = self.manager.get_scheduled_administrations()
+            today_pending = manager.refresh_today_snapshot()
         except Exception:
             today_pending = []
 
         # Build concentration map from ALL active preparations so the
         # forecast shows ml estimates even for peptides not scheduled today.
-        self._conc_map = {}   # peptide_id → concentration mcg/ml
+        conc_map = {}   # peptide_id → concentration mcg/ml
         try:
             # NB: get_preparations() non include la composizione peptidi;
             # i peptidi arrivano solo da get_preparation_details().
-            for prep in self.manager.get_preparations(only_active=True):
-                det = self.manager.get_preparation_details(prep["id"])
+            for prep in manager.get_preparations(only_active=True):
+                det = manager.get_preparation_details(prep["id"])
                 if not det:
                     continue
                 vials = det.get("vials_used", 1)
                 vol = det.get("volume_ml", 1)
                 for pc in det.get("peptides", []):
                     pid = pc.get("peptide_id")
-                    if pid and pid not in self._conc_map:
+                    if pid and pid not in conc_map:
                         mg = pc.get("mg_per_vial") or pc.get("mg_amount") or 0
                         if mg > 0 and vol > 0:
-                            self._conc_map[pid] = (mg * vials / vol) * 1000
+                            conc_map[pid] = (mg * vials / vol) * 1000
         except Exception:
             pass
 
         # Build prep map from today's schedule (blend grouping in forecast)
-        self._prep_map = {}   # (peptide_id, cycle_id) → preparation_id
+        prep_map = {}   # (peptide_id, cycle_id) → preparation_id
         for it in today_pending:
             pid = it.get("peptide_id")
             prep_id = it.get("preparation_id")
             cid = it.get("cycle_id")
             if prep_id is not None and pid is not None and cid is not None:
-                self._prep_map[(pid, cid)] = prep_id
+                prep_map[(pid, cid)] = prep_id
 
         # Completed administrations
-        lookback = max(self._days_ahead, 7) + 1
+        lookback = max(days_ahead, 7) + 1
         try:
-            recent = self.manager.get_administrations(days_back=lookback)
+            recent = manager.get_administrations(days_back=lookback)
         except Exception:
             recent = []
 
@@ -585,28 +744,79 @@ class TodayView(BaseView):
             if ad:
                 done_by_date.setdefault(ad, []).append(a)
 
-        # Active cycles for forecast
-        try:
-            cycles = self.manager.get_cycles(active_only=True)
-        except Exception:
-            cycles = []
+        # Future doses: one range query on the materialized schedule
+        # (peptide_manager/schedule_cache.py), shared with export and CLI
+        window_end = params["selected_date"] + timedelta(days=days_ahead - 1)
+        forecast = {}
+        if window_end > today:
+            try:
+                for dose in manager.get_schedule(today + timedelta(days=1), window_end):
+                    forecast.setdefault(dose["date"], []).append((
+                        dose["peptide_name"], dose["dose_mcg"], dose["cycle_name"],
+                        dose["peptide_id"], dose["cycle_id"], dose["dose_index"],
+                    ))
+            except Exception:
+                forecast = {}
 
         # Simula il consumo futuro per segnalare le prep in esaurimento
         try:
-            self._shortfall, first_short = self._compute_prep_shortfalls(
-                cycles, today_pending
+            shortfall, first_short = self._compute_prep_shortfalls(
+                manager, forecast, today_pending, window_end
             )
         except Exception:
-            self._shortfall, first_short = set(), {}
-        self._update_alert(first_short)
-
-        # Day sections
-        for offset in range(self._days_ahead):
-            d = self._selected_date + timedelta(days=offset)
-            self._clayout.addWidget(
-                self._day_section(d, today, today_pending, done_by_date.get(d, []), cycles)
-            )
-        self._clayout.addStretch()
+            shortfall, first_short = set(), {}
+
+        # Ordini da emettere oggi (MRP su tutti i piani, include i ritardi)
+        try:
+            calendar = manager.get_order_calendar()
+            due_orders = [
+                o for o in calendar["orders"]
+                if o["release_date"] <= today.isoformat()
+            ]
+        except Exception:
+            due_orders = []
+
+        return {
+            **params,
+            "today": today,
+            "today_pending": today_pending,
+            "conc_map": conc_map,
+            "prep_map": prep_map,
+            "done_by_date": done_by_date,
+            "forecast": forecast,
+            "shortfall": shortfall,
+            "first_short": first_short,
+            "due_orders": due_orders,
+        }
+
+    def render(self, data):
+        today = data["today"]
+        self._conc_map = data["conc_map"]
+        self._prep_map = data["prep_map"]
+        self._shortfall = data["shortfall"]
+        self._forecast = data["forecast"]
+        self._update_alert(data["first_short"], data["due_orders"])
+
+        # Day sections and their rows are keyed and patched in place: only
+        # rows that appear or disappear are created or destroyed
+        old = self._sections
+        self._sections = {}
+        for offset in range(data["days_ahead"]):
+            d = data["selected_date"] + timedelta(days=offset)
+            section = old.pop(d, None)
+            if section is None:
+                section = _DaySection(self._register)
+            section.set_day(d, today)
+            section.sync(self._day_rows(
+                d, today, data["today_pending"],
+                data["done_by_date"].get(d, []),
+            ))
+            self._sections[d] = section
+        for section in old.values():
+            self._clayout.removeWidget(section)
+            section.deleteLater()
+        _place_in_order(self._clayout, self._sections.values())
+        startup.mark("today_data")
 
     # ── Grouping ─────────────────────────────────────────────────────
 
@@ -626,82 +836,53 @@ class TodayView(BaseView):
             groups.setdefault(key, []).append(item)
         return list(groups.values())
 
-    # ── Day section ──────────────────────────────────────────────────
-
-    def _day_section(self, d, today, today_pending, completed, cycles):
-        frame = QFrame()
-        frame.setFrameShape(QFrame.StyledPanel)
-        border = _BLUE if d == today else "#424242"
-        frame.setStyleSheet(
-            "QFrame { background: #252525; border-radius: 6px;"
-            " border-left: 3px solid %s; margin: 2px 0; padding: 8px; }" % border
-        )
-        lay = QVBoxLayout(frame)
-        lay.setContentsMargins(12, 8, 12, 8)
-
-        if d == today:
-            txt = f"OGGI \u2014 {_fmt_date(d)}"
-        elif d == today + timedelta(days=1):
-            txt = f"DOMANI \u2014 {_fmt_date(d)}"
-        else:
-            txt = _fmt_date(d)
-        hdr = QLabel(txt)
-        hdr.setStyleSheet(
-            "font-weight: bold; font-size: 14px; color: %s; padding-bottom: 4px;"
-            % (_BLUE if d == today else "#e0e0e0")
-        )
-        lay.addWidget(hdr)
+    # ── Day rows ─────────────────────────────────────────────────────
 
+    def _day_rows(self, d, today, today_pending, completed):
+        """Keyed row specs of day ``d`` → [(key, _RowSpec)]."""
         if d == today:
-            self._items_today(lay, today_pending, completed)
-        elif d < today:
-            self._items_past(lay, completed)
-        else:
-            self._items_future(lay, d, cycles)
-
-        return frame
-
-    # ── Today items ──────────────────────────────────────────────────
-
-    def _items_today(self, lay, pending, completed):
-        has = False
-        for a in completed:
-            has = True
-            lay.addWidget(self._completed_label(a))
-        for group in self._group_by_prep(pending):
-            has = True
-            lay.addWidget(self._pending_row(group))
-        if not has:
-            lay.addWidget(self._empty("Nessuna somministrazione programmata"))
-
-    def _items_past(self, lay, completed):
-        if not completed:
-            lay.addWidget(self._empty("\u2014"))
-            return
-        for a in completed:
-            lay.addWidget(self._completed_label(a))
-
-    def _items_future(self, lay, d, cycles):
-        items = self._forecast(d, cycles)
+            rows = self._rows_done(completed)
+            for group in self._group_by_prep(today_pending):
+                first = group[0]
+                key = ("pending", first.get("preparation_id"),
+                       first.get("cycle_id"), first.get("dose_number", 1))
+                rows.append((key, self._pending_spec(group)))
+            if not rows:
+                rows.append((("empty",), self._empty_spec("Nessuna somministrazione programmata")))
+            return rows
+        if d < today:
+            return self._rows_done(completed) or [(("empty",), self._empty_spec("\u2014"))]
+        items = self._forecast.get(d, [])
         if not items:
-            lay.addWidget(self._empty("Nessuna somministrazione prevista"))
-            return
+            return [(("empty",), self._empty_spec("Nessuna somministrazione prevista"))]
         # Group by preparation (blend awareness) using today's prep map
-        for group in self._group_forecast(items):
-            lay.addWidget(self._forecast_label(group, d))
+        return [
+            (("forecast",) + key, self._forecast_spec(group, d))
+            for key, group in self._group_forecast(items)
+        ]
+
+    def _rows_done(self, completed):
+        return [
+            (("done", a.get("id") if a.get("id") is not None else f"#{i}"),
+             self._completed_spec(a))
+            for i, a in enumerate(completed)
+        ]
 
     def _group_forecast(self, items):
-        """Group forecast items by known preparation_id (from today's schedule)."""
+        """Group forecast items by known preparation_id (from today's schedule).
+
+        Returns ``[(key, group)]``; the key identifies the row across refreshes.
+        """
         groups: dict[tuple, list] = {}
         for name, dose, cname, pid, cid, dose_idx in items:
             prep_id = self._prep_map.get((pid, cid))
             # Include dose_idx so multi-dose peptides each get their own row
             key = (prep_id, cid, dose_idx) if prep_id is not None else (f"_u{pid}_{dose_idx}", cid)
             groups.setdefault(key, []).append((name, dose, cname, pid))
-        return list(groups.values())
+        return list(groups.items())
 
-    def _forecast_label(self, group, d):
-        """Render a (possibly merged) forecast row."""
+    def _forecast_spec(self, group, d):
+        """Content of a (possibly merged) forecast row."""
         if len(group) == 1:
             name, dose, cname, pid = group[0]
             dose_str = f"{dose:.0f} mcg"
@@ -736,31 +917,21 @@ class TodayView(BaseView):
             f'  <span style="color: {_DIM};">[{cname}]</span>'
             f'{short_html}'
         )
-        lbl = QLabel(html)
-        lbl.setTextFormat(Qt.RichText)
-        lbl.setStyleSheet("padding: 2px 0 2px 16px;")
-        return lbl
+        return _RowSpec(html, "padding: 2px 0 2px 16px;", rich=True)
 
     # ── Row widgets ──────────────────────────────────────────────────
 
-    def _completed_label(self, admin):
+    def _completed_spec(self, admin):
         peptide = admin.get("peptide_name") or admin.get("peptide_names", "?")
         ml = float(admin.get("dose_ml", 0))
         proto = admin.get("protocol_name", "")
         text = f"\u2713  {peptide}  {ml:.2f} ml"
         if proto:
             text += f"  [{proto}]"
-        lbl = QLabel(text)
-        lbl.setStyleSheet(f"color: {_GREEN}; padding: 2px 0 2px 16px;")
-        return lbl
-
-    def _pending_row(self, group):
-        """Row for one injection — single peptide or blend group."""
-        row = QWidget()
-        rlay = QHBoxLayout(row)
-        rlay.setContentsMargins(16, 4, 8, 4)
-        rlay.setSpacing(8)
+        return _RowSpec(text, f"color: {_GREEN}; padding: 2px 0 2px 16px;")
 
+    def _pending_spec(self, group):
+        """Content of the row for one injection — single peptide or blend group."""
         first = group[0]
         sched = first.get("schedule_status", "")
         prep_st = first.get("status", "")
@@ -816,55 +987,53 @@ class TodayView(BaseView):
             f'<span style="color: {color};">{suffix}</span>'
             f'{warn}'
         )
-        info = QLabel(html)
-        info.setTextFormat(Qt.RichText)
-        rlay.addWidget(info, 1)
-
-        if prep_st == "ready":
-            btn = QPushButton("Registra")
-            btn.setFixedWidth(90)
-            btn.setStyleSheet(_BTN_REGISTER)
-            btn.clicked.connect(partial(self._register, group))
-            rlay.addWidget(btn)
-        elif prep_st == "insufficient_volume":
-            btn = QPushButton("Registra ⚠")
-            btn.setFixedWidth(100)
-            btn.setStyleSheet(_BTN_REGISTER_PARTIAL)
-            btn.setToolTip("Volume insufficiente — verrà registrata la dose disponibile")
-            btn.clicked.connect(partial(self._register, group))
-            rlay.addWidget(btn)
-
-        return row
+        button = {"ready": "ready", "insufficient_volume": "partial"}.get(prep_st)
+        return _RowSpec(
+            html, rich=True, margins=(16, 4, 8, 4), button=button, payload=group,
+        )
 
     # ── Quick register ───────────────────────────────────────────────
 
     def _register(self, group):
         """Open registration dialog for review/edit before saving."""
         dlg = _RegisterDialog(self.app, group, parent=self)
-        if dlg.exec() == QDialog.Accepted:
-            # Refresh all sections: the administration also decremented a
-            # preparation volume shown in Inventario, not just today's list.
-            self.app.refresh_all_views()
+        dlg.exec()
+        # Nessun refresh esplicito: i commit della registrazione arrivano
+        # dal bus modifiche a questa vista e alle altre (volume prep in
+        # Inventario, Storico) solo se leggono le tabelle toccate
 
     # ── Prep shortfall simulation ────────────────────────────────────
 
-    def _update_alert(self, first_short):
-        """Mostra/nasconde il banner delle prep in esaurimento."""
-        if not first_short:
+    def _update_alert(self, first_short, due_orders=None):
+        """Mostra/nasconde il banner delle prep in esaurimento e degli ordini da fare."""
+        if not first_short and not due_orders:
             self._alert.setVisible(False)
             return
         today = date.today()
-        lines = []
-        for _pid, (day, name) in sorted(first_short.items(), key=lambda kv: kv[1][0]):
-            when = "domani" if day == today + timedelta(days=1) else _fmt_date(day)
-            lines.append(f"• {name} — scorta esaurita dal {when}")
-        self._alert.setText(
-            "⚠  Serve preparare una nuova soluzione ricostituita:<br>"
-            + "<br>".join(lines)
-        )
+        blocks = []
+        if first_short:
+            lines = []
+            for _pid, (day, name) in sorted(first_short.items(), key=lambda kv: kv[1][0]):
+                when = "domani" if day == today + timedelta(days=1) else _fmt_date(day)
+                lines.append(f"• {name} — scorta esaurita dal {when}")
+            blocks.append(
+                "⚠  Serve preparare una nuova soluzione ricostituita:<br>"
+                + "<br>".join(lines)
+            )
+        if due_orders:
+            lines = []
+            for o in due_orders:
+                need = _fmt_date(_parse_date(o["need_date"]))
+                late = " (in ritardo)" if o.get("late") else ""
+                lines.append(
+                    f"• {o['peptide_name']} — {o['vials']} fiale"
+                    f" ({o['mg']:g} mg) per il {need}{late}"
+                )
+            blocks.append("🛒  Ordini da effettuare:<br>" + "<br>".join(lines))
+        self._alert.setText("<br><br>".join(blocks))
         self._alert.setVisible(True)
 
-    def _compute_prep_shortfalls(self, cycles, today_pending):
+    def _compute_prep_shortfalls(self, manager, forecast, today_pending, window_end):
         """Simula il consumo FIFO delle prep attive per i giorni della finestra.
 
         Ritorna ``(shortfall, first_short)`` dove:
@@ -877,7 +1046,6 @@ class TodayView(BaseView):
         co-somministrati — coerente con la registrazione (`_merged_distribution`).
         """
         today = date.today()
-        window_end = self._selected_date + timedelta(days=self._days_ahead - 1)
         if window_end <= today:
             return set(), {}
 
@@ -886,11 +1054,11 @@ class TodayView(BaseView):
         prep_conc: dict[int, dict[int, float]] = {}
         fifo: dict[int, list[int]] = {}
         try:
-            active = self.manager.get_preparations(only_active=True)
+            active = manager.get_preparations(only_active=True)
         except Exception:
             return set(), {}
         for p in active:
-            det = self.manager.get_preparation_details(p["id"])
+            det = manager.get_preparation_details(p["id"])
             if not det:
                 continue
             vol = det.get("volume_ml") or 0
@@ -947,7 +1115,7 @@ class TodayView(BaseView):
         day = today + timedelta(days=1)
         while day <= window_end:
             injections: dict[tuple, list] = {}
-            for name, dose, _cname, pid, cid, dose_idx in self._forecast(day, cycles):
+            for name, dose, _cname, pid, cid, dose_idx in forecast.get(day, []):
                 injections.setdefault((cid, dose_idx), []).append((pid, dose, name))
             for peps in injections.values():
                 merged: dict[int, float] = {}
@@ -969,66 +1137,7 @@ class TodayView(BaseView):
 
         return shortfall, first_short
 
-    # ── Forecast ─────────────────────────────────────────────────────
-
-    def _forecast(self, target, cycles):
-        """Expected items for *target* date → list of (name, mcg, cycle_name, pid, cycle_id)."""
-        items = []
-        for c in cycles:
-            snap = c.get("protocol_snapshot")
-            if not isinstance(snap, dict):
-                continue
-            peptides = snap.get("peptides", [])
-            if not peptides:
-                continue
-
-            start = _parse_date(c.get("start_date"))
-            end = _parse_date(c.get("planned_end_date"))
-            if start and target < start:
-                continue
-            if end and target > end:
-                continue
-
-            days_on = snap.get("days_on") or c.get("days_on")
-            days_off = snap.get("days_off", 0) or c.get("days_off", 0)
-            if days_on and days_on > 0 and start:
-                elapsed = (target - start).days
-                period = days_on + days_off
-                if period > 0 and (elapsed % period) >= days_on:
-                    continue
-
-            week = max(1, ((target - start).days // 7 + 1)) if start else 1
-            ramp = c.get("ramp_schedule") or []
-            cname = c.get("name", "")
-
-            for p in peptides:
-                pep_weekdays = p.get("weekdays")
-                if pep_weekdays is not None and target.weekday() not in pep_weekdays:
-                    continue
-
-                base = p.get("target_dose_mcg") or p.get("dose_mcg", 0)
-                dose = base
-                for entry in ramp:
-                    if entry.get("week") == week:
-                        for rd in entry.get("doses", []):
-                            if rd.get("peptide_id") == p.get("peptide_id"):
-                                dose = rd.get("dose_mcg", base)
-                                break
-                        else:
-                            pct = entry.get("percentage")
-                            if pct is not None:
-                                dose = base * pct / 100
-                        break
-                pname = p.get("name") or p.get("peptide_name", "?")
-                freq = p.get("daily_frequency", 1) or 1
-                for dose_idx in range(freq):
-                    items.append((pname, dose, cname, p.get("peptide_id"), c.get("id"), dose_idx))
-
-        return sorted(items, key=lambda x: x[0])
-
     # ── Helpers ──────────────────────────────────────────────────────
 
-    def _empty(self, text):
-        lbl = QLabel(text)
-        lbl.setStyleSheet(f"color: {_DIM}; padding: 4px 0 4px 16px; font-style: italic;")
-        return lbl
+    def _empty_spec(self, text):
+        return _RowSpec(text, f"color: {_DIM}; padding: 4px 0 4px 16px; font-style: italic;")
@@ -389,6 +389,11 @@ class _RampEditor(QWidget):
 class CyclesTab(BaseView):
     """Cycles list with status filter and context menu actions."""
 
+    watch_tables = (
+        'cycles', 'protocols', 'protocol_peptides', 'peptides',
+        'administrations', 'treatment_plans', 'plan_phases',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -452,19 +457,18 @@ class CyclesTab(BaseView):
 
     _IN_CORSO = {"active", "planned", "paused"}
 
-    def refresh(self):
-        status_filter = self._status_filter.currentData()
-        try:
-            all_cycles = self.manager.get_cycles(active_only=False)
-            if status_filter == "in_corso":
-                cycles = [c for c in all_cycles if c.get("status") in self._IN_CORSO]
-            elif status_filter:
-                cycles = [c for c in all_cycles if c.get("status") == status_filter]
-            else:
-                cycles = all_cycles
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch_params(self):
+        return {"status": self._status_filter.currentData()}
+
+    def fetch(self, manager, params):
+        status_filter = params["status"]
+        all_cycles = manager.get_cycles(active_only=False)
+        if status_filter == "in_corso":
+            cycles = [c for c in all_cycles if c.get("status") in self._IN_CORSO]
+        elif status_filter:
+            cycles = [c for c in all_cycles if c.get("status") == status_filter]
+        else:
+            cycles = all_cycles
 
         rows = []
         for c in cycles:
@@ -495,6 +499,9 @@ class CyclesTab(BaseView):
                 "progress": progress,
                 "_status": c.get("status"),
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     # ── Actions ──────────────────────────────────────────────────────────
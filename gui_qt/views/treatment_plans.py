@@ -432,6 +432,11 @@ class _ExportCalendarDialog(QDialog):
 class PlansTab(BaseView):
     """Treatment plans list with status filter and CRUD."""
 
+    watch_tables = (
+        'treatment_plans', 'plan_phases', 'plan_resources', 'plan_simulations',
+        'cycles', 'administrations',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -501,13 +506,11 @@ class PlansTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        status_filter = self._status_filter.currentData()
-        try:
-            plans = self.manager.get_treatment_plans(status=status_filter)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch_params(self):
+        return {"status": self._status_filter.currentData()}
+
+    def fetch(self, manager, params):
+        plans = manager.get_treatment_plans(status=params["status"])
 
         rows = []
         for p in plans:
@@ -516,7 +519,7 @@ class PlansTab(BaseView):
             if not phases_count:
                 # Fallback for legacy plans without total_phases
                 try:
-                    full = self.manager.get_treatment_plan(p.get("id"))
+                    full = manager.get_treatment_plan(p.get("id"))
                     if full and "phases" in full:
                         phases_count = len(full["phases"])
                 except Exception:
@@ -532,6 +535,9 @@ class PlansTab(BaseView):
                 "phases_count": phases_count,
                 "_status": p.get("status"),
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     # ── Actions ──────────────────────────────────────────────────────────
@@ -36,6 +36,10 @@ from .treatment_common import (
 class ProtocolsTab(BaseView):
     """Protocols list with add/edit/delete via context menu."""
 
+    watch_tables = (
+        'protocols', 'protocol_peptides', 'peptides', 'cycles', 'administrations',
+    )
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -76,19 +80,15 @@ class ProtocolsTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        try:
-            protocols = self.manager.get_protocols(active_only=True)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
-            return
+    def fetch(self, manager, params):
+        protocols = manager.get_protocols(active_only=True)
 
         rows = []
         for p in protocols:
             # Get admin count
             admin_count = 0
             try:
-                stats = self.manager.get_protocol_statistics(p["id"])
+                stats = manager.get_protocol_statistics(p["id"])
                 admin_count = stats.get("count", 0)
             except Exception:
                 pass
@@ -100,6 +100,9 @@ class ProtocolsTab(BaseView):
                 "peptides_display": p.get("peptides_display", "-"),
                 "admin_count": admin_count,
             })
+        return rows
+
+    def render(self, rows):
         self._table.load_data(rows)
 
     # ── Actions ──────────────────────────────────────────────────────────
@@ -162,6 +162,8 @@ _EXAMPLE_TEMPLATES = [
 class TemplatesTab(BaseView):
     """Treatment plan templates — CRUD + phase editor."""
 
+    watch_tables = ('treatment_plan_templates',)
+
     def __init__(self, app, parent=None):
         super().__init__(app, parent)
         self._build_ui()
@@ -213,31 +215,31 @@ class TemplatesTab(BaseView):
 
     # ── Data ─────────────────────────────────────────────────────────────
 
-    def refresh(self):
-        try:
-            cur = self._conn().cursor()
-            cur.execute("""
-                SELECT id, name, short_name, category,
-                       total_phases, total_duration_weeks, is_active
-                FROM treatment_plan_templates
-                ORDER BY category, name
-            """)
-            rows = []
-            cat_labels = dict(_CATEGORY_OPTIONS)
-            for tid, name, short_name, cat, phases, weeks, active in cur.fetchall():
-                rows.append({
-                    "id": tid,
-                    "name": name,
-                    "short_name": short_name or "—",
-                    "category": cat_labels.get(cat, cat or "—"),
-                    "total_phases": phases,
-                    "total_weeks": weeks,
-                    "active": "Sì" if active else "No",
-                    "_is_active": bool(active),
-                })
-            self._table.load_data(rows)
-        except Exception as e:
-            error_dialog(self, "Errore", str(e))
+    def fetch(self, manager, params):
+        cur = manager.conn.cursor()
+        cur.execute("""
+            SELECT id, name, short_name, category,
+                   total_phases, total_duration_weeks, is_active
+            FROM treatment_plan_templates
+            ORDER BY category, name
+        """)
+        rows = []
+        cat_labels = dict(_CATEGORY_OPTIONS)
+        for tid, name, short_name, cat, phases, weeks, active in cur.fetchall():
+            rows.append({
+                "id": tid,
+                "name": name,
+                "short_name": short_name or "—",
+                "category": cat_labels.get(cat, cat or "—"),
+                "total_phases": phases,
+                "total_weeks": weeks,
+                "active": "Sì" if active else "No",
+                "_is_active": bool(active),
+            })
+        return rows
+
+    def render(self, rows):
+        self._table.load_data(rows)
 
     # ── Actions ──────────────────────────────────────────────────────────
 
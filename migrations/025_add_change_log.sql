@@ -0,0 +1,138 @@
+-- Change-data-capture: journal delle modifiche alle tabelle principali
+--
+-- Ogni INSERT/UPDATE/DELETE sulle tabelle sotto aggiunge una riga a `change_log`
+-- (seq monotona, tabella, rowid, operazione). Cache, export e sync prod->dev
+-- possono così leggere solo le modifiche successive al proprio cursore invece
+-- di rileggere tutto (API in peptide_manager/change_log.py).
+--
+-- seq usa AUTOINCREMENT: non viene mai riutilizzata, nemmeno dopo la
+-- compattazione del log.
+--
+-- NB: una migration che ricrea una di queste tabelle (DROP + RENAME) elimina
+-- anche i suoi trigger: vanno ricreati nella stessa migration.
+--
+-- ROLLBACK:
+--   DROP TRIGGER IF EXISTS trg_change_log_<tabella>_<insert|update|delete>;
+--   DROP TABLE IF EXISTS change_log;
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_tbl_row ON change_log(tbl, row_id);
+
+-- batches
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batches_insert
+AFTER INSERT ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batches_update
+AFTER UPDATE ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batches_delete
+AFTER DELETE ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', OLD.rowid, 'delete');
+END;
+
+-- preparations
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparations_insert
+AFTER INSERT ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparations_update
+AFTER UPDATE ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparations_delete
+AFTER DELETE ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', OLD.rowid, 'delete');
+END;
+
+-- administrations
+CREATE TRIGGER IF NOT EXISTS trg_change_log_administrations_insert
+AFTER INSERT ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_administrations_update
+AFTER UPDATE ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_administrations_delete
+AFTER DELETE ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', OLD.rowid, 'delete');
+END;
+
+-- preparation_events
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparation_events_insert
+AFTER INSERT ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparation_events_update
+AFTER UPDATE ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_preparation_events_delete
+AFTER DELETE ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', OLD.rowid, 'delete');
+END;
+
+-- cycles
+CREATE TRIGGER IF NOT EXISTS trg_change_log_cycles_insert
+AFTER INSERT ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_cycles_update
+AFTER UPDATE ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_cycles_delete
+AFTER DELETE ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', OLD.rowid, 'delete');
+END;
+
+-- treatment_plans
+CREATE TRIGGER IF NOT EXISTS trg_change_log_treatment_plans_insert
+AFTER INSERT ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_treatment_plans_update
+AFTER UPDATE ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_treatment_plans_delete
+AFTER DELETE ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', OLD.rowid, 'delete');
+END;
+
+-- plan_phases
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_phases_insert
+AFTER INSERT ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_phases_update
+AFTER UPDATE ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_phases_delete
+AFTER DELETE ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', OLD.rowid, 'delete');
+END;
+
+-- plan_resources
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_resources_insert
+AFTER INSERT ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_resources_update
+AFTER UPDATE ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_plan_resources_delete
+AFTER DELETE ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', OLD.rowid, 'delete');
+END;
@@ -0,0 +1,46 @@
+-- Cache materializzata dello schedule dosi per i prossimi N giorni
+--
+-- Vista Oggi (previsione e simulazione esaurimento prep), export calendario e
+-- CLI ricalcolavano lo schedule da zero dai cicli attivi. `schedule_cache`
+-- contiene una riga per dose prevista (giorno, ciclo, peptide, indice della
+-- dose nel giorno) da oggi a oggi + horizon_days - 1: i lettori fanno una
+-- range query sull'indice primario.
+--
+-- Mantenuta da peptide_manager/schedule_cache.py: dopo le modifiche a cicli
+-- (ramp incluse) e somministrazioni registrate nel journal `change_log`
+-- (migration 025) si ricalcolano solo i cicli toccati; ogni giorno le date
+-- passate vengono eliminate e l'orizzonte esteso. `schedule_cache_state`
+-- (una sola riga) salva orizzonte e cursore del journal: un lettore capisce
+-- da solo se la cache è aggiornata.
+--
+-- status: 'planned' (da fare) | 'done' (somministrazione registrata quel
+-- giorno per ciclo e peptide).
+--
+-- ROLLBACK:
+--   DROP TABLE IF EXISTS schedule_cache_state;
+--   DROP INDEX IF EXISTS idx_schedule_cache_cycle;
+--   DROP TABLE IF EXISTS schedule_cache;
+
+CREATE TABLE IF NOT EXISTS schedule_cache (
+    date DATE NOT NULL,
+    cycle_id INTEGER NOT NULL,
+    peptide_id INTEGER NOT NULL,
+    dose_index INTEGER NOT NULL DEFAULT 0,
+    dose_mcg REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'planned' CHECK (status IN ('planned', 'done')),
+    PRIMARY KEY (date, cycle_id, peptide_id, dose_index)
+);
+
+-- Ricalcolo incrementale: righe di un ciclo
+CREATE INDEX IF NOT EXISTS idx_schedule_cache_cycle ON schedule_cache(cycle_id, date);
+
+CREATE TABLE IF NOT EXISTS schedule_cache_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    horizon_days INTEGER NOT NULL DEFAULT 60 CHECK (horizon_days > 0),
+    horizon_start DATE,
+    horizon_end DATE,
+    cursor INTEGER NOT NULL DEFAULT 0
+);
+
+-- Cache vuota (horizon_start NULL): costruita al primo avvio
+INSERT OR IGNORE INTO schedule_cache_state (id) VALUES (1);
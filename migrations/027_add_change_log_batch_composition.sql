@@ -0,0 +1,24 @@
+-- Journal (migration 025) anche per batch_composition
+--
+-- Lo stato 'done' di schedule_cache (migration 026) dipende dal peptide delle
+-- somministrazioni: administrations -> preparations -> batch_composition.
+-- Senza trigger una modifica della composizione di un batch non sposta il
+-- cursore del journal e la cache sembrerebbe aggiornata.
+--
+-- ROLLBACK:
+--   DROP TRIGGER IF EXISTS trg_change_log_batch_composition_insert;
+--   DROP TRIGGER IF EXISTS trg_change_log_batch_composition_update;
+--   DROP TRIGGER IF EXISTS trg_change_log_batch_composition_delete;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batch_composition_insert
+AFTER INSERT ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batch_composition_update
+AFTER UPDATE ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', NEW.rowid, 'update');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_change_log_batch_composition_delete
+AFTER DELETE ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', OLD.rowid, 'delete');
+END;
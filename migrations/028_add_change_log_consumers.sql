@@ -0,0 +1,16 @@
+-- Cursori dei consumatori del journal change_log (migration 025)
+--
+-- Ogni consumatore (schedule cache, export, sync prod->dev, ...) salva qui
+-- l'ultimo seq elaborato. La compattazione del journal
+-- (peptide_manager/change_log.py, ChangeLog.compact_consumed) elimina solo
+-- le voci già lette da tutti: MIN(cursor). Senza consumatori registrati il
+-- journal non viene compattato.
+--
+-- ROLLBACK:
+--   DROP TABLE IF EXISTS change_log_consumers;
+
+CREATE TABLE IF NOT EXISTS change_log_consumers (
+    name TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -5,16 +5,24 @@ Sistema migrazioni database
 import sqlite3
 import sys
 from pathlib import Path
-from datetime import datetime
 
 # Aggiungi parent directory al path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from scripts.environment import get_environment
+from peptide_manager.migrator import (
+    MIGRATIONS_TABLE, MigrationError, Migrator, description_of,
+)
 
 
 class MigrationManager:
-    """Gestisce migrazioni database."""
+    """
+    Gestisce migrazioni database.
+
+    Interfaccia CLI sul motore condiviso con l'app
+    (``peptide_manager/migrator.py``): stesso registro, stessa baseline
+    per i database creati senza registro, una transazione per migrazione.
+    """
     
     def __init__(self, db_path: Path):
         self.db_path = db_path
@@ -23,48 +31,34 @@ class MigrationManager:
         # Crea tabella tracking migrazioni
         self._init_migrations_table()
     
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _migrator(self, conn: sqlite3.Connection) -> Migrator:
+        return Migrator(conn, self.migrations_dir, verbose=False)
+
     def _init_migrations_table(self):
         """Crea tabella per tracking migrazioni."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schema_migrations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                migration_name TEXT UNIQUE NOT NULL,
-                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                description TEXT
-            )
-        ''')
-        
+        conn = self._connect()
+        conn.execute(MIGRATIONS_TABLE)
         conn.commit()
         conn.close()
     
     def get_applied_migrations(self) -> set:
         """Recupera migrazioni già applicate."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT migration_name FROM schema_migrations')
-        applied = {row[0] for row in cursor.fetchall()}
-        
-        conn.close()
-        return applied
+        conn = self._connect()
+        try:
+            return self._migrator(conn).applied()
+        finally:
+            conn.close()
     
     def get_pending_migrations(self) -> list:
-        """Recupera migrazioni pendenti."""
-        applied = self.get_applied_migrations()
-        
-        # Trova tutti i file .sql nella directory migrations
-        all_migrations = sorted(self.migrations_dir.glob('*.sql'))
-        
-        # Filtra già applicati
-        pending = [
-            m for m in all_migrations 
-            if m.stem not in applied
-        ]
-        
-        return pending
+        """Recupera migrazioni pendenti (al netto della baseline)."""
+        conn = self._connect()
+        try:
+            return self._migrator(conn).plan()[1]
+        finally:
+            conn.close()
     
     def apply_migration(self, migration_file: Path) -> bool:
         """
@@ -78,58 +72,16 @@ class MigrationManager:
         """
         
         print(f"\n📝 Applicazione: {migration_file.name}")
+        description = description_of(migration_file.read_text(encoding='utf-8'))
         
-        # Leggi SQL
-        with open(migration_file, 'r', encoding='utf-8') as f:
-            sql = f.read()
-        
-        # Estrai descrizione (primo commento)
-        description = None
-        for line in sql.split('\n'):
-            if line.strip().startswith('--'):
-                description = line.strip('- ').strip()
-                break
-        
-        # Applica migrazione
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        conn = self._connect()
         try:
-            # Esegui SQL
-            cursor.executescript(sql)
-            
-            # Registra migrazione applicata
-            cursor.execute('''
-                INSERT INTO schema_migrations (migration_name, description)
-                VALUES (?, ?)
-            ''', (migration_file.stem, description))
-            
-            conn.commit()
+            self._migrator(conn).apply(migration_file)
             print(f"   ✅ {description or 'Migrazione applicata'}")
             return True
-            
-        except Exception as e:
-            # Handle some idempotent-safe errors (e.g., column already exists)
-            err_text = str(e).lower()
-            if 'duplicate column' in err_text or 'duplicate column name' in err_text or 'column .* already exists' in err_text:
-                # Log warning, record migration as applied to avoid blocking dry-runs on DBs
-                print(f"   ⚠️ Warning: possibile colonna già presente. Registriamo la migrazione come applicata (warning). Errore originale: {e}")
-                try:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO schema_migrations (migration_name, description)
-                        VALUES (?, ?)
-                    ''', (migration_file.stem, description))
-                    conn.commit()
-                    return True
-                except Exception as e2:
-                    conn.rollback()
-                    print(f"   ❌ Errore durante registrazione migration: {e2}")
-                    return False
-            else:
-                conn.rollback()
-                print(f"   ❌ Errore: {e}")
-                return False
-            
+        except MigrationError as e:
+            print(f"   ❌ Errore: {e}")
+            return False
         finally:
             conn.close()
     
@@ -147,13 +99,15 @@ class MigrationManager:
             print(f"   • {m.name}")
         print()
         
-        # Applica una per una
-        for migration in pending:
-            success = self.apply_migration(migration)
-            
-            if not success:
-                print("\n❌ Migrazione fallita! Stop.")
-                return False
+        conn = self._connect()
+        migrator = Migrator(conn, self.migrations_dir)
+        try:
+            migrator.migrate(create=True)
+        except MigrationError as e:
+            print(f"\n❌ Migrazione fallita! Stop. ({e})")
+            return False
+        finally:
+            conn.close()
         
         print("\n✅ Tutte le migrazioni applicate con successo!")
         return True
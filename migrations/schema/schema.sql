@@ -0,0 +1,712 @@
+-- Schema finale generato dalle migration: NON modificare a mano.
+-- Rigenera con: python -m peptide_manager.schema_template
+
+BEGIN;
+CREATE TABLE shipments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER NOT NULL,
+        shipping_cost REAL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        shipping_date DATE,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
+    );
+CREATE TABLE suppliers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        country TEXT,
+        website TEXT,
+        email TEXT,
+        notes TEXT,
+        reliability_rating INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    , janoshik_certificates INTEGER DEFAULT 0, janoshik_avg_purity REAL, janoshik_min_purity REAL, janoshik_max_purity REAL, janoshik_last_test_date TEXT, janoshik_days_since_last_test INTEGER, janoshik_quality_score REAL, janoshik_updated_at TIMESTAMP);
+CREATE TABLE peptides (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        common_uses TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+CREATE TABLE batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER NOT NULL,
+        product_name TEXT NOT NULL,
+        batch_number TEXT,
+        vials_count INTEGER NOT NULL,
+        vials_received INTEGER DEFAULT NULL,
+        mg_per_vial REAL,
+        total_price REAL,
+        price_per_vial REAL,
+        currency TEXT DEFAULT 'EUR',
+        purchase_date DATE,
+        expiry_date DATE,
+        storage_location TEXT,
+        vials_remaining INTEGER NOT NULL DEFAULT 0,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL,
+        manufacturing_date DATE,
+        coa_path TEXT,
+        shipping_cost REAL,
+        shipment_id INTEGER REFERENCES shipments(id)
+    );
+CREATE TABLE batch_composition (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        peptide_id INTEGER NOT NULL,
+        mg_per_vial REAL NOT NULL,
+        mg_amount REAL
+    );
+CREATE TABLE certificates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        certificate_type TEXT NOT NULL,
+        lab_name TEXT,
+        test_date DATE,
+        file_path TEXT,
+        file_name TEXT,
+        purity_percentage REAL,
+        endotoxin_level TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+CREATE TABLE certificate_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        certificate_id INTEGER NOT NULL,
+        test_parameter TEXT NOT NULL,
+        result_value TEXT,
+        unit TEXT,
+        specification TEXT,
+        pass_fail TEXT
+    );
+CREATE TABLE preparations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        vials_used INTEGER NOT NULL,
+        volume_ml REAL NOT NULL,
+        diluent TEXT DEFAULT 'BAC Water',
+        preparation_date DATE NOT NULL,
+        expiry_date DATE,
+        volume_remaining_ml REAL NOT NULL,
+        storage_location TEXT,
+        notes TEXT,
+        status TEXT DEFAULT 'available',
+        actual_depletion_date DATE,
+        wastage_ml REAL,
+        wastage_reason TEXT,
+        wastage_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+CREATE TABLE preparation_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        preparation_id INTEGER NOT NULL,
+        event_type TEXT NOT NULL DEFAULT 'wastage',
+        volume_ml REAL NOT NULL,
+        event_date DATE NOT NULL,
+        reason TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL,
+        FOREIGN KEY (preparation_id) REFERENCES preparations(id)
+    );
+CREATE TABLE protocol_peptides (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        protocol_id INTEGER NOT NULL,
+        peptide_id INTEGER NOT NULL,
+        target_dose_mcg REAL NOT NULL
+    );
+CREATE TABLE administrations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        preparation_id INTEGER NOT NULL,
+        protocol_id INTEGER,
+        administration_datetime TIMESTAMP NOT NULL,
+        dose_ml REAL NOT NULL,
+        injection_site TEXT,
+        notes TEXT,
+        side_effects TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        injection_method TEXT,
+        deleted_at TIMESTAMP DEFAULT NULL
+    , cycle_id INTEGER);
+CREATE TABLE schema_migrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    migration_name TEXT NOT NULL UNIQUE,
+    description TEXT,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE janoshik_certificates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_number TEXT UNIQUE NOT NULL,
+    image_url TEXT NOT NULL,
+    image_hash TEXT UNIQUE,
+    local_image_path TEXT,
+    supplier_name TEXT,
+    product_name TEXT,
+    test_date TEXT,
+    purity_percentage REAL,
+    purity_mg_per_vial REAL,
+    endotoxin_eu_per_mg REAL,
+    testing_lab TEXT DEFAULT 'Janoshik Analytical',
+    raw_llm_response TEXT,
+    extraction_timestamp TEXT,
+    created_at TEXT DEFAULT (datetime('now')),
+    updated_at TEXT DEFAULT (datetime('now')),
+    supplier_website TEXT,
+    peptide_name TEXT,
+    batch_number TEXT,
+    testing_ordered TEXT,
+    sample_received TEXT,
+    analysis_conducted TEXT,
+    quantity_tested_mg REAL,
+    heavy_metals_result TEXT,
+    microbiology_tamc INTEGER,
+    microbiology_tymc INTEGER,
+    test_type TEXT,
+    test_category TEXT,
+    comments TEXT,
+    verification_key TEXT,
+    raw_data TEXT,
+    scraped_at TEXT,
+    processed INTEGER DEFAULT 0,
+    peptide_name_std TEXT,
+    quantity_nominal REAL,
+    unit_of_measure TEXT
+, protocol_name TEXT, is_blend INTEGER DEFAULT 0, blend_components TEXT, has_replicates INTEGER DEFAULT 0, replicate_measurements TEXT, replicate_statistics TEXT);
+CREATE TABLE supplier_rankings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    supplier_name TEXT UNIQUE NOT NULL,
+    total_score REAL NOT NULL,
+    volume_score REAL,
+    quality_score REAL,
+    consistency_score REAL,
+    recency_score REAL,
+    endotoxin_score REAL,
+    cert_count INTEGER DEFAULT 0,
+    avg_purity REAL,
+    min_purity REAL,
+    purity_std_dev REAL,
+    recent_cert_count INTEGER DEFAULT 0,
+    last_cert_date TEXT,
+    avg_endotoxin REAL,
+    has_endotoxin_tests INTEGER DEFAULT 0,
+    rank_position INTEGER,
+    created_at TEXT DEFAULT (datetime('now')),
+    updated_at TEXT DEFAULT (datetime('now'))
+, avg_accuracy REAL, certs_with_accuracy INTEGER DEFAULT 0, accuracy_score REAL DEFAULT 50.0);
+CREATE TABLE treatment_plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    protocol_template_id INTEGER,  -- Can be NULL, no FK constraint
+    description TEXT,
+    reason TEXT,
+    planned_end_date DATE,
+    actual_end_date DATE,
+    status TEXT DEFAULT 'active', -- 'active', 'paused', 'completed', 'abandoned', 'planned'
+    total_planned_days INTEGER,
+    days_completed INTEGER DEFAULT 0,
+    adherence_percentage REAL DEFAULT 100.0,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP
+, is_multi_phase BOOLEAN DEFAULT 0, simulation_id INTEGER REFERENCES plan_simulations(id) ON DELETE SET NULL, current_phase_id INTEGER REFERENCES plan_phases(id) ON DELETE SET NULL, total_phases INTEGER DEFAULT 1, resources_summary TEXT);
+CREATE TABLE plan_phases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    treatment_plan_id INTEGER NOT NULL,
+    phase_number INTEGER NOT NULL, -- 1, 2, 3, 4 (Foundation, Intensification, Consolidation, Transition)
+    phase_name TEXT NOT NULL, -- es. "Foundation", "Intensification", etc.
+    description TEXT,
+    
+    -- Timing
+    duration_weeks INTEGER NOT NULL, -- Durata prevista in settimane
+    start_week INTEGER, -- Settimana di inizio relativa al piano (1-based, NULL se non ancora iniziata)
+    
+    -- Peptide configuration (JSON array)
+    -- [{peptide_id: 1, dose_mcg: 100, peptide_name: "CJC-1295"}, ...]
+    peptides_config TEXT NOT NULL, -- JSON array di configurazioni peptidi
+    
+    -- Dosing protocol
+    daily_frequency INTEGER NOT NULL DEFAULT 1, -- 1x, 2x, 3x al giorno
+    five_two_protocol BOOLEAN DEFAULT 0, -- 5 giorni on, 2 giorni off
+    ramp_schedule TEXT, -- JSON per ramp-up/down opzionale
+    
+    -- Status tracking
+    status TEXT DEFAULT 'planned', -- 'planned', 'active', 'completed', 'skipped'
+    cycle_id INTEGER, -- Link al Cycle quando la fase viene attivata
+    actual_start_date DATE,
+    actual_end_date DATE,
+    
+    -- Notes
+    notes TEXT,
+    
+    -- Metadata
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP, administration_times TEXT, peptide_timing TEXT, weekday_pattern TEXT, dose_adjustments TEXT,
+    
+    FOREIGN KEY (treatment_plan_id) REFERENCES treatment_plans(id) ON DELETE CASCADE,
+    FOREIGN KEY (cycle_id) REFERENCES cycles(id) ON DELETE SET NULL,
+    
+    -- Constraint: phase_number unico per treatment_plan
+    UNIQUE(treatment_plan_id, phase_number)
+);
+CREATE TABLE plan_resources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    
+    -- Scope: fase specifica o piano completo
+    treatment_plan_id INTEGER NOT NULL,
+    plan_phase_id INTEGER, -- NULL = risorse per intero piano, altrimenti per fase specifica
+    
+    -- Resource identification
+    resource_type TEXT NOT NULL, -- 'peptide', 'syringe', 'needle', 'consumable'
+    resource_id INTEGER, -- peptide_id, NULL per consumabili generici
+    resource_name TEXT NOT NULL, -- Nome descrittivo
+    
+    -- Quantities
+    quantity_needed REAL NOT NULL, -- Quantità totale richiesta
+    quantity_unit TEXT NOT NULL, -- 'vials', 'mg', 'ml', 'units'
+    
+    -- Inventory check (snapshot al momento del calcolo)
+    quantity_available REAL DEFAULT 0,
+    quantity_gap REAL, -- quantity_needed - quantity_available (può essere negativo)
+    
+    -- Acquisition planning
+    needs_ordering BOOLEAN DEFAULT 0, -- Flag se serve ordinare
+    order_by_week INTEGER, -- Settimana entro cui ordinare (relativa a inizio piano)
+    estimated_cost REAL, -- Costo stimato per acquisto gap
+    currency TEXT DEFAULT 'EUR',
+    
+    -- Calculation metadata
+    calculation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    calculation_params TEXT, -- JSON con parametri usati per calcolo
+    
+    -- Notes
+    notes TEXT,
+    
+    -- Metadata
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (treatment_plan_id) REFERENCES treatment_plans(id) ON DELETE CASCADE,
+    FOREIGN KEY (plan_phase_id) REFERENCES plan_phases(id) ON DELETE CASCADE,
+    FOREIGN KEY (resource_id) REFERENCES peptides(id) ON DELETE SET NULL
+);
+CREATE TABLE plan_simulations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    
+    -- Simulation metadata
+    name TEXT NOT NULL,
+    description TEXT,
+    base_plan_id INTEGER, -- Piano originale da cui deriva la simulazione (può essere NULL)
+    
+    -- Configuration snapshot (JSON)
+    -- Salva intera configurazione fasi + parametri per riproducibilità
+    simulation_config TEXT NOT NULL, -- JSON completo della simulazione
+    
+    -- Results summary (JSON)
+    -- Salva risultati calcolati: risorse totali, costi, timeline
+    results_summary TEXT, -- JSON con risultati aggregati
+    
+    -- Comparison metadata (se deriva da piano esistente)
+    comparison_notes TEXT, -- Note sulle differenze vs piano base
+    
+    -- Status
+    is_archived BOOLEAN DEFAULT 0,
+    converted_to_plan BOOLEAN DEFAULT 0, -- Se simulazione è diventata piano reale
+    converted_plan_id INTEGER, -- ID del piano creato da questa simulazione
+    
+    -- Metadata
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP,
+    
+    FOREIGN KEY (base_plan_id) REFERENCES treatment_plans(id) ON DELETE SET NULL,
+    FOREIGN KEY (converted_plan_id) REFERENCES treatment_plans(id) ON DELETE SET NULL
+);
+CREATE TABLE protocols (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    frequency_per_day INTEGER DEFAULT 1,
+    days_on INTEGER,
+    days_off INTEGER DEFAULT 0,
+    cycle_duration_weeks INTEGER,
+    notes TEXT,
+    active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP DEFAULT NULL
+);
+CREATE TABLE vendor_products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    supplier_id INTEGER NOT NULL,
+    
+    -- Product identification (può essere peptide o consumabile)
+    product_type TEXT NOT NULL, -- 'peptide', 'syringe', 'needle', 'bac_water', 'alcohol_swab', 'sharps_container'
+    peptide_id INTEGER, -- NULL se non è peptide
+    product_name TEXT NOT NULL, -- Nome prodotto (es. "BPC-157 5mg", "Insulin Syringe 1ml")
+    
+    -- Quantity per unit
+    mg_per_vial REAL, -- Solo per peptidi
+    units_per_pack INTEGER DEFAULT 1, -- Per consumabili (es. 100 siringhe per box)
+    
+    -- Pricing
+    price REAL NOT NULL,
+    currency TEXT DEFAULT 'EUR',
+    price_per_mg REAL, -- Calcolato: price / mg_per_vial (solo peptidi)
+    
+    -- Availability
+    is_available BOOLEAN DEFAULT 1,
+    lead_time_days INTEGER, -- Tempo consegna stimato
+    minimum_order_qty INTEGER DEFAULT 1,
+    
+    -- Metadata
+    sku TEXT, -- Codice prodotto fornitore
+    url TEXT, -- Link diretto al prodotto
+    notes TEXT,
+    last_price_update DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE CASCADE,
+    FOREIGN KEY (peptide_id) REFERENCES peptides(id) ON DELETE SET NULL
+);
+CREATE TABLE consumable_defaults (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    consumable_type TEXT NOT NULL UNIQUE, -- 'syringe_1ml', 'needle_29g', 'bac_water_30ml', etc.
+    display_name TEXT NOT NULL,
+    default_price REAL NOT NULL,
+    currency TEXT DEFAULT 'EUR',
+    units_per_pack INTEGER DEFAULT 1,
+    notes TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE treatment_plan_templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    
+    -- Identificazione
+    name TEXT NOT NULL UNIQUE,
+    short_name TEXT, -- Es. "GH-Recomp", "MetRestore", "AntiAge"
+    category TEXT, -- "weight_loss", "body_recomposition", "metabolic", "anti_aging"
+    
+    -- Profilo candidato
+    candidate_profile TEXT, -- JSON con criteri (BMI range, condizioni, etc.)
+    
+    -- Struttura fasi: JSON array completo
+    -- [{phase_number: 1, phase_name: "Foundation", duration_weeks: 4, peptides: [...], ...}]
+    phases_config TEXT NOT NULL, -- JSON completo definizione fasi
+    
+    -- Totali
+    total_duration_weeks INTEGER NOT NULL,
+    total_phases INTEGER NOT NULL,
+    
+    -- Expected outcomes
+    expected_outcomes TEXT, -- JSON array di outcome attesi
+    
+    -- Metadata
+    source TEXT, -- Es. "Peptide Weight Loss Book", "Custom"
+    is_system_template BOOLEAN DEFAULT 0, -- Template di sistema non modificabili
+    is_active BOOLEAN DEFAULT 1,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE user_preferences (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    preference_key TEXT NOT NULL UNIQUE,
+    preference_value TEXT NOT NULL,
+    value_type TEXT DEFAULT 'string', -- 'string', 'int', 'bool', 'json'
+    category TEXT DEFAULT 'general', -- 'notifications', 'display', 'general'
+    description TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE peptide_aliases (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    peptide_id INTEGER NOT NULL REFERENCES peptides(id) ON DELETE CASCADE,
+    alias      TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(alias COLLATE NOCASE)
+);
+CREATE TABLE "cycles" (
+    id                    INTEGER PRIMARY KEY AUTOINCREMENT,
+    protocol_id           INTEGER,                        -- ora nullable
+    name                  TEXT NOT NULL,
+    description           TEXT,
+    start_date            DATE,
+    planned_end_date      DATE,
+    actual_end_date       DATE,
+    days_on               INTEGER,
+    days_off              INTEGER,
+    cycle_duration_weeks  INTEGER,
+    protocol_snapshot     TEXT,
+    ramp_schedule         TEXT,
+    status                TEXT DEFAULT 'active',
+    plan_phase_id         INTEGER,                        -- nuovo: link a plan_phases
+    created_at            TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at            TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at            TIMESTAMP, resumed_at DATE,
+    FOREIGN KEY (protocol_id)  REFERENCES protocols(id),
+    FOREIGN KEY (plan_phase_id) REFERENCES plan_phases(id)
+);
+CREATE TABLE change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE schedule_cache (
+    date DATE NOT NULL,
+    cycle_id INTEGER NOT NULL,
+    peptide_id INTEGER NOT NULL,
+    dose_index INTEGER NOT NULL DEFAULT 0,
+    dose_mcg REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'planned' CHECK (status IN ('planned', 'done')),
+    PRIMARY KEY (date, cycle_id, peptide_id, dose_index)
+);
+CREATE TABLE schedule_cache_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    horizon_days INTEGER NOT NULL DEFAULT 60 CHECK (horizon_days > 0),
+    horizon_start DATE,
+    horizon_end DATE,
+    cursor INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE change_log_consumers (
+    name TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_batches_supplier ON batches(supplier_id);
+CREATE INDEX idx_batch_composition_batch ON batch_composition(batch_id);
+CREATE INDEX idx_certificates_batch ON certificates(batch_id);
+CREATE INDEX idx_preparations_batch ON preparations(batch_id);
+CREATE INDEX idx_administrations_date ON administrations(administration_datetime);
+CREATE INDEX idx_administrations_prep ON administrations(preparation_id);
+CREATE INDEX idx_administrations_cycle_id ON administrations(cycle_id);
+CREATE INDEX idx_janoshik_supplier ON janoshik_certificates(supplier_name);
+CREATE INDEX idx_janoshik_test_date ON janoshik_certificates(test_date);
+CREATE INDEX idx_janoshik_task ON janoshik_certificates(task_number);
+CREATE INDEX idx_janoshik_image_hash ON janoshik_certificates(image_hash);
+CREATE INDEX idx_janoshik_processed ON janoshik_certificates(processed);
+CREATE INDEX idx_ranking_score ON supplier_rankings(total_score DESC);
+CREATE INDEX idx_ranking_supplier ON supplier_rankings(supplier_name);
+CREATE INDEX idx_suppliers_janoshik_certificates ON suppliers(janoshik_certificates);
+CREATE INDEX idx_suppliers_janoshik_quality ON suppliers(janoshik_quality_score);
+CREATE INDEX idx_treatment_plans_status ON treatment_plans(status);
+CREATE INDEX idx_treatment_plans_template ON treatment_plans(protocol_template_id);
+CREATE INDEX idx_treatment_plans_dates ON treatment_plans(start_date, planned_end_date);
+CREATE INDEX idx_plan_phases_plan ON plan_phases(treatment_plan_id);
+CREATE INDEX idx_plan_phases_status ON plan_phases(status);
+CREATE INDEX idx_plan_phases_cycle ON plan_phases(cycle_id);
+CREATE INDEX idx_plan_resources_plan ON plan_resources(treatment_plan_id);
+CREATE INDEX idx_plan_resources_phase ON plan_resources(plan_phase_id);
+CREATE INDEX idx_plan_resources_type ON plan_resources(resource_type);
+CREATE INDEX idx_plan_resources_ordering ON plan_resources(needs_ordering);
+CREATE INDEX idx_plan_simulations_base ON plan_simulations(base_plan_id);
+CREATE INDEX idx_plan_simulations_converted ON plan_simulations(converted_to_plan);
+CREATE INDEX idx_treatment_plans_multi_phase ON treatment_plans(is_multi_phase);
+CREATE INDEX idx_treatment_plans_current_phase ON treatment_plans(current_phase_id);
+CREATE INDEX idx_vendor_products_supplier ON vendor_products(supplier_id);
+CREATE INDEX idx_vendor_products_peptide ON vendor_products(peptide_id);
+CREATE INDEX idx_vendor_products_type ON vendor_products(product_type);
+CREATE INDEX idx_vendor_products_available ON vendor_products(is_available);
+CREATE INDEX idx_tpt_category ON treatment_plan_templates(category);
+CREATE INDEX idx_tpt_active ON treatment_plan_templates(is_active);
+CREATE INDEX idx_janoshik_is_blend ON janoshik_certificates(is_blend);
+CREATE INDEX idx_janoshik_has_replicates ON janoshik_certificates(has_replicates);
+CREATE INDEX idx_janoshik_protocol ON janoshik_certificates(protocol_name);
+CREATE UNIQUE INDEX idx_janoshik_verification_key
+ON janoshik_certificates(verification_key)
+WHERE verification_key IS NOT NULL;
+CREATE INDEX idx_peptide_aliases_alias
+    ON peptide_aliases(alias COLLATE NOCASE);
+CREATE INDEX idx_cycles_status       ON cycles(status);
+CREATE INDEX idx_cycles_protocol_id  ON cycles(protocol_id);
+CREATE INDEX idx_cycles_plan_phase_id ON cycles(plan_phase_id);
+CREATE INDEX idx_preparation_events_prep
+    ON preparation_events(preparation_id, event_date);
+CREATE INDEX idx_change_log_tbl_row ON change_log(tbl, row_id);
+CREATE INDEX idx_schedule_cache_cycle ON schedule_cache(cycle_id, date);
+CREATE TRIGGER prevent_cycleid_overwrite
+BEFORE UPDATE ON administrations
+FOR EACH ROW
+WHEN OLD.cycle_id IS NOT NULL AND NEW.cycle_id IS NOT NULL AND (NEW.cycle_id != OLD.cycle_id)
+BEGIN
+    SELECT RAISE(ABORT, 'Cannot change cycle_id from one cycle to another');
+END;
+CREATE TRIGGER trg_change_log_batches_insert
+AFTER INSERT ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_batches_update
+AFTER UPDATE ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_batches_delete
+AFTER DELETE ON batches BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batches', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_preparations_insert
+AFTER INSERT ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_preparations_update
+AFTER UPDATE ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_preparations_delete
+AFTER DELETE ON preparations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparations', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_administrations_insert
+AFTER INSERT ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_administrations_update
+AFTER UPDATE ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_administrations_delete
+AFTER DELETE ON administrations BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('administrations', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_preparation_events_insert
+AFTER INSERT ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_preparation_events_update
+AFTER UPDATE ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_preparation_events_delete
+AFTER DELETE ON preparation_events BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('preparation_events', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_cycles_insert
+AFTER INSERT ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_cycles_update
+AFTER UPDATE ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_cycles_delete
+AFTER DELETE ON cycles BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('cycles', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_treatment_plans_insert
+AFTER INSERT ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_treatment_plans_update
+AFTER UPDATE ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_treatment_plans_delete
+AFTER DELETE ON treatment_plans BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('treatment_plans', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_plan_phases_insert
+AFTER INSERT ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_plan_phases_update
+AFTER UPDATE ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_plan_phases_delete
+AFTER DELETE ON plan_phases BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_phases', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_plan_resources_insert
+AFTER INSERT ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_plan_resources_update
+AFTER UPDATE ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_plan_resources_delete
+AFTER DELETE ON plan_resources BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('plan_resources', OLD.rowid, 'delete');
+END;
+CREATE TRIGGER trg_change_log_batch_composition_insert
+AFTER INSERT ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', NEW.rowid, 'insert');
+END;
+CREATE TRIGGER trg_change_log_batch_composition_update
+AFTER UPDATE ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', NEW.rowid, 'update');
+END;
+CREATE TRIGGER trg_change_log_batch_composition_delete
+AFTER DELETE ON batch_composition BEGIN
+    INSERT INTO change_log (tbl, row_id, op) VALUES ('batch_composition', OLD.rowid, 'delete');
+END;
+INSERT INTO "peptides" ("id", "name", "description", "common_uses", "notes", "deleted_at") VALUES (1, 'Selank', 'Esapeptide nootropico e anxiolitico (Thr-Lys-Pro-Arg-Pro-Gly-Pro) derivato dalla tuftina. Aumenta BDNF, modula serotonina e dopamina. Approvato in Russia come nootropico.', 'Riduzione dell''ansia senza sedazione; miglioramento della memoria e concentrazione; neuroprotezione; supporto in stati di stress; stabilizzazione dell''umore.', NULL, NULL);
+INSERT INTO "peptides" ("id", "name", "description", "common_uses", "notes", "deleted_at") VALUES (2, 'CJC-1295 DAC', 'Analogo GHRH (1-29) coniugato con Drug Affinity Complex (DAC) che lo lega all''albumina plasmatica prolungando la t½ a ~8 giorni. Stimola la secrezione prolungata e pulsatile di GH.', 'Aumento sostenuto di GH e IGF-1; crescita massa muscolare magra; riduzione grasso corporeo; recupero; cicli settimanali (1-2 iniezioni/settimana).', NULL, NULL);
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('001_create_base_schema', 'Migration 001: Create base schema');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('002_add_cycles', 'Aggiunge supporto per Cycles tracking');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('003_add_preparation_status', 'Migration 003: Add preparation status and wastage tracking');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('004_add_administrations_cycle_id', 'Aggiunge la colonna cycle_id alla tabella administrations per collegare somministrazioni ai cicli');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('005_prevent_cycleid_overwrite', 'Prevent accidental overwrite of administrations.cycle_id');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('006_add_janoshik_tables', 'Migration 006: Add Janoshik supplier ranking tables');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('006_make_cycle_startdate_nullable', 'Migration 006: Make cycles.start_date nullable');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('007_add_janoshik_missing_columns', 'Migration 007: Add missing columns to janoshik_certificates');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('007_remove_protocol_dose_ml', 'Removed dose_ml from protocols table');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('008_allow_cycle_unlink', 'Allow unlinking administrations from cycles (setting cycle_id to NULL)');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('008_janoshik_supplier_ranking', 'Migration 008: Janoshik Supplier Ranking System');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('009_add_quantity_accuracy', 'Migration 009: Add quantity accuracy tracking to supplier_rankings');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('010_add_testing_completeness', 'Migration 010: Testing Completeness Tracking');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('011_enhance_suppliers_janoshik', 'Migration 011: Enhance suppliers table with Janoshik metrics');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('012_add_treatment_planner', 'Migration 012: Add Treatment Planner Tables');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('013_make_cycle_protocolid_nullable', 'Migration 013: Make cycles.protocol_id nullable for planner-generated cycles');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('014_remove_protocol_dose_ml', 'Migration 014: Rimuove colonna dose_ml da protocols');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('015_add_vendor_pricing', 'Migration 015: Add Vendor Pricing and Enhanced Phase Timing');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('016_cycles_support_multiphase_plans', 'Migration 016: Support multi-phase plans in cycles table');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('017_add_janoshik_blend_replicate_support', 'Migration: Add support for blend and replicate certificates in Janoshik system');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('018_remove_duplicate_expiration_date', 'Migration 018: Remove duplicate expiration_date column from batches');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('019_add_peptide_aliases', 'Migration 019: tabella alias peptidi + split Semax/Selank + fix naming');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('020_fix_cycles_schema', 'Migration 020: Fix cycles table — make protocol_id nullable, add plan_phase_id');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('021_add_cycle_resumed_at', 'Migration 021: Add resumed_at to cycles');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('022_add_shipping_cost', NULL);
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('023_add_shipments', NULL);
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('024_add_preparation_events', 'Storico eventi preparazione: sprechi tracciabili, correggibili e cancellabili');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('025_add_change_log', 'Change-data-capture: journal delle modifiche alle tabelle principali');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('026_add_schedule_cache', 'Cache materializzata dello schedule dosi per i prossimi N giorni');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('027_add_change_log_batch_composition', 'Journal (migration 025) anche per batch_composition');
+INSERT INTO "schema_migrations" ("migration_name", "description") VALUES ('028_add_change_log_consumers', 'Cursori dei consumatori del journal change_log (migration 025)');
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (1, 'syringe_1ml', 'Siringa insulina 1ml', 0.15, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (2, 'syringe_05ml', 'Siringa insulina 0.5ml', 0.15, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (3, 'needle_29g', 'Ago 29G x 12.7mm', 0.1, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (4, 'needle_30g', 'Ago 30G x 8mm', 0.1, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (5, 'needle_31g', 'Ago 31G x 6mm', 0.12, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (6, 'bac_water_10ml', 'Acqua batteriostatica 10ml', 5.0, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (7, 'bac_water_30ml', 'Acqua batteriostatica 30ml', 8.0, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (8, 'alcohol_swab', 'Salvietta alcool', 0.05, 'EUR', 1, NULL);
+INSERT INTO "consumable_defaults" ("id", "consumable_type", "display_name", "default_price", "currency", "units_per_pack", "notes") VALUES (9, 'sharps_container', 'Contenitore aghi 1L', 3.0, 'EUR', 1, NULL);
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (1, 'notify_morning_reminder', 'true', 'bool', 'notifications', 'Reminder mattutino giornaliero');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (2, 'notify_morning_time', '08:00', 'string', 'notifications', 'Orario reminder mattutino');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (3, 'notify_dose_overdue', 'true', 'bool', 'notifications', 'Alert se dose mancata');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (4, 'notify_overdue_hours', '4', 'int', 'notifications', 'Ore dopo le quali segnalare dose mancata');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (5, 'notify_low_inventory', 'true', 'bool', 'notifications', 'Alert scorte basse');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (6, 'notify_low_inventory_weeks', '2', 'int', 'notifications', 'Settimane di scorta minima');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (7, 'notify_method', 'toast', 'string', 'notifications', 'Metodo notifica: toast, tray, both');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (8, 'currency_default', 'EUR', 'string', 'general', 'Valuta default');
+INSERT INTO "user_preferences" ("id", "preference_key", "preference_value", "value_type", "category", "description") VALUES (9, 'autosave_drafts', 'true', 'bool', 'general', 'Salvataggio automatico bozze');
+INSERT INTO "schedule_cache_state" ("id", "horizon_days", "horizon_start", "horizon_end", "cursor") VALUES (1, 60, NULL, NULL, 0);
+DELETE FROM sqlite_sequence;
+INSERT INTO sqlite_sequence (name, seq) VALUES ('consumable_defaults', 9);
+INSERT INTO sqlite_sequence (name, seq) VALUES ('cycles', 0);
+INSERT INTO sqlite_sequence (name, seq) VALUES ('peptides', 2);
+INSERT INTO sqlite_sequence (name, seq) VALUES ('protocols', 0);
+INSERT INTO sqlite_sequence (name, seq) VALUES ('schema_migrations', 32);
+INSERT INTO sqlite_sequence (name, seq) VALUES ('user_preferences', 9);
+PRAGMA user_version = 1875040273;
+COMMIT;
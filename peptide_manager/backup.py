@@ -2,16 +2,66 @@
 Backup automatico database con gestione retention policy.
 
 Funzionalità:
+- Backup online con la backup API di SQLite (snapshot consistente anche
+  con scritture in corso), a blocchi di pagine e verificato con
+  ``PRAGMA quick_check``
+- Backup in background (``start_backup``) con callback di avanzamento
+- Archivio compresso e deduplicato opzionale (``store=True``, vedi
+  backup_store.py): ogni backup è un manifest di chunk condivisi
 - Backup automatico alla chiusura dell'app
 - Cleanup automatico backup vecchi
 - Retention policy configurabile (giornalieri, settimanali, mensili)
+- Catalogo SQLite dei backup (backup_catalog.py): elenco, statistiche e
+  retention sono query, senza glob della directory
 """
 
+import hashlib
 import os
 import shutil
+import sqlite3
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
+
+from .backup_catalog import BackupCatalog, parse_backup_name, schema_version
+from .backup_store import BackupStore
+
+# Pagine copiate per passo: tra un passo e l'altro le altre connessioni
+# possono scrivere (il backup riparte solo se il sorgente cambia)
+BACKUP_STEP_PAGES = 256
+
+ProgressCallback = Callable[[int, int], None]   # (pagine copiate, totale)
+
+
+class BackupJob:
+    """Backup in esecuzione su un thread dedicato (vedi ``start_backup``)."""
+
+    def __init__(self, thread: threading.Thread):
+        self._thread = thread
+        self.path: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Attende la fine del backup.
+
+        Returns:
+            Path del backup, None se ancora in corso allo scadere del timeout
+
+        Raises:
+            L'eccezione del backup, se fallito
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.path
 
 
 class DatabaseBackupManager:
@@ -23,7 +73,9 @@ class DatabaseBackupManager:
         backup_dir: str = "data/backups/production",
         daily_retention_days: int = 30,
         weekly_retention_weeks: int = 12,
-        monthly_retention_months: int = 12
+        monthly_retention_months: int = 12,
+        store: bool = False,
+        codec: str = "zlib",
     ):
         """
         Inizializza backup manager.
@@ -34,6 +86,9 @@ class DatabaseBackupManager:
             daily_retention_days: Giorni di retention per backup giornalieri
             weekly_retention_weeks: Settimane di retention per backup settimanali
             monthly_retention_months: Mesi di retention per backup mensili
+            store: True = nuovi backup nell'archivio compresso/deduplicato
+                (``<backup_dir>/store``) invece che come file .db completi
+            codec: Compressione dei chunk dell'archivio ('zlib' o 'lzma')
         """
         self.db_path = Path(db_path)
         self.backup_dir = Path(backup_dir)
@@ -43,63 +98,214 @@ class DatabaseBackupManager:
         
         # Crea directory backup se non esiste
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.store_dir = self.backup_dir / "store"
+        self.store = BackupStore(self.store_dir, codec=codec) if store else None
+        self.catalog = BackupCatalog(self.backup_dir)
+        if self.catalog.created:
+            # Directory con backup precedenti al catalogo: import una tantum
+            self.rebuild_catalog()
+
+    def _open_store(self) -> Optional[BackupStore]:
+        """Archivio per leggere/eliminare snapshot, anche con store=False."""
+        if self.store is not None:
+            return self.store
+        if (self.store_dir / "manifests").exists():
+            return BackupStore(self.store_dir)
+        return None
     
-    def create_backup(self, label: str = "auto") -> str:
+    def create_backup(
+        self,
+        label: str = "auto",
+        progress: Optional[ProgressCallback] = None,
+        step_pages: int = BACKUP_STEP_PAGES,
+    ) -> str:
         """
-        Crea backup del database.
-        
+        Crea backup del database con la backup API di SQLite.
+
+        La copia avviene a blocchi di ``step_pages`` pagine da una
+        connessione in sola lettura: il database resta utilizzabile e il
+        file ottenuto è uno snapshot consistente (mai una scrittura a metà).
+        Il file viene scritto come ``.tmp``, verificato con
+        ``PRAGMA quick_check`` e solo allora rinominato e registrato nel
+        catalogo.
+
         Args:
             label: Etichetta per il backup (auto, manual, etc.)
-        
+            progress: Callback (pagine copiate, pagine totali) dopo ogni passo
+            step_pages: Pagine per passo
+
         Returns:
-            Path del backup creato
-        
+            Path del backup creato (del manifest, con ``store=True``)
+
         Raises:
             FileNotFoundError: Se il database non esiste
-            IOError: Se il backup fallisce
+            IOError: Se il backup fallisce o non supera la verifica
         """
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database non trovato: {self.db_path}")
         
         # Timestamp per nome file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        created_at = datetime.now().replace(microsecond=0)
+        timestamp = created_at.strftime("%Y%m%d_%H%M%S")
         backup_name = f"peptide_management_backup_{timestamp}_{label}.db"
         backup_path = self.backup_dir / backup_name
-        
+        tmp_path = backup_path.with_suffix(".db.tmp")
+
+        def _on_step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
         try:
-            # Copia database
-            shutil.copy2(self.db_path, backup_path)
+            source = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True
+            )
+            try:
+                target = sqlite3.connect(str(tmp_path))
+                try:
+                    source.backup(target, pages=step_pages, progress=_on_step)
+                    check = target.execute("PRAGMA quick_check").fetchone()[0]
+                    version = schema_version(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"quick_check: {check}")
+            if self.store is not None:
+                # Nell'archivio: solo i chunk nuovi + il manifest
+                manifest = self.store.add_snapshot(
+                    tmp_path, backup_path.stem, created=created_at, label=label
+                )
+                tmp_path.unlink()
+                backup_path = self.store.manifest_path(backup_path.stem)
+                self.catalog.add_store_bytes(manifest["new_bytes"])
+                self.catalog.record(
+                    backup_path, created_at, label, kind="store",
+                    size_bytes=manifest["size"],
+                    stored_bytes=backup_path.stat().st_size,
+                    sha256=manifest["sha256"], schema_version=version,
+                    verified=check,
+                )
+                print(f"✅ Backup creato: {backup_path} "
+                      f"(+{manifest['new_bytes'] / 1024:.1f} KB)")
+                return str(backup_path)
+            os.replace(tmp_path, backup_path)
+            size = backup_path.stat().st_size
+            self.catalog.record(
+                backup_path, created_at, label, size_bytes=size,
+                stored_bytes=size, sha256=_file_sha256(backup_path),
+                schema_version=version, verified=check,
+            )
             print(f"✅ Backup creato: {backup_path}")
             return str(backup_path)
         except Exception as e:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
             raise IOError(f"Errore durante backup: {str(e)}")
+
+    def start_backup(
+        self,
+        label: str = "auto",
+        progress: Optional[ProgressCallback] = None,
+        cleanup: bool = False,
+        daemon: bool = False,
+    ) -> BackupJob:
+        """
+        Esegue ``create_backup`` (e opzionalmente il cleanup) su un thread.
+
+        Il thread non è daemon per default: se il programma termina prima
+        della fine, l'interprete attende il backup invece di troncarlo.
+        ``progress`` viene chiamato dal thread del backup.
+
+        Returns:
+            BackupJob (``wait()`` per il path o l'errore)
+        """
+        def _run():
+            try:
+                job.path = self.create_backup(label=label, progress=progress)
+                if cleanup:
+                    stats = self.cleanup_old_backups(dry_run=False)
+                    if stats["deleted"] > 0:
+                        print(f"Cleanup: {stats['deleted']} backup eliminati")
+            except BaseException as e:
+                job.error = e
+                print(f"Backup failed: {e}")
+
+        thread = threading.Thread(
+            target=_run, name=f"backup-{label}", daemon=daemon
+        )
+        job = BackupJob(thread)
+        thread.start()
+        return job
     
     def get_all_backups(self) -> List[Tuple[Path, datetime]]:
         """
-        Recupera lista di tutti i backup con timestamp.
+        Recupera lista di tutti i backup con timestamp (dal catalogo).
+
+        Include i file .db completi e i manifest dell'archivio (.json).
         
         Returns:
-            Lista di tuple (path, datetime)
+            Lista di tuple (path, datetime), dal più recente
         """
-        backups = []
-        
-        for backup_file in self.backup_dir.glob("peptide_management_backup_*.db"):
-            try:
-                # Estrai timestamp dal nome file
-                # Formato: peptide_management_backup_YYYYMMDD_HHMMSS_label.db
-                parts = backup_file.stem.split("_")
-                if len(parts) >= 4:
-                    date_str = parts[3]  # YYYYMMDD
-                    time_str = parts[4]  # HHMMSS
-                    timestamp = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-                    backups.append((backup_file, timestamp))
-            except (ValueError, IndexError):
+        return self.catalog.list_backups()
+
+    def _backup_files(self) -> List[Path]:
+        """Backup presenti su disco (file .db e manifest dell'archivio)."""
+        files = list(self.backup_dir.glob("peptide_management_backup_*.db"))
+        files += (self.store_dir / "manifests").glob("peptide_management_backup_*.json")
+        return files
+
+    def rebuild_catalog(self, verify: bool = False) -> int:
+        """
+        Ricostruisce il catalogo dai file presenti nella directory.
+
+        Per le directory precedenti al catalogo (o modificate a mano).
+        Timestamp ed etichetta vengono dal nome del file; hash e versione
+        schema dai manifest, o leggendo i file .db se ``verify`` è True
+        (che esegue anche ``PRAGMA quick_check``).
+
+        Returns:
+            Numero di backup registrati
+        """
+        self.catalog.clear()
+        count = 0
+        store = self._open_store()
+        for path in self._backup_files():
+            parsed = parse_backup_name(path.stem)
+            if parsed is None:
                 # Skip file con formato non valido
                 continue
-        
-        # Ordina per timestamp (più recente prima)
-        backups.sort(key=lambda x: x[1], reverse=True)
-        return backups
+            created_at, label = parsed
+            stored = path.stat().st_size
+            if path.suffix == ".json":
+                manifest = store.load_manifest(path.stem)
+                self.catalog.record(
+                    path, created_at, label, kind="store",
+                    size_bytes=manifest["size"], stored_bytes=stored,
+                    sha256=manifest["sha256"],
+                )
+            else:
+                sha256 = version = check = None
+                if verify:
+                    sha256 = _file_sha256(path)
+                    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+                    try:
+                        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+                        version = schema_version(conn)
+                    except sqlite3.DatabaseError as e:
+                        check = str(e)
+                    finally:
+                        conn.close()
+                self.catalog.record(
+                    path, created_at, label, size_bytes=stored,
+                    stored_bytes=stored, sha256=sha256,
+                    schema_version=version, verified=check,
+                )
+            count += 1
+        self.catalog.set_store_bytes(store.chunk_usage() if store is not None else 0)
+        return count
     
     def cleanup_old_backups(self, dry_run: bool = False) -> dict:
         """
@@ -116,68 +322,49 @@ class DatabaseBackupManager:
         Returns:
             Dict con statistiche: {kept, deleted, total_size_freed}
         """
-        backups = self.get_all_backups()
-        
-        if not backups:
-            return {"kept": 0, "deleted": 0, "total_size_freed": 0}
-        
         now = datetime.now()
-        to_keep = set()
-        
-        # 1. Mantieni backup giornalieri (ultimi N giorni)
         daily_cutoff = now - timedelta(days=self.daily_retention_days)
-        daily_dates = set()
-        
-        for backup_path, backup_time in backups:
-            if backup_time >= daily_cutoff:
-                # Mantieni un backup per giorno
-                date_key = backup_time.date()
-                if date_key not in daily_dates:
-                    to_keep.add(backup_path)
-                    daily_dates.add(date_key)
-        
-        # 2. Mantieni backup settimanali (oltre i giorni giornalieri)
         weekly_cutoff = now - timedelta(weeks=self.weekly_retention_weeks)
-        weekly_dates = set()
-        
-        for backup_path, backup_time in backups:
-            if daily_cutoff > backup_time >= weekly_cutoff:
-                # Mantieni un backup per settimana (numero settimana dell'anno)
-                week_key = (backup_time.year, backup_time.isocalendar()[1])
-                if week_key not in weekly_dates:
-                    to_keep.add(backup_path)
-                    weekly_dates.add(week_key)
-        
-        # 3. Mantieni backup mensili (oltre le settimane settimanali)
         monthly_cutoff = now - timedelta(days=self.monthly_retention_months * 30)
-        monthly_dates = set()
-        
-        for backup_path, backup_time in backups:
-            if weekly_cutoff > backup_time >= monthly_cutoff:
-                # Mantieni un backup per mese
-                month_key = (backup_time.year, backup_time.month)
-                if month_key not in monthly_dates:
-                    to_keep.add(backup_path)
-                    monthly_dates.add(month_key)
+
+        # Un backup per giorno / settimana / mese (il più recente): query sul catalogo
+        to_keep, to_delete = self.catalog.retention(
+            daily_cutoff, weekly_cutoff, monthly_cutoff
+        )
         
-        # 4. Elimina backup non mantenuti
+        # Elimina backup non mantenuti
         deleted_count = 0
         total_size_freed = 0
         
-        for backup_path, backup_time in backups:
-            if backup_path not in to_keep:
-                size = backup_path.stat().st_size
-                
-                if dry_run:
-                    print(f"[DRY RUN] Eliminerebbe: {backup_path.name} ({backup_time}) - {size / 1024 / 1024:.2f} MB")
+        store = self._open_store()
+        manifests_deleted = False
+
+        for entry in to_delete:
+            backup_path, backup_time = entry["path"], entry["created_at"]
+            is_manifest = entry["kind"] == "store"
+            # Manifest: lo spazio dei chunk si libera col gc, sotto
+            size = entry["stored_bytes"] or 0
+            
+            if dry_run:
+                print(f"[DRY RUN] Eliminerebbe: {backup_path.name} ({backup_time}) - {size / 1024 / 1024:.2f} MB")
+                continue
+            try:
+                if is_manifest:
+                    store.delete(backup_path.stem)
+                    manifests_deleted = True
                 else:
-                    try:
-                        backup_path.unlink()
-                        print(f"🗑️  Eliminato backup vecchio: {backup_path.name} ({backup_time})")
-                        deleted_count += 1
-                        total_size_freed += size
-                    except Exception as e:
-                        print(f"⚠️  Errore eliminazione {backup_path.name}: {e}")
+                    backup_path.unlink(missing_ok=True)
+                self.catalog.remove(backup_path)
+                print(f"🗑️  Eliminato backup vecchio: {backup_path.name} ({backup_time})")
+                deleted_count += 1
+                total_size_freed += size
+            except Exception as e:
+                print(f"⚠️  Errore eliminazione {backup_path.name}: {e}")
+
+        if manifests_deleted:
+            freed = store.gc()["freed_bytes"]
+            self.catalog.add_store_bytes(-freed)
+            total_size_freed += freed
         
         return {
             "kept": len(to_keep),
@@ -210,8 +397,11 @@ class DatabaseBackupManager:
                 shutil.copy2(target, safety_backup)
                 print(f"📦 Backup di sicurezza creato: {safety_backup}")
             
-            # Ripristina
-            shutil.copy2(backup_path, target)
+            # Ripristina (manifest: ricompone i chunk dall'archivio)
+            if backup_path.suffix == ".json":
+                BackupStore(backup_path.parent.parent).restore(backup_path.stem, target)
+            else:
+                shutil.copy2(backup_path, target)
             print(f"✅ Database ripristinato da: {backup_path}")
             return True
         except Exception as e:
@@ -225,47 +415,44 @@ class DatabaseBackupManager:
         Returns:
             Dict con: total_count, total_size_mb, oldest, newest
         """
-        backups = self.get_all_backups()
-        
-        if not backups:
-            return {
-                "total_count": 0,
-                "total_size_mb": 0.0,
-                "oldest": None,
-                "newest": None
-            }
-        
-        total_size = sum(b[0].stat().st_size for b in backups)
-        
+        stats = self.catalog.stats()
         return {
-            "total_count": len(backups),
-            "total_size_mb": total_size / 1024 / 1024,
-            "oldest": backups[-1][1],
-            "newest": backups[0][1]
+            "total_count": stats["count"],
+            "total_size_mb": stats["stored_bytes"] / 1024 / 1024,
+            "oldest": stats["oldest"],
+            "newest": stats["newest"]
         }
 
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
-def create_backup_on_exit(db_path: str = "data/production/peptide_management.db") -> str:
+def create_backup_on_exit(
+    db_path: str = "data/production/peptide_management.db",
+    wait: bool = True,
+    backup_dir: str = "data/backups/production",
+):
     """
     Crea backup automatico alla chiusura dell'app.
     
     Args:
         db_path: Path del database
+        backup_dir: Directory dei backup
+        wait: False = non bloccare: backup + cleanup proseguono su un
+            thread (non daemon) e viene restituito il BackupJob
     
     Returns:
-        Path del backup creato
+        Path del backup creato (o BackupJob se ``wait`` è False)
     """
-    manager = DatabaseBackupManager(db_path)
-    backup_path = manager.create_backup(label="auto_exit")
-    
-    # Cleanup automatico
-    stats = manager.cleanup_old_backups(dry_run=False)
-    
-    if stats["deleted"] > 0:
-        print(f"🧹 Cleanup completato: {stats['deleted']} backup eliminati, "
-              f"{stats['total_size_freed'] / 1024 / 1024:.2f} MB liberati")
-    
-    return backup_path
+    manager = DatabaseBackupManager(db_path, backup_dir=backup_dir)
+    job = manager.start_backup(label="auto_exit", cleanup=True)
+    if not wait:
+        return job
+    return job.wait()
 
 
 if __name__ == "__main__":
@@ -278,10 +465,17 @@ if __name__ == "__main__":
     parser.add_argument("--cleanup", action="store_true", help="Cleanup backup vecchi")
     parser.add_argument("--dry-run", action="store_true", help="Dry run per cleanup")
     parser.add_argument("--stats", action="store_true", help="Mostra statistiche")
+    parser.add_argument("--store", action="store_true", help="Backup nell'archivio compresso/deduplicato")
+    parser.add_argument("--rebuild-catalog", action="store_true", help="Ricostruisci il catalogo dai file")
+    parser.add_argument("--verify", action="store_true", help="Con --rebuild-catalog: hash + quick_check dei .db")
     
     args = parser.parse_args()
     
-    manager = DatabaseBackupManager(args.db)
+    manager = DatabaseBackupManager(args.db, store=args.store)
+    
+    if args.rebuild_catalog:
+        count = manager.rebuild_catalog(verify=args.verify)
+        print(f"Catalogo ricostruito: {count} backup")
     
     if args.backup:
         backup_path = manager.create_backup(label="manual")
@@ -0,0 +1,256 @@
+"""
+Catalogo SQLite dei backup (``<backup_dir>/backup_catalog.db``).
+
+Ogni backup viene registrato alla creazione con timestamp, etichetta,
+dimensione, hash del contenuto, versione dello schema e stato della
+verifica. Elenco, statistiche e retention diventano query indicizzate
+invece di glob della directory + parsing dei nomi + stat di ogni file.
+
+Le directory create prima del catalogo si importano con::
+
+    python -m peptide_manager.backup --rebuild-catalog [--verify]
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CATALOG_NAME = 'backup_catalog.db'
+
+# Formato dei timestamp nel catalogo (ordinabile come testo)
+_TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    path TEXT PRIMARY KEY,          -- relativo alla directory dei backup
+    created_at TEXT NOT NULL,
+    label TEXT,
+    kind TEXT NOT NULL DEFAULT 'file',   -- 'file' (.db) | 'store' (manifest)
+    size_bytes INTEGER,             -- dimensione del database salvato
+    stored_bytes INTEGER,           -- byte su disco del file / manifest
+    sha256 TEXT,
+    schema_version TEXT,            -- ultima migration applicata
+    verified TEXT                   -- esito quick_check (NULL = non verificato)
+);
+CREATE INDEX IF NOT EXISTS idx_backups_created_at ON backups(created_at);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = (
+    'path', 'created_at', 'label', 'kind', 'size_bytes', 'stored_bytes',
+    'sha256', 'schema_version', 'verified',
+)
+
+
+def _iso_week(ts: str) -> str:
+    """Chiave settimana ISO (come ``isocalendar()``, non ``strftime('%W')``)."""
+    year, week, _ = datetime.strptime(ts, _TS_FORMAT).isocalendar()
+    return f'{year}-{week:02d}'
+
+
+def parse_backup_name(stem: str) -> Optional[Tuple[datetime, str]]:
+    """
+    Timestamp ed etichetta da ``peptide_management_backup_YYYYMMDD_HHMMSS_label``.
+
+    Returns:
+        (datetime, label) o None se il nome non ha il formato atteso
+    """
+    parts = stem.split('_')
+    if len(parts) < 5:
+        return None
+    try:
+        timestamp = datetime.strptime(f'{parts[3]}_{parts[4]}', '%Y%m%d_%H%M%S')
+    except ValueError:
+        return None
+    return timestamp, '_'.join(parts[5:])
+
+
+def schema_version(conn: sqlite3.Connection) -> Optional[str]:
+    """Ultima migration registrata in ``schema_migrations`` (None se assente)."""
+    try:
+        row = conn.execute('SELECT MAX(migration_name) FROM schema_migrations').fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+class BackupCatalog:
+    """Indice dei backup di una directory."""
+
+    def __init__(self, backup_dir):
+        self.backup_dir = Path(backup_dir)
+        self.path = self.backup_dir / CATALOG_NAME
+        #: True se il catalogo è stato appena creato (directory legacy da importare)
+        self.created = not self.path.exists()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Una connessione per operazione: il backup gira su un thread dedicato
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.create_function('iso_week', 1, _iso_week, deterministic=True)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _relative(self, path) -> str:
+        path = Path(path)
+        try:
+            return path.relative_to(self.backup_dir).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    # ── Scrittura ───────────────────────────────────────────────────
+
+    def record(
+        self,
+        path,
+        created_at: datetime,
+        label: str = '',
+        kind: str = 'file',
+        size_bytes: Optional[int] = None,
+        stored_bytes: Optional[int] = None,
+        sha256: Optional[str] = None,
+        schema_version: Optional[str] = None,
+        verified: Optional[str] = None,
+    ) -> None:
+        """Registra (o aggiorna) un backup."""
+        values = (
+            self._relative(path), created_at.strftime(_TS_FORMAT), label, kind,
+            size_bytes, stored_bytes, sha256, schema_version, verified,
+        )
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO backups ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                values,
+            )
+
+    def remove(self, path) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM backups WHERE path = ?', (self._relative(path),))
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM backups')
+            conn.execute('DELETE FROM catalog_meta')
+
+    def set_store_bytes(self, value: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('store_chunk_bytes', ?)",
+                (value,),
+            )
+
+    def add_store_bytes(self, delta: int) -> None:
+        """Aggiorna i byte dei chunk dell'archivio (nuovi chunk / gc)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('store_chunk_bytes', 0)"
+            )
+            conn.execute(
+                "UPDATE catalog_meta SET value = MAX(value + ?, 0) WHERE key = 'store_chunk_bytes'",
+                (delta,),
+            )
+
+    # ── Lettura ─────────────────────────────────────────────────────
+
+    def list_backups(self) -> List[Tuple[Path, datetime]]:
+        """Backup (path assoluto, timestamp), dal più recente."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT path, created_at FROM backups ORDER BY created_at DESC'
+            ).fetchall()
+        return [
+            (self.backup_dir / path, datetime.strptime(created, _TS_FORMAT))
+            for path, created in rows
+        ]
+
+    def entries(self) -> List[Dict]:
+        """Righe complete del catalogo, dal backup più recente."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('SELECT * FROM backups ORDER BY created_at DESC').fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: {count, stored_bytes (file + manifest + chunk), oldest, newest}
+        """
+        with self._connect() as conn:
+            count, stored, oldest, newest = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0), '
+                'MIN(created_at), MAX(created_at) FROM backups'
+            ).fetchone()
+            row = conn.execute(
+                "SELECT value FROM catalog_meta WHERE key = 'store_chunk_bytes'"
+            ).fetchone()
+        parse = lambda ts: datetime.strptime(ts, _TS_FORMAT) if ts else None
+        return {
+            'count': count,
+            'stored_bytes': stored + (row[0] if row else 0),
+            'oldest': parse(oldest),
+            'newest': parse(newest),
+        }
+
+    def retention(
+        self,
+        daily_cutoff: datetime,
+        weekly_cutoff: datetime,
+        monthly_cutoff: datetime,
+    ) -> Tuple[List[Path], List[Dict]]:
+        """
+        Applica la retention policy con una query.
+
+        Tiene il backup più recente di ogni giorno dopo ``daily_cutoff``, di
+        ogni settimana ISO tra ``weekly_cutoff`` e ``daily_cutoff``, di ogni
+        mese tra ``monthly_cutoff`` e ``weekly_cutoff``.
+
+        Returns:
+            (path da mantenere, righe da eliminare con path assoluto)
+        """
+        daily, weekly, monthly = (
+            c.strftime(_TS_FORMAT) for c in (daily_cutoff, weekly_cutoff, monthly_cutoff)
+        )
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                """
+                WITH bucketed AS (
+                    SELECT *,
+                        CASE
+                            WHEN created_at >= :daily THEN 'd' || date(created_at)
+                            WHEN created_at >= :weekly THEN 'w' || iso_week(created_at)
+                            WHEN created_at >= :monthly THEN 'm' || strftime('%Y-%m', created_at)
+                        END AS bucket
+                    FROM backups
+                )
+                SELECT *,
+                    bucket IS NOT NULL AND ROW_NUMBER() OVER (
+                        PARTITION BY bucket ORDER BY created_at DESC
+                    ) = 1 AS keep
+                FROM bucketed
+                ORDER BY created_at DESC
+                """,
+                {'daily': daily, 'weekly': weekly, 'monthly': monthly},
+            ).fetchall()
+        keep: List[Path] = []
+        delete: List[Dict] = []
+        for row in rows:
+            entry = dict(row)
+            entry['path'] = self.backup_dir / entry['path']
+            entry['created_at'] = datetime.strptime(entry['created_at'], _TS_FORMAT)
+            if entry.pop('keep'):
+                keep.append(entry['path'])
+            else:
+                delete.append(entry)
+        return keep, delete
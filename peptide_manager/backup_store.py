@@ -0,0 +1,237 @@
+"""
+Archivio backup compresso e deduplicato per contenuto.
+
+Ogni snapshot del database viene diviso in chunk allineati alle pagine
+SQLite (``PAGES_PER_CHUNK`` pagine); ogni chunk è identificato dal suo
+SHA-256 e salvato una sola volta, compresso (zlib o lzma della stdlib).
+Uno snapshot è un piccolo manifest JSON con l'elenco ordinato dei chunk:
+due backup giornalieri che differiscono per poche pagine costano solo i
+chunk cambiati.
+
+Layout::
+
+    <root>/manifests/<nome>.json
+    <root>/chunks/ab/abcdef....z     (zlib)  oppure  .xz  (lzma)
+
+Eliminare uno snapshot = eliminare il manifest; ``gc()`` rimuove poi i
+chunk non più referenziati da alcun manifest.
+
+Usage:
+    store = BackupStore('data/backups/production/store')
+    store.add_snapshot('backup.db', 'peptide_management_backup_20250101_120000_auto')
+    store.restore('peptide_management_backup_20250101_120000_auto', 'restored.db')
+    store.delete(name); store.gc()
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Chunk = 4 pagine: una pagina modificata costa un chunk di 16 KB (4 KB/pagina)
+PAGES_PER_CHUNK = 4
+
+_DEFAULT_PAGE_SIZE = 4096
+
+_CODECS = {
+    'zlib': ('.z', lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': ('.xz', lzma.compress, lzma.decompress),
+}
+
+
+def sqlite_page_size(path) -> int:
+    """Page size dall'header del file SQLite (default 4096 se non leggibile)."""
+    with open(path, 'rb') as f:
+        header = f.read(18)
+    if len(header) < 18 or not header.startswith(b'SQLite format 3\x00'):
+        return _DEFAULT_PAGE_SIZE
+    size = int.from_bytes(header[16:18], 'big')
+    return 65536 if size == 1 else size
+
+
+class BackupStore:
+    """Snapshot come manifest + chunk compressi condivisi."""
+
+    def __init__(self, root, codec: str = 'zlib'):
+        """
+        Args:
+            root: Directory dell'archivio (creata se manca)
+            codec: Compressione dei nuovi chunk: 'zlib' o 'lzma'
+        """
+        if codec not in _CODECS:
+            raise ValueError(f"Codec non supportato: {codec}")
+        self.root = Path(root)
+        self.codec = codec
+        self.manifest_dir = self.root / 'manifests'
+        self.chunk_dir = self.root / 'chunks'
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+
+    # ── Chunk ───────────────────────────────────────────────────────
+
+    def _chunk_path(self, digest: str, codec: str) -> Path:
+        return self.chunk_dir / digest[:2] / (digest + _CODECS[codec][0])
+
+    def _find_chunk(self, digest: str) -> Optional[Path]:
+        """Chunk già presente (con qualunque codec)."""
+        for codec in _CODECS:
+            path = self._chunk_path(digest, codec)
+            if path.exists():
+                return path
+        return None
+
+    def _write_chunk(self, digest: str, data: bytes) -> int:
+        """Salva il chunk se nuovo. Returns: byte scritti (0 se già presente)."""
+        if self._find_chunk(digest) is not None:
+            return 0
+        path = self._chunk_path(digest, self.codec)
+        path.parent.mkdir(exist_ok=True)
+        payload = _CODECS[self.codec][1](data)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+        return len(payload)
+
+    def _read_chunk(self, digest: str) -> bytes:
+        path = self._find_chunk(digest)
+        if path is None:
+            raise FileNotFoundError(f"Chunk mancante: {digest}")
+        codec = next(c for c, (suffix, _, _) in _CODECS.items() if path.name.endswith(suffix))
+        data = _CODECS[codec][2](path.read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise IOError(f"Chunk corrotto: {digest}")
+        return data
+
+    # ── Snapshot ────────────────────────────────────────────────────
+
+    def add_snapshot(
+        self,
+        db_file,
+        name: str,
+        created: Optional[datetime] = None,
+        label: str = '',
+    ) -> Dict:
+        """
+        Aggiunge uno snapshot del file ``db_file`` (un backup già consistente).
+
+        Returns:
+            Manifest, con in più ``new_bytes`` (byte compressi aggiunti)
+        """
+        db_file = Path(db_file)
+        page_size = sqlite_page_size(db_file)
+        chunk_size = page_size * PAGES_PER_CHUNK
+        whole = hashlib.sha256()
+        chunks: List[str] = []
+        new_bytes = 0
+        size = 0
+
+        with open(db_file, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                whole.update(data)
+                size += len(data)
+                digest = hashlib.sha256(data).hexdigest()
+                new_bytes += self._write_chunk(digest, data)
+                chunks.append(digest)
+
+        manifest = {
+            'name': name,
+            'created': (created or datetime.now()).isoformat(timespec='seconds'),
+            'label': label,
+            'page_size': page_size,
+            'chunk_size': chunk_size,
+            'size': size,
+            'sha256': whole.hexdigest(),
+            'chunks': chunks,
+        }
+        path = self.manifest_path(name)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(manifest), encoding='utf-8')
+        os.replace(tmp, path)
+        return {**manifest, 'new_bytes': new_bytes}
+
+    def manifest_path(self, name: str) -> Path:
+        return self.manifest_dir / f"{name}.json"
+
+    def load_manifest(self, name: str) -> Dict:
+        path = self.manifest_path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot non trovato: {name}")
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def list_snapshots(self) -> List[str]:
+        """Nomi degli snapshot (ordine alfabetico = cronologico per i backup)."""
+        return sorted(p.stem for p in self.manifest_dir.glob('*.json'))
+
+    def restore(self, name: str, target) -> Path:
+        """
+        Ricompone lo snapshot in ``target`` (scritto come .tmp e verificato).
+
+        Raises:
+            FileNotFoundError: Snapshot o chunk mancante
+            IOError: Contenuto ricomposto diverso dall'originale
+        """
+        manifest = self.load_manifest(name)
+        target = Path(target)
+        tmp = target.with_name(target.name + '.tmp')
+        whole = hashlib.sha256()
+        try:
+            with open(tmp, 'wb') as out:
+                for digest in manifest['chunks']:
+                    data = self._read_chunk(digest)
+                    whole.update(data)
+                    out.write(data)
+            if whole.hexdigest() != manifest['sha256']:
+                raise IOError(f"Snapshot {name}: checksum non corrispondente")
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return target
+
+    def delete(self, name: str) -> bool:
+        """Elimina il manifest (i chunk restano fino al prossimo ``gc()``)."""
+        try:
+            self.manifest_path(name).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def gc(self) -> Dict:
+        """
+        Rimuove i chunk non referenziati da alcun manifest.
+
+        Da non eseguire in parallelo con ``add_snapshot`` (i chunk di uno
+        snapshot in scrittura non sono ancora referenziati).
+
+        Returns:
+            Dict: {deleted, freed_bytes}
+        """
+        referenced = set()
+        for name in self.list_snapshots():
+            referenced.update(self.load_manifest(name)['chunks'])
+
+        deleted = 0
+        freed = 0
+        for path in self.chunk_dir.glob('*/*'):
+            digest = path.name.split('.', 1)[0]
+            if digest in referenced and not path.name.endswith('.tmp'):
+                continue
+            freed += path.stat().st_size
+            path.unlink()
+            deleted += 1
+        return {'deleted': deleted, 'freed_bytes': freed}
+
+    def disk_usage(self) -> int:
+        """Byte occupati da chunk e manifest."""
+        return sum(p.stat().st_size for p in self.root.rglob('*') if p.is_file())
+
+    def chunk_usage(self) -> int:
+        """Byte occupati dai soli chunk."""
+        return sum(p.stat().st_size for p in self.chunk_dir.glob('*/*'))
@@ -404,6 +404,8 @@ class ResourcePlanner:
         """
         self.db = db
         self.calculator = DilutionCalculator()
+        # Snapshot inventario condiviso da tutte le fasi/peptidi della sessione
+        self._snapshot: Optional['InventorySnapshot'] = None
     
     def calculate_phase_requirements(
         self,
@@ -615,6 +617,9 @@ class ResourcePlanner:
         if not self.db:
             raise ValueError("Database connection richiesto per inventory check")
         
+        from .mrp import RequirementsPlanner
+        lead_times = RequirementsPlanner(self.db, snapshot=self.get_inventory_snapshot())
+        
         analysis = {
             'has_gaps': False,
             'peptides_analysis': [],
@@ -645,9 +650,10 @@ class ResourcePlanner:
             if gap > 0:
                 analysis['has_gaps'] = True
                 
-                # Calcola quando ordinare (es. ordina per settimana 2 se serve per settimana 4)
-                # Buffer di 2 settimane per shipping
-                order_by_week = max(1, (peptide.get('start_week', 1) - 2))
+                # Calcola quando ordinare: settimana di inizio meno il lead time
+                # del fornitore (default 2 settimane se non specificato)
+                lead_weeks = -(-lead_times.get_lead_time_days(peptide_id) // 7)
+                order_by_week = max(1, (peptide.get('start_week', 1) - lead_weeks))
                 
                 analysis['ordering_recommendations'].append({
                     'peptide_name': peptide['resource_name'],
@@ -701,10 +707,20 @@ class ResourcePlanner:
         
         return consumables
     
+    def get_inventory_snapshot(self, refresh: bool = False) -> 'InventorySnapshot':
+        """
+        Restituisce lo snapshot inventario della sessione di pianificazione.
+
+        Caricato alla prima richiesta e riusato da tutte le fasi e i peptidi;
+        ``refresh=True`` forza la rilettura (es. dopo una modifica inventario).
+        """
+        if self._snapshot is None or refresh:
+            self._snapshot = InventorySnapshot.load(self.db.conn)
+        return self._snapshot
+
     def _get_available_vials(self, peptide_id: int) -> int:
         """
-        Query inventario per vials disponibili.
-        ESCLUDI batch MIX (con più peptidi) perché hanno rapporti fissi.
+        Vials disponibili (solo batch puri, esclusi MIX con rapporti fissi).
         
         Args:
             peptide_id: ID peptide
@@ -714,118 +730,192 @@ class ResourcePlanner:
         """
         if not self.db:
             return 0
-        
-        cursor = self.db.conn.cursor()
-        
-        # Query batches attivi per peptide
-        # ESCLUDI batch con più di 1 peptide (MIX)
-        cursor.execute("""
-            SELECT COALESCE(SUM(b.vials_remaining), 0) as total_vials
-            FROM batches b
-            WHERE b.deleted_at IS NULL
-            AND (b.expiry_date IS NULL OR b.expiry_date > DATE('now'))
-            AND b.vials_remaining > 0
-            AND b.id IN (
-                SELECT batch_id 
-                FROM batch_composition 
-                WHERE peptide_id = ?
-            )
-            -- ESCLUDI batch MIX: quelli con più di 1 peptide
-            AND b.id NOT IN (
-                SELECT batch_id
-                FROM batch_composition
-                GROUP BY batch_id
-                HAVING COUNT(DISTINCT peptide_id) > 1
-            )
-        """, (peptide_id,))
-        
-        result = cursor.fetchone()
-        return int(result[0]) if result else 0
+        return self.get_inventory_snapshot().vials_for(peptide_id)
 
     def _get_available_mg(self, peptide_id: int) -> float:
         """
-        Query inventario per mg totali disponibili (non-mix batches).
-
-        Somma due fonti:
-        1. Fiale non ancora ricostituite (vials_remaining su batches)
-        2. Preparazioni attive già ricostituite (volume residuo → mg)
+        mg totali disponibili (non-mix batches): fiale intatte + preparazioni attive.
         """
         if not self.db:
             return 0.0
-        cursor = self.db.conn.cursor()
+        return self.get_inventory_snapshot().mg_for(peptide_id)
+
+    def _estimate_peptide_cost(self, peptide_id: int, vials: int) -> Optional[Decimal]:
+        """
+        Stima costo basato su ultimi acquisti.
+        
+        Args:
+            peptide_id: ID peptide
+            vials: Numero vials da ordinare
+            
+        Returns:
+            Costo stimato o None
+        """
+        if not self.db:
+            return None
+        avg_price = self.get_inventory_snapshot().price_for(peptide_id)
+        if avg_price is None:
+            return None
+        return round(avg_price * vials, 2)
+
+
+class InventorySnapshot:
+    """
+    Fotografia dell'inventario per una sessione di pianificazione.
+
+    Carica in un numero fisso di query (indipendente dal numero di peptidi):
+    - set dei batch MIX (più di un peptide in composizione)
+    - mg e vials disponibili per peptide da batch puri non scaduti
+    - mg per peptide da preparazioni attive di batch puri
+    - prezzo medio per vial degli ultimi acquisti per peptide
+    """
+
+    # Numero di acquisti recenti usati per la stima del prezzo
+    RECENT_PURCHASES = 3
+
+    def __init__(
+        self,
+        batch_mg: Optional[Dict[int, float]] = None,
+        batch_vials: Optional[Dict[int, int]] = None,
+        prep_mg: Optional[Dict[int, float]] = None,
+        blend_batch_ids: Optional[set] = None,
+        avg_price_per_vial: Optional[Dict[int, Decimal]] = None,
+        prep_residual_mg: Optional[Dict[int, float]] = None,
+    ):
+        self.batch_mg = batch_mg or {}
+        self.batch_vials = batch_vials or {}
+        self.prep_mg = prep_mg or {}
+        self.prep_residual_mg = prep_residual_mg if prep_residual_mg is not None else dict(self.prep_mg)
+        self.blend_batch_ids = blend_batch_ids or set()
+        self.avg_price_per_vial = avg_price_per_vial or {}
 
-        # 1. Fiale ancora intatte nel batch
+    @classmethod
+    def load(cls, conn) -> 'InventorySnapshot':
+        """
+        Legge lo snapshot dal database.
+
+        Args:
+            conn: Connessione sqlite3
+
+        Returns:
+            InventorySnapshot popolato
+        """
+        cursor = conn.cursor()
+
+        # 1. Batch MIX: calcolati una sola volta e riusati come tabella temporanea
+        #    logica nelle query successive (CTE), invece della subquery NOT IN
+        #    rivalutata per ogni peptide.
         cursor.execute("""
-            SELECT COALESCE(SUM(b.vials_remaining * bc.mg_per_vial), 0.0)
+            SELECT batch_id FROM batch_composition
+            GROUP BY batch_id HAVING COUNT(DISTINCT peptide_id) > 1
+        """)
+        blend_batch_ids = {row[0] for row in cursor.fetchall()}
+
+        blends_cte = """
+            WITH blends AS (
+                SELECT batch_id FROM batch_composition
+                GROUP BY batch_id HAVING COUNT(DISTINCT peptide_id) > 1
+            )
+        """
+
+        # 2. Fiale intatte nei batch puri, per peptide
+        cursor.execute(blends_cte + """
+            SELECT bc.peptide_id,
+                   COALESCE(SUM(b.vials_remaining * bc.mg_per_vial), 0.0),
+                   COALESCE(SUM(b.vials_remaining), 0)
             FROM batches b
             JOIN batch_composition bc ON bc.batch_id = b.id
+            LEFT JOIN blends bl ON bl.batch_id = b.id
             WHERE b.deleted_at IS NULL
               AND (b.expiry_date IS NULL OR b.expiry_date > DATE('now'))
               AND b.vials_remaining > 0
-              AND bc.peptide_id = ?
-              AND b.id NOT IN (
-                  SELECT batch_id FROM batch_composition
-                  GROUP BY batch_id HAVING COUNT(DISTINCT peptide_id) > 1
-              )
-        """, (peptide_id,))
-        batch_mg = float(cursor.fetchone()[0] or 0.0)
-
-        # 2. Preparazioni attive già ricostituite — mg totali della prep (non il residuo).
-        # Usiamo il totale perché questa funzione serve al pianificatore per decidere
+              AND bl.batch_id IS NULL
+            GROUP BY bc.peptide_id
+        """)
+        batch_mg = {}
+        batch_vials = {}
+        for peptide_id, mg, vials in cursor.fetchall():
+            batch_mg[peptide_id] = float(mg or 0.0)
+            batch_vials[peptide_id] = int(vials or 0)
+
+        # 3. Preparazioni attive già ricostituite — mg totali della prep (non il residuo).
+        # Usiamo il totale perché lo snapshot serve al pianificatore per decidere
         # se serve riapprovvigionamento: il consumo è tracciato altrove.
-        cursor.execute("""
-            SELECT COALESCE(SUM(bc.mg_per_vial * p.vials_used), 0.0)
+        # Il residuo (quota di volume rimasta) serve a chi proietta la domanda
+        # da oggi in avanti (MRP), dove le dosi già iniettate non sono scorta.
+        cursor.execute(blends_cte + """
+            SELECT bc.peptide_id,
+                   COALESCE(SUM(bc.mg_per_vial * p.vials_used), 0.0),
+                   COALESCE(SUM(
+                       bc.mg_per_vial * p.vials_used
+                       * MIN(p.volume_remaining_ml / NULLIF(p.volume_ml, 0), 1.0)
+                   ), 0.0)
             FROM preparations p
             JOIN batches b ON b.id = p.batch_id
             JOIN batch_composition bc ON bc.batch_id = b.id
+            LEFT JOIN blends bl ON bl.batch_id = b.id
             WHERE p.deleted_at IS NULL
               AND p.volume_remaining_ml > 0.01
               AND (p.expiry_date IS NULL OR p.expiry_date > DATE('now'))
-              AND bc.peptide_id = ?
-              AND b.id NOT IN (
-                  SELECT batch_id FROM batch_composition
-                  GROUP BY batch_id HAVING COUNT(DISTINCT peptide_id) > 1
-              )
-        """, (peptide_id,))
-        prep_mg = float(cursor.fetchone()[0] or 0.0)
+              AND bl.batch_id IS NULL
+            GROUP BY bc.peptide_id
+        """)
+        prep_mg = {}
+        prep_residual_mg = {}
+        for peptide_id, mg, residual in cursor.fetchall():
+            prep_mg[peptide_id] = float(mg or 0.0)
+            prep_residual_mg[peptide_id] = float(residual or 0.0)
 
-        return batch_mg + prep_mg
-
-    def _estimate_peptide_cost(self, peptide_id: int, vials: int) -> Optional[Decimal]:
-        """
-        Stima costo basato su ultimi acquisti.
-        
-        Args:
-            peptide_id: ID peptide
-            vials: Numero vials da ordinare
-            
-        Returns:
-            Costo stimato o None
-        """
-        if not self.db:
-            return None
-        
-        cursor = self.db.conn.cursor()
-        
-        # Media prezzo per vial da ultimi 3 acquisti
+        # 4. Prezzo medio per vial degli ultimi acquisti di ogni peptide
         cursor.execute("""
-            SELECT AVG(price_per_vial) as avg_price
-            FROM batches
-            WHERE deleted_at IS NULL
-            AND price_per_vial IS NOT NULL
-            AND id IN (
-                SELECT DISTINCT batch_id 
-                FROM batch_composition 
-                WHERE peptide_id = ?
+            WITH ranked AS (
+                SELECT bc.peptide_id, b.price_per_vial,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY bc.peptide_id
+                           ORDER BY b.purchase_date DESC, b.id DESC
+                       ) AS rn
+                FROM batches b
+                JOIN (SELECT DISTINCT batch_id, peptide_id FROM batch_composition) bc
+                  ON bc.batch_id = b.id
+                WHERE b.deleted_at IS NULL
+                  AND b.price_per_vial IS NOT NULL
             )
-            ORDER BY purchase_date DESC
-            LIMIT 3
-        """, (peptide_id,))
-        
-        result = cursor.fetchone()
-        if result and result[0]:
-            avg_price = Decimal(str(result[0]))
-            return round(avg_price * vials, 2)
-        
-        return None
+            SELECT peptide_id, AVG(price_per_vial)
+            FROM ranked
+            WHERE rn <= ?
+            GROUP BY peptide_id
+        """, (cls.RECENT_PURCHASES,))
+        avg_price_per_vial = {
+            row[0]: Decimal(str(row[1]))
+            for row in cursor.fetchall()
+            if row[1]
+        }
+
+        return cls(
+            batch_mg=batch_mg,
+            batch_vials=batch_vials,
+            prep_mg=prep_mg,
+            blend_batch_ids=blend_batch_ids,
+            avg_price_per_vial=avg_price_per_vial,
+            prep_residual_mg=prep_residual_mg,
+        )
+
+    def mg_for(self, peptide_id: int) -> float:
+        """mg disponibili per un peptide (fiale intatte + preparazioni attive)."""
+        return self.batch_mg.get(peptide_id, 0.0) + self.prep_mg.get(peptide_id, 0.0)
+
+    def residual_mg_for(self, peptide_id: int) -> float:
+        """mg ancora utilizzabili: fiale intatte + residuo delle preparazioni attive."""
+        return self.batch_mg.get(peptide_id, 0.0) + self.prep_residual_mg.get(peptide_id, 0.0)
+
+    def vials_for(self, peptide_id: int) -> int:
+        """Vials intatte disponibili per un peptide (solo batch puri)."""
+        return self.batch_vials.get(peptide_id, 0)
+
+    def price_for(self, peptide_id: int) -> Optional[Decimal]:
+        """Prezzo medio per vial recente, o None se mai acquistato."""
+        return self.avg_price_per_vial.get(peptide_id)
 
+    def is_blend(self, batch_id: int) -> bool:
+        """True se il batch è un MIX (più di un peptide)."""
+        return batch_id in self.blend_batch_ids
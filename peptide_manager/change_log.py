@@ -0,0 +1,200 @@
+"""
+Journal persistente delle modifiche (change-data-capture).
+
+La migration 025 crea la tabella ``change_log`` e i trigger AFTER
+INSERT/UPDATE/DELETE sulle tabelle principali (``CHANGE_LOG_TABLES``): ogni
+scrittura, da qualunque processo, aggiunge (seq, tabella, rowid, op).
+
+A differenza del ``ChangeBus`` (events.py: notifiche in memoria, solo per la
+connessione che scrive) il journal sopravvive alla chiusura dell'app: un
+consumatore (cache, export, sync prod→dev) salva l'ultimo ``seq`` letto e
+al giro successivo elabora solo le modifiche successive.
+
+I consumatori registrano il proprio cursore in ``change_log_consumers``
+(migration 028) con ``ack()``; ``compact_consumed()`` (alla chiusura del
+DatabaseManager) elimina solo le voci già lette da tutti.
+
+Usage:
+    log = ChangeLog(conn)
+    cursor = 0
+    for entry in log.since(cursor, tables={'administrations'}):
+        ...
+    cursor = log.head()
+    changed = log.changed_rows(cursor)   # {tabella: RowChanges}
+    log.ack('export', cursor)            # nella transazione del consumatore
+    log.compact_consumed()               # fino a MIN(cursor) dei consumatori
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+TABLE = 'change_log'
+CONSUMERS_TABLE = 'change_log_consumers'
+
+# Tabelle con trigger (migrations/025_add_change_log.sql, 027 per batch_composition)
+CHANGE_LOG_TABLES = (
+    'batches',
+    'batch_composition',
+    'preparations',
+    'administrations',
+    'preparation_events',
+    'cycles',
+    'treatment_plans',
+    'plan_phases',
+    'plan_resources',
+)
+
+
+class ChangeLogEntry(NamedTuple):
+    seq: int
+    table: str
+    row_id: int
+    op: str
+    changed_at: str
+
+
+class RowChanges(NamedTuple):
+    """Stato finale delle righe modificate di una tabella."""
+    upserted: Set[int]   # inserite o modificate: da rileggere
+    deleted: Set[int]    # eliminate (ultima operazione = delete)
+
+
+class ChangeLog:
+    """Lettura e compattazione del journal ``change_log``."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def available(self) -> bool:
+        """False su database senza la migration 025."""
+        row = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)
+        ).fetchone()
+        return row is not None
+
+    def head(self) -> int:
+        """Ultimo seq assegnato (0 se il journal è vuoto)."""
+        # sqlite_sequence: corretto anche dopo una compattazione totale
+        try:
+            row = self.conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?", (TABLE,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return 0
+        return row[0] if row else 0
+
+    def _where(self, cursor: int, tables: Optional[Iterable[str]]):
+        clauses, params = ['seq > ?'], [cursor]
+        if tables is not None:
+            tables = list(tables)
+            clauses.append(f"tbl IN ({', '.join('?' * len(tables))})")
+            params.extend(tables)
+        return ' AND '.join(clauses), params
+
+    def since(
+        self,
+        cursor: int = 0,
+        tables: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChangeLogEntry]:
+        """
+        Modifiche con seq > ``cursor``, in ordine.
+
+        Args:
+            cursor: Ultimo seq già elaborato dal consumatore
+            tables: Solo queste tabelle (None = tutte)
+            limit: Numero massimo di righe (per elaborare a blocchi)
+        """
+        where, params = self._where(cursor, tables)
+        sql = f"SELECT seq, tbl, row_id, op, changed_at FROM {TABLE} WHERE {where} ORDER BY seq"
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [ChangeLogEntry(*row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def changed_rows(
+        self,
+        cursor: int = 0,
+        tables: Optional[Iterable[str]] = None,
+    ) -> Dict[str, RowChanges]:
+        """
+        Righe toccate dopo ``cursor``, una volta sola con l'ultima operazione.
+
+        Una riga inserita e poi modificata risulta in ``upserted``; una
+        riga modificata e poi eliminata solo in ``deleted``.
+        """
+        where, params = self._where(cursor, tables)
+        rows = self.conn.execute(
+            f"""
+            SELECT tbl, row_id, op FROM {TABLE}
+            WHERE seq IN (
+                SELECT MAX(seq) FROM {TABLE} WHERE {where} GROUP BY tbl, row_id
+            )
+            """,
+            params,
+        ).fetchall()
+        result: Dict[str, RowChanges] = {}
+        for tbl, row_id, op in rows:
+            changes = result.setdefault(tbl, RowChanges(set(), set()))
+            (changes.deleted if op == 'delete' else changes.upserted).add(row_id)
+        return result
+
+    def ack(self, consumer: str, cursor: int):
+        """
+        Salva ``cursor`` come ultimo seq elaborato da ``consumer``.
+
+        Non fa commit: va eseguito nella transazione che applica le modifiche
+        lette, così cursore e dati del consumatore restano allineati.
+        """
+        self.conn.execute(
+            f"INSERT INTO {CONSUMERS_TABLE} (name, cursor) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET cursor = excluded.cursor, "
+            "updated_at = CURRENT_TIMESTAMP",
+            (consumer, cursor),
+        )
+
+    def consumers(self) -> Dict[str, int]:
+        """Cursori dei consumatori registrati ({} senza la migration 028)."""
+        try:
+            rows = self.conn.execute(f"SELECT name, cursor FROM {CONSUMERS_TABLE}").fetchall()
+        except sqlite3.OperationalError:
+            return {}
+        return dict(rows)
+
+    def compact_consumed(self) -> int:
+        """
+        Compatta fino al cursore minimo dei consumatori registrati.
+
+        Returns:
+            Numero di voci eliminate (0 senza consumatori registrati)
+        """
+        cursors = self.consumers()
+        if not cursors:
+            return 0
+        return self.compact(upto=min(cursors.values()))
+
+    def compact(self, upto: Optional[int] = None) -> int:
+        """
+        Riduce il journal.
+
+        - Le righe con seq <= ``upto`` vengono eliminate: ``upto`` non deve
+          superare il cursore di nessun consumatore (``compact_consumed``).
+        - Delle restanti si tiene solo l'ultima modifica di ogni riga:
+          ``changed_rows`` dà lo stesso risultato per qualunque cursore.
+
+        Returns:
+            Numero di voci eliminate
+        """
+        deleted = 0
+        with self.conn:
+            if upto is not None:
+                deleted += self.conn.execute(
+                    f"DELETE FROM {TABLE} WHERE seq <= ?", (upto,)
+                ).rowcount
+            deleted += self.conn.execute(
+                f"""
+                DELETE FROM {TABLE}
+                WHERE seq NOT IN (SELECT MAX(seq) FROM {TABLE} GROUP BY tbl, row_id)
+                """
+            ).rowcount
+        return deleted
@@ -2,21 +2,36 @@
 Database manager - gestisce connessione e repository.
 """
 
-import re
+import importlib
 import sqlite3
 from pathlib import Path
 from typing import Optional
 
-from .models.supplier import SupplierRepository
-from .models.peptide import PeptideRepository
-from .models.batch import BatchRepository  
-from .models.batch_composition import BatchCompositionRepository
-from .models.preparation import PreparationRepository
-from .models.preparation_event import PreparationEventRepository
-from .models.protocol import ProtocolRepository
-from .models.administration import AdministrationRepository
-from .models.certificate import CertificateRepository
-from .models.shipment import ShipmentRepository
+from .events import ChangeBus, TrackingConnection, install_change_tracking
+from .change_log import ChangeLog
+from .migrator import MigrationError, Migrator
+from .schedule_cache import SOURCE_TABLES, ScheduleCache
+
+
+class _Repository:
+    """
+    Repository creato al primo accesso (con l'import del suo modello) e
+    poi memorizzato sull'istanza.
+    """
+
+    def __init__(self, module: str, cls: str):
+        self.module = module
+        self.cls = cls
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        repository = getattr(importlib.import_module(self.module, __package__), self.cls)
+        obj.__dict__[self.name] = instance = repository(obj.conn)
+        return instance
 
 
 class DatabaseManager:
@@ -24,48 +39,97 @@ class DatabaseManager:
     Manager centrale per gestire connessione database e repository.
     
     Questo sostituisce la vecchia classe PeptideManager monolitica.
-    Ogni entità ha il suo repository dedicato.
+    Ogni entità ha il suo repository dedicato, creato al primo uso.
     """
+
+    suppliers = _Repository('.models.supplier', 'SupplierRepository')
+    peptides = _Repository('.models.peptide', 'PeptideRepository')
+    batches = _Repository('.models.batch', 'BatchRepository')
+    batch_composition = _Repository('.models.batch_composition', 'BatchCompositionRepository')
+    preparations = _Repository('.models.preparation', 'PreparationRepository')
+    preparation_events = _Repository('.models.preparation_event', 'PreparationEventRepository')
+    protocols = _Repository('.models.protocol', 'ProtocolRepository')
+    administrations = _Repository('.models.administration', 'AdministrationRepository')
+    certificates = _Repository('.models.certificate', 'CertificateRepository')
+    shipments = _Repository('.models.shipment', 'ShipmentRepository')
     
-    def __init__(self, db_path: str = 'peptide_management.db'):
+    def __init__(self, db_path: str = 'peptide_management.db', read_only: bool = False):
         """
         Inizializza il database manager.
         
         Args:
             db_path: Percorso del file database
+            read_only: Connessione in sola lettura (PRAGMA query_only), usabile
+                da un thread diverso da quello che l'ha creata (loader GUI);
+                non applica migration
         """
         self.db_path = db_path
+        self.read_only = read_only
         self.conn = self._create_connection()
+
+        # Migration mancanti (prima dei trigger TEMP: le migration ricreano
+        # tabelle). Schema aggiornato = una query su PRAGMA user_version
+        if not read_only:
+            self._migrate()
+
+        # Notifiche modifiche (tabella, id, op) dopo ogni commit; le connessioni
+        # di sola lettura non scrivono, quindi solo data_version
+        self.changes = ChangeBus(self.conn)
+        if not read_only:
+            install_change_tracking(self.conn, self.changes)
+        # Journal persistente (migration 025): modifiche dopo un cursore
+        self.change_log = ChangeLog(self.conn)
+        # Schedule dosi materializzato (migration 026): la connessione che
+        # scrive lo riallinea all'avvio e dopo ogni modifica a cicli e
+        # somministrazioni (anche di altri processi, via poll_external)
+        self.schedule_cache = ScheduleCache(self.conn, read_only=read_only)
+        if not read_only:
+            self._sync_schedule_cache()
+            self.changes.subscribe(self._sync_schedule_cache, tables=SOURCE_TABLES)
+
+    def _sync_schedule_cache(self, events=None):
+        try:
+            self.schedule_cache.sync()
+        except sqlite3.Error as e:
+            # Cache derivata: i lettori ricalcolano in memoria se è indietro
+            print(f"⚠️  Schedule cache non aggiornata: {e}")
         
-        # Inizializza repository
-        self.suppliers = SupplierRepository(self.conn)
-        self.peptides = PeptideRepository(self.conn)
-        self.batches = BatchRepository(self.conn)
-        self.batch_composition = BatchCompositionRepository(self.conn)
-        self.preparations = PreparationRepository(self.conn)
-        self.preparation_events = PreparationEventRepository(self.conn)
-        self.protocols = ProtocolRepository(self.conn)
-        self.administrations = AdministrationRepository(self.conn)
-        self.certificates = CertificateRepository(self.conn)
-        self.shipments = ShipmentRepository(self.conn)
-        
-    
+    def _migrate(self):
+        """
+        Applica le migration mancanti. Se una fallisce (annullata) l'app
+        parte comunque con lo schema attuale: si riprova al prossimo avvio.
+        """
+        try:
+            Migrator(self.conn).migrate()
+        except MigrationError as e:
+            print(f"⚠️  Migration non applicata: {e}")
+
     def _create_connection(self) -> sqlite3.Connection:
         """
         Crea connessione al database con configurazione ottimale.
         """
-        conn = sqlite3.connect(self.db_path)
+        if self.read_only:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, factory=TrackingConnection)
         conn.row_factory = sqlite3.Row  # Per accesso dati come dict
         
         # Abilita foreign keys
         cursor = conn.cursor()
         cursor.execute('PRAGMA foreign_keys = ON')
+        if self.read_only:
+            cursor.execute('PRAGMA query_only = ON')
         
         return conn
     
     def close(self):
-        """Chiude la connessione al database."""
+        """Chiude la connessione al database (compattando il journal già letto)."""
         if self.conn:
+            if not self.read_only:
+                try:
+                    self.change_log.compact_consumed()
+                except sqlite3.Error:
+                    pass  # si riprova alla prossima chiusura
             self.conn.close()
     
     def __enter__(self):
@@ -112,7 +176,8 @@ def init_database(db_path: str = 'peptide_management.db') -> sqlite3.Connection:
     Questa funzione mantiene compatibilità con i test che si aspettano una
     connessione SQLite e assicura che le tabelle siano create.
     """
-    from .paths import ensure_db_parent, get_migrations_dir
+    from .migrator import MigrationError, Migrator
+    from .paths import ensure_db_parent
 
     db_path = str(db_path)
     ensure_db_parent(db_path)
@@ -120,209 +185,10 @@ def init_database(db_path: str = 'peptide_management.db') -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
 
-    # Check if the database already has tables (i.e. not a fresh DB).
-    # If tables exist, skip base schema + migrations — they've already been applied.
-    # Re-running destructive migrations (DROP TABLE + recreate) on an existing DB
-    # causes data loss.
-    existing_tables = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='suppliers'"
-    ).fetchone()
-    if existing_tables:
-        conn.execute('PRAGMA foreign_keys = ON')
-        return conn
-
-    # FK off during schema setup — standard SQLite pattern for migrations.
-    # Enabled after all migrations have been applied.
-
-    # Applicare tutte le migration SQL disponibili (ordine alfabetico)
-    migrations_dir = get_migrations_dir()
-    # Se il database è nuovo, creare lo schema base necessario per i test e l'app
-    base_schema = r"""
-    -- Schema base essenziale
-    CREATE TABLE IF NOT EXISTS shipments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        supplier_id INTEGER NOT NULL,
-        shipping_cost REAL,
-        currency TEXT NOT NULL DEFAULT 'USD',
-        shipping_date DATE,
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS suppliers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        country TEXT,
-        website TEXT,
-        email TEXT,
-        notes TEXT,
-        reliability_rating INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS peptides (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT,
-        common_uses TEXT,
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS batches (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        supplier_id INTEGER NOT NULL,
-        product_name TEXT NOT NULL,
-        batch_number TEXT,
-        vials_count INTEGER NOT NULL,
-        vials_received INTEGER DEFAULT NULL,
-        mg_per_vial REAL,
-        total_price REAL,
-        price_per_vial REAL,
-        currency TEXT DEFAULT 'EUR',
-        purchase_date DATE,
-        expiry_date DATE,
-        storage_location TEXT,
-        vials_remaining INTEGER NOT NULL DEFAULT 0,
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL,
-        manufacturing_date DATE,
-        coa_path TEXT,
-        shipping_cost REAL,
-        shipment_id INTEGER REFERENCES shipments(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS batch_composition (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER NOT NULL,
-        peptide_id INTEGER NOT NULL,
-        mg_per_vial REAL NOT NULL,
-        mg_amount REAL
-    );
-
-    CREATE TABLE IF NOT EXISTS certificates (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER NOT NULL,
-        certificate_type TEXT NOT NULL,
-        lab_name TEXT,
-        test_date DATE,
-        file_path TEXT,
-        file_name TEXT,
-        purity_percentage REAL,
-        endotoxin_level TEXT,
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS certificate_details (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        certificate_id INTEGER NOT NULL,
-        test_parameter TEXT NOT NULL,
-        result_value TEXT,
-        unit TEXT,
-        specification TEXT,
-        pass_fail TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS preparations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER NOT NULL,
-        vials_used INTEGER NOT NULL,
-        volume_ml REAL NOT NULL,
-        diluent TEXT DEFAULT 'BAC Water',
-        preparation_date DATE NOT NULL,
-        expiry_date DATE,
-        volume_remaining_ml REAL NOT NULL,
-        storage_location TEXT,
-        notes TEXT,
-        status TEXT DEFAULT 'available',
-        actual_depletion_date DATE,
-        wastage_ml REAL,
-        wastage_reason TEXT,
-        wastage_notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS preparation_events (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        preparation_id INTEGER NOT NULL,
-        event_type TEXT NOT NULL DEFAULT 'wastage',
-        volume_ml REAL NOT NULL,
-        event_date DATE NOT NULL,
-        reason TEXT,
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL,
-        FOREIGN KEY (preparation_id) REFERENCES preparations(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS protocols (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT,
-        dose_ml REAL NOT NULL,
-        frequency_per_day INTEGER DEFAULT 1,
-        days_on INTEGER,
-        days_off INTEGER DEFAULT 0,
-        cycle_duration_weeks INTEGER,
-        notes TEXT,
-        active INTEGER DEFAULT 1,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS protocol_peptides (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        protocol_id INTEGER NOT NULL,
-        peptide_id INTEGER NOT NULL,
-        target_dose_mcg REAL NOT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS administrations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        preparation_id INTEGER NOT NULL,
-        protocol_id INTEGER,
-        administration_datetime TIMESTAMP NOT NULL,
-        dose_ml REAL NOT NULL,
-        injection_site TEXT,
-        notes TEXT,
-        side_effects TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        injection_method TEXT,
-        deleted_at TIMESTAMP DEFAULT NULL
-    );
-    """
-    conn.executescript(base_schema)
-    if migrations_dir.exists() and migrations_dir.is_dir():
-        sql_files = sorted(migrations_dir.glob('*.sql'))
-        for sql_file in sql_files:
-            if not sql_file.name.endswith('.sql'):
-                continue
-            print(f"  migration: {sql_file.name} ...", end=" ", flush=True)
-            with sql_file.open('r', encoding='utf-8') as f:
-                sql = f.read()
-                if not sql.strip():
-                    print("(empty, skipped)")
-                    continue
-                # Strip FK pragmas — FK is deliberately OFF during migrations
-                sql = re.sub(r'(?i)PRAGMA\s+foreign_keys\s*=\s*\w+\s*;', '', sql)
-                try:
-                    conn.executescript(sql)
-                    print("ok")
-                except (sqlite3.OperationalError, sqlite3.IntegrityError) as e:
-                    # Alcune migration possono già essere state applicate
-                    # Ignoriamo errori comuni per non bloccare l'inizializzazione in test
-                    msg = str(e).lower()
-                    if any(x in msg for x in ['duplicate column', 'unique constraint', 'already exists', 'no such column']):
-                        print(f"(skipped: {e})")
-                        continue
-                    raise
+    # Schema base + migration mancanti (registrate in schema_migrations).
+    # Database già aggiornato: una sola query (PRAGMA user_version), e le
+    # migration distruttive (DROP TABLE + recreate) non vengono rieseguite.
+    Migrator(conn).migrate(create=True)
 
     # Enable FK enforcement now that schema is stable
     conn.execute('PRAGMA foreign_keys = ON')
@@ -0,0 +1,316 @@
+"""
+Sync incrementale tra due database SQLite (prod → dev/staging).
+
+Invece di copiare l'intero file, per ogni tabella si calcola su entrambi i
+lati un albero di hash (stile Merkle) per intervalli di rowid:
+
+- foglie: hash delle righe di ogni intervallo di ``RANGE_ROWS`` rowid,
+  calcolate con una sola scansione ordinata per rowid;
+- livelli superiori: hash dei figli a gruppi di ``FANOUT``;
+- tabella invariata = radici uguali; altrimenti si scende solo nei rami
+  diversi fino agli intervalli da trasferire.
+
+Gli intervalli diversi vengono riscritti nel target (DELETE + INSERT ...
+SELECT dal sorgente ATTACHed) in un'unica transazione: il target è sempre
+o vecchio o aggiornato, mai a metà. Lo schema viene confrontato prima da
+``sqlite_master`` in un passaggio: se è diverso il sync si ferma con
+``SchemaMismatchError`` senza scrivere (servono le migration o una copia
+completa), invece di lasciare un database con dati di due versioni.
+
+Il registro delle migration, la cache dello schedule e i cursori dei
+consumatori del journal restano quelli del target (``_NOT_SYNCED``): il
+primo va con ``PRAGMA user_version``; cache e cursori si riferiscono ai dati
+e al journal precedenti e vengono invalidati se i dati cambiano.
+
+Usage:
+    report = sync_database('data/production/peptide_management.db',
+                           'data/development/peptide_management.db')
+    print(format_report(report))
+"""
+
+import hashlib
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Righe (rowid consecutivi) per foglia e figli per nodo dell'albero
+RANGE_ROWS = 256
+FANOUT = 16
+
+# Tabelle sincronizzate per ultime: i trigger del journal (migration 025)
+# scrivono nel target durante il sync, il journal del sorgente le sovrascrive
+_SYNC_LAST = ('change_log',)
+
+# Tabelle del target mai sovrascritte (vedi docstring del modulo)
+_NOT_SYNCED = (
+    'schema_migrations', 'schedule_cache', 'schedule_cache_state', 'change_log_consumers',
+)
+
+
+# ── Schema ──────────────────────────────────────────────────────────────
+
+
+class SchemaDiff(NamedTuple):
+    """Differenze di ``sqlite_master``: liste di (type, name)."""
+    only_source: List[Tuple[str, str]]
+    only_target: List[Tuple[str, str]]
+    changed: List[Tuple[str, str]]
+
+    @property
+    def identical(self) -> bool:
+        return not (self.only_source or self.only_target or self.changed)
+
+    def describe(self) -> List[str]:
+        """Righe leggibili delle differenze."""
+        return [
+            f"{label}: " + ', '.join(f'{t} {n}' for t, n in items)
+            for label, items in (
+                ('solo nel sorgente', self.only_source),
+                ('solo nel target', self.only_target),
+                ('schema diverso', self.changed),
+            )
+            if items
+        ]
+
+
+class SchemaMismatchError(Exception):
+    """Schema del sorgente e del target diversi: sync incrementale non possibile."""
+
+    def __init__(self, diff: SchemaDiff):
+        self.diff = diff
+        super().__init__('Schema diverso tra sorgente e target (' + '; '.join(diff.describe()) + ')')
+
+
+def _normalize_sql(sql: Optional[str]) -> Optional[str]:
+    if sql is None:
+        return None
+    # "CREATE TABLE IF NOT EXISTS" viene salvato com'è scritto: stesso oggetto
+    sql = re.sub(r'(?i)\bIF\s+NOT\s+EXISTS\s+', '', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def read_schema(conn: sqlite3.Connection, schema: str = 'main') -> Dict[Tuple[str, str], str]:
+    """Oggetti di ``sqlite_master`` → SQL normalizzato, in una query."""
+    rows = conn.execute(
+        f"SELECT type, name, sql FROM {schema}.sqlite_master "
+        "WHERE name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    return {(type_, name): _normalize_sql(sql) for type_, name, sql in rows}
+
+
+def schema_diff(source: Dict, target: Dict) -> SchemaDiff:
+    """Confronta due risultati di ``read_schema``."""
+    return SchemaDiff(
+        only_source=sorted(set(source) - set(target)),
+        only_target=sorted(set(target) - set(source)),
+        changed=sorted(k for k in set(source) & set(target) if source[k] != target[k]),
+    )
+
+
+# ── Albero di hash ──────────────────────────────────────────────────────
+
+
+class RangeTree:
+    """Hash per intervallo di rowid (foglie) + livelli aggregati."""
+
+    def __init__(self, leaves: Dict[int, bytes], rows: int):
+        self.rows = rows
+        self._levels: List[Dict[int, bytes]] = [leaves]
+
+    @property
+    def leaves(self) -> Dict[int, bytes]:
+        return self._levels[0]
+
+    def depth(self) -> int:
+        """Livelli sopra le foglie per arrivare a una sola radice (chiave 0)."""
+        top = max((abs(k) for k in self.leaves), default=0)
+        depth = 0
+        while top > 0:
+            top //= FANOUT
+            depth += 1
+        return depth
+
+    def level(self, n: int) -> Dict[int, bytes]:
+        while len(self._levels) <= n:
+            below = self._levels[-1]
+            grouped: Dict[int, list] = {}
+            for key in sorted(below):
+                grouped.setdefault(key // FANOUT, []).append(
+                    key.to_bytes(8, 'big', signed=True) + below[key]
+                )
+            self._levels.append({
+                key: hashlib.blake2b(b''.join(parts), digest_size=16).digest()
+                for key, parts in grouped.items()
+            })
+        return self._levels[n]
+
+    def diff(self, other: 'RangeTree') -> List[int]:
+        """Foglie (indici di intervallo) diverse tra i due alberi."""
+        depth = max(self.depth(), other.depth())
+        keys: Set[int] = set(self.level(depth)) | set(other.level(depth))
+        for n in range(depth, 0, -1):
+            mine, theirs = self.level(n), other.level(n)
+            changed = {k for k in keys if mine.get(k) != theirs.get(k)}
+            if not changed:
+                return []
+            below = set(self.level(n - 1)) | set(other.level(n - 1))
+            keys = {k for k in below if k // FANOUT in changed}
+        mine, theirs = self.leaves, other.leaves
+        return sorted(k for k in keys if mine.get(k) != theirs.get(k))
+
+
+def table_tree(
+    conn: sqlite3.Connection,
+    schema: str,
+    table: str,
+    range_rows: int = RANGE_ROWS,
+) -> RangeTree:
+    """Albero di ``schema.table`` con una scansione ordinata per rowid."""
+    leaves: Dict[int, bytes] = {}
+    current = None
+    digest = None
+    count = 0
+    for row in conn.execute(f'SELECT rowid, * FROM {schema}."{table}" ORDER BY rowid'):
+        bucket = row[0] // range_rows
+        if bucket != current:
+            if digest is not None:
+                leaves[current] = digest.digest()
+            current = bucket
+            digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(row).encode())
+        count += 1
+    if digest is not None:
+        leaves[current] = digest.digest()
+    return RangeTree(leaves, count)
+
+
+# ── Sync ────────────────────────────────────────────────────────────────
+
+
+def _insert_columns(conn: sqlite3.Connection, table: str) -> str:
+    """Colonne per INSERT ... SELECT, rowid incluso se non ha un alias."""
+    info = conn.execute(f'PRAGMA main.table_info("{table}")').fetchall()
+    columns = [f'"{col[1]}"' for col in info]
+    pks = [col for col in info if col[5]]
+    has_alias = len(pks) == 1 and pks[0][2].upper() == 'INTEGER'
+    return ', '.join(columns if has_alias else ['rowid', *columns])
+
+
+def _copy_ranges(conn, table: str, buckets: List[int], range_rows: int) -> int:
+    """Riscrive gli intervalli dal sorgente. Returns: righe copiate."""
+    columns = _insert_columns(conn, table)
+    copied = 0
+    for bucket in buckets:
+        lo = bucket * range_rows
+        hi = lo + range_rows - 1
+        conn.execute(f'DELETE FROM main."{table}" WHERE rowid BETWEEN ? AND ?', (lo, hi))
+        copied += conn.execute(
+            f'INSERT INTO main."{table}" ({columns}) '
+            f'SELECT {columns} FROM src."{table}" WHERE rowid BETWEEN ? AND ?',
+            (lo, hi),
+        ).rowcount
+    return copied
+
+
+def sync_database(
+    source_path,
+    target_path,
+    range_rows: int = RANGE_ROWS,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Allinea i dati di ``target_path`` a ``source_path``.
+
+    Il sorgente è aperto in sola lettura.
+
+    Returns:
+        Dict: {tables: {nome: {ranges, rows}}, unchanged, seconds}
+
+    Raises:
+        FileNotFoundError: Sorgente o target mancante
+        SchemaMismatchError: Schema diverso (target non modificato)
+    """
+    started = time.perf_counter()
+    source_path, target_path = Path(source_path), Path(target_path)
+    if not source_path.exists():
+        raise FileNotFoundError(f"Database sorgente non trovato: {source_path}")
+
+    if not target_path.exists():
+        raise FileNotFoundError(f"Database target non trovato: {target_path}")
+
+    # Connessione unica: target come main, sorgente ATTACHed in sola lettura
+    conn = sqlite3.connect(target_path.resolve().as_uri(), uri=True, isolation_level=None)
+    report = {'tables': {}, 'unchanged': 0}
+    try:
+        conn.execute('ATTACH DATABASE ? AS src', (f"{source_path.resolve().as_uri()}?mode=ro",))
+        source_schema = read_schema(conn, 'src')
+        diff = schema_diff(source_schema, read_schema(conn, 'main'))
+        if not diff.identical:
+            raise SchemaMismatchError(diff)
+
+        tables = sorted(
+            (name for type_, name in source_schema
+             if type_ == 'table' and name not in _NOT_SYNCED),
+            key=lambda name: (name in _SYNC_LAST, name),
+        )
+        excluded = ', '.join(f"'{name}'" for name in _NOT_SYNCED)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for table in tables:
+                target_tree = table_tree(conn, 'main', table, range_rows)
+                source_tree = table_tree(conn, 'src', table, range_rows)
+                buckets = source_tree.diff(target_tree)
+                if not buckets:
+                    report['unchanged'] += 1
+                    continue
+                rows = 0 if dry_run else _copy_ranges(conn, table, buckets, range_rows)
+                report['tables'][table] = {'ranges': len(buckets), 'rows': rows}
+
+            if not dry_run and 'sqlite_sequence' in _tables(conn, 'src'):
+                # Contatori AUTOINCREMENT: i prossimi id come nel sorgente
+                conn.execute(f'DELETE FROM main.sqlite_sequence WHERE name NOT IN ({excluded})')
+                conn.execute(
+                    'INSERT INTO main.sqlite_sequence SELECT * FROM src.sqlite_sequence '
+                    f'WHERE name NOT IN ({excluded})'
+                )
+            target_tables = _tables(conn, 'main')
+            if not dry_run and report['tables'] and 'schedule_cache_state' in target_tables:
+                # Cursore del journal non più valido: ricostruzione completa al prossimo avvio
+                conn.execute(
+                    'UPDATE main.schedule_cache_state '
+                    'SET horizon_start = NULL, horizon_end = NULL, cursor = 0'
+                )
+            if not dry_run and report['tables'] and 'change_log_consumers' in target_tables:
+                # Journal del sorgente: i consumatori si registrano di nuovo
+                conn.execute('DELETE FROM main.change_log_consumers')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('ROLLBACK' if dry_run else 'COMMIT')
+    finally:
+        conn.close()
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def _tables(conn: sqlite3.Connection, schema: str) -> Set[str]:
+    return {
+        row[0] for row in conn.execute(
+            f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'"
+        )
+    }
+
+
+def format_report(report: Dict) -> str:
+    """Riepilogo leggibile di ``sync_database``."""
+    lines = []
+    for table, stats in sorted(report['tables'].items()):
+        lines.append(f"  {table}: {stats['ranges']} intervalli, {stats['rows']} righe")
+    if not report['tables']:
+        lines.append('  nessuna differenza nei dati')
+    lines.append(f"  tabelle invariate: {report['unchanged']}")
+    lines.append(f"  tempo: {report['seconds'] * 1000:.0f} ms")
+    return '\n'.join(lines)
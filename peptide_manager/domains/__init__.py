@@ -0,0 +1,6 @@
+"""
+Domini di PeptideManager poco usati (certificati, template, planner).
+
+Ogni modulo definisce una classe ``<Nome>Domain`` i cui metodi vengono
+installati su PeptideManager al primo accesso (peptide_manager/manager.py).
+"""
@@ -0,0 +1,1012 @@
+"""
+Piani di trattamento e planner multi-fase (metodi di PeptideManager).
+
+Dominio caricato al primo accesso a uno dei suoi metodi
+(vedi ``_DOMAINS`` in peptide_manager/manager.py): calcolo risorse,
+simulazioni e MRP vengono importati solo da qui.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class PlannerDomain:
+    """Metodi piani di trattamento, installati su PeptideManager al primo uso."""
+
+    # ==================== TREATMENT PLANS (NUOVO ✅) ====================
+    
+    def add_treatment_plan(
+        self,
+        name: str,
+        start_date: str,
+        protocol_template_id: int = None,
+        description: str = None,
+        reason: str = None,
+        planned_end_date: str = None,
+        total_planned_days: int = None,
+        status: str = 'active',
+        notes: str = None
+    ) -> int:
+        """
+        Crea un nuovo piano di trattamento.
+        
+        Args:
+            name: Nome del piano
+            start_date: Data inizio (YYYY-MM-DD)
+            protocol_template_id: ID del template (opzionale)
+            description: Descrizione
+            reason: Motivo del trattamento
+            planned_end_date: Data fine pianificata
+            total_planned_days: Giorni totali pianificati
+            status: Status ('active', 'planned', 'paused', 'completed', 'abandoned')
+            notes: Note
+            
+        Returns:
+            ID del piano creato
+        """
+        from ..models import TreatmentPlan, TreatmentPlanRepository
+        from datetime import date
+        
+        plan = TreatmentPlan(
+            name=name,
+            start_date=date.fromisoformat(start_date),
+            protocol_template_id=protocol_template_id,
+            description=description,
+            reason=reason,
+            planned_end_date=date.fromisoformat(planned_end_date) if planned_end_date else None,
+            total_planned_days=total_planned_days,
+            status=status,
+            notes=notes
+        )
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.create(plan)
+    
+    def get_treatment_plans(
+        self,
+        status: str = None,
+        template_id: int = None
+    ) -> List[Dict]:
+        """
+        Recupera piani di trattamento.
+        
+        Args:
+            status: Filtra per status ('active', 'planned', 'completed', etc.)
+            template_id: Filtra per template
+            
+        Returns:
+            Lista di dict con dati dei piani
+        """
+        from ..models import TreatmentPlanRepository
+        
+        repo = TreatmentPlanRepository(self.conn)
+        
+        if status == 'active':
+            plans = repo.get_active_plans()
+        elif status == 'planned':
+            plans = repo.get_planned_plans()
+        elif status == 'completed':
+            plans = repo.get_completed_plans()
+        elif template_id:
+            plans = repo.get_by_template(template_id)
+        else:
+            plans = repo.get_all()
+        
+        return [plan.__dict__ for plan in plans]
+    
+    def get_treatment_plan_basic(self, plan_id: int) -> Optional[Dict]:
+        """
+        Recupera un piano specifico (solo dati base, senza fasi/risorse).
+
+        Args:
+            plan_id: ID del piano
+
+        Returns:
+            Dict con dati del piano o None
+        """
+        from ..models import TreatmentPlanRepository
+
+        repo = TreatmentPlanRepository(self.conn)
+        plan = repo.get_by_id(plan_id)
+
+        return plan.__dict__ if plan else None
+    
+    def update_treatment_plan(self, plan_id: int, **kwargs) -> bool:
+        """Aggiorna i campi base di un piano di trattamento."""
+        allowed = {
+            "name", "start_date", "planned_end_date", "actual_end_date",
+            "status", "description", "reason", "notes",
+        }
+        updates = {}
+        for k, v in kwargs.items():
+            if k not in allowed:
+                continue
+            if k in ("start_date", "planned_end_date", "actual_end_date"):
+                if isinstance(v, str) and v:
+                    from datetime import date as _date
+                    v = _date.fromisoformat(v[:10]).isoformat()
+                elif not v:
+                    v = None
+            updates[k] = v
+
+        if not updates:
+            return True
+
+        cols = ", ".join(f"{k} = ?" for k in updates)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"UPDATE treatment_plans SET {cols}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            list(updates.values()) + [plan_id],
+        )
+        self.conn.commit()
+        return cursor.rowcount > 0
+    
+    def pause_treatment_plan(self, plan_id: int) -> bool:
+        """
+        Mette in pausa un piano.
+        
+        Args:
+            plan_id: ID del piano
+            
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.change_status(plan_id, 'paused')
+    
+    def resume_treatment_plan(self, plan_id: int) -> bool:
+        """
+        Riprende un piano in pausa.
+        
+        Args:
+            plan_id: ID del piano
+            
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.change_status(plan_id, 'active')
+    
+    def complete_treatment_plan(self, plan_id: int) -> bool:
+        """
+        Completa un piano di trattamento.
+        
+        Args:
+            plan_id: ID del piano
+            
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.change_status(plan_id, 'completed')
+    
+    def abandon_treatment_plan(self, plan_id: int) -> bool:
+        """
+        Abbandona un piano di trattamento.
+
+        Marca anche le fasi attive come 'abandoned' e cancella i cicli collegati,
+        in modo che il piano possa essere successivamente eliminato.
+
+        Args:
+            plan_id: ID del piano
+
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        from ..models.planner import PlanPhaseRepository
+        from ..models.cycle import CycleRepository
+
+        plan_repo = TreatmentPlanRepository(self.db)
+        phase_repo = PlanPhaseRepository(self.db)
+        cycle_repo = CycleRepository(self.db)
+
+        # Chiudi fasi attive e relativi cicli
+        phases = phase_repo.get_by_plan(plan_id)
+        for phase in phases:
+            if phase.status == 'active':
+                phase.status = 'abandoned'
+                phase_repo.update(phase)
+                if phase.cycle_id:
+                    cycle_repo.update_status(phase.cycle_id, 'cancelled')
+
+        return plan_repo.change_status(plan_id, 'abandoned')
+    
+    def update_plan_adherence(self, plan_id: int, adherence: float) -> bool:
+        """
+        Aggiorna percentuale di aderenza.
+        
+        Args:
+            plan_id: ID del piano
+            adherence: Percentuale (0-100)
+            
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        from decimal import Decimal
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.update_adherence(plan_id, Decimal(str(adherence)))
+    
+    def increment_plan_days(self, plan_id: int) -> bool:
+        """
+        Incrementa contatore giorni completati.
+        
+        Args:
+            plan_id: ID del piano
+            
+        Returns:
+            True se successo
+        """
+        from ..models import TreatmentPlanRepository
+        
+        repo = TreatmentPlanRepository(self.conn)
+        return repo.increment_days_completed(plan_id)
+    
+    def link_preparation_to_plan(
+        self,
+        plan_id: int,
+        preparation_id: int,
+        peptide_id: int = None,
+        actual_dose_mcg: float = None,
+        actual_dose_ml: float = None,
+        frequency: str = None,
+        notes: str = None
+    ) -> int:
+        """
+        Associa una preparazione a un piano.
+        
+        Args:
+            plan_id: ID del piano
+            preparation_id: ID della preparazione
+            peptide_id: ID del peptide (opzionale)
+            actual_dose_mcg: Dose effettiva in mcg
+            actual_dose_ml: Dose effettiva in ml
+            frequency: Frequenza somministrazione
+            notes: Note
+            
+        Returns:
+            ID dell'associazione creata
+        """
+        from ..models import TreatmentPlanPreparation, TreatmentPlanPreparationRepository
+        
+        link = TreatmentPlanPreparation(
+            plan_id=plan_id,
+            preparation_id=preparation_id,
+            peptide_id=peptide_id,
+            actual_dose_mcg=actual_dose_mcg,
+            actual_dose_ml=actual_dose_ml,
+            frequency=frequency,
+            notes=notes
+        )
+        
+        repo = TreatmentPlanPreparationRepository(self.conn)
+        return repo.create(link)
+    
+    def get_plan_preparations(self, plan_id: int, active_only: bool = True) -> List[Dict]:
+        """
+        Recupera preparazioni di un piano.
+        
+        Args:
+            plan_id: ID del piano
+            active_only: Se True, solo preparazioni attive
+            
+        Returns:
+            Lista di dict con associazioni
+        """
+        from ..models import TreatmentPlanPreparationRepository
+        
+        repo = TreatmentPlanPreparationRepository(self.conn)
+        
+        if active_only:
+            links = repo.get_active_preparations(plan_id)
+        else:
+            links = repo.get_by_plan(plan_id)
+        
+        return [link.__dict__ for link in links]
+
+    # ==================== TREATMENT PLANNER (MULTI-PHASE) ====================
+    
+    def create_treatment_plan(
+        self,
+        name: str,
+        start_date: str,
+        phases_config: List[Dict],
+        description: Optional[str] = None,
+        calculate_resources: bool = True
+    ) -> Dict:
+        """
+        Crea un piano di trattamento multi-fase con calcolo risorse.
+        
+        Args:
+            name: Nome del piano (es. "Protocol 2 - GH Secretagogue")
+            start_date: Data inizio formato ISO (YYYY-MM-DD)
+            phases_config: Lista configurazioni fasi:
+                [
+                    {
+                        'phase_name': 'Foundation',
+                        'duration_weeks': 4,
+                        'peptides': [
+                            {'peptide_id': 1, 'peptide_name': 'CJC-1295', 'dose_mcg': 100},
+                            {'peptide_id': 2, 'peptide_name': 'Ipamorelin', 'dose_mcg': 200}
+                        ],
+                        'daily_frequency': 1,
+                        'five_two_protocol': False,
+                        'description': 'Foundation phase...'
+                    },
+                    ...
+                ]
+            description: Descrizione generale del piano
+            calculate_resources: Se True, calcola subito risorse necessarie
+            
+        Returns:
+            Dict con piano creato, fasi, e risorse calcolate
+        """
+        from ..models.treatment_plan import TreatmentPlan, TreatmentPlanRepository
+        from ..models.planner import PlanPhase, PlanPhaseRepository, ResourceRequirementRepository
+        from ..calculator import ResourcePlanner
+        import json
+        from datetime import date, timedelta
+        
+        # Valida configurazione
+        if not phases_config or len(phases_config) == 0:
+            raise ValueError("Almeno una fase richiesta")
+        
+        # Calcola durata totale
+        total_weeks = sum(p['duration_weeks'] for p in phases_config)
+        start_date_obj = date.fromisoformat(start_date)
+        planned_end_date = start_date_obj + timedelta(weeks=total_weeks)
+        
+        # Crea treatment plan
+        plan = TreatmentPlan(
+            name=name,
+            start_date=start_date_obj,
+            planned_end_date=planned_end_date,
+            description=description,
+            status='planned',
+            total_planned_days=total_weeks * 7,
+            is_multi_phase=True,
+            total_phases=len(phases_config)
+        )
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        plan_id = plan_repo.create(plan)
+        
+        if not plan_id:
+            raise RuntimeError("Errore creazione treatment plan")
+        
+        # Crea fasi
+        phase_repo = PlanPhaseRepository(self.db)
+        phases_created = []
+        current_week = 1
+        
+        for idx, phase_config in enumerate(phases_config, 1):
+            # Converti peptides list a JSON
+            peptides_json = json.dumps(phase_config['peptides'])
+            
+            phase = PlanPhase(
+                treatment_plan_id=plan_id,
+                phase_number=idx,
+                phase_name=phase_config['phase_name'],
+                description=phase_config.get('description'),
+                duration_weeks=phase_config['duration_weeks'],
+                start_week=current_week,
+                peptides_config=peptides_json,
+                daily_frequency=phase_config.get('daily_frequency', 1),
+                five_two_protocol=phase_config.get('five_two_protocol', False),
+                ramp_schedule=phase_config.get('ramp_schedule'),
+                status='planned'
+            )
+            
+            phase_id = phase_repo.create(phase)
+            phase.id = phase_id
+            phases_created.append(phase)
+            
+            current_week += phase_config['duration_weeks']
+        
+        # Calcola risorse se richiesto
+        resources_summary = None
+        if calculate_resources:
+            planner = ResourcePlanner(self.db)
+            resources = planner.calculate_total_plan_resources(
+                phases_config,
+                inventory_check=True
+            )
+            resources_summary = resources
+            
+            # Salva requirements nel database
+            ResourceRequirementRepository(self.db).sync_plan(
+                plan_id, self._build_plan_requirements(plan_id, resources)
+            )
+            
+            # Salva summary in treatment_plan
+            plan_repo.update_resources_summary(plan_id, json.dumps(resources['summary']))
+        
+        return {
+            'plan_id': plan_id,
+            'plan': plan.to_dict(),
+            'phases': [p.to_dict() for p in phases_created],
+            'resources': resources_summary
+        }
+    
+    def get_treatment_plan(self, plan_id: int) -> Optional[Dict]:
+        """
+        Recupera piano di trattamento completo con fasi e risorse.
+        
+        Returns:
+            Dict con plan, phases, resources, current_phase_info
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        from ..models.planner import PlanPhaseRepository, ResourceRequirementRepository
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        plan = plan_repo.get_by_id(plan_id)
+        
+        if not plan:
+            return None
+        
+        phase_repo = PlanPhaseRepository(self.db)
+        phases = phase_repo.get_by_plan(plan_id)
+        
+        resource_repo = ResourceRequirementRepository(self.db)
+        resources = resource_repo.get_by_plan(plan_id)
+        
+        # Trova fase corrente
+        current_phase = None
+        if plan.current_phase_id:
+            current_phase = next((p for p in phases if p.id == plan.current_phase_id), None)
+        elif plan.status == 'active':
+            # Trova prima fase attiva o pianificata
+            current_phase = next((p for p in phases if p.status in ['active', 'planned']), None)
+        
+        return {
+            'plan': plan.to_dict(),
+            'phases': [p.to_dict() for p in phases],
+            'resources': [r.to_dict() for r in resources],
+            'current_phase': current_phase.to_dict() if current_phase else None,
+            'needs_ordering': any(r.needs_ordering for r in resources)
+        }
+    
+    def list_treatment_plans(self, status: Optional[str] = None) -> List[Dict]:
+        """
+        Lista piani di trattamento.
+        
+        Args:
+            status: Filtra per status ('planned', 'active', 'completed', None=tutti)
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        
+        if status == 'active':
+            plans = plan_repo.get_active_plans()
+        elif status == 'planned':
+            plans = plan_repo.get_planned_plans()
+        elif status == 'completed':
+            plans = plan_repo.get_completed_plans(limit=50)
+        else:
+            plans = plan_repo.get_all()
+        
+        return [p.to_dict() for p in plans]
+    
+    def replace_plan_phases(self, plan_id: int, phases_config: List[Dict]) -> Dict:
+        """Sostituisce tutte le fasi pianificate di un piano con una nuova configurazione.
+
+        Vincolo: se esistono fasi active/completed, solleva ValueError.
+        """
+        from ..models.planner import PlanPhase, PlanPhaseRepository, ResourceRequirementRepository
+        import json
+        from datetime import date, timedelta, datetime
+
+        phase_repo = PlanPhaseRepository(self.db)
+        existing = phase_repo.get_by_plan(plan_id)
+
+        locked = [p for p in existing if p.status in ("active", "completed")]
+        if locked:
+            raise ValueError(
+                f"Impossibile modificare le fasi: "
+                f"{len(locked)} fase/i già attiva/completata"
+            )
+
+        cursor = self.db.conn.cursor()
+        now = datetime.now().isoformat()
+        cursor.execute(
+            "UPDATE plan_phases SET deleted_at = ? WHERE treatment_plan_id = ? AND deleted_at IS NULL",
+            (now, plan_id),
+        )
+
+        res_repo = ResourceRequirementRepository(self.db)
+        res_repo.delete_by_plan(plan_id)
+
+        current_week = 1
+        for idx, cfg in enumerate(phases_config, 1):
+            phase = PlanPhase(
+                treatment_plan_id=plan_id,
+                phase_number=idx,
+                phase_name=cfg.get("phase_name", f"Fase {idx}"),
+                description=cfg.get("description"),
+                duration_weeks=cfg.get("duration_weeks", 8),
+                start_week=current_week,
+                peptides_config=json.dumps(cfg.get("peptides", [])),
+                daily_frequency=cfg.get("daily_frequency", 1),
+                five_two_protocol=cfg.get("five_two_protocol", False),
+                ramp_schedule=cfg.get("ramp_schedule"),
+                status="planned",
+            )
+            phase_repo.create(phase)
+            current_week += cfg.get("duration_weeks", 8)
+
+        total_weeks = sum(c.get("duration_weeks", 8) for c in phases_config)
+        cursor.execute(
+            "SELECT start_date FROM treatment_plans WHERE id = ?", (plan_id,)
+        )
+        row = cursor.fetchone()
+        if row and row[0]:
+            start = date.fromisoformat(str(row[0])[:10])
+            new_end = (start + timedelta(weeks=total_weeks)).isoformat()
+            cursor.execute(
+                "UPDATE treatment_plans SET planned_end_date = ?, total_phases = ?, "
+                "updated_at = ? WHERE id = ?",
+                (new_end, len(phases_config), now, plan_id),
+            )
+
+        self.db.conn.commit()
+
+        try:
+            self.update_plan_resources(plan_id)
+        except Exception:
+            pass
+
+        return {"plan_id": plan_id, "phases_count": len(phases_config)}
+
+    def delete_treatment_plan(self, plan_id: int, soft: bool = True) -> bool:
+        """
+        Elimina un piano di trattamento.
+
+        Args:
+            plan_id: ID del piano da eliminare
+            soft: Se True usa soft delete (default), altrimenti hard delete
+            
+        Returns:
+            True se successo
+            
+        Raises:
+            ValueError: Se piano non trovato o ha fasi attive
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        from ..models.planner import PlanPhaseRepository
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        phase_repo = PlanPhaseRepository(self.db)
+        
+        # Verifica esistenza
+        plan = plan_repo.get_by_id(plan_id)
+        if not plan:
+            raise ValueError(f"Piano {plan_id} non trovato")
+        
+        # Verifica che non ci siano fasi attive
+        phases = phase_repo.get_by_plan(plan_id)
+        active_phases = [p for p in phases if p.status == 'active']
+        if active_phases:
+            raise ValueError(f"Impossibile eliminare: il piano ha {len(active_phases)} fasi attive")
+        
+        # Elimina il piano
+        return plan_repo.delete(plan_id, soft=soft)
+    
+    def activate_plan_phase(
+        self,
+        plan_id: int,
+        phase_number: int,
+        create_cycle: bool = True
+    ) -> Dict:
+        """
+        Attiva una fase del piano, opzionalmente creando un Cycle collegato.
+        
+        Args:
+            plan_id: ID del piano
+            phase_number: Numero fase da attivare (1-based)
+            create_cycle: Se True, crea Cycle per tracking amministrazioni
+            
+        Returns:
+            Dict con fase attivata e cycle_id se creato
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        from ..models.planner import PlanPhaseRepository
+        from ..models.cycle import Cycle, CycleRepository
+        import json
+        from datetime import date, timedelta
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        phase_repo = PlanPhaseRepository(self.db)
+        
+        # Get plan e fase
+        plan = plan_repo.get_by_id(plan_id)
+        if not plan:
+            raise ValueError(f"Piano {plan_id} non trovato")
+        
+        phases = phase_repo.get_by_plan(plan_id)
+        phase = next((p for p in phases if p.phase_number == phase_number), None)
+        
+        if not phase:
+            raise ValueError(f"Fase {phase_number} non trovata")
+        
+        if phase.status == 'active':
+            raise ValueError(f"Fase {phase_number} già attiva")
+        
+        # Attiva la fase — actual_start_date = giorno dell'attivazione, non creazione piano
+        phase.status = 'active'
+        if not phase.actual_start_date:
+            phase.actual_start_date = date.today()
+        phase_repo.update(phase)
+
+        # Aggiorna piano
+        if plan.status == 'planned':
+            plan.status = 'active'
+            # Allinea start_date del piano al giorno di attivazione effettiva
+            plan.start_date = phase.actual_start_date
+        plan.current_phase_id = phase.id
+        plan_repo.update(plan)
+        
+        cycle_id = None
+        
+        # Crea Cycle se richiesto
+        if create_cycle:
+            # Parse peptides config
+            peptides = json.loads(phase.peptides_config)
+            
+            # Crea un protocol snapshot
+            protocol_snapshot = json.dumps({
+                'phase_name': phase.phase_name,
+                'phase_number': phase.phase_number,
+                'peptides': peptides,
+                'daily_frequency': phase.daily_frequency,
+                'five_two_protocol': phase.five_two_protocol
+            })
+            
+            # Date del ciclo
+            cycle_start_date = phase.actual_start_date
+            cycle_end_date = cycle_start_date + timedelta(weeks=phase.duration_weeks)
+            
+            # Crea cycle
+            cycle = Cycle(
+                protocol_id=None,  # Non collegato a protocol tradizionale per cicli da planner
+                name=f"{plan.name} - {phase.phase_name}",
+                description=f"Fase {phase_number} di {plan.total_phases}",
+                start_date=cycle_start_date,
+                planned_end_date=cycle_end_date,
+                days_on=5 if phase.five_two_protocol else 7,
+                days_off=2 if phase.five_two_protocol else 0,
+                cycle_duration_weeks=phase.duration_weeks,
+                protocol_snapshot=protocol_snapshot,
+                ramp_schedule=phase.ramp_schedule,
+                status='active',
+                plan_phase_id=phase.id
+            )
+            
+            cycle_repo = CycleRepository(self.db)
+            cycle_id = cycle_repo.create(cycle)
+            
+            # Collega cycle alla fase
+            phase_repo.link_to_cycle(phase.id, cycle_id)
+        
+        return {
+            'phase': phase.to_dict(),
+            'cycle_id': cycle_id,
+            'plan_status': plan.status
+        }
+    
+    def transition_to_next_phase(self, plan_id: int) -> Dict:
+        """
+        Completa fase corrente e attiva la successiva.
+        
+        Returns:
+            Dict con old_phase, new_phase, cycle_id
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        from ..models.planner import PlanPhaseRepository
+        from ..models.cycle import CycleRepository
+        from datetime import date
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        phase_repo = PlanPhaseRepository(self.db)
+        
+        plan = plan_repo.get_by_id(plan_id)
+        if not plan:
+            raise ValueError(f"Piano {plan_id} non trovato")
+        
+        phases = phase_repo.get_by_plan(plan_id)
+        phases_sorted = sorted(phases, key=lambda p: p.phase_number)
+        
+        # Trova fase corrente
+        current_phase = next((p for p in phases_sorted if p.status == 'active'), None)
+        
+        if not current_phase:
+            raise ValueError("Nessuna fase attiva da completare")
+        
+        # Completa fase corrente
+        current_phase.status = 'completed'
+        current_phase.actual_end_date = date.today()
+        phase_repo.update(current_phase)
+        
+        # Completa cycle collegato se esiste
+        if current_phase.cycle_id:
+            cycle_repo = CycleRepository(self.db)
+            cycle_repo.complete_cycle(current_phase.cycle_id)
+        
+        # Trova fase successiva
+        next_phase = next(
+            (p for p in phases_sorted if p.phase_number == current_phase.phase_number + 1),
+            None
+        )
+        
+        if next_phase:
+            # Attiva fase successiva
+            result = self.activate_plan_phase(plan_id, next_phase.phase_number, create_cycle=True)
+            
+            return {
+                'completed_phase': current_phase.to_dict(),
+                'activated_phase': result['phase'],
+                'new_cycle_id': result['cycle_id'],
+                'plan_continues': True
+            }
+        else:
+            # Tutte le fasi completate - completa il piano
+            plan.status = 'completed'
+            plan.actual_end_date = date.today()
+            plan.current_phase_id = None
+            plan_repo.update(plan)
+            
+            return {
+                'completed_phase': current_phase.to_dict(),
+                'activated_phase': None,
+                'new_cycle_id': None,
+                'plan_continues': False,
+                'plan_completed': True
+            }
+    
+    def _get_plan_phases_config(self, plan_id: int) -> List[Dict]:
+        """Ricostruisce phases_config (formato ResourcePlanner) dalle fasi salvate."""
+        from ..models.planner import PlanPhaseRepository
+        import json
+        
+        phases = PlanPhaseRepository(self.db).get_by_plan(plan_id)
+        return [
+            {
+                'phase_name': phase.phase_name,
+                'duration_weeks': phase.duration_weeks,
+                'peptides': json.loads(phase.peptides_config),
+                'daily_frequency': phase.daily_frequency,
+                'five_two_protocol': phase.five_two_protocol
+            }
+            for phase in sorted(phases, key=lambda p: p.phase_number)
+        ]
+    
+    def simulate_plan_scenarios(
+        self,
+        plan_id: int,
+        scenarios: List[Dict],
+        save_as: Optional[str] = None,
+        description: Optional[str] = None
+    ) -> Dict:
+        """
+        Valuta un lotto di scenari what-if su un piano esistente.
+        
+        Tutti gli scenari sono calcolati insieme (NumPy) contro un solo
+        snapshot inventario. Vedi peptide_manager.simulation per il formato.
+        
+        Args:
+            plan_id: ID del piano base
+            scenarios: Lista scenari (dose_factor, duration_weeks, ...)
+            save_as: Se indicato, salva in plan_simulations con questo nome
+            description: Descrizione della simulazione salvata
+            
+        Returns:
+            Dict con summary dei risultati e simulation_id (se salvata)
+        """
+        from ..simulation import PlanSimulationEngine
+        
+        phases_config = self._get_plan_phases_config(plan_id)
+        if not phases_config:
+            raise ValueError(f"Piano {plan_id} senza fasi")
+        
+        engine = PlanSimulationEngine(self.db)
+        results = engine.evaluate(phases_config, scenarios)
+        
+        simulation_id = None
+        if save_as:
+            simulation_id = engine.save(
+                save_as, phases_config, scenarios, results,
+                base_plan_id=plan_id, description=description
+            )
+        
+        summary = results.to_summary()
+        summary['simulation_id'] = simulation_id
+        return summary
+    
+    def optimize_plan_purchase(
+        self,
+        plan_id: Optional[int] = None,
+        phases_config: Optional[List[Dict]] = None,
+        currency: Optional[str] = None
+    ) -> Dict:
+        """
+        Mix di acquisto più economico (SKU per fornitore) per coprire i gap del piano.
+        
+        Accetta un piano salvato o una configurazione fasi in modifica
+        (plan builder), così può essere rieseguito a ogni modifica.
+        
+        Args:
+            plan_id: ID piano salvato (alternativo a phases_config)
+            phases_config: Configurazione fasi non ancora salvata
+            currency: Valuta dell'acquisto (obbligatoria se il catalogo ne ha più d'una)
+            
+        Returns:
+            Dict da VendorProductRepository.optimize_purchase
+        """
+        from ..calculator import ResourcePlanner
+        from ..models.vendor_product import VendorProductRepository
+        
+        if phases_config is None:
+            if plan_id is None:
+                raise ValueError("plan_id o phases_config richiesto")
+            phases_config = self._get_plan_phases_config(plan_id)
+        
+        resources = ResourcePlanner(self.db).calculate_total_plan_resources(
+            phases_config, inventory_check=True
+        )
+        mg_gaps = {
+            p['resource_id']: p['mg_gap']
+            for p in resources['total_peptides']
+            if p.get('resource_id') and p.get('mg_gap', 0) > 0
+        }
+        return VendorProductRepository(self.conn).optimize_purchase(mg_gaps, currency=currency)
+    
+    def get_order_calendar(self, horizon_weeks: int = 26, order_period_weeks: int = 4) -> Dict:
+        """
+        Calendario ordini time-phased su tutti i piani attivi e pianificati.
+        
+        Nettizza la domanda settimanale per peptide contro l'inventario
+        proiettato e anticipa gli ordini del lead time dei fornitori.
+        
+        Args:
+            horizon_weeks: Orizzonte in settimane
+            order_period_weeks: Settimane di fabbisogno coperte da ogni ordine
+            
+        Returns:
+            Dict da RequirementsPlanner.plan (peptides, orders, calendar)
+        """
+        from ..mrp import RequirementsPlanner
+        return RequirementsPlanner(self.db).plan(
+            horizon_weeks=horizon_weeks,
+            order_period_weeks=order_period_weeks
+        )
+    
+    def _build_plan_requirements(self, plan_id: int, resources: Dict) -> List:
+        """
+        Converte l'output di ResourcePlanner in righe plan_resources (totali piano).
+        
+        Args:
+            plan_id: ID del piano
+            resources: Dict da calculate_total_plan_resources
+            
+        Returns:
+            Lista di ResourceRequirement
+        """
+        from ..models.planner import ResourceRequirement
+        from decimal import Decimal
+        import json
+        
+        requirements = []
+        for peptide_req in resources['total_peptides']:
+            requirements.append(ResourceRequirement(
+                treatment_plan_id=plan_id,
+                plan_phase_id=None,  # NULL = totale piano
+                resource_type='peptide',
+                resource_id=peptide_req.get('resource_id'),
+                resource_name=peptide_req['resource_name'],
+                quantity_needed=Decimal(str(peptide_req['mg_needed'])),
+                quantity_unit='mg',
+                quantity_available=Decimal(str(peptide_req.get('mg_available', 0))),
+                needs_ordering=peptide_req.get('mg_gap', 0) > 0,
+                calculation_params=json.dumps({
+                    'mg_per_vial': peptide_req.get('mg_per_vial'),
+                    'injections': peptide_req.get('injections'),
+                    'dose_mcg': peptide_req.get('dose_mcg'),
+                    'daily_frequency': peptide_req.get('daily_frequency'),
+                })
+            ))
+        
+        for consumable in resources['total_consumables']:
+            requirements.append(ResourceRequirement(
+                treatment_plan_id=plan_id,
+                resource_type=consumable.get('resource_type', 'consumable'),
+                resource_name=consumable['resource_name'],
+                quantity_needed=Decimal(str(consumable['quantity_needed'])),
+                quantity_unit=consumable['quantity_unit']
+            ))
+        
+        return requirements
+    
+    def update_all_plan_resources(self, statuses=('active', 'planned')) -> Dict[int, Dict]:
+        """
+        Ricalcola le risorse di tutti i piani (es. dopo modifica inventario).
+        
+        Un solo snapshot inventario condiviso tra i piani e un solo commit
+        finale: le righe invariate non vengono riscritte.
+        
+        Args:
+            statuses: Stati dei piani da ricalcolare
+            
+        Returns:
+            Dict {plan_id: conteggi sync (inserted/updated/deleted/unchanged)}
+        """
+        from ..models.planner import ResourceRequirementRepository
+        from ..calculator import ResourcePlanner
+        
+        placeholders = ', '.join('?' * len(statuses))
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            f"SELECT id FROM treatment_plans WHERE deleted_at IS NULL "
+            f"AND status IN ({placeholders}) ORDER BY id",
+            tuple(statuses)
+        )
+        plan_ids = [row[0] for row in cursor.fetchall()]
+        
+        planner = ResourcePlanner(self.db)
+        resource_repo = ResourceRequirementRepository(self.db)
+        results = {}
+        try:
+            for plan_id in plan_ids:
+                resources = planner.calculate_total_plan_resources(
+                    self._get_plan_phases_config(plan_id),
+                    inventory_check=True
+                )
+                results[plan_id] = resource_repo.sync_plan(
+                    plan_id, self._build_plan_requirements(plan_id, resources),
+                    commit=False
+                )
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+        
+        return results
+    
+    def update_plan_resources(self, plan_id: int) -> Dict:
+        """
+        Ricalcola risorse per un piano esistente (es. dopo modifica inventario).
+        
+        Returns:
+            Dict con risorse aggiornate
+        """
+        from ..models.treatment_plan import TreatmentPlanRepository
+        from ..models.planner import ResourceRequirementRepository
+        from ..calculator import ResourcePlanner
+        
+        plan_repo = TreatmentPlanRepository(self.db)
+        resource_repo = ResourceRequirementRepository(self.db)
+        
+        plan = plan_repo.get_by_id(plan_id)
+        if not plan:
+            raise ValueError(f"Piano {plan_id} non trovato")
+        
+        phases_config = self._get_plan_phases_config(plan_id)
+        
+        # Ricalcola
+        planner = ResourcePlanner(self.db)
+        resources = planner.calculate_total_plan_resources(
+            phases_config,
+            inventory_check=True
+        )
+        
+        # Allinea requirements salvati (diff + executemany, una transazione)
+        resource_repo.sync_plan(plan_id, self._build_plan_requirements(plan_id, resources))
+        
+        return resources
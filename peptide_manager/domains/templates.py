@@ -0,0 +1,146 @@
+"""
+Template di protocollo (metodi di PeptideManager).
+
+Dominio caricato al primo accesso a uno dei suoi metodi
+(vedi ``_DOMAINS`` in peptide_manager/manager.py).
+"""
+
+from typing import Dict, List, Optional
+
+
+class TemplatesDomain:
+    """Metodi template di protocollo, installati su PeptideManager al primo uso."""
+
+    # ==================== PROTOCOL TEMPLATES (NUOVO ✅) ====================
+    
+    def add_protocol_template(
+        self,
+        name: str,
+        description: str = None,
+        dose_ml: float = None,
+        frequency_per_day: int = 1,
+        days_on: int = None,
+        days_off: int = 0,
+        cycle_duration_weeks: int = None,
+        notes: str = None,
+        tags: str = None
+    ) -> int:
+        """
+        Aggiunge un nuovo template di protocollo.
+        
+        Args:
+            name: Nome del template
+            description: Descrizione
+            dose_ml: Dose in ml per somministrazione
+            frequency_per_day: Somministrazioni al giorno
+            days_on: Giorni ON del ciclo
+            days_off: Giorni OFF del ciclo
+            cycle_duration_weeks: Durata totale ciclo in settimane
+            notes: Note
+            tags: Tags (separati da virgola)
+            
+        Returns:
+            ID del template creato
+        """
+        from ..models import ProtocolTemplate, ProtocolTemplateRepository
+        
+        template = ProtocolTemplate(
+            name=name,
+            description=description,
+            dose_ml=dose_ml,
+            frequency_per_day=frequency_per_day,
+            days_on=days_on,
+            days_off=days_off,
+            cycle_duration_weeks=cycle_duration_weeks,
+            notes=notes,
+            tags=tags
+        )
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        return repo.create(template)
+    
+    def get_protocol_templates(self, active_only: bool = True) -> List[Dict]:
+        """
+        Recupera templates di protocolli.
+        
+        Args:
+            active_only: Se True, solo templates attivi
+            
+        Returns:
+            Lista di dict con dati templates
+        """
+        from ..models import ProtocolTemplateRepository
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        
+        if active_only:
+            templates = repo.get_active_templates()
+        else:
+            templates = repo.get_all()
+        
+        return [template.__dict__ for template in templates]
+    
+    def get_protocol_template(self, template_id: int) -> Optional[Dict]:
+        """
+        Recupera un template specifico.
+        
+        Args:
+            template_id: ID del template
+            
+        Returns:
+            Dict con dati del template o None
+        """
+        from ..models import ProtocolTemplateRepository
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        template = repo.get_by_id(template_id)
+        
+        return template.__dict__ if template else None
+    
+    def update_protocol_template(self, template_id: int, **kwargs) -> bool:
+        """
+        Aggiorna un template.
+        
+        Args:
+            template_id: ID del template
+            **kwargs: Campi da aggiornare
+            
+        Returns:
+            True se successo
+        """
+        from ..models import ProtocolTemplateRepository
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        return repo.update(template_id, **kwargs)
+    
+    def delete_protocol_template(self, template_id: int) -> bool:
+        """
+        Elimina (soft delete) un template.
+        
+        Args:
+            template_id: ID del template
+            
+        Returns:
+            True se successo
+        """
+        from ..models import ProtocolTemplateRepository
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        return repo.soft_delete(template_id)
+    
+    def search_protocol_templates(self, query: str) -> List[Dict]:
+        """
+        Cerca templates per nome.
+        
+        Args:
+            query: Stringa di ricerca
+            
+        Returns:
+            Lista di dict con templates trovati
+        """
+        from ..models import ProtocolTemplateRepository
+        
+        repo = ProtocolTemplateRepository(self.conn)
+        templates = repo.search_by_name(query)
+        
+        return [template.__dict__ for template in templates]
@@ -0,0 +1,200 @@
+"""
+Bus di notifica modifiche: (tabella, id, operazione) dopo ogni commit.
+
+Le scritture sulla connessione principale vengono registrate da trigger TEMP
+(locali alla connessione, non toccano lo schema del file) in una tabella
+temporanea; al ``commit()`` la connessione raccoglie le righe modificate e le
+pubblica sul ``ChangeBus`` come ``ChangeEvent``. Così ogni repository e ogni
+metodo di PeptideManager notifica senza codice dedicato, e un rollback scarta
+anche le notifiche della transazione annullata.
+
+Le scritture di altri processi (script, seconda istanza) non passano dai
+trigger: ``ChangeBus.poll_external()`` le rileva con ``PRAGMA data_version``
+e pubblica un evento ``external`` senza tabella (= "qualsiasi dato").
+
+Usage:
+    db = DatabaseManager('peptide_management.db')
+    unsubscribe = db.changes.subscribe(on_change, tables={'administrations'})
+    db.administrations.create(...)      # on_change([ChangeEvent(...)])
+    db.changes.poll_external()          # da un timer, per gli altri processi
+"""
+
+import logging
+import sqlite3
+from typing import Callable, FrozenSet, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+EXTERNAL = 'external'
+
+_CHANGES_TABLE = '_pending_changes'
+
+
+class ChangeEvent(NamedTuple):
+    """
+    Modifica committata.
+
+    ``table`` None e ``ids`` vuoto = modifica non localizzata (altro processo):
+    chi la riceve deve considerare obsoleti tutti i dati.
+    """
+    table: Optional[str]
+    ids: FrozenSet[int]
+    op: str
+
+    def touches(self, tables: Iterable[str]) -> bool:
+        """True se l'evento riguarda una delle tabelle (o è non localizzato)."""
+        return self.table is None or self.table in tables
+
+
+class ChangeBus:
+    """Publish/subscribe sincrono per ChangeEvent."""
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        self._conn = conn
+        self._subscribers: List[tuple] = []
+        self._data_version = self._read_data_version()
+
+    def subscribe(
+        self,
+        callback: Callable[[List[ChangeEvent]], None],
+        tables: Optional[Iterable[str]] = None,
+    ) -> Callable[[], None]:
+        """
+        Registra ``callback(events)``.
+
+        Args:
+            callback: Riceve la lista degli eventi di un commit
+            tables: Notifica solo se uno di questi è toccato (None = tutti)
+
+        Returns:
+            Funzione che annulla la sottoscrizione
+        """
+        entry = (callback, frozenset(tables) if tables is not None else None)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, events: List[ChangeEvent]):
+        """Consegna gli eventi ai sottoscrittori interessati."""
+        if not events:
+            return
+        for callback, tables in list(self._subscribers):
+            if tables is None:
+                relevant = events
+            else:
+                relevant = [e for e in events if e.touches(tables)]
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception:
+                # Il commit è già avvenuto: un sottoscrittore rotto non deve
+                # far sembrare fallita la scrittura
+                logger.exception("Errore nel sottoscrittore modifiche %r", callback)
+
+    # ── Scritture di altri processi ─────────────────────────────────
+
+    def _read_data_version(self) -> Optional[int]:
+        if self._conn is None:
+            return None
+        try:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def poll_external(self) -> bool:
+        """
+        Pubblica un evento ``external`` se un'altra connessione ha committato
+        dall'ultimo controllo. Costa una PRAGMA: adatto a un timer.
+        """
+        version = self._read_data_version()
+        if version is None or version == self._data_version:
+            return False
+        self._data_version = version
+        self.publish([ChangeEvent(None, frozenset(), EXTERNAL)])
+        return True
+
+
+class TrackingConnection(sqlite3.Connection):
+    """
+    Connessione che pubblica sul bus le righe modificate a ogni commit.
+
+    Usare come ``sqlite3.connect(path, factory=TrackingConnection)`` e poi
+    ``install_change_tracking(conn, bus)``.
+    """
+
+    bus: Optional[ChangeBus] = None
+    _seen_changes = 0
+
+    def commit(self):
+        events = self._drain_changes()
+        super().commit()
+        if events and self.bus is not None:
+            self.bus.publish(events)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Il commit di "with conn:" non passa da commit(): lo instradiamo qui
+        if exc_type is None:
+            self.commit()
+            return False
+        return super().__exit__(exc_type, exc_value, traceback)
+
+    def _drain_changes(self) -> List[ChangeEvent]:
+        """Legge e svuota le modifiche registrate (nella stessa transazione)."""
+        if self.bus is None or self.total_changes == self._seen_changes:
+            return []
+        rows = self.execute(
+            f"SELECT tbl, op, row_id FROM temp.{_CHANGES_TABLE}"
+        ).fetchall()
+        if rows:
+            self.execute(f"DELETE FROM temp.{_CHANGES_TABLE}")
+        self._seen_changes = self.total_changes
+
+        grouped: dict = {}
+        for tbl, op, row_id in rows:
+            grouped.setdefault((tbl, op), set()).add(row_id)
+        return [
+            ChangeEvent(tbl, frozenset(ids), op)
+            for (tbl, op), ids in grouped.items()
+        ]
+
+
+def install_change_tracking(conn: TrackingConnection, bus: ChangeBus):
+    """
+    Crea la tabella e i trigger TEMP che registrano INSERT/UPDATE/DELETE su
+    tutte le tabelle del database (escluso il journal persistente
+    ``change_log``, scritto dai suoi trigger). Idempotente: richiamarla dopo aver creato
+    nuove tabelle le aggiunge al tracciamento.
+    """
+    conn.bus = bus
+    cursor = conn.cursor()
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_CHANGES_TABLE} "
+        "(tbl TEXT NOT NULL, op TEXT NOT NULL, row_id INTEGER)"
+    )
+    tables = [
+        row[0] for row in cursor.execute(
+            "SELECT name FROM main.sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != 'change_log'"
+        ).fetchall()
+    ]
+    for table in tables:
+        for op, timing, ref in (
+            (INSERT, 'INSERT', 'NEW'),
+            (UPDATE, 'UPDATE', 'NEW'),
+            (DELETE, 'DELETE', 'OLD'),
+        ):
+            cursor.execute(
+                f'CREATE TEMP TRIGGER IF NOT EXISTS "_chg_{table}_{op}" '
+                f'AFTER {timing} ON main."{table}" BEGIN '
+                f"INSERT INTO {_CHANGES_TABLE} VALUES ('{table}', '{op}', {ref}.rowid); "
+                "END"
+            )
+    # DDL dei trigger fuori da transazioni utente: nessuna notifica spuria
+    conn._seen_changes = conn.total_changes
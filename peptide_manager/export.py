@@ -6,10 +6,9 @@ No external dependencies — stdlib only.
 
 from __future__ import annotations
 
-import json
 import uuid
 from datetime import date, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List
 
 _DAYS_IT = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
 _MONTHS_IT = [
@@ -20,100 +19,29 @@ _MONTHS_IT = [
 
 def build_schedule(manager, start_date: date, end_date: date) -> Dict[date, List[dict]]:
     """
-    Compute dose schedule for [start_date, end_date] from active cycles.
+    Dose schedule for [start_date, end_date] from active cycles.
+
+    Reads the materialized schedule (``manager.get_schedule``, see
+    schedule_cache.py) shared with the Today view and the CLI.
 
     Returns {date: [{'peptide_name', 'dose_mcg', 'cycle_name', 'frequency'}]}.
     Days with no doses are absent.
     """
-    from .models.cycle import Cycle
-
-    try:
-        active_cycles = [c for c in manager.get_cycles(active_only=False) if c.get("status") == "active"]
-    except Exception:
-        return {}
-
     schedule: Dict[date, List[dict]] = {}
-
-    for cycle in active_cycles:
-        cycle_id = cycle.get("id")
-        cycle_name = cycle.get("name") or f"Ciclo #{cycle_id}"
-        proto = cycle.get("protocol_snapshot")
-
-        if not proto:
-            continue
-        if isinstance(proto, str):
-            try:
-                proto = json.loads(proto)
-                if isinstance(proto, str):
-                    proto = json.loads(proto)
-            except Exception:
-                continue
-        if not isinstance(proto, dict):
-            continue
-
-        days_on = cycle.get("days_on") if cycle.get("days_on") is not None else proto.get("days_on")
-        days_off = (
-            cycle.get("days_off") if cycle.get("days_off") is not None else proto.get("days_off", 0)
-        )
-        frequency_per_day = int(proto.get("frequency_per_day") or 1)
-
-        if days_on is not None and int(days_on) > 0:
-            cycle_length = int(days_on) + int(days_off or 0)
-            effective_days_on = int(days_on)
-        else:
-            cycle_length = 1
-            effective_days_on = 1
-
-        raw_start = cycle.get("start_date")
-        if not raw_start:
-            continue
-        cycle_start = date.fromisoformat(raw_start) if isinstance(raw_start, str) else raw_start
-
-        raw_resumed = cycle.get("resumed_at")
-        if raw_resumed:
-            anchor = date.fromisoformat(raw_resumed[:10]) if isinstance(raw_resumed, str) else raw_resumed
-        else:
-            anchor = cycle_start
-
-        ramp_data = cycle.get("ramp_schedule")  # already parsed list from get_all()
-        cycle_obj: Optional[Cycle] = None
-        if ramp_data:
-            cycle_obj = Cycle(start_date=cycle_start, ramp_schedule=ramp_data)
-
-        custom_doses = proto.get("custom_doses", {})
-
-        for pep in proto.get("peptides", []):
-            peptide_id = pep.get("peptide_id")
-            peptide_name = pep.get("name") or pep.get("peptide_name") or f"Peptide #{peptide_id}"
-            base_dose = float(
-                custom_doses.get(str(peptide_id))
-                or pep.get("target_dose_mcg")
-                or pep.get("dose_mcg")
-                or 0
-            )
-
-            current = start_date
-            while current <= end_date:
-                if current < anchor:
-                    current += timedelta(days=1)
-                    continue
-
-                if (current - anchor).days % cycle_length < effective_days_on:
-                    if cycle_obj is not None:
-                        exact = cycle_obj.get_ramp_dose(peptide_id, current)
-                        dose_mcg = float(exact) if exact is not None else base_dose * cycle_obj.get_ramp_percentage(current)
-                    else:
-                        dose_mcg = base_dose
-
-                    if dose_mcg > 0:
-                        schedule.setdefault(current, []).append({
-                            "peptide_name": peptide_name,
-                            "dose_mcg": round(dose_mcg),
-                            "cycle_name": cycle_name,
-                            "frequency": frequency_per_day,
-                        })
-
-                current += timedelta(days=1)
+    entries: Dict[tuple, dict] = {}
+
+    for dose in manager.get_schedule(start_date, end_date):
+        key = (dose["date"], dose["cycle_id"], dose["peptide_id"])
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {
+                "peptide_name": dose["peptide_name"],
+                "dose_mcg": round(dose["dose_mcg"]),
+                "cycle_name": dose["cycle_name"],
+                "frequency": 0,
+            }
+            schedule.setdefault(dose["date"], []).append(entry)
+        entry["frequency"] += 1
 
     return schedule
 
@@ -0,0 +1,3150 @@
+"""
+Adapter per retrocompatibilità con il vecchio PeptideManager.
+
+Questo modulo permette al vecchio codice GUI di continuare a funzionare
+mentre migriamo progressivamente alla nuova architettura.
+
+Strategia:
+- Suppliers, Peptides, Batches: usa nuova architettura (DatabaseManager + Repository)
+- Altri moduli (Protocols, etc.): delega al vecchio models.py
+
+Questo permette migrazione incrementale senza bloccare la GUI.
+"""
+
+from typing import List, Dict, Optional
+from datetime import datetime
+from .database import DatabaseManager
+
+
+# Etichette leggibili per i motivi di spreco
+WASTAGE_REASON_LABELS = {
+    'spillage': 'Fuoriuscita',
+    'measurement_error': 'Errore misurazione',
+    'contamination': 'Contaminazione',
+    'other': 'Altro',
+}
+
+
+class PeptideManager:
+    """
+    Adapter ibrido: nuova architettura per moduli migrati + fallback per il resto.
+    
+    Moduli migrati (usa nuova architettura):
+    - Suppliers ✅
+    - Peptides ✅
+    - Batches ✅
+    - BatchComposition ✅
+    
+    Moduli non migrati (usa vecchio codice):
+    - Certificates
+    - Preparations
+    - Protocols
+    - Administrations
+
+    Planner, template e certificati sono in peptide_manager/domains/ e
+    vengono caricati al primo accesso (vedi _DOMAINS in fondo al modulo).
+    """
+    
+    def __init__(self, db_path: str = 'peptide_management.db', read_only: bool = False):
+        """
+        Inizializza il manager (compatibile con vecchia interfaccia).
+        
+        Args:
+            db_path: Percorso del database
+            read_only: Solo letture (es. caricamento dati GUI in background);
+                le migration (peptide_manager/migrator.py) restano al
+                manager principale
+        """
+        self.db_path = db_path
+        self.db = DatabaseManager(db_path, read_only=read_only)
+
+        # Per retrocompatibilità
+        self.conn = self.db.conn
+        # Bus modifiche: (tabella, id, op) dopo ogni commit (vedi events.py)
+        self.changes = self.db.changes
+
+        # Scritture sullo schedule: close() aggiorna lo snapshot della CLI
+        # "oggi" (peptide_manager/today.py)
+        self._schedule_changed = False
+        if not read_only:
+            from .today import SCHEDULE_TABLES
+            self.changes.subscribe(self._mark_schedule_changed, tables=SCHEDULE_TABLES)
+
+        # Lazy loading del vecchio manager (solo se serve)
+        self._old_manager = None
+
+    def _mark_schedule_changed(self, events):
+        self._schedule_changed = True
+
+    
+    def _get_old_manager(self):
+        """
+        Lazy load del vecchio PeptideManager per metodi non ancora migrati.
+        
+        Importa il vecchio models_legacy.py solo quando necessario.
+        """
+        if self._old_manager is None:
+            try:
+                # Importa vecchio PeptideManager da models_legacy.py (stesso package)
+                from .models_legacy import PeptideManager as OldPeptideManager
+                self._old_manager = OldPeptideManager(self.db_path)
+                # Silenzioso: usato solo per check_data_integrity()
+            except ImportError as e:
+                raise ImportError(
+                    "Impossibile importare vecchio PeptideManager. "
+                    "Assicurati che peptide_manager/models_legacy.py esista. "
+                    f"Errore: {e}"
+                )
+        
+        return self._old_manager
+    
+    def close(self):
+        """Chiude le connessioni (compatibile con vecchia interfaccia)."""
+        if self._schedule_changed:
+            self._schedule_changed = False
+            try:
+                self.refresh_today_snapshot()
+            except Exception:
+                pass  # la CLI ricalcola comunque uno snapshot obsoleto
+        self.db.close()
+        if self._old_manager:
+            self._old_manager.close()
+    
+    # ==================== SUPPLIERS (MIGRATO ✅) ====================
+    
+    def get_suppliers(self, search: str = None) -> List[Dict]:
+        """
+        Recupera fornitori (usa nuova architettura).
+        
+        Args:
+            search: Filtro ricerca (opzionale)
+            
+        Returns:
+            Lista di dict (compatibile con vecchia interfaccia)
+        """
+        suppliers = self.db.suppliers.get_all(search=search)
+        return [s.to_dict() for s in suppliers]
+    
+    def get_supplier_by_id(self, supplier_id: int) -> Optional[Dict]:
+        """Recupera singolo fornitore per ID."""
+        supplier = self.db.suppliers.get_by_id(supplier_id)
+        return supplier.to_dict() if supplier else None
+
+    def add_supplier(self, name: str, country: str = None, website: str = None,
+                     email: str = None, notes: str = None, rating: int = None) -> int:
+        """
+        Aggiunge fornitore (usa nuova architettura).
+        
+        Args:
+            name: Nome fornitore
+            country: Paese (opzionale)
+            website: Sito web (opzionale)
+            email: Email (opzionale)
+            notes: Note (opzionale)
+            rating: Rating 1-5 (opzionale)
+            
+        Returns:
+            ID del fornitore creato
+        """
+        from .models.supplier import Supplier
+
+        supplier = Supplier(
+            name=name,
+            country=country,
+            website=website,
+            email=email,
+            notes=notes,
+            reliability_rating=rating
+        )
+        
+        supplier_id = self.db.suppliers.create(supplier)
+        print(f"Fornitore '{name}' aggiunto (ID: {supplier_id})")
+        return supplier_id
+    
+    def update_supplier(self, supplier_id: int, **kwargs) -> bool:
+        """
+        Aggiorna fornitore (usa nuova architettura).
+        
+        Args:
+            supplier_id: ID fornitore
+            **kwargs: Campi da aggiornare
+            
+        Returns:
+            True se aggiornato
+        """
+        supplier = self.db.suppliers.get_by_id(supplier_id)
+        if not supplier:
+            print(f"Fornitore #{supplier_id} non trovato")
+            return False
+        
+        # Aggiorna campi
+        allowed_fields = ['name', 'country', 'website', 'email', 'notes']
+        for key, value in kwargs.items():
+            if key in allowed_fields:
+                setattr(supplier, key, value)
+            elif key == 'rating':
+                supplier.reliability_rating = value
+        
+        # Salva
+        try:
+            self.db.suppliers.update(supplier)
+            print(f"Fornitore ID {supplier_id} aggiornato")
+            return True
+        except ValueError as e:
+            print(f"Errore: {e}")
+            return False
+    
+    def soft_delete_supplier(self, supplier_id: int) -> bool:
+        """
+        Elimina fornitore (usa nuova architettura).
+        
+        Args:
+            supplier_id: ID fornitore
+            
+        Returns:
+            True se eliminato
+        """
+        success, message = self.db.suppliers.delete(supplier_id, force=False)
+        
+        if success:
+            print(f"✓ {message}")
+        else:
+            print(f"❌ {message}")
+        
+        return success
+    
+    # Alias per backward compatibility
+    def delete_supplier(self, supplier_id: int, force: bool = False) -> bool:
+        """Alias per soft_delete_supplier (backward compatibility con vecchi test)."""
+        return self.db.suppliers.delete(supplier_id, force=force)[0]
+    
+    # ==================== PEPTIDES (MIGRATO ✅) ====================
+    
+    def get_peptides(self, search: str = None) -> List[Dict]:
+        """
+        Recupera peptidi con i relativi alias.
+
+        Returns:
+            Lista di dict con chiave 'aliases' (list[str]) aggiunta.
+        """
+        peptides = self.db.peptides.get_all(search=search)
+        rows = [p.to_dict() for p in peptides]
+
+        # Arricchisce ogni peptide con i propri alias (se la tabella esiste)
+        try:
+            alias_map: dict[int, list[str]] = {}
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT peptide_id, alias FROM peptide_aliases ORDER BY alias"
+            )
+            for pid, alias in cursor.fetchall():
+                alias_map.setdefault(pid, []).append(alias)
+            for row in rows:
+                row["aliases"] = alias_map.get(row["id"], [])
+        except Exception:
+            for row in rows:
+                row.setdefault("aliases", [])
+
+        return rows
+    
+    def get_peptide_by_id(self, peptide_id: int) -> Optional[Dict]:
+        """
+        Recupera peptide per ID con alias inclusi.
+
+        Returns:
+            Dict con chiave 'aliases' (list[str]), o None.
+        """
+        peptide = self.db.peptides.get_by_id(peptide_id)
+        if not peptide:
+            return None
+        row = peptide.to_dict()
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT alias FROM peptide_aliases WHERE peptide_id = ? ORDER BY alias",
+                (peptide_id,)
+            )
+            row["aliases"] = [r[0] for r in cursor.fetchall()]
+        except Exception:
+            row.setdefault("aliases", [])
+        return row
+    
+    def add_peptide(self, name: str, description: str = None,
+                    common_uses: str = None, notes: str = None) -> int:
+        """
+        Aggiunge peptide (usa nuova architettura).
+        
+        Args:
+            name: Nome peptide
+            description: Descrizione (opzionale)
+            common_uses: Usi comuni (opzionale)
+            notes: Note (opzionale)
+            
+        Returns:
+            ID del peptide creato
+        """
+        from .models.peptide import Peptide
+
+        peptide = Peptide(
+            name=name,
+            description=description,
+            common_uses=common_uses,
+            notes=notes
+        )
+        
+        peptide_id = self.db.peptides.create(peptide)
+        print(f"Peptide '{name}' aggiunto al catalogo (ID: {peptide_id})")
+        return peptide_id
+    
+    def update_peptide(self, peptide_id: int, **kwargs) -> bool:
+        """
+        Aggiorna peptide (usa nuova architettura).
+        
+        Args:
+            peptide_id: ID peptide
+            **kwargs: Campi da aggiornare
+            
+        Returns:
+            True se aggiornato
+        """
+        peptide = self.db.peptides.get_by_id(peptide_id)
+        if not peptide:
+            print(f"Peptide #{peptide_id} non trovato")
+            return False
+        
+        # Aggiorna campi
+        allowed_fields = ['name', 'description', 'common_uses', 'notes']
+        for key, value in kwargs.items():
+            if key in allowed_fields:
+                setattr(peptide, key, value)
+        
+        # Salva
+        try:
+            self.db.peptides.update(peptide)
+            print(f"Peptide ID {peptide_id} aggiornato")
+            return True
+        except ValueError as e:
+            print(f"Errore: {e}")
+            return False
+    
+    def soft_delete_peptide(self, peptide_id: int) -> bool:
+        """
+        Elimina peptide (usa nuova architettura).
+        
+        Args:
+            peptide_id: ID peptide
+            
+        Returns:
+            True se eliminato
+        """
+        success, message = self.db.peptides.delete(peptide_id, force=False)
+        
+        if success:
+            print(f"✓ {message}")
+        else:
+            print(f"❌ {message}")
+        
+        return success
+    
+    # Alias per backward compatibility
+    def delete_peptide(self, peptide_id: int, force: bool = False) -> bool:
+        """Alias per soft_delete_peptide (backward compatibility con vecchi test)."""
+        return self.db.peptides.delete(peptide_id, force=force)[0]
+    
+    # ==================== BATCHES (MIGRATO ✅) ====================
+    
+    def get_batches(
+        self,
+        search: str = None,
+        supplier_id: int = None,
+        only_available: bool = False,
+        only_depleted: bool = False,
+        only_expired: bool = False
+    ) -> List[Dict]:
+        """
+        Recupera batches con filtri opzionali.
+        
+        Args:
+            search: Filtro ricerca (nome prodotto o batch number)
+            supplier_id: Filtra per fornitore specifico
+            only_available: Solo batches con fiale disponibili
+            only_depleted: Solo batches esauriti
+            only_expired: Solo batches scaduti
+        
+        Returns:
+            Lista di dict batch (compatibile GUI)
+        """
+        batches = self.db.batches.get_all(
+            search=search,
+            supplier_id=supplier_id,
+            only_available=only_available,
+            only_depleted=only_depleted,
+            only_expired=only_expired
+        )
+        
+        # Batch-load supplier names (avoid N+1 queries)
+        supplier_ids = {b.supplier_id for b in batches if b.supplier_id}
+        supplier_map = {}
+        for sid in supplier_ids:
+            supplier = self.db.suppliers.get_by_id(sid)
+            if supplier:
+                supplier_map[sid] = supplier.name
+
+        result = []
+        for batch in batches:
+            batch_dict = batch.to_dict()
+            batch_dict['supplier_name'] = supplier_map.get(batch.supplier_id, "Sconosciuto")
+            result.append(batch_dict)
+
+        return result
+
+    def get_batch_summaries(
+        self,
+        search: str = None,
+        supplier_id: int = None,
+        only_available: bool = False,
+        only_depleted: bool = False,
+        only_expired: bool = False
+    ) -> List[Dict]:
+        """
+        Elenco batches per Inventario e Storico Acquisti in una sola query.
+
+        Come get_batches(), più 'peptide_names' (composizione),
+        'preparations_count' e 'active_preparations_count': evita di chiamare
+        get_batch_details() per ogni batch.
+
+        Returns:
+            Lista di dict batch arricchiti
+        """
+        return self.db.batches.get_summaries(
+            search=search,
+            supplier_id=supplier_id,
+            only_available=only_available,
+            only_depleted=only_depleted,
+            only_expired=only_expired
+        )
+    
+    def add_batch(
+        self,
+        supplier_id: int = None,
+        product_name: str = None,
+        batch_number: str = None,
+        peptide_ids: List[int] = None,
+        peptide_amounts: Dict[int, float] = None,
+        supplier_name: str = None,  # Legacy: nome invece di ID
+        composition: List = None,  # Legacy: List[Tuple[name, mg]]
+        vials_count: int = None,
+        mg_per_vial: float = None,
+        total_price: float = None,
+        purchase_date: str = None,
+        expiry_date: str = None,
+        storage_location: str = None,
+        **kwargs
+    ) -> int:
+        """
+        Aggiunge un nuovo batch con composizione peptidi.
+        
+        Supporta sia nuova API che vecchia per compatibilità.
+        
+        Args:
+            supplier_id: ID fornitore (nuovo)
+            supplier_name: Nome fornitore (legacy)
+            product_name: Nome prodotto
+            batch_number: Numero batch
+            peptide_ids: Lista ID peptidi (nuovo)
+            peptide_amounts: Dict {peptide_id: mg_amount} (nuovo)
+            composition: List[Tuple[name, mg]] (legacy)
+            vials_count: Numero fiale
+            mg_per_vial: Mg per fiala
+            total_price: Prezzo totale
+            purchase_date: Data acquisto
+            expiry_date: Data scadenza
+            storage_location: Posizione storage
+            **kwargs: Altri campi batch
+        
+        Returns:
+            ID del batch creato
+        """
+        # Compatibilità backward: converti supplier_name in supplier_id
+        if supplier_name and not supplier_id:
+            suppliers = self.db.suppliers.get_all()
+            supplier = next((s for s in suppliers if s.name == supplier_name), None)
+            if not supplier:
+                raise ValueError(f"Supplier '{supplier_name}' non trovato")
+            supplier_id = supplier.id
+        
+        # Se non c'è batch_number, genera uno automatico
+        if not batch_number:
+            from datetime import datetime
+            batch_number = f"BATCH-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        
+        # Compatibilità backward: converti composition in peptide_ids/amounts
+        if composition and not peptide_ids:
+            peptide_ids = []
+            peptide_amounts = {}
+            
+            for item in composition:
+                if isinstance(item, tuple) and len(item) == 2:
+                    peptide_name, mg_amount = item
+                    # Cerca peptide per nome
+                    peptides = self.db.peptides.get_all()
+                    peptide = next((p for p in peptides if p.name == peptide_name), None)
+                    if peptide:
+                        peptide_ids.append(peptide.id)
+                        peptide_amounts[peptide.id] = float(mg_amount)
+        
+        # Prepara kwargs per Batch
+        batch_kwargs = {}
+        if vials_count is not None:
+            batch_kwargs['vials_count'] = vials_count
+            batch_kwargs['vials_remaining'] = vials_count  # Inizialmente tutti disponibili
+        if mg_per_vial is not None:
+            batch_kwargs['mg_per_vial'] = mg_per_vial
+        if total_price is not None:
+            # Mantieni total_price per compatibilità DB
+            batch_kwargs['total_price'] = total_price
+            if vials_count:
+                # Calcola anche price_per_vial
+                batch_kwargs['price_per_vial'] = total_price / vials_count
+        if purchase_date:
+            batch_kwargs['purchase_date'] = purchase_date
+        if expiry_date:
+            batch_kwargs['expiry_date'] = expiry_date
+        if storage_location:
+            batch_kwargs['storage_location'] = storage_location
+        
+        # Merge con altri kwargs (escludendo total_price se già gestito)
+        for k, v in kwargs.items():
+            if k not in batch_kwargs:
+                batch_kwargs[k] = v
+        
+        # Crea batch
+        from .models.batch import Batch
+
+        batch = Batch(
+            supplier_id=supplier_id,
+            product_name=product_name,
+            batch_number=batch_number,
+            **batch_kwargs
+        )
+        
+        batch_id = self.db.batches.create(batch)
+        
+        # Aggiungi composizione se specificata
+        if peptide_ids:
+            for peptide_id in peptide_ids:
+                mg_amount = None
+                if peptide_amounts and peptide_id in peptide_amounts:
+                    mg_amount = peptide_amounts[peptide_id]
+                
+                try:
+                    self.db.batch_composition.add_peptide_to_batch(
+                        batch_id=batch_id,
+                        peptide_id=peptide_id,
+                        mg_amount=mg_amount
+                    )
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+        
+        print(f"✅ Batch '{product_name}' aggiunto (ID: {batch_id})")
+        return batch_id
+    
+    def update_batch(
+        self, 
+        batch_id: int,
+        peptide_ids: List[int] = None,
+        peptide_amounts: Dict[int, float] = None,
+        **kwargs
+    ) -> bool:
+        """
+        Aggiorna batch esistente.
+        
+        Args:
+            batch_id: ID batch
+            peptide_ids: Nuova lista peptidi (opzionale, sovrascrive composizione)
+            peptide_amounts: Dict {peptide_id: mg_amount}
+            **kwargs: Campi batch da aggiornare
+        
+        Returns:
+            True se aggiornato
+        """
+        batch = self.db.batches.get_by_id(batch_id)
+        if not batch:
+            print(f"❌ Batch #{batch_id} non trovato")
+            return False
+        
+        # Aggiorna campi batch
+        allowed_fields = [
+            'supplier_id', 'product_name', 'batch_number',
+            'manufacturing_date', 'expiry_date', 'mg_per_vial',
+            'vials_count', 'vials_remaining', 'purchase_date',
+            'price_per_vial', 'currency', 'storage_location', 'notes', 'coa_path',
+            'shipment_id'
+        ]
+        
+        for key, value in kwargs.items():
+            if key in allowed_fields:
+                setattr(batch, key, value)
+        
+        # Salva batch
+        try:
+            self.db.batches.update(batch)
+        except ValueError as e:
+            print(f"❌ Errore: {e}")
+            return False
+        
+        # Aggiorna composizione se specificata
+        if peptide_ids is not None:
+            # Rimuovi composizione esistente
+            self.db.batch_composition.clear_batch_composition(batch_id)
+            
+            # Aggiungi nuova composizione
+            for peptide_id in peptide_ids:
+                mg_amount = None
+                if peptide_amounts and peptide_id in peptide_amounts:
+                    mg_amount = peptide_amounts[peptide_id]
+                
+                try:
+                    self.db.batch_composition.add_peptide_to_batch(
+                        batch_id=batch_id,
+                        peptide_id=peptide_id,
+                        mg_amount=mg_amount
+                    )
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+        
+        print(f"✅ Batch ID {batch_id} aggiornato")
+        return True
+    
+    def soft_delete_batch(self, batch_id: int) -> bool:
+        """
+        Elimina batch (soft delete).
+        
+        Args:
+            batch_id: ID batch
+        
+        Returns:
+            True se eliminato
+        """
+        success, message = self.db.batches.delete(batch_id, force=False)
+        
+        if success:
+            print(f"✓ {message}")
+        else:
+            print(f"✗ {message}")
+        
+        return success
+    
+    def delete_batch(self, batch_id: int, force: bool = False) -> bool:
+        """Alias per soft_delete_batch."""
+        return self.db.batches.delete(batch_id, force=force)[0]
+    
+    def get_batch_details(self, batch_id: int) -> Optional[Dict]:
+        """
+        Recupera dettagli batch completi per GUI.
+        
+        Returns:
+            Dict con:
+            - Tutti i campi batch
+            - 'composition': lista peptidi [{id, name, mg_amount}, ...]
+            - 'preparations': lista preparazioni
+            - 'supplier_name': nome fornitore
+        """
+        batch = self.db.batches.get_by_id(batch_id)
+        if not batch:
+            return None
+        
+        # 1. Dati batch base
+        result = batch.to_dict()
+        
+        # 2. Composizione peptidi
+        peptides = self.db.batch_composition.get_peptides_in_batch(batch_id)
+        # Aggiungi alias 'name' per compatibilità GUI (defensive)
+        for peptide in peptides:
+            # Prefer explicit keys if present, otherwise fallback safely
+            peptide_name = peptide.get('peptide_name') or peptide.get('name') or peptide.get('peptide_id')
+            peptide['name'] = peptide_name
+            # Normalize mg amount: prefer existing mg_amount, else mg_per_vial
+            if peptide.get('mg_amount') is None and peptide.get('mg_per_vial') is not None:
+                peptide['mg_amount'] = peptide['mg_per_vial']  # Alias per compatibilità
+        result['composition'] = peptides
+        
+        # 3. Preparazioni (usa nuova architettura)
+        preparations = self.get_preparations(batch_id=batch_id)
+        result['preparations'] = preparations
+        
+        # 4. Nome fornitore (JOIN)
+        supplier = self.db.suppliers.get_by_id(batch.supplier_id)
+        result['supplier_name'] = supplier.name if supplier else "Sconosciuto"
+        
+        return result
+    
+    def get_expiring_batches(self, days: int = 60, limit: int = 5) -> List[Dict]:
+        """
+        Recupera batches in scadenza entro N giorni.
+        
+        Args:
+            days: Giorni di anticipo (default: 60)
+            limit: Numero massimo risultati
+        
+        Returns:
+            Lista di dict batch in scadenza
+        """
+        batches = self.db.batches.get_expiring_soon(days=days)
+        
+        # Converti a dict e limita risultati
+        result = [b.to_dict() for b in batches[:limit]]
+        
+        return result
+    
+    def adjust_batch_vials(
+        self, 
+        batch_id: int, 
+        adjustment: int, 
+        reason: str = None
+    ) -> bool:
+        """
+        Corregge conteggio fiale batch.
+        
+        Args:
+            batch_id: ID batch
+            adjustment: Numero fiale da aggiungere (+) o rimuovere (-)
+            reason: Motivo correzione (opzionale)
+        
+        Returns:
+            True se successo
+        """
+        success, message = self.db.batches.adjust_vials(
+            batch_id, 
+            adjustment, 
+            reason
+        )
+        
+        if success:
+            print(f"✅ {message}")
+        else:
+            print(f"❌ {message}")
+        
+        return success
+    
+    # ═══════════════════════════════════════════════════════════════════
+    #  SHIPMENTS
+    # ═══════════════════════════════════════════════════════════════════
+
+    def add_shipment(
+        self,
+        supplier_id: int,
+        shipping_cost: float = None,
+        currency: str = 'USD',
+        shipping_date: str = None,
+        notes: str = None,
+    ) -> int:
+        from .models.shipment import Shipment
+        shipment = Shipment(
+            supplier_id=supplier_id,
+            shipping_cost=shipping_cost,
+            currency=currency,
+            shipping_date=shipping_date or None,
+            notes=notes,
+        )
+        shipment_id = self.db.shipments.create(shipment)
+        print(f"✅ Spedizione creata (ID: {shipment_id})")
+        return shipment_id
+
+    def get_shipments(self, supplier_id: int = None) -> List[Dict]:
+        return self.db.shipments.get_all(supplier_id=supplier_id)
+
+    def get_shipment_details(self, shipment_id: int) -> Optional[Dict]:
+        shipment = self.db.shipments.get_by_id(shipment_id)
+        if not shipment:
+            return None
+        result = shipment.to_dict()
+        supplier = self.db.suppliers.get_by_id(shipment.supplier_id)
+        result['supplier_name'] = supplier.name if supplier else "Sconosciuto"
+        result['batches'] = self.db.shipments.get_batches(shipment_id)
+        return result
+
+    def update_shipment(self, shipment_id: int, **kwargs) -> bool:
+        from .models.shipment import Shipment
+        shipment = self.db.shipments.get_by_id(shipment_id)
+        if not shipment:
+            return False
+        allowed = ['supplier_id', 'shipping_cost', 'currency', 'shipping_date', 'notes']
+        for k, v in kwargs.items():
+            if k in allowed:
+                setattr(shipment, k, v)
+        # Re-run __post_init__ conversions by rebuilding
+        shipment.__post_init__()
+        self.db.shipments.update(shipment)
+        return True
+
+    def delete_shipment(self, shipment_id: int) -> tuple:
+        return self.db.shipments.delete(shipment_id)
+
+    def get_inventory_summary(self) -> Dict:
+        """Calcola statistiche inventario complete per dashboard."""
+        # 1. Statistiche batches
+        batch_stats = self.db.batches.get_inventory_summary()
+        
+        # 2. Peptidi unici
+        unique_peptides = self.db.peptides.count()
+        
+        # 3. Valore totale inventario
+        query = '''
+            SELECT SUM(vials_remaining * COALESCE(price_per_vial, 0))
+            FROM batches WHERE deleted_at IS NULL AND vials_remaining > 0
+        '''
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        row = cursor.fetchone()
+        total_value = float(row[0]) if row and row[0] else 0.0
+        
+        # 4. Batches in scadenza (entro 60 giorni)
+        expiring = self.db.batches.get_expiring_soon(days=60)
+        expiring_soon = len(expiring)
+        
+        # Combina
+        return {
+            **batch_stats,
+            'unique_peptides': unique_peptides,
+            'total_value': total_value,
+            'expiring_soon': expiring_soon,
+        }
+
+    def get_vial_consumption(
+        self,
+        start_date: str = None,
+        end_date: str = None
+    ) -> Dict:
+        """
+        Calcola il consumo di fiale in un periodo, gestendo correttamente i blend.
+
+        Per i blend (es. BPC-157 + TB500 nella stessa fiala) le fiale fisiche
+        vengono conteggiate una sola volta a livello di batch, mentre i mg
+        vengono ripartiti per ogni peptide componente secondo batch_composition.
+
+        Args:
+            start_date: Data inizio (YYYY-MM-DD), None = inizio storico
+            end_date:   Data fine   (YYYY-MM-DD), None = oggi
+
+        Returns:
+            {
+              'by_peptide': [
+                  {
+                      'peptide_id': int,
+                      'peptide_name': str,
+                      'total_mg': float,
+                      'preparations_count': int,
+                      'is_blend_component': bool,
+                  }, ...
+              ],
+              'by_batch': [
+                  {
+                      'batch_id': int,
+                      'product_name': str,
+                      'vials_used': int,
+                      'is_blend': bool,
+                      'components': [{'peptide_name': str, 'mg_per_vial': float}, ...]
+                  }, ...
+              ],
+              'period': {'start': str|None, 'end': str|None},
+            }
+        """
+        cursor = self.conn.cursor()
+
+        date_filter = "pr.deleted_at IS NULL"
+        params = []
+        if start_date:
+            date_filter += " AND pr.preparation_date >= ?"
+            params.append(start_date)
+        if end_date:
+            date_filter += " AND pr.preparation_date <= ?"
+            params.append(end_date)
+
+        # --- mg per peptide (corretto anche per blend: usa bc.mg_per_vial) ---
+        cursor.execute(f"""
+            SELECT
+                p.id                                        AS peptide_id,
+                p.name                                      AS peptide_name,
+                SUM(pr.vials_used * bc.mg_per_vial)        AS total_mg,
+                COUNT(DISTINCT pr.id)                       AS preparations_count,
+                MAX(CASE WHEN blend.n_peptides > 1 THEN 1 ELSE 0 END) AS is_blend_component
+            FROM preparations pr
+            JOIN batches b ON b.id = pr.batch_id
+            JOIN batch_composition bc ON bc.batch_id = b.id
+            JOIN peptides p ON p.id = bc.peptide_id
+            JOIN (
+                SELECT batch_id, COUNT(*) AS n_peptides
+                FROM batch_composition
+                GROUP BY batch_id
+            ) blend ON blend.batch_id = b.id
+            WHERE {date_filter}
+            GROUP BY p.id, p.name
+            ORDER BY total_mg DESC
+        """, params)
+        by_peptide = [
+            {
+                'peptide_id': row[0],
+                'peptide_name': row[1],
+                'total_mg': round(float(row[2]), 2),
+                'preparations_count': row[3],
+                'is_blend_component': bool(row[4]),
+            }
+            for row in cursor.fetchall()
+        ]
+
+        # --- fiale fisiche per batch (deduplicato, non moltiplicate per blend) ---
+        cursor.execute(f"""
+            SELECT
+                b.id                        AS batch_id,
+                b.product_name              AS product_name,
+                SUM(pr.vials_used)          AS vials_used,
+                blend.n_peptides > 1        AS is_blend
+            FROM preparations pr
+            JOIN batches b ON b.id = pr.batch_id
+            JOIN (
+                SELECT batch_id, COUNT(*) AS n_peptides
+                FROM batch_composition
+                GROUP BY batch_id
+            ) blend ON blend.batch_id = b.id
+            WHERE {date_filter}
+            GROUP BY b.id, b.product_name, is_blend
+            ORDER BY vials_used DESC
+        """, params)
+        batch_rows = cursor.fetchall()
+
+        # Arricchisce con i componenti per ogni batch
+        by_batch = []
+        for row in batch_rows:
+            batch_id, product_name, vials_used, is_blend = row
+            cursor.execute("""
+                SELECT p.name, bc.mg_per_vial
+                FROM batch_composition bc
+                JOIN peptides p ON p.id = bc.peptide_id
+                WHERE bc.batch_id = ?
+                ORDER BY p.name
+            """, (batch_id,))
+            components = [
+                {'peptide_name': r[0], 'mg_per_vial': r[1]}
+                for r in cursor.fetchall()
+            ]
+            by_batch.append({
+                'batch_id': batch_id,
+                'product_name': product_name,
+                'vials_used': vials_used,
+                'is_blend': bool(is_blend),
+                'components': components,
+            })
+
+        return {
+            'by_peptide': by_peptide,
+            'by_batch': by_batch,
+            'period': {'start': start_date, 'end': end_date},
+        }
+
+    # ==================== PREPARATIONS (MIGRATO ✅) ====================
+    
+    def get_preparations(
+        self,
+        batch_id: int = None,
+        only_active: bool = False
+    ) -> List[Dict]:
+        """
+        Recupera preparazioni (usa nuova architettura).
+        
+        Args:
+            batch_id: Filtra per batch specifico
+            only_active: Solo preparazioni con volume rimanente > 0
+            
+        Returns:
+            Lista di dict (compatibile con vecchia interfaccia)
+        """
+        preparations = self.db.preparations.get_all(
+            batch_id=batch_id,
+            only_active=only_active
+        )
+        
+        # Arricchisci con informazioni batch per compatibilità GUI
+        result = []
+        for p in preparations:
+            prep_dict = p.to_dict()
+            
+            # Aggiungi info batch
+            batch = self.db.batches.get_by_id(p.batch_id)
+            if batch:
+                prep_dict['batch_product'] = batch.product_name
+                prep_dict['batch_number'] = batch.batch_number
+                prep_dict['supplier_id'] = batch.supplier_id
+            else:
+                prep_dict['batch_product'] = 'N/A'
+                prep_dict['batch_number'] = 'N/A'
+                prep_dict['supplier_id'] = None
+            
+            result.append(prep_dict)
+        
+        return result
+    
+    def add_preparation(
+        self,
+        batch_id: int,
+        vials_used: int,
+        volume_ml: float,
+        preparation_date: str = None,
+        diluent: str = 'BAC Water',
+        expiry_date: str = None,
+        storage_location: str = None,
+        notes: str = None
+    ) -> int:
+        """
+        Aggiunge preparazione (usa nuova architettura).
+        
+        Args:
+            batch_id: ID batch
+            vials_used: Numero fiale usate
+            volume_ml: Volume totale ml
+            preparation_date: Data preparazione (YYYY-MM-DD), default oggi
+            diluent: Tipo diluente
+            expiry_date: Data scadenza (opzionale)
+            storage_location: Posizione conservazione
+            notes: Note
+            
+        Returns:
+            ID preparazione creata
+        """
+        from datetime import date
+        from .models.preparation import Preparation
+        from decimal import Decimal
+        
+        preparation = Preparation(
+            batch_id=batch_id,
+            vials_used=vials_used,
+            volume_ml=Decimal(str(volume_ml)),
+            diluent=diluent,
+            preparation_date=date.fromisoformat(preparation_date) if preparation_date else None,
+            expiry_date=date.fromisoformat(expiry_date) if expiry_date else None,
+            storage_location=storage_location,
+            notes=notes
+        )
+        
+        prep_id = self.db.preparations.create(preparation)
+        return prep_id
+    
+    def update_preparation(self, prep_id: int, **kwargs) -> bool:
+        """
+        Aggiorna preparazione (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione
+            **kwargs: Campi da aggiornare
+            
+        Returns:
+            True se aggiornato
+        """
+        preparation = self.db.preparations.get_by_id(prep_id)
+        if not preparation:
+            return False
+        
+        # Aggiorna campi permessi
+        allowed_fields = {
+            'volume_remaining_ml': lambda v: Decimal(str(v)),
+            'expiry_date': lambda v: date.fromisoformat(v) if v and isinstance(v, str) else v,
+            'storage_location': lambda v: v,
+            'notes': lambda v: v,
+            'diluent': lambda v: v
+        }
+        
+        from datetime import date
+        from decimal import Decimal
+        
+        for key, value in kwargs.items():
+            if key in allowed_fields:
+                converter = allowed_fields[key]
+                setattr(preparation, key, converter(value))
+        
+        return self.db.preparations.update(preparation)
+    
+    def soft_delete_preparation(self, prep_id: int, restore_vials: bool = False) -> bool:
+        """
+        Elimina preparazione (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione
+            restore_vials: Se True, ripristina fiale al batch
+            
+        Returns:
+            True se eliminato
+        """
+        success, message = self.db.preparations.delete(
+            prep_id,
+            force=False,
+            restore_vials=restore_vials
+        )
+        return success
+
+    def discard_preparation(
+        self,
+        prep_id: int,
+        reason: str = 'other',
+        notes: str = None
+    ) -> tuple:
+        """
+        Scarta una preparazione (la butta via) mantenendola nello storico.
+
+        A differenza dell'eliminazione, la fiala NON torna al batch: la
+        preparazione era reale, la fiala e' gia stata consumata. Il volume
+        residuo viene registrato come spreco.
+
+        Returns:
+            Tuple (successo, messaggio)
+        """
+        return self.db.preparations.discard_preparation(prep_id, reason, notes)
+
+    def discard_vials(
+        self,
+        batch_id: int,
+        count: int,
+        reason: str = None,
+        notes: str = None
+    ) -> tuple:
+        """
+        Scarta fiale liofilizzate da un batch (es. difettose o non conformi).
+
+        Riduce le fiale disponibili e registra il motivo in nota.
+
+        Returns:
+            Tuple (successo, messaggio)
+        """
+        return self.db.batches.discard_vials(batch_id, count, reason, notes)
+    
+    def get_preparation_details(self, prep_id: int) -> Optional[Dict]:
+        """
+        Recupera dettagli preparazione con informazioni batch (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione
+            
+        Returns:
+            Dict con dettagli completi o None
+        """
+        preparation = self.db.preparations.get_by_id(prep_id)
+        if not preparation:
+            return None
+        
+        result = preparation.to_dict()
+        
+        # Converti Decimal in float per compatibilità GUI
+        from decimal import Decimal
+        for key, value in result.items():
+            if isinstance(value, Decimal):
+                result[key] = float(value)
+        
+        # Aggiungi informazioni batch (JOIN)
+        batch = self.db.batches.get_by_id(preparation.batch_id)
+        if batch:
+            result['batch_product'] = batch.product_name
+            result['product_name'] = batch.product_name  # Alias per compatibilità GUI
+            result['batch_number'] = batch.batch_number
+            result['batch_supplier_id'] = batch.supplier_id
+            
+            # Calcola concentrazione se abbiamo mg_per_vial
+            if batch.mg_per_vial and preparation.volume_ml:
+                total_mg = float(batch.mg_per_vial) * preparation.vials_used
+                concentration = total_mg / float(preparation.volume_ml)
+                result['concentration_mg_ml'] = concentration
+            
+            # Aggiungi composizione peptidi dal batch (defensive keys)
+            compositions = self.db.batch_composition.get_peptides_in_batch(preparation.batch_id)
+            result['peptides'] = []
+            for comp in compositions:
+                peptide_name = comp.get('peptide_name') or comp.get('name') or comp.get('peptide_id')
+                # mg may be stored as 'mg_per_vial' or 'mg_amount'
+                mg_value = None
+                if comp.get('mg_per_vial') is not None:
+                    mg_value = comp.get('mg_per_vial')
+                elif comp.get('mg_amount') is not None:
+                    mg_value = comp.get('mg_amount')
+
+                try:
+                    mg_float = float(mg_value) if mg_value is not None else 0.0
+                except Exception:
+                    mg_float = 0.0
+
+                result['peptides'].append({
+                    'peptide_id': comp.get('peptide_id'),
+                    'name': peptide_name,
+                    'mg_per_vial': mg_float
+                })
+        
+        # Conta somministrazioni per questa preparazione
+        admin_count = self.db.conn.execute(
+            'SELECT COUNT(*) FROM administrations WHERE preparation_id = ? AND deleted_at IS NULL',
+            (prep_id,)
+        ).fetchone()[0]
+        result['administrations_count'] = admin_count
+        
+        return result
+    
+    def use_preparation(
+        self,
+        prep_id: int,
+        ml_used: float,
+        administration_datetime: str = None,
+        injection_site: str = None,
+        notes: str = None,
+        protocol_id: int = None,
+        injection_method: str = None,
+        side_effects: str = None
+    ) -> bool:
+        """
+        Usa volume da preparazione (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione
+            ml_used: ML da usare
+            administration_datetime: Data/ora somministrazione
+            injection_site: Sito iniezione
+            notes: Note
+            protocol_id: ID protocollo (opzionale)
+            injection_method: Metodo iniezione (compatibilità)
+            side_effects: Effetti collaterali (compatibilità)
+            
+        Returns:
+            True se successo
+        """
+        success, message = self.db.preparations.use_volume(prep_id, ml_used)
+        
+        if not success:
+            return False
+        
+        # TODO: Quando migri administrations, crea record qui
+        # if administration_datetime:
+        #     self.db.administrations.create(...)
+        
+        return True
+    
+    def record_wastage(
+        self,
+        prep_id: int,
+        volume_ml: float,
+        reason: str = 'spillage',
+        notes: str = None
+    ) -> tuple:
+        """
+        Registra spreco su preparazione (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione
+            volume_ml: Volume sprecato in ml
+            reason: Motivo (measurement_error, spillage, contamination, other)
+            notes: Note aggiuntive
+            
+        Returns:
+            Tuple (successo, messaggio)
+        """
+        return self.db.preparations.record_wastage(prep_id, volume_ml, reason, notes)
+    
+    def get_wastage_history(self, prep_id: int) -> List[Dict]:
+        """
+        Recupera lo storico sprechi di una preparazione.
+
+        Legge i record reali da `preparation_events`: ogni voce ha un `id`
+        proprio, quindi e' correggibile via update_wastage_event() e
+        cancellabile via delete_wastage_event().
+
+        Args:
+            prep_id: ID preparazione
+
+        Returns:
+            Lista di dict con: id, date, volume_ml, reason, notes
+        """
+        events = self.db.preparation_events.get_by_preparation(prep_id)
+
+        return [
+            {
+                'id': e.id,
+                'date': e.event_date.isoformat(),
+                'volume_ml': float(e.volume_ml),
+                'reason': e.reason or 'other',
+                'notes': e.notes,
+                'event_type': e.event_type,
+            }
+            for e in events
+        ]
+
+    def update_wastage_event(
+        self,
+        event_id: int,
+        volume_ml: float = None,
+        event_date: str = None,
+        reason: str = None,
+        notes: str = None
+    ) -> tuple:
+        """
+        Corregge uno spreco gia' registrato.
+
+        Il volume rimanente della preparazione viene riallineato
+        automaticamente (e lo status con lui).
+
+        Returns:
+            Tuple (successo, messaggio)
+        """
+        return self.db.preparations.update_wastage_event(
+            event_id, volume_ml, event_date, reason, notes
+        )
+
+    def delete_wastage_event(self, event_id: int) -> tuple:
+        """
+        Annulla uno spreco registrato per errore.
+
+        Il volume torna disponibile e la preparazione, se era stata
+        marcata esaurita da questo spreco, torna attiva.
+
+        Returns:
+            Tuple (successo, messaggio)
+        """
+        return self.db.preparations.delete_wastage_event(event_id)
+
+    def get_preparation_timeline(self, prep_id: int) -> List[Dict]:
+        """
+        Storia completa di una preparazione, in ordine cronologico.
+
+        Unifica in un'unica lista: creazione, somministrazioni, sprechi ed
+        esaurimento, cosi' da poter ricostruire come si e' consumato il volume.
+
+        Ogni voce ha:
+            date, kind ('creation'|'administration'|'wastage'|'depletion'),
+            volume_ml (delta sul rimanente, negativo per i consumi),
+            balance_ml (volume rimanente dopo l'evento),
+            label, notes, editable (True solo per gli sprechi),
+            id (ID del record sottostante, per gli eventi modificabili)
+
+        Args:
+            prep_id: ID preparazione
+
+        Returns:
+            Lista di voci ordinate per data
+        """
+        prep = self.db.preparations.get_by_id(prep_id)
+        if not prep:
+            return []
+
+        entries = [{
+            'date': prep.preparation_date.isoformat() if prep.preparation_date else '',
+            'kind': 'creation',
+            'volume_ml': float(prep.volume_ml),
+            'label': f"Preparazione creata — {float(prep.volume_ml):.2f} ml",
+            'notes': prep.notes,
+            'editable': False,
+            'id': prep.id,
+        }]
+
+        rows = self.db.conn.execute(
+            'SELECT id, dose_ml, administration_datetime, injection_site, notes '
+            'FROM administrations '
+            'WHERE preparation_id = ? AND deleted_at IS NULL '
+            'ORDER BY administration_datetime ASC',
+            (prep_id,)
+        ).fetchall()
+
+        for row in rows:
+            when = (row['administration_datetime'] or '')[:10]
+            site = row['injection_site']
+            entries.append({
+                'date': when,
+                'kind': 'administration',
+                'volume_ml': -float(row['dose_ml']),
+                'label': f"Somministrazione — {float(row['dose_ml']):.2f} ml"
+                         + (f" ({site})" if site else ""),
+                'notes': row['notes'],
+                'editable': False,
+                'id': row['id'],
+            })
+
+        # Su una preparazione scartata l'evento di chiusura E' lo scarto: gli
+        # sprechi parziali precedenti restano 'wastage' e non sono toccati
+        discarded = prep.status == 'discarded'
+        for event in self.db.preparation_events.get_by_preparation(prep_id):
+            is_depletion = event.event_type == 'depletion'
+            if is_depletion and discarded:
+                verb, kind = "Scarto", 'discard'
+            elif is_depletion:
+                verb, kind = "Esaurimento", 'depletion'
+            else:
+                verb, kind = "Spreco", 'wastage'
+            entries.append({
+                'date': event.event_date.isoformat(),
+                'kind': kind,
+                'volume_ml': -float(event.volume_ml),
+                'label': verb
+                         + f" — {float(event.volume_ml):.2f} ml"
+                         + f" ({WASTAGE_REASON_LABELS.get(event.reason, event.reason or '-')})",
+                'notes': event.notes,
+                'reason_code': event.reason,
+                'editable': True,
+                'id': event.id,
+            })
+
+        # 'creation' per prima a parita' di data: e' l'evento che apre la storia
+        entries.sort(key=lambda e: (e['date'], 0 if e['kind'] == 'creation' else 1))
+
+        balance = 0.0
+        for entry in entries:
+            balance = round(balance + entry['volume_ml'], 2)
+            entry['balance_ml'] = balance
+
+        # Scarto tra il rimanente ricostruito e quello registrato: volume
+        # consumato senza lasciare traccia (o dosi registrate in eccesso).
+        # Lo mostriamo invece di correggerlo in silenzio.
+        unaccounted = round(balance - float(prep.volume_remaining_ml), 2)
+        if abs(unaccounted) > 0.01:
+            entries.append({
+                'date': '',
+                'kind': 'unaccounted',
+                'volume_ml': -unaccounted,
+                'balance_ml': float(prep.volume_remaining_ml),
+                'label': f"Non registrato — {abs(unaccounted):.2f} ml"
+                         + (" mancanti" if unaccounted > 0 else " in eccesso"),
+                'notes': "Differenza tra la storia ricostruita e il volume "
+                         "rimanente registrato.",
+                'editable': False,
+                'id': None,
+            })
+
+        return entries
+    
+    def reconcile_preparation_volumes(self, prep_id: int = None) -> Dict:
+        """
+        Riconcilia volumi preparazioni (usa nuova architettura).
+        
+        Args:
+            prep_id: ID preparazione specifica (None = tutte)
+            
+        Returns:
+            Dict con statistiche riconciliazione compatibile con GUI:
+            {
+                'checked': int,
+                'fixed': int,
+                'total_diff': float,
+                'details': [...]
+            }
+        """
+        cursor = self.conn.cursor()
+        
+        # Ottieni tutte le preparazioni da controllare
+        if prep_id:
+            cursor.execute('''
+                SELECT p.id, p.volume_ml, p.volume_remaining_ml, b.product_name
+                FROM preparations p
+                JOIN batches b ON p.batch_id = b.id
+                WHERE p.id = ? AND p.deleted_at IS NULL
+            ''', (prep_id,))
+        else:
+            cursor.execute('''
+                SELECT p.id, p.volume_ml, p.volume_remaining_ml, b.product_name
+                FROM preparations p
+                JOIN batches b ON p.batch_id = b.id
+                WHERE p.deleted_at IS NULL
+            ''')
+        
+        preparations = cursor.fetchall()
+        
+        checked = 0
+        fixed = 0
+        total_diff = 0.0
+        details = []
+        
+        for prep_id_item, volume_initial, volume_current, product_name in preparations:
+            checked += 1
+            
+            # Recupera wastage registrato per questa preparazione
+            cursor.execute('''
+                SELECT COALESCE(wastage_ml, 0), status
+                FROM preparations
+                WHERE id = ?
+            ''', (prep_id_item,))
+            
+            wastage_result = cursor.fetchone()
+            wastage_ml = wastage_result[0] if wastage_result else 0
+            prep_status = wastage_result[1] if wastage_result else 'active'
+            
+            # Calcola volume atteso basandosi sulle somministrazioni attive E wastage
+            cursor.execute('''
+                SELECT COALESCE(SUM(dose_ml), 0)
+                FROM administrations
+                WHERE preparation_id = ? AND deleted_at IS NULL
+            ''', (prep_id_item,))
+            
+            total_used = cursor.fetchone()[0]
+            volume_expected = volume_initial - total_used - wastage_ml
+            
+            # Se preparazione è depleted con wastage, il volume rimanente deve essere 0
+            if prep_status == 'depleted' and wastage_ml > 0:
+                volume_expected = 0.0
+            
+            # Arrotonda a 2 decimali per evitare errori floating point
+            volume_expected = round(volume_expected, 2)
+            volume_current = round(volume_current, 2)
+            
+            difference = volume_current - volume_expected
+            
+            # Se c'è una differenza significativa (> 0.01 ml = 1 centesimo di ml), correggi
+            if abs(difference) > 0.01:
+                fixed += 1
+                total_diff += abs(difference)
+                
+                # Aggiorna il volume (e status se necessario)
+                cursor.execute('''
+                    UPDATE preparations
+                    SET volume_remaining_ml = ?,
+                        status = CASE 
+                            WHEN ? <= 0 THEN 'depleted'
+                            ELSE status
+                        END
+                    WHERE id = ?
+                ''', (volume_expected, volume_expected, prep_id_item))
+                
+                details.append({
+                    'prep_id': prep_id_item,
+                    'product_name': product_name,
+                    'old_volume': volume_current,
+                    'new_volume': volume_expected,
+                    'difference': difference
+                })
+        
+        # Normalizza tutti i volumi a 2 decimali per eliminare errori floating point
+        cursor.execute('''
+            UPDATE preparations
+            SET volume_remaining_ml = ROUND(volume_remaining_ml, 2)
+            WHERE deleted_at IS NULL
+        ''')
+        
+        self.conn.commit()
+        
+        return {
+            'checked': checked,
+            'fixed': fixed,
+            'total_diff': total_diff,
+            'details': details
+        }
+    
+    # ==================== PROTOCOLS (MIGRATO ✅) ====================
+    
+    def get_protocols(self, active_only: bool = True) -> List[Dict]:
+        """
+        Recupera protocolli (usa nuova architettura).
+        
+        Args:
+            active_only: Solo protocolli attivi
+        
+        Returns:
+            Lista di dict (compatibile con vecchia interfaccia)
+        """
+        protocols = self.db.protocols.get_all(active_only=active_only)
+        result = []
+        
+        for p in protocols:
+            protocol_dict = p.to_dict()
+            
+            # Recupera peptidi e dosi per questo protocollo
+            cursor = self.conn.cursor()
+            peptides_info = cursor.execute('''
+                SELECT pep.name, pp.target_dose_mcg
+                FROM protocol_peptides pp
+                JOIN peptides pep ON pp.peptide_id = pep.id
+                WHERE pp.protocol_id = ?
+                ORDER BY pep.name
+            ''', (p.id,)).fetchall()
+            
+            # Aggiungi info peptidi formattate (es: "Ipamorelin 250mcg, BPC-157 500mcg")
+            if peptides_info:
+                peptides_str = ", ".join([f"{name} {int(dose)}mcg" for name, dose in peptides_info])
+                protocol_dict['peptides_display'] = peptides_str
+                # Prendi la prima dose come dose rappresentativa (per retrocompatibilità)
+                protocol_dict['first_dose_mcg'] = peptides_info[0][1]
+            else:
+                protocol_dict['peptides_display'] = "N/A"
+                protocol_dict['first_dose_mcg'] = None
+            
+            result.append(protocol_dict)
+        
+        return result
+    
+    def add_protocol(
+        self,
+        name: str,
+        frequency_per_day: int = 1,
+        days_on: int = None,
+        days_off: int = 0,
+        cycle_duration_weeks: int = None,
+        peptides: List = None,  # List[Tuple[str, float]] o List[Tuple[int, float]]
+        description: str = None,
+        notes: str = None
+    ) -> int:
+        """
+        Crea nuovo protocollo (usa nuova architettura).
+        
+        Args:
+            name: Nome protocollo
+            frequency_per_day: Frequenza al giorno
+            days_on: Giorni ON del ciclo
+            days_off: Giorni OFF del ciclo
+            cycle_duration_weeks: Durata ciclo in settimane
+            peptides: Lista di (peptide_name/id, target_dose_mcg)
+            description: Descrizione
+            notes: Note
+        
+        Returns:
+            ID protocollo creato
+        """
+        from .models.protocol import Protocol
+
+        protocol = Protocol(
+            name=name,
+            description=description,
+            frequency_per_day=frequency_per_day,
+            days_on=days_on,
+            days_off=days_off,
+            cycle_duration_weeks=cycle_duration_weeks,
+            notes=notes,
+            active=True
+        )
+        
+        protocol_id = self.db.protocols.create(protocol)
+        
+        # Aggiungi peptidi se specificati
+        if peptides:
+            for peptide_ref, target_dose_mcg in peptides:
+                # Se è una stringa, cerca il peptide per nome
+                if isinstance(peptide_ref, str):
+                    # Cerca peptide esistente
+                    all_peptides = self.db.peptides.get_all()
+                    peptide = next((p for p in all_peptides if p.name == peptide_ref), None)
+                    
+                    if not peptide:
+                        # Crea nuovo peptide se non esiste
+                        from .models import Peptide
+                        new_peptide = Peptide(name=peptide_ref)
+                        peptide_id = self.db.peptides.create(new_peptide)
+                    else:
+                        peptide_id = peptide.id
+                else:
+                    # Assume sia un ID
+                    peptide_id = peptide_ref
+                
+                # Aggiungi al protocollo
+                self.db.protocols.add_peptide_to_protocol(
+                    protocol_id,
+                    peptide_id,
+                    float(target_dose_mcg)
+                )
+        
+        return protocol_id
+    
+    def update_protocol(self, protocol_id: int, **kwargs) -> bool:
+        """
+        Aggiorna protocollo (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+            **kwargs: Campi da aggiornare
+        
+        Returns:
+            True se aggiornato
+        """
+        protocol = self.db.protocols.get_by_id(protocol_id)
+        if not protocol:
+            return False
+        
+        # Campi permessi
+        allowed_fields = {
+            'name': lambda v: v,
+            'description': lambda v: v,
+            'frequency_per_day': lambda v: int(v),
+            'days_on': lambda v: int(v) if v is not None else None,
+            'days_off': lambda v: int(v),
+            'cycle_duration_weeks': lambda v: int(v) if v is not None else None,
+            'notes': lambda v: v,
+            'active': lambda v: bool(v)
+        }
+        
+        from decimal import Decimal
+        
+        for key, value in kwargs.items():
+            if key in allowed_fields:
+                converter = allowed_fields[key]
+                setattr(protocol, key, converter(value))
+        
+        return self.db.protocols.update(protocol)
+    
+    def soft_delete_protocol(
+        self,
+        protocol_id: int,
+        unlink_administrations: bool = True
+    ) -> bool:
+        """
+        Elimina protocollo (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+            unlink_administrations: Se True, scollega amministrazioni
+        
+        Returns:
+            True se eliminato
+        """
+        success, message = self.db.protocols.delete(
+            protocol_id,
+            force=False,
+            unlink_administrations=unlink_administrations
+        )
+        return success
+    
+    def get_protocol_details(self, protocol_id: int) -> Optional[Dict]:
+        """
+        Recupera dettagli protocollo con peptidi e statistiche (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+        
+        Returns:
+            Dict con dettagli completi o None
+        """
+        protocol = self.db.protocols.get_by_id(protocol_id)
+        if not protocol:
+            return None
+        
+        result = protocol.to_dict()
+        
+        # Aggiungi peptidi
+        result['peptides'] = self.db.protocols.get_peptides_for_protocol(protocol_id)
+        
+        # Aggiungi statistiche
+        stats = self.db.protocols.get_statistics(protocol_id)
+        if stats:
+            result['administrations_count'] = stats['count']
+            result['first_administration'] = stats['first_date']
+            result['last_administration'] = stats['last_date']
+            result['total_ml_administered'] = stats['total_ml']
+        
+        return result
+    
+    def activate_protocol(self, protocol_id: int) -> bool:
+        """
+        Attiva protocollo (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+        
+        Returns:
+            True se attivato
+        """
+        success, message = self.db.protocols.activate(protocol_id)
+        return success
+    
+    def deactivate_protocol(self, protocol_id: int) -> bool:
+        """
+        Disattiva protocollo (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+        
+        Returns:
+            True se disattivato
+        """
+        success, message = self.db.protocols.deactivate(protocol_id)
+        return success
+    
+    def get_protocol_statistics(self, protocol_id: int) -> Dict:
+        """
+        Recupera statistiche protocollo (usa nuova architettura).
+        
+        Args:
+            protocol_id: ID protocollo
+        
+        Returns:
+            Dict con statistiche
+        """
+        stats = self.db.protocols.get_statistics(protocol_id)
+        return stats if stats else {}
+    
+    # ==================== ADMINISTRATIONS ====================
+    
+    def add_administration(
+        self,
+        preparation_id: int,
+        dose_ml: float,
+        administration_datetime: Optional[datetime] = None,
+        protocol_id: Optional[int] = None,
+        injection_site: Optional[str] = None,
+        injection_method: Optional[str] = None,
+        notes: Optional[str] = None,
+        side_effects: Optional[str] = None
+    ) -> int:
+        """
+        Registra una somministrazione di peptide.
+        
+        Args:
+            preparation_id: ID preparazione
+            dose_ml: Dose somministrata in ml
+            administration_datetime: Data/ora somministrazione (default: ora corrente)
+            protocol_id: ID protocollo opzionale
+            injection_site: Sito iniezione
+            injection_method: Metodo iniezione
+            notes: Note
+            side_effects: Effetti collaterali
+            
+        Returns:
+            ID somministrazione creata
+            
+        Raises:
+            ValueError: Se dati non validi o volume insufficiente
+        """
+        from .models.administration import Administration
+        
+        admin = Administration(
+            preparation_id=preparation_id,
+            dose_ml=dose_ml,
+            administration_datetime=administration_datetime or datetime.now(),
+            protocol_id=protocol_id,
+            injection_site=injection_site,
+            injection_method=injection_method,
+            notes=notes,
+            side_effects=side_effects
+        )
+        
+        return self.db.administrations.create(admin)
+    
+    def get_administration_by_id(self, admin_id: int) -> Optional[dict]:
+        """Recupera singola somministrazione per ID con dettagli completi."""
+        results = self.db.administrations.get_with_details(admin_id=admin_id)
+        return results[0] if results else None
+
+    def get_administrations(
+        self,
+        protocol_id: Optional[int] = None,
+        preparation_id: Optional[int] = None,
+        days_back: Optional[int] = None,
+        include_deleted: bool = False
+    ) -> list[dict]:
+        """
+        Recupera somministrazioni con dettagli completi.
+        
+        Args:
+            protocol_id: Filtra per protocollo
+            preparation_id: Filtra per preparazione
+            days_back: Filtra ultimi N giorni
+            include_deleted: Include eliminate
+            
+        Returns:
+            Lista di dict con dettagli somministrazioni
+        """
+        return self.db.administrations.get_with_details(
+            protocol_id=protocol_id,
+            preparation_id=preparation_id,
+            days_back=days_back,
+            include_deleted=include_deleted
+        )
+    
+    def update_administration(
+        self,
+        admin_id: int,
+        protocol_id: Optional[int] = None,
+        administration_datetime: Optional[datetime] = None,
+        injection_site: Optional[str] = None,
+        injection_method: Optional[str] = None,
+        notes: Optional[str] = None,
+        side_effects: Optional[str] = None,
+        dose_ml: Optional[float] = None,
+        preparation_id: Optional[int] = None
+    ) -> bool:
+        """
+        Aggiorna somministrazione esistente.
+        
+        Args:
+            admin_id: ID somministrazione
+            protocol_id: Nuovo ID protocollo
+            administration_datetime: Nuova data/ora
+            injection_site: Nuovo sito iniezione
+            injection_method: Nuovo metodo iniezione
+            notes: Nuove note
+            side_effects: Nuovi effetti collaterali
+            dose_ml: Nuova dose in ml (aggiorna anche volume preparazione)
+            preparation_id: Nuova preparazione
+            
+        Returns:
+            True se aggiornato con successo
+        """
+        from decimal import Decimal
+        
+        # Recupera somministrazione esistente
+        admin = self.db.administrations.get_by_id(admin_id)
+        if not admin:
+            raise ValueError(f"Somministrazione #{admin_id} non trovata")
+        
+        old_dose_ml = float(admin.dose_ml) if admin.dose_ml else 0.0
+        old_prep_id = admin.preparation_id
+        
+        # Gestione cambio dose_ml - aggiorna volume preparazione
+        if dose_ml is not None and abs(dose_ml - old_dose_ml) > 0.0001:
+            dose_diff = dose_ml - old_dose_ml  # positivo = più volume usato
+            
+            # Prima prova a usare la preparazione originale
+            prep = self.db.preparations.get_by_id(admin.preparation_id)
+            
+            if prep and dose_diff > 0:
+                # Prova a scalare dalla preparazione originale
+                available = float(prep.volume_remaining_ml) if prep.volume_remaining_ml else 0
+                
+                if available >= dose_diff:
+                    # C'è abbastanza volume nella prep originale
+                    new_remaining = available - dose_diff
+                    cursor = self.conn.cursor()
+                    cursor.execute(
+                        'UPDATE preparations SET volume_remaining_ml = ? WHERE id = ?',
+                        (round(new_remaining, 4), prep.id)
+                    )
+                    self.conn.commit()
+                    admin.dose_ml = Decimal(str(dose_ml))
+                else:
+                    # Volume insufficiente nella prep originale, cerca altre preparazioni (FIFO)
+                    batch_id = prep.batch_id
+                    
+                    # Cerca altre preparazioni disponibili dello stesso peptide (stesso batch)
+                    if batch_id:
+                        other_preps = self.db.preparations.get_all()
+                        # Filtra per stesso batch, con volume disponibile, non eliminata
+                        available_preps = [
+                            p for p in other_preps 
+                            if p.id != prep.id and 
+                            p.batch_id == batch_id and 
+                            p.volume_remaining_ml and 
+                            float(p.volume_remaining_ml) > 0 and
+                            p.deleted_at is None
+                        ]
+                        # Ordina per data preparazione (FIFO)
+                        available_preps.sort(key=lambda x: x.preparation_date or '')
+                        
+                        remaining_diff = dose_diff - available
+                        new_admin_ids = []
+                        
+                        # Prima riduci a 0 la prep originale
+                        cursor = self.conn.cursor()
+                        cursor.execute(
+                            'UPDATE preparations SET volume_remaining_ml = 0 WHERE id = ?',
+                            (prep.id,)
+                        )
+                        
+                        # Poi usa le altre preparazioni
+                        for other_prep in available_preps:
+                            if remaining_diff <= 0:
+                                break
+                            other_available = float(other_prep.volume_remaining_ml)
+                            use_from_this = min(other_available, remaining_diff)
+                            
+                            cursor.execute(
+                                'UPDATE preparations SET volume_remaining_ml = ? WHERE id = ?',
+                                (round(other_available - use_from_this, 4), other_prep.id)
+                            )
+                            
+                            # Crea una nuova somministrazione per questa prep
+                            new_admin = type(admin)(
+                                preparation_id=other_prep.id,
+                                dose_ml=round(use_from_this, 4),
+                                administration_datetime=admin.administration_datetime,
+                                protocol_id=admin.protocol_id,
+                                injection_site=admin.injection_site,
+                                injection_method=admin.injection_method,
+                                notes=f"Multi-prep (aggiunto da modifica)",
+                                side_effects=admin.side_effects
+                            )
+                            new_admin_id = self.db.administrations.create(new_admin)
+                            new_admin_ids.append(new_admin_id)
+                            
+                            remaining_diff -= use_from_this
+                        
+                        self.conn.commit()
+                        
+                        if remaining_diff > 0.001:
+                            raise ValueError(f"Volume insufficiente anche cercando altre preparazioni. Mancano: {remaining_diff:.2f}ml")
+                    
+                    admin.dose_ml = Decimal(str(dose_ml))
+            elif prep and dose_diff < 0:
+                # Dose diminuita, restituisci volume alla prep
+                new_remaining = float(prep.volume_remaining_ml) + abs(dose_diff)
+                cursor = self.conn.cursor()
+                cursor.execute(
+                    'UPDATE preparations SET volume_remaining_ml = ? WHERE id = ?',
+                    (round(new_remaining, 4), prep.id)
+                )
+                self.conn.commit()
+                admin.dose_ml = Decimal(str(dose_ml))
+        
+        # Gestione cambio preparazione
+        if preparation_id is not None and preparation_id != old_prep_id:
+            admin.preparation_id = preparation_id
+        
+        # Aggiorna altri campi specificati
+        if protocol_id is not None:
+            admin.protocol_id = protocol_id
+        if administration_datetime is not None:
+            admin.administration_datetime = administration_datetime
+        if injection_site is not None:
+            admin.injection_site = injection_site
+        if injection_method is not None:
+            admin.injection_method = injection_method
+        if notes is not None:
+            admin.notes = notes
+        if side_effects is not None:
+            admin.side_effects = side_effects
+        
+        return self.db.administrations.update(admin)
+    
+    def soft_delete_administration(
+        self,
+        admin_id: int,
+        restore_volume: bool = False
+    ) -> tuple[bool, str]:
+        """
+        Elimina somministrazione (soft delete).
+        
+        Args:
+            admin_id: ID somministrazione
+            restore_volume: Se True, ripristina volume alla preparazione
+            
+        Returns:
+            (success: bool, message: str)
+        """
+        return self.db.administrations.delete(
+            admin_id=admin_id,
+            force=False,
+            restore_volume=restore_volume
+        )
+    
+    def delete_administration(
+        self,
+        admin_id: int,
+        restore_volume: bool = False
+    ) -> tuple[bool, str]:
+        """
+        Alias per soft_delete_administration (backward compatibility).
+        """
+        return self.soft_delete_administration(admin_id, restore_volume)
+    
+    def calculate_multi_prep_distribution(
+        self,
+        required_ml: float,
+        available_preps: list
+    ) -> tuple[bool, list, str]:
+        """
+        Calcola distribuzione dose su più preparazioni (FIFO per scadenza).
+        
+        Args:
+            required_ml: Volume richiesto (ml)
+            available_preps: Lista preparazioni disponibili (dict con id, remaining_volume_ml, expiry_date)
+        
+        Returns:
+            (success, distribution, message)
+            - success: bool se distribuzione possibile
+            - distribution: lista [{'prep_id': int, 'volume_ml': float}, ...]
+            - message: messaggio esplicativo
+        """
+        from decimal import Decimal
+        return self.db.administrations.calculate_multi_prep_distribution(
+            Decimal(str(required_ml)),
+            available_preps
+        )
+    
+    def create_multi_prep_administration(
+        self,
+        distribution: list,
+        protocol_id: int,
+        administration_datetime: str,
+        injection_site: str,
+        injection_method: str,
+        notes: str = None,
+        side_effects: str = None,
+        cycle_id: int = None
+    ) -> tuple[bool, str]:
+        """
+        Crea somministrazione multi-preparazione (transazionale).
+        
+        Args:
+            distribution: Lista [{'prep_id': int, 'ml': float}, ...] (output di calculate_multi_prep_distribution)
+            protocol_id: ID protocollo
+            administration_datetime: Data/ora somministrazione (ISO format)
+            injection_site: Sito iniezione
+            injection_method: Metodo iniezione
+            notes: Note opzionali
+            side_effects: Effetti collaterali
+            cycle_id: ID ciclo (opzionale)
+        
+        Returns:
+            (success, admin_ids, message) - admin_ids è la lista degli ID creati
+        """
+        from decimal import Decimal
+        import sys
+        print(f"[DEBUG] Chiamata create_multi_prep_administration:", file=sys.stderr)
+        print(f"  distribution: {distribution}", file=sys.stderr)
+        print(f"  protocol_id: {protocol_id}", file=sys.stderr)
+        print(f"  administration_datetime: {administration_datetime}", file=sys.stderr)
+        print(f"  injection_site: {injection_site}", file=sys.stderr)
+        print(f"  injection_method: {injection_method}", file=sys.stderr)
+        print(f"  notes: {notes}", file=sys.stderr)
+        print(f"  side_effects: {side_effects}", file=sys.stderr)
+        print(f"  cycle_id: {cycle_id}", file=sys.stderr)
+        
+        distribution_decimal = [
+            {'prep_id': d['prep_id'], 'ml': Decimal(str(d['ml']))}
+            for d in distribution
+        ]
+        print(f"[DEBUG] distribution_decimal: {distribution_decimal}", file=sys.stderr)
+        
+        success, admin_ids, message = self.db.administrations.create_multi_prep_administration(
+            distribution=distribution_decimal,
+            protocol_id=protocol_id,
+            administration_datetime=administration_datetime,
+            injection_site=injection_site,
+            injection_method=injection_method,
+            notes=notes,
+            side_effects=side_effects,
+            cycle_id=cycle_id
+        )
+        print(f"[DEBUG] Risultato backend: success={success}, admin_ids={admin_ids}, message={message}", file=sys.stderr)
+        
+        return success, admin_ids, message
+    
+    def get_all_administrations_df(self):
+        """
+        Recupera tutte le somministrazioni come DataFrame.
+        
+        Returns:
+            pandas.DataFrame con tutte le somministrazioni
+        """
+        import pandas as pd
+        from datetime import datetime
+        
+        administrations = self.db.administrations.get_with_details()
+        
+        if not administrations:
+            # DataFrame vuoto con colonne corrette
+            return pd.DataFrame(columns=[
+                'id', 'preparation_id', 'preparation_display', 'protocol_id', 'protocol_name',
+                'administration_datetime', 'dose_ml', 'dose_mcg', 'date',
+                'injection_site', 'injection_method', 'notes', 'side_effects',
+                'batch_product', 'peptide_names'
+            ])
+        
+        df = pd.DataFrame(administrations)
+        
+        # Aggiungi colonna date (solo data senza ora)
+        # Usa format='mixed' per gestire datetime con/senza microsecondi
+        df['date'] = pd.to_datetime(df['administration_datetime'], format='mixed').dt.date
+        
+        # Aggiungi colonna time (solo ora senza data)
+        df['time'] = pd.to_datetime(df['administration_datetime'], format='mixed').dt.time
+        
+        # Calcola dose_mcg: devo recuperare mg_per_vial dalla preparazione
+        # Per ora uso una stima basata su batch_product (TODO: migliorare)
+        # Assumo dose_ml * concentrazione_tipica (es. 1mg/ml = 1000mcg/ml)
+        # La GUI legacy usava preparazione con mg totali / volume
+        # Per compatibility, calcolo da preparations
+        df['dose_mcg'] = df.apply(lambda row: self._calculate_dose_mcg(
+            row['preparation_id'], row['dose_ml']
+        ), axis=1)
+        
+        # Aggiungi colonna preparation_display con info leggibili
+        df['preparation_display'] = df.apply(lambda row: self._format_preparation_display(
+            row['preparation_id']
+        ), axis=1)
+        
+        return df
+    
+    def _calculate_dose_mcg(self, preparation_id: int, dose_ml: float) -> float:
+        """
+        Calcola dose in microgrammi per una somministrazione.
+        
+        Args:
+            preparation_id: ID preparazione
+            dose_ml: Dose in millilitri
+            
+        Returns:
+            Dose in microgrammi
+        """
+        try:
+            # Recupera preparazione per calcolare concentrazione
+            prep = self.db.preparations.get_by_id(preparation_id)
+            if not prep:
+                return 0.0
+            
+            # Recupera batch per mg_per_vial
+            batch = self.db.batches.get_by_id(prep.batch_id)
+            if not batch or not batch.mg_per_vial:
+                return 0.0
+            
+            # Calcola concentrazione: (mg_per_vial * vials_used) / volume_ml
+            total_mg = float(batch.mg_per_vial) * prep.vials_used
+            concentration_mg_per_ml = total_mg / float(prep.volume_ml)
+            
+            # Dose in mcg = dose_ml * concentration_mg_per_ml * 1000
+            dose_mcg = dose_ml * concentration_mg_per_ml * 1000
+            
+            return float(dose_mcg)
+        except Exception:
+            return 0.0
+    
+    def _format_preparation_display(self, preparation_id: int) -> str:
+        """
+        Formatta informazioni preparazione per visualizzazione.
+        
+        Args:
+            preparation_id: ID preparazione
+            
+        Returns:
+            Stringa formattata (es: "Prep #10: 2.5mg/ml")
+        """
+        try:
+            prep = self.db.preparations.get_by_id(preparation_id)
+            if not prep:
+                return f"Prep #{preparation_id}"
+            
+            batch = self.db.batches.get_by_id(prep.batch_id)
+            if not batch or not batch.mg_per_vial:
+                return f"Prep #{prep.id}"
+            
+            # Calcola concentrazione
+            total_mg = float(batch.mg_per_vial) * prep.vials_used
+            concentration = total_mg / float(prep.volume_ml)
+            
+            return f"Prep #{prep.id}: {concentration:.1f}mg/ml"
+        except Exception:
+            return f"Prep #{preparation_id}"
+
+    def get_peptide_history_report(self, peptide_id: int,
+                                    date_from=None, date_to=None) -> dict:
+        """
+        Raccoglie dati storici per un peptide specifico.
+
+        Returns:
+            {
+              'peptide': {'id', 'name'},
+              'administrations': [{'date', 'dose_ml', 'dose_mcg', 'cycle_id', 'cycle_name'}],
+              'cycles': [{'id', 'name', 'start_date', 'end_date', 'status',
+                          'days_on', 'days_off', 'weekdays'}],
+              'stats': {'total_admin', 'total_ml', 'total_mcg',
+                        'first_date', 'last_date', 'cycle_count'}
+            }
+        """
+        from datetime import date as _date
+        import json
+
+        # 1. Peptide info
+        pep_name = f"Peptide #{peptide_id}"
+        try:
+            for p in (self.get_peptides() or []):
+                if p.get('id') == peptide_id:
+                    pep_name = p.get('name', pep_name)
+                    break
+        except Exception:
+            pass
+
+        # 2. Administrations via SQL join (calcola dose_mcg inline)
+        q = """
+            SELECT a.id, a.administration_datetime, a.dose_ml, a.cycle_id,
+                   a.dose_ml
+                   * (COALESCE(bc.mg_per_vial, bc.mg_amount, 0) * prep.vials_used
+                      / MAX(prep.volume_ml, 0.001))
+                   * 1000.0 AS dose_mcg
+            FROM administrations a
+            JOIN preparations prep ON a.preparation_id = prep.id
+            JOIN batch_composition bc
+                 ON prep.batch_id = bc.batch_id AND bc.peptide_id = ?
+            WHERE a.deleted_at IS NULL
+        """
+        params = [peptide_id]
+        if date_from:
+            q += " AND DATE(a.administration_datetime) >= ?"
+            params.append(str(date_from)[:10])
+        if date_to:
+            q += " AND DATE(a.administration_datetime) <= ?"
+            params.append(str(date_to)[:10])
+        q += " ORDER BY a.administration_datetime ASC"
+
+        cur = self.db.conn.cursor()
+        cur.execute(q, params)
+        rows = cur.fetchall()
+
+        admins = []
+        seen_cycle_ids = set()
+        for row in rows:
+            r = dict(row)
+            dt = str(r.get('administration_datetime', '') or '')
+            admins.append({
+                'date': dt[:10],
+                'dose_ml': float(r.get('dose_ml') or 0),
+                'dose_mcg': float(r.get('dose_mcg') or 0),
+                'cycle_id': r.get('cycle_id'),
+                'cycle_name': '—',
+            })
+            if r.get('cycle_id'):
+                seen_cycle_ids.add(r['cycle_id'])
+
+        # 3. Cycles containing this peptide (all, regardless of date filter)
+        all_cycles = self.get_cycles(active_only=False)
+        cycles_out = []
+        for c in all_cycles:
+            snap = c.get('protocol_snapshot') or {}
+            pep_list = snap.get('peptides', [])
+            pep_entry = next((p for p in pep_list if p.get('peptide_id') == peptide_id), None)
+            if pep_entry is None and c.get('id') not in seen_cycle_ids:
+                continue
+            start = c.get('start_date')
+            end = c.get('actual_end_date') or c.get('planned_end_date')
+            cycles_out.append({
+                'id': c.get('id'),
+                'name': c.get('name', f"Ciclo #{c['id']}"),
+                'start_date': str(start)[:10] if start else None,
+                'end_date': str(end)[:10] if end else None,
+                'status': c.get('status', ''),
+                'days_on': c.get('days_on'),
+                'days_off': c.get('days_off') or 0,
+                'weekdays': pep_entry.get('weekdays') if pep_entry else None,
+            })
+
+        # Assign cycle names to admins
+        cname_map = {c['id']: c['name'] for c in cycles_out}
+        for a in admins:
+            a['cycle_name'] = cname_map.get(a['cycle_id'], '—')
+
+        total_ml = sum(a['dose_ml'] for a in admins)
+        total_mcg = sum(a['dose_mcg'] for a in admins)
+        dates = [a['date'] for a in admins if a['date']]
+
+        return {
+            'peptide': {'id': peptide_id, 'name': pep_name},
+            'administrations': admins,
+            'cycles': cycles_out,
+            'stats': {
+                'total_admin': len(admins),
+                'total_ml': total_ml,
+                'total_mcg': total_mcg,
+                'first_date': min(dates) if dates else None,
+                'last_date': max(dates) if dates else None,
+                'cycle_count': len(cycles_out),
+            },
+        }
+
+    def get_schedule(self, start_date, end_date) -> list[dict]:
+        """
+        Dosi previste dai cicli attivi in [start_date, end_date].
+
+        Legge la cache materializzata (peptide_manager/schedule_cache.py);
+        fuori orizzonte o con cache indietro calcola in memoria.
+
+        Args:
+            start_date, end_date: `datetime.date` o stringa ISO (YYYY-MM-DD)
+
+        Returns:
+            Lista di dict: date, cycle_id, cycle_name, peptide_id,
+            peptide_name, dose_index, dose_mcg, status ('planned' | 'done')
+        """
+        from datetime import date
+
+        if isinstance(start_date, str):
+            start_date = date.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        return self.db.schedule_cache.get_range(start_date, end_date)
+
+    def sync_schedule_cache(self):
+        """Riallinea la cache dello schedule (nuovo giorno, modifiche esterne)."""
+        return self.db.schedule_cache.sync()
+
+    def set_schedule_horizon(self, days: int):
+        """Giorni coperti dalla cache dello schedule (default 60)."""
+        return self.db.schedule_cache.set_horizon(days)
+
+    def refresh_today_snapshot(self, target_date=None) -> list[dict]:
+        """
+        Come get_scheduled_administrations, aggiornando lo snapshot della
+        CLI "oggi" se esiste (vedi peptide_manager/today.py).
+        """
+        from .today import refresh_snapshot
+        return refresh_snapshot(self, target_date)
+
+    def get_scheduled_administrations(self, target_date=None) -> list[dict]:
+        """
+        Recupera le somministrazioni DA FARE oggi basandosi sui cicli attivi e schedule.
+        
+        **WORKFLOW FLESSIBILE**: 
+        - Calcola quando è PREVISTA la prossima dose basandosi su ultima somministrazione
+        - Mostra dosi previste per oggi + dosi in ritardo
+        - Permette all'utente di somministrare fuori schedule (sistema si adatta)
+
+        Args:
+            target_date: `datetime.date` o stringa ISO (YYYY-MM-DD). Se None usa oggi.
+
+        Returns:
+            Lista di dict con chiavi:
+            - peptide_id: ID peptide
+            - peptide_name: Nome peptide
+            - target_dose_mcg: Dose target in mcg (dal protocollo ciclo)
+            - suggested_dose_ml: Dose suggerita in ml (calcolata da prep disponibile)
+            - preparation_id: ID preparazione suggerita (None se non disponibile)
+            - preparation: Dettagli preparazione
+            - protocol_name: Nome protocollo
+            - cycle_id: ID ciclo
+            - cycle_name: Nome ciclo
+            - status: 'ready' | 'no_prep'
+            - schedule_status: 'due_today' | 'overdue' | 'future' | 'completed'
+            - next_due_date: Data prossima dose prevista (None se oggi)
+            - days_overdue: Giorni di ritardo (0 se in orario)
+        """
+        from datetime import date, datetime, timedelta
+        import json
+
+        if target_date is None:
+            target_date = date.today()
+        elif isinstance(target_date, str):
+            target_date = date.fromisoformat(target_date)
+
+        # 1. Recupera TUTTE le somministrazioni del database (per calcolare schedule)
+        all_admins = self.db.administrations.get_with_details(include_deleted=False)
+        
+        # Mappa: (cycle_id, peptide_id) -> ultima somministrazione
+        last_admin_map = {}
+        completed_today_count: dict = {}  # (cycle_id, peptide_id) -> n. somministrazioni oggi
+        
+        for a in all_admins:
+            adm_dt = a.get('administration_datetime')
+            cycle_id = a.get('cycle_id')
+            
+            if adm_dt is None:
+                continue
+
+            # Normalize to datetime
+            if isinstance(adm_dt, str):
+                try:
+                    adm_dt_obj = datetime.fromisoformat(adm_dt)
+                except Exception:
+                    try:
+                        adm_dt_obj = datetime.strptime(adm_dt, '%Y-%m-%d %H:%M:%S')
+                    except Exception:
+                        continue
+            else:
+                adm_dt_obj = adm_dt
+
+            adm_date = adm_dt_obj.date()
+            
+            # Trova peptidi in questa somministrazione
+            prep = self.get_preparation_details(a.get('preparation_id'))
+            if prep and prep.get('peptides'):
+                for pep_comp in prep['peptides']:
+                    peptide_id = pep_comp['peptide_id']
+                    key = (cycle_id, peptide_id) if cycle_id else (None, peptide_id)
+                    
+                    # Aggiorna ultima somministrazione per questo peptide/ciclo
+                    if key not in last_admin_map or adm_date > last_admin_map[key]['date']:
+                        last_admin_map[key] = {
+                            'date': adm_date,
+                            'datetime': adm_dt_obj
+                        }
+                    
+                    # Se somministrazione oggi, incrementa contatore
+                    if adm_date == target_date and cycle_id:
+                        completed_today_count[key] = completed_today_count.get(key, 0) + 1
+
+        # 2. Recupera cicli attivi e genera schedule
+        to_do = []
+        try:
+            active_cycles = self.get_cycles(active_only=False)
+            active_cycles = [c for c in active_cycles if c.get('status') == 'active']
+        except Exception:
+            return to_do
+        
+        for cycle in active_cycles:
+            cycle_id = cycle.get('id')
+            cycle_name = cycle.get('name', f'Ciclo #{cycle_id}')
+            protocol_snapshot = cycle.get('protocol_snapshot')
+            
+            if not protocol_snapshot:
+                continue
+            
+            # Parse JSON snapshot (gestisce doppia codifica: json.dumps su una stringa già JSON)
+            if isinstance(protocol_snapshot, str):
+                try:
+                    proto = json.loads(protocol_snapshot)
+                    if isinstance(proto, str):
+                        proto = json.loads(proto)
+                except Exception:
+                    continue
+            else:
+                proto = protocol_snapshot
+
+            if not isinstance(proto, dict):
+                continue
+            
+            # Estrai parametri schedule dal ciclo (fonte autoritativa — l'utente può
+            # aver modificato days_on/days_off dopo la creazione), con fallback
+            # allo snapshot del protocollo se il ciclo non li definisce.
+            frequency_per_day = proto.get('frequency_per_day') or proto.get('daily_frequency', 1)
+            days_on = cycle.get('days_on') if cycle.get('days_on') is not None else proto.get('days_on')
+            _days_off_raw = cycle.get('days_off')
+            days_off = _days_off_raw if _days_off_raw is not None else proto.get('days_off', 0)
+
+            # Calcola intervallo tra dosi (in giorni)
+            if days_on is not None and days_on > 0:
+                # Pattern ON/OFF: cycle_length = giorni_on + giorni_off
+                # days_off=0 significa somministrazione giornaliera (no pausa)
+                cycle_length = days_on + (days_off or 0)
+            elif frequency_per_day and frequency_per_day >= 1:
+                # Frequenza giornaliera: dose ogni giorno
+                cycle_length = 1
+            else:
+                # Default settimanale
+                cycle_length = 7
+            
+            # Estrai peptidi dal protocollo
+            peptides = proto.get('peptides', [])
+            custom_doses = proto.get('custom_doses', {})
+            
+            for pep in peptides:
+                peptide_id = pep.get('peptide_id')
+                peptide_name = pep.get('name') or pep.get('peptide_name', f'Peptide #{peptide_id}')
+                key = (cycle_id, peptide_id)
+                
+                # Frequenza e weekdays per-peptide (fallback al valore di fase)
+                pep_frequency = pep.get('daily_frequency', frequency_per_day)
+                pep_weekdays = pep.get('weekdays')
+                if pep_weekdays is not None and target_date.weekday() not in pep_weekdays:
+                    continue
+
+                # Skip se tutte le dosi giornaliere sono già state somministrate
+                done_today = completed_today_count.get(key, 0)
+                if done_today >= pep_frequency:
+                    continue
+                
+                # Dose target (base, senza ramp)
+                if custom_doses and str(peptide_id) in custom_doses:
+                    target_dose_mcg = float(custom_doses[str(peptide_id)])
+                else:
+                    target_dose_mcg = float(
+                        pep.get('target_dose_mcg') or pep.get('dose_mcg', 0)
+                    )
+                
+                # Applica ramp-up se configurato
+                ramp_percentage = 1.0  # Default 100%
+                current_week = 1
+                ramp_info = None
+                
+                if cycle.get('ramp_schedule'):
+                    from .models.cycle import Cycle
+                    # Crea oggetto Cycle temporaneo per usare helper
+                    cycle_obj = Cycle(
+                        start_date=date.fromisoformat(cycle['start_date']) if cycle.get('start_date') and isinstance(cycle['start_date'], str) else cycle.get('start_date'),
+                        ramp_schedule=cycle.get('ramp_schedule')
+                    )
+                    current_week = cycle_obj.get_current_week(target_date)
+                    
+                    # Try to get exact dose first (new format)
+                    exact_dose = cycle_obj.get_ramp_dose(peptide_id, target_date)
+                    if exact_dose is not None:
+                        # Use exact dose from ramp schedule
+                        ramped_dose_mcg = exact_dose
+                        ramp_info = {
+                            'week': current_week,
+                            'dose_mcg': exact_dose,
+                            'type': 'exact'
+                        }
+                    else:
+                        # Fallback to percentage (legacy)
+                        ramp_percentage = cycle_obj.get_ramp_percentage(target_date)
+                        ramped_dose_mcg = target_dose_mcg * ramp_percentage
+                        ramp_info = {
+                            'week': current_week,
+                            'percentage': int(ramp_percentage * 100),
+                            'type': 'percentage'
+                        }
+                else:
+                    # No ramp schedule
+                    ramped_dose_mcg = target_dose_mcg
+                
+                # Schedule ancorato a start_date (non rolling dall'ultima somm).
+                # La dose è prevista ogni cycle_length giorni a partire da start_date.
+                # Se la settimana scorsa è stata fatta in ritardo, la prossima scadenza
+                # ricade comunque al periodo regolare — non si sposta.
+                last_admin = last_admin_map.get(key)
+                schedule_status = 'due_today'
+                next_due_date = None
+                days_overdue = 0
+
+                cycle_start_raw = cycle.get('start_date')
+                if cycle_start_raw:
+                    if isinstance(cycle_start_raw, str):
+                        cycle_start = date.fromisoformat(cycle_start_raw)
+                    else:
+                        cycle_start = cycle_start_raw
+                else:
+                    cycle_start = None
+
+                # Gestione pausa/ripresa: ricomincia il conteggio periodi dalla
+                # data di ripresa se il ciclo è stato messo in pausa.
+                resumed_raw = cycle.get('resumed_at')
+                if resumed_raw:
+                    if isinstance(resumed_raw, str):
+                        anchor = date.fromisoformat(resumed_raw[:10])
+                    else:
+                        anchor = resumed_raw
+                else:
+                    anchor = cycle_start
+
+                if anchor is None or target_date < anchor:
+                    schedule_status = 'future'
+                    next_due_date = anchor
+                else:
+                    elapsed = (target_date - anchor).days
+                    period_index = elapsed // cycle_length
+                    period_start = anchor + timedelta(days=period_index * cycle_length)
+                    day_in_period = elapsed % cycle_length
+
+                    if day_in_period < days_on:
+                        # Siamo in un giorno ON: dose prevista oggi.
+                        # "Già fatto oggi" è gestito da completed_today sopra.
+                        schedule_status = 'due_today'
+                        next_due_date = target_date
+                        days_overdue = 0
+                    else:
+                        # Giorni OFF: skip se almeno una dose è stata fatta
+                        # durante il periodo ON corrente, altrimenti in ritardo.
+                        if last_admin and last_admin['date'] >= period_start:
+                            continue
+                        schedule_status = 'overdue'
+                        next_due_date = period_start
+                        days_overdue = (target_date - period_start).days
+                
+                # Mostra solo dosi previste per oggi o in ritardo
+                if schedule_status not in ['due_today', 'overdue']:
+                    continue
+                
+                # MULTI-PREP FIFO: Combina tutte le preparazioni compatibili dello stesso peptide
+                # (anche da batch diversi) usando FIFO (più vecchie per prime)
+                multi_prep_distribution = []
+                status = 'no_prep'
+                suggested_dose_ml = 0.0
+                remaining_mcg = ramped_dose_mcg
+                
+                all_preps = self.get_preparations(only_active=True)
+                
+                # Ordina FIFO per data preparazione (più vecchie per prime)
+                sorted_preps = []
+                for prep in all_preps:
+                    prep_details = self.get_preparation_details(prep['id'])
+                    if prep_details:
+                        sorted_preps.append(prep_details)
+                
+                sorted_preps.sort(key=lambda p: (p.get('preparation_date', ''), p.get('id', 0)))
+                
+                # Cerca tutte le prep che contengono il peptide e distribuisci FIFO
+                for prep_details in sorted_preps:
+                    if remaining_mcg <= 0:
+                        break
+                    
+                    if not prep_details.get('peptides'):
+                        continue
+                    
+                    # Trova il peptide nella composizione (supporta sia singoli che blend)
+                    pep_comp = None
+                    for pc in prep_details['peptides']:
+                        if pc.get('peptide_id') == peptide_id:
+                            pep_comp = pc
+                            break
+                    
+                    if not pep_comp:
+                        continue
+                    
+                    # Calcola concentrazione e disponibilità
+                    # mg_per_vial è i mg PER FIALA, quindi moltiplica per vials_used per il totale
+                    mg_per_vial = pep_comp.get('mg_amount') or pep_comp.get('mg_per_vial') or 0
+                    vials_used = prep_details.get('vials_used', 1)
+                    total_mg = mg_per_vial * vials_used
+                    volume_ml = prep_details.get('volume_ml', 1)
+                    volume_remaining = prep_details.get('volume_remaining_ml', volume_ml)
+                    
+                    if volume_ml > 0 and total_mg > 0 and volume_remaining > 0.01:
+                        concentration_mcg_per_ml = (total_mg / volume_ml) * 1000
+                        available_mcg = concentration_mcg_per_ml * volume_remaining
+                        
+                        # Prendi quanto serve o quanto disponibile
+                        take_mcg = min(remaining_mcg, available_mcg)
+                        take_ml = take_mcg / concentration_mcg_per_ml
+                        
+                        multi_prep_distribution.append({
+                            'prep_id': prep_details['id'],
+                            'ml': take_ml,
+                            'mcg': take_mcg,
+                            'concentration_mcg_per_ml': concentration_mcg_per_ml,
+                            'prep_details': prep_details
+                        })
+                        
+                        remaining_mcg -= take_mcg
+                        suggested_dose_ml += take_ml
+                        status = 'ready'
+                
+                # Verifica se il volume disponibile è sufficiente
+                # Se remaining_mcg > 0.01 significa che non siamo riusciti a soddisfare la dose completa
+                if status == 'ready' and remaining_mcg > 0.01:
+                    status = 'insufficient_volume'
+                    # Calcola quanti ml servirebbero ancora (stima approssimativa)
+                    # Usiamo la concentrazione dell'ultima preparazione come riferimento
+                    if multi_prep_distribution:
+                        last_concentration = multi_prep_distribution[-1]['concentration_mcg_per_ml']
+                        missing_ml = remaining_mcg / last_concentration if last_concentration > 0 else 0
+                    else:
+                        missing_ml = 0
+                
+                base_entry = {
+                    'peptide_id': peptide_id,
+                    'peptide_name': peptide_name,
+                    'target_dose_mcg': target_dose_mcg,
+                    'ramped_dose_mcg': ramped_dose_mcg,
+                    'ramp_info': ramp_info,
+                    'suggested_dose_ml': suggested_dose_ml if status == 'ready' else None,
+                    'multi_prep_distribution': multi_prep_distribution,
+                    'multi_prep_ids': [d['prep_id'] for d in multi_prep_distribution],
+                    'preparation_id': multi_prep_distribution[0]['prep_id'] if multi_prep_distribution else None,
+                    'protocol_id': proto.get('id'),
+                    'protocol_name': proto.get('name'),
+                    'cycle_id': cycle_id,
+                    'cycle_name': cycle_name,
+                    'status': status,
+                    'schedule_status': schedule_status,
+                    'next_due_date': next_due_date,
+                    'days_overdue': days_overdue,
+                    'missing_mcg': remaining_mcg if status == 'insufficient_volume' else 0,
+                    'missing_ml': missing_ml if status == 'insufficient_volume' else 0,
+                    'available_mcg': ramped_dose_mcg - remaining_mcg,
+                    'available_ml': suggested_dose_ml,
+                    'daily_frequency': frequency_per_day,
+                }
+                for dose_num in range(done_today + 1, pep_frequency + 1):
+                    to_do.append({**base_entry, 'dose_number': dose_num, 'daily_frequency': pep_frequency})
+
+        # 3. Ordina: prima ritardi, poi previste oggi, poi per nome
+        to_do.sort(key=lambda x: (0 if x['schedule_status'] == 'overdue' else 1, x['peptide_name']))
+        
+        return to_do
+    
+    def link_administration_to_protocol(
+        self,
+        admin_id: int,
+        protocol_id: int
+    ) -> tuple[bool, str]:
+        """
+        Collega somministrazione a un protocollo.
+        
+        Args:
+            admin_id: ID somministrazione
+            protocol_id: ID protocollo
+            
+        Returns:
+            (success: bool, message: str)
+        """
+        return self.db.administrations.link_to_protocol(admin_id, protocol_id)
+    
+    def get_administration_statistics(
+        self,
+        protocol_id: Optional[int] = None
+    ) -> dict:
+        """
+        Calcola statistiche somministrazioni.
+        
+        Args:
+            protocol_id: ID protocollo (None = tutte)
+            
+        Returns:
+            Dict con statistiche
+        """
+        return self.db.administrations.get_statistics(protocol_id)
+    
+    # ==================== CYCLES (NUOVO) ====================
+
+    def start_cycle(
+        self,
+        protocol_id: int,
+        name: str = None,
+        start_date: str = None,
+        planned_end_date: str = None,
+        days_on: int = None,
+        days_off: int = 0,
+        cycle_duration_weeks: int = None,
+        ramp_schedule: list = None,
+        status: str = 'active',
+    ) -> int:
+        """
+        Avvia un nuovo cycle (istanza di trattamento) a partire da un protocol template.
+
+        Salva uno snapshot del protocol corrente e opzionalmente un ramp_schedule.
+        Returns the created cycle id.
+        """
+        from .models.cycle import Cycle, CycleRepository
+        from datetime import date
+
+        proto = self.get_protocol_details(protocol_id)
+        if not proto:
+            raise ValueError(f"Protocol #{protocol_id} non trovato")
+
+        # Build snapshot from protocol details
+        protocol_snapshot = proto
+
+        cycle = Cycle(
+            protocol_id=protocol_id,
+            name=name or f"Cycle for {proto.get('name')}",
+            description=proto.get('description'),
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            planned_end_date=date.fromisoformat(planned_end_date) if planned_end_date else None,
+            days_on=days_on if days_on is not None else proto.get('days_on'),
+            days_off=days_off if days_off is not None else proto.get('days_off', 0),
+            cycle_duration_weeks=cycle_duration_weeks if cycle_duration_weeks is not None else proto.get('cycle_duration_weeks'),
+            protocol_snapshot=protocol_snapshot,
+            ramp_schedule=ramp_schedule,
+            status=status,
+        )
+
+        repo = CycleRepository(self.conn)
+        cycle_id = repo.create(cycle)
+        return cycle_id
+
+    def get_cycles(self, active_only: bool = True) -> List[Dict]:
+        """Recupera cicli esistenti."""
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        return repo.get_all(active_only=active_only)
+
+    def get_cycle_details(self, cycle_id: int) -> Optional[Dict]:
+        """Recupera dettagli di un ciclo."""
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        return repo.get_by_id(cycle_id)
+
+    def update_cycle(self, cycle_id: int, **kwargs) -> bool:
+        """
+        Aggiorna un ciclo esistente.
+        
+        Args:
+            cycle_id: ID del ciclo
+            **kwargs: Campi da aggiornare (name, description, start_date, planned_end_date,
+                     days_on, days_off, cycle_duration_weeks, ramp_schedule, status)
+        
+        Returns:
+            True se aggiornato con successo
+        """
+        from .models.cycle import CycleRepository
+        
+        repo = CycleRepository(self.conn)
+        return repo.update(cycle_id, **kwargs)
+
+    def record_cycle_administration(self, cycle_id: int, administration_id: int) -> bool:
+        """Associa una somministrazione esistente a un ciclo."""
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        return repo.record_administration(cycle_id, administration_id)
+
+    def assign_administrations_to_cycle(self, admin_ids: list, cycle_id: int) -> int:
+        """Assegna retroattivamente somministrazioni esistenti a un ciclo."""
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        return repo.assign_administrations(admin_ids, cycle_id)
+
+    def update_cycle_ramp_schedule(self, cycle_id: int, ramp_schedule: list) -> bool:
+        """Aggiorna il ramp_schedule di un ciclo (wrapper su CycleRepository)."""
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        return repo.update_ramp_schedule(cycle_id, ramp_schedule)
+
+    def suggest_doses_from_inventory(self, cycle_id: int) -> Dict:
+        """Stub: suggerisce dosi possibili in base all'inventario per un ciclo.
+
+        Implementazione iniziale: ritorna struttura minimale. Verrà estesa con logica
+        di matching batch/preparations.
+        """
+        from decimal import Decimal, ROUND_FLOOR
+        from .models.cycle import CycleRepository
+
+        repo = CycleRepository(self.conn)
+        cycle = repo.get_by_id(cycle_id)
+        if not cycle:
+            raise ValueError(f"Cycle #{cycle_id} non trovato")
+
+        # Extract targets from protocol_snapshot if present, otherwise try to load protocol
+        targets = []
+        proto = cycle.get('protocol_snapshot') or {}
+        
+        # Check for custom_doses first (from personalized cycle creation)
+        custom_doses = {}
+        if proto and isinstance(proto, dict) and proto.get('custom_doses'):
+            custom_doses = proto.get('custom_doses', {})
+        
+        if proto and isinstance(proto, dict) and proto.get('peptides'):
+            for p in proto.get('peptides'):
+                peptide_id = p.get('peptide_id')
+                # Use custom dose if available, otherwise template dose
+                if custom_doses and str(peptide_id) in custom_doses:
+                    planned_mcg = Decimal(str(custom_doses[str(peptide_id)]))
+                else:
+                    planned_mcg = Decimal(str(p.get('target_dose_mcg') or 0))
+                
+                targets.append({
+                    'peptide_id': peptide_id,
+                    'name': p.get('name'),
+                    'planned_mcg': planned_mcg
+                })
+        else:
+            # Fallback to current protocol
+            if cycle.get('protocol_id'):
+                protocol = self.get_protocol_details(cycle['protocol_id'])
+                for p in protocol.get('peptides', []):
+                    targets.append({
+                        'peptide_id': p.get('peptide_id'),
+                        'name': p.get('name'),
+                        'planned_mcg': Decimal(str(p.get('target_dose_mcg') or 0))
+                    })
+
+        # Build a map for quick lookup of planned doses
+        target_map = {t['peptide_id']: t for t in targets}
+
+        # Compute available mcg per peptide from active preparations (reconstituted solutions)
+        available = {}
+        preps = self.db.preparations.get_all(only_active=True)
+        for prep in preps:
+            batch_id = prep.batch_id
+            vials_used = prep.vials_used
+            try:
+                volume_remaining = Decimal(str(prep.volume_remaining_ml))
+            except Exception:
+                volume_remaining = Decimal('0')
+
+            if volume_remaining <= 0:
+                continue
+
+            comps = self.db.batch_composition.get_by_batch(batch_id)
+            for comp in comps:
+                pid = comp.peptide_id
+                # BatchComposition dataclass usa mg_amount
+                mg_per_vial = comp.mg_amount
+                if mg_per_vial is None:
+                    continue
+
+                total_mg = Decimal(str(mg_per_vial)) * Decimal(str(vials_used))
+                try:
+                    conc_mg_ml = total_mg / Decimal(str(prep.volume_ml))
+                except Exception:
+                    conc_mg_ml = Decimal('0')
+
+                available_mcg = conc_mg_ml * volume_remaining * Decimal('1000')
+                available[pid] = available.get(pid, Decimal('0')) + available_mcg
+
+        # Compute available mcg per peptide from dry batches (vials)
+        mixes = []  # collect mix batches info to report dependencies
+        batches = self.db.batches.get_all(only_available=True)
+        for batch in batches:
+            if not getattr(batch, 'vials_remaining', 0):
+                continue
+
+            comps = self.db.batch_composition.get_by_batch(batch.id)
+            if not comps:
+                continue
+
+            # Record mix info if batch contains multiple peptides
+            if len(comps) > 1:
+                comp_entries = []
+                for comp in comps:
+                    pid = comp.peptide_id
+                    mg_per_vial = getattr(comp, 'mg_amount', None) or getattr(comp, 'mg_per_vial', None)
+                    comp_entries.append({
+                        'peptide_id': pid,
+                        'mg_per_vial': float(Decimal(str(mg_per_vial))) if mg_per_vial is not None else None
+                    })
+
+                # Determine if this mix maps to cycle targets; compute how many administrations
+                supported_admins = None
+                batch_peptide_ids = [c.peptide_id for c in comps]
+                if all(pid in target_map for pid in batch_peptide_ids):
+                    # For each peptide, compute how many admins the batch can support for that peptide
+                    per_pep_admins = []
+                    for comp in comps:
+                        pid = comp.peptide_id
+                        mg_per_vial = getattr(comp, 'mg_amount', None) or getattr(comp, 'mg_per_vial', None)
+                        if mg_per_vial is None:
+                            per_pep_admins.append(0)
+                            continue
+                        total_mcg = Decimal(str(mg_per_vial)) * Decimal(str(batch.vials_remaining)) * Decimal('1000')
+                        planned = target_map.get(pid, {}).get('planned_mcg') or Decimal('0')
+                        try:
+                            if planned <= 0:
+                                per_pep_admins.append(0)
+                            else:
+                                per_pep_admins.append((total_mcg / planned).to_integral_value(rounding=ROUND_FLOOR))
+                        except Exception:
+                            per_pep_admins.append(0)
+
+                    supported_admins = int(min(per_pep_admins)) if per_pep_admins else 0
+
+                mixes.append({
+                    'batch_id': batch.id,
+                    'product_name': getattr(batch, 'product_name', None),
+                    'vials_remaining': int(getattr(batch, 'vials_remaining', 0)),
+                    'composition': comp_entries,
+                    'supported_admins_for_cycle': supported_admins,
+                })
+
+            # Add batch contributions to availability per peptide
+            for comp in comps:
+                pid = comp.peptide_id
+                mg_per_vial = getattr(comp, 'mg_amount', None) or getattr(comp, 'mg_per_vial', None)
+                if mg_per_vial is None:
+                    continue
+
+                total_mg = Decimal(str(mg_per_vial)) * Decimal(str(batch.vials_remaining))
+                # convert mg -> mcg
+                total_mcg = total_mg * Decimal('1000')
+                available[pid] = available.get(pid, Decimal('0')) + total_mcg
+
+        # Build suggestion results
+        suggestions = {}
+        for t in targets:
+            pid = t['peptide_id']
+            planned = t.get('planned_mcg') or Decimal('0')
+            avail = available.get(pid, Decimal('0'))
+            # Find mixes that include this peptide
+            related_mixes = [m for m in mixes if any(c['peptide_id'] == pid for c in m['composition'])]
+
+            suggestions[pid] = {
+                'peptide_id': pid,
+                'name': t.get('name'),
+                'planned_mcg': float(planned),
+                'available_mcg': float(avail),
+                'can_meet_planned_today': float(avail) >= float(planned),
+                'mix_dependencies': related_mixes,
+            }
+
+        return {
+            'per_peptide': suggestions,
+            'mixes': mixes
+        }
+    
+    def delete_cycle(self, cycle_id: int) -> bool:
+        """Delete a cycle and unassign its administrations."""
+        from .models.cycle import CycleRepository
+        repo = CycleRepository(self.conn)
+        return repo.delete(cycle_id)
+
+    def update_cycle_status(self, cycle_id: int, new_status: str) -> bool:
+        """Update cycle status (planned, active, paused, completed, cancelled)."""
+        from .models.cycle import CycleRepository
+        repo = CycleRepository(self.conn)
+        return repo.update_status(cycle_id, new_status)
+    
+    def complete_cycle(self, cycle_id: int) -> bool:
+        """Mark cycle as completed with current date as actual_end_date."""
+        from .models.cycle import CycleRepository
+        repo = CycleRepository(self.conn)
+        result = repo.complete_cycle(cycle_id)
+        if result:
+            # Se il ciclo è collegato a una fase del piano, completa anche quella
+            cycle = repo.get_by_id(cycle_id)
+            plan_phase_id = cycle.get('plan_phase_id') if cycle else None
+            if plan_phase_id:
+                cur = self.conn.cursor()
+                cur.execute(
+                    "UPDATE plan_phases SET status = 'completed', actual_end_date = DATE('now'), "
+                    "updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'active'",
+                    (plan_phase_id,)
+                )
+                self.conn.commit()
+        return result
+    
+    def check_and_complete_expired_cycles(self) -> int:
+        """
+        Auto-complete cycles that have passed their planned_end_date.
+        Should be called periodically (e.g., on app startup or dashboard load).
+        Returns number of cycles auto-completed.
+        """
+        from .models.cycle import CycleRepository
+        repo = CycleRepository(self.conn)
+        return repo.check_and_complete_expired_cycles()
+    
+    # ==================== NON ANCORA MIGRATI (FALLBACK) ====================
+    
+    def check_data_integrity(self, *args, **kwargs):
+        """Delega al vecchio manager (TODO: migrare)."""
+        return self._get_old_manager().check_data_integrity(*args, **kwargs)
+
+
+# ==================== DOMINI CARICATI AL PRIMO USO ====================
+
+# Metodi dei domini poco usati (peptide_manager/domains/<dominio>.py): il
+# modulo viene importato al primo accesso a uno di questi attributi e i suoi
+# metodi sostituiscono i segnaposto sulla classe.
+_DOMAINS = {
+    'certificates': (
+        'add_certificate', 'get_certificates',
+    ),
+    'templates': (
+        'add_protocol_template', 'get_protocol_templates', 'get_protocol_template',
+        'update_protocol_template', 'delete_protocol_template',
+        'search_protocol_templates',
+    ),
+    'planner': (
+        'add_treatment_plan', 'get_treatment_plans', 'get_treatment_plan_basic',
+        'update_treatment_plan', 'pause_treatment_plan', 'resume_treatment_plan',
+        'complete_treatment_plan', 'abandon_treatment_plan', 'update_plan_adherence',
+        'increment_plan_days', 'link_preparation_to_plan', 'get_plan_preparations',
+        'create_treatment_plan', 'get_treatment_plan', 'list_treatment_plans',
+        'replace_plan_phases', 'delete_treatment_plan', 'activate_plan_phase',
+        'transition_to_next_phase', '_get_plan_phases_config',
+        'simulate_plan_scenarios', 'optimize_plan_purchase', 'get_order_calendar',
+        '_build_plan_requirements', 'update_all_plan_resources',
+        'update_plan_resources',
+    ),
+}
+
+
+class _DomainMethod:
+    """Segnaposto di un metodo di dominio: carica il dominio al primo accesso."""
+
+    def __init__(self, domain: str, name: str):
+        self.domain = domain
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        func = load_domain(self.domain)[self.name]
+        return func if obj is None else func.__get__(obj, objtype)
+
+
+def load_domain(domain: str) -> Dict:
+    """
+    Importa un dominio e ne installa i metodi su PeptideManager.
+
+    Returns:
+        Dict nome → funzione
+    """
+    import importlib
+
+    module = importlib.import_module(f'.domains.{domain}', __package__)
+    cls = getattr(module, f'{domain.capitalize()}Domain')
+    methods = {
+        name: value for name, value in vars(cls).items()
+        if callable(value) and not name.startswith('__')
+    }
+    for name, func in methods.items():
+        setattr(PeptideManager, name, func)
+    return methods
+
+
+for _domain, _names in _DOMAINS.items():
+    for _name in _names:
+        setattr(PeptideManager, _name, _DomainMethod(_domain, _name))
+del _domain, _names, _name
@@ -0,0 +1,429 @@
+"""
+Motore delle migration SQL (``migrations/*.sql``), condiviso da app e script.
+
+Ogni migration applicata è registrata in ``schema_migrations`` (come fa
+``migrations/migrate.py``). In più ``PRAGMA user_version`` contiene
+un'impronta dell'elenco delle migration note al codice: all'avvio una sola
+query confronta l'impronta e, se lo schema è aggiornato, non si fa altro.
+Solo se differisce si leggono le migration registrate e si applicano le
+mancanti, ognuna nella propria transazione.
+
+Database senza impronta (``user_version`` 0: creati dal vecchio
+``init_database``, che non registrava le migration, o aggiornati a mano da
+script come ``apply_critical_migrations.py``): le migration fino a
+``BASELINE`` sono considerate applicate, come faceva l'app, insieme a quelle
+già nel registro; si applicano solo le altre. Le migration che ricreano
+tabelle non vengono così rieseguite su dati esistenti.
+
+Usage:
+    Migrator(conn).migrate()              # app: database esistente
+    Migrator(conn).migrate(create=True)   # init_database: anche da vuoto
+"""
+
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+# Ultima migration applicata dal vecchio init_database alla creazione
+BASELINE = '024_add_preparation_events'
+
+# Errori tollerati: su database nuovo lo schema 001 contiene già colonne
+# aggiunte da migration successive (comportamento storico di init_database:
+# lo script si ferma al primo errore tollerato, lo schema generato in
+# migrations/schema/ dipende da questo); in aggiornamento solo le colonne già
+# presenti (come migrate.py), saltando il solo statement
+FRESH_TOLERATED = ('duplicate column', 'unique constraint', 'already exists', 'no such column')
+UPGRADE_TOLERATED = ('duplicate column',)
+
+# Schema base su database nuovo (le migration 001+ lo completano)
+_FRESH_PRELUDE = """
+    CREATE TABLE IF NOT EXISTS shipments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER NOT NULL,
+        shipping_cost REAL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        shipping_date DATE,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS suppliers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        country TEXT,
+        website TEXT,
+        email TEXT,
+        notes TEXT,
+        reliability_rating INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS peptides (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        common_uses TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER NOT NULL,
+        product_name TEXT NOT NULL,
+        batch_number TEXT,
+        vials_count INTEGER NOT NULL,
+        vials_received INTEGER DEFAULT NULL,
+        mg_per_vial REAL,
+        total_price REAL,
+        price_per_vial REAL,
+        currency TEXT DEFAULT 'EUR',
+        purchase_date DATE,
+        expiry_date DATE,
+        storage_location TEXT,
+        vials_remaining INTEGER NOT NULL DEFAULT 0,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL,
+        manufacturing_date DATE,
+        coa_path TEXT,
+        shipping_cost REAL,
+        shipment_id INTEGER REFERENCES shipments(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS batch_composition (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        peptide_id INTEGER NOT NULL,
+        mg_per_vial REAL NOT NULL,
+        mg_amount REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS certificates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        certificate_type TEXT NOT NULL,
+        lab_name TEXT,
+        test_date DATE,
+        file_path TEXT,
+        file_name TEXT,
+        purity_percentage REAL,
+        endotoxin_level TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS certificate_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        certificate_id INTEGER NOT NULL,
+        test_parameter TEXT NOT NULL,
+        result_value TEXT,
+        unit TEXT,
+        specification TEXT,
+        pass_fail TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS preparations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        vials_used INTEGER NOT NULL,
+        volume_ml REAL NOT NULL,
+        diluent TEXT DEFAULT 'BAC Water',
+        preparation_date DATE NOT NULL,
+        expiry_date DATE,
+        volume_remaining_ml REAL NOT NULL,
+        storage_location TEXT,
+        notes TEXT,
+        status TEXT DEFAULT 'available',
+        actual_depletion_date DATE,
+        wastage_ml REAL,
+        wastage_reason TEXT,
+        wastage_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS preparation_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        preparation_id INTEGER NOT NULL,
+        event_type TEXT NOT NULL DEFAULT 'wastage',
+        volume_ml REAL NOT NULL,
+        event_date DATE NOT NULL,
+        reason TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL,
+        FOREIGN KEY (preparation_id) REFERENCES preparations(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS protocols (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        dose_ml REAL NOT NULL,
+        frequency_per_day INTEGER DEFAULT 1,
+        days_on INTEGER,
+        days_off INTEGER DEFAULT 0,
+        cycle_duration_weeks INTEGER,
+        notes TEXT,
+        active INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS protocol_peptides (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        protocol_id INTEGER NOT NULL,
+        peptide_id INTEGER NOT NULL,
+        target_dose_mcg REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS administrations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        preparation_id INTEGER NOT NULL,
+        protocol_id INTEGER,
+        administration_datetime TIMESTAMP NOT NULL,
+        dose_ml REAL NOT NULL,
+        injection_site TEXT,
+        notes TEXT,
+        side_effects TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        injection_method TEXT,
+        deleted_at TIMESTAMP DEFAULT NULL
+    );
+"""
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    migration_name TEXT UNIQUE NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    description TEXT
+)
+"""
+
+# La transazione la apre il motore; FK gestite dal motore (OFF durante le migration)
+_STRIP = re.compile(
+    r'(?im)^\s*(BEGIN\s+TRANSACTION|BEGIN|COMMIT|PRAGMA\s+foreign_keys\s*=\s*\w+)\s*;'
+)
+
+
+def split_statements(sql: str) -> List[str]:
+    """Statement completi di uno script (trigger BEGIN ... END inclusi)."""
+    statements, current = [], ''
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ''
+    return statements
+
+
+def _resolve_dir(migrations_dir: Optional[Path]) -> Path:
+    if migrations_dir is None:
+        from .paths import get_migrations_dir
+        migrations_dir = get_migrations_dir()
+    return Path(migrations_dir)
+
+
+def migration_files(migrations_dir: Optional[Path] = None) -> List[Path]:
+    """File .sql in ordine di applicazione (alfabetico)."""
+    migrations_dir = _resolve_dir(migrations_dir)
+    if not migrations_dir.is_dir():
+        return []
+    return sorted(migrations_dir.glob('*.sql'))
+
+
+def fingerprint(files: List[Path]) -> int:
+    """Impronta (31 bit, mai 0) dell'elenco di migration, per ``user_version``."""
+    digest = hashlib.sha256('\n'.join(f.stem for f in files).encode()).digest()
+    return int.from_bytes(digest[:4], 'big') & 0x7FFFFFFF or 1
+
+
+def description_of(sql: str) -> Optional[str]:
+    """Primo commento del file (descrizione registrata in schema_migrations)."""
+    for line in sql.split('\n'):
+        if line.strip().startswith('--'):
+            return line.strip('- ').strip()
+    return None
+
+
+class MigrationError(Exception):
+    """Migration fallita (la sua transazione è stata annullata)."""
+
+
+class Migrator:
+    """Applica le migration mancanti a una connessione."""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        migrations_dir: Optional[Path] = None,
+        verbose: bool = True,
+    ):
+        self.conn = conn
+        self.migrations_dir = _resolve_dir(migrations_dir)
+        self.files = migration_files(self.migrations_dir)
+        self.fingerprint = fingerprint(self.files)
+        self.verbose = verbose
+
+    # ── Stato ───────────────────────────────────────────────────────
+
+    def state(self) -> Tuple[int, bool]:
+        """Una query: (user_version, database inizializzato)."""
+        version, initialized = self.conn.execute(
+            "SELECT user_version,"
+            " EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'suppliers')"
+            " FROM pragma_user_version"
+        ).fetchone()
+        return version, bool(initialized)
+
+    def is_current(self) -> bool:
+        return self.state()[0] == self.fingerprint
+
+    def applied(self) -> Set[str]:
+        """Migration registrate in ``schema_migrations``."""
+        try:
+            rows = self.conn.execute('SELECT migration_name FROM schema_migrations').fetchall()
+        except sqlite3.OperationalError:
+            return set()
+        return {row[0] for row in rows}
+
+    def plan(self) -> Tuple[bool, List[Path]]:
+        """
+        Returns:
+            (serve la baseline, migration da applicare in ordine)
+        """
+        version, initialized = self.state()
+        if not initialized:
+            return False, list(self.files)
+        applied = self.applied()
+        baseline = version == 0
+        if baseline:
+            applied |= {f.stem for f in self.files if f.stem <= BASELINE}
+        return baseline, [f for f in self.files if f.stem not in applied]
+
+    # ── Applicazione ────────────────────────────────────────────────
+
+    def _log(self, message: str, end: str = '\n'):
+        if self.verbose:
+            print(message, end=end, flush=True)
+
+    def apply(self, migration: Path, fresh: bool = False) -> bool:
+        """
+        Applica e registra una migration in una transazione.
+
+        Gli statement vengono eseguiti uno alla volta: un errore tollerato
+        (``UPGRADE_TOLERATED``, es. colonna già presente) salta solo quello
+        statement e gli altri vengono comunque eseguiti, così una migration
+        registrata è sempre arrivata in fondo. Con ``fresh`` (database appena
+        creato) vale ``FRESH_TOLERATED`` e, come il vecchio init_database,
+        lo script si ferma al primo errore tollerato.
+
+        Returns:
+            False se vuota (saltata)
+
+        Raises:
+            MigrationError: Errore non tollerato (transazione annullata)
+        """
+        sql = migration.read_text(encoding='utf-8')
+        self._log(f"  migration: {migration.name} ...", end=' ')
+        statements = split_statements(_STRIP.sub('', sql))
+        if not statements:
+            self._log('(empty, skipped)')
+            return False
+        tolerated = FRESH_TOLERATED if fresh else UPGRADE_TOLERATED
+        conn = self.conn
+        skipped = []
+        if conn.in_transaction:
+            conn.commit()  # come executescript
+        conn.execute('BEGIN')
+        try:
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except (sqlite3.OperationalError, sqlite3.IntegrityError) as e:
+                    # Errore tollerato solo se SQLite ha annullato il solo statement
+                    if not conn.in_transaction or not any(x in str(e).lower() for x in tolerated):
+                        raise
+                    skipped.append(str(e))
+                    if fresh:
+                        break
+            conn.execute(MIGRATIONS_TABLE)
+            conn.execute(
+                'INSERT OR IGNORE INTO schema_migrations (migration_name, description) '
+                'VALUES (?, ?)',
+                (migration.stem, description_of(sql)),
+            )
+        except (sqlite3.OperationalError, sqlite3.IntegrityError) as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._log(f'failed: {e}')
+            raise MigrationError(f"{migration.name}: {e}") from e
+        conn.commit()
+        self._log(f"ok (skipped: {'; '.join(skipped)})" if skipped else 'ok')
+        return True
+
+    def _baseline(self):
+        """Registra le migration fino a BASELINE senza eseguirle."""
+        self.conn.execute(MIGRATIONS_TABLE)
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO schema_migrations (migration_name, description) VALUES (?, ?)',
+            [(f.stem, 'baseline') for f in self.files if f.stem <= BASELINE],
+        )
+        # Unica migration che la vecchia app applicava a ogni avvio (021)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(cycles)')}
+        if columns and 'resumed_at' not in columns:
+            self.conn.execute('ALTER TABLE cycles ADD COLUMN resumed_at DATE')
+        self.conn.commit()
+
+    def migrate(self, create: bool = False, template: bool = True) -> List[str]:
+        """
+        Porta lo schema alla versione del codice.
+
+        Args:
+            create: Crea lo schema anche su un database vuoto (init_database).
+                Senza, un database non inizializzato resta com'è.
+            template: Database vuoto: copia lo schema finale generato
+                (peptide_manager/schema_template.py) invece di rigiocare
+                tutte le migration; si applicano solo quelle più recenti.
+
+        Returns:
+            Nomi delle migration applicate (vuoto se già aggiornato)
+
+        Raises:
+            MigrationError: Una migration è fallita (le precedenti restano)
+        """
+        version, initialized = self.state()
+        if version == self.fingerprint or not (initialized or create):
+            return []
+
+        fresh = not initialized
+        if fresh and template:
+            from .schema_template import copy_template
+            if copy_template(self.conn, self.migrations_dir):
+                return self.migrate()
+        baseline, pending = self.plan()
+        foreign_keys = self.conn.execute('PRAGMA foreign_keys').fetchone()[0]
+        # FK off durante le migration (ricreano tabelle): standard SQLite
+        self.conn.execute('PRAGMA foreign_keys = OFF')
+        applied = []
+        try:
+            if fresh:
+                self.conn.executescript(_FRESH_PRELUDE)
+            elif baseline:
+                self._baseline()
+            for migration in pending:
+                if self.apply(migration, fresh):
+                    applied.append(migration.stem)
+            self.conn.execute(f'PRAGMA user_version = {self.fingerprint}')
+            self.conn.commit()
+        finally:
+            self.conn.execute(f'PRAGMA foreign_keys = {"ON" if foreign_keys else "OFF"}')
+        return applied
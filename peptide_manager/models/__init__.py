@@ -1,49 +1,74 @@
 """
 Models package - espone tutte le classi modello e repository.
+
+Import al primo accesso (PEP 562): ``from peptide_manager.models import
+BatchRepository`` carica solo ``batch.py`` (e ``base.py``).
 """
 
-from .base import BaseModel, Repository
-from .supplier import Supplier, SupplierRepository
-from .peptide import Peptide, PeptideRepository
-from .batch import Batch, BatchRepository
-from .batch_composition import BatchComposition, BatchCompositionRepository
-from .preparation import Preparation, PreparationRepository
-from .preparation_event import PreparationEvent, PreparationEventRepository
-from .protocol import Protocol, ProtocolRepository
-from .administration import Administration, AdministrationRepository
-from .certificate import Certificate, CertificateDetail, CertificateRepository
-from .protocol_template import (
-    ProtocolTemplate,
-    ProtocolTemplateRepository,
-    ProtocolTemplatePeptide,
-    ProtocolTemplatePeptideRepository
-)
-from .treatment_plan import (
-    TreatmentPlan, 
-    TreatmentPlanRepository,
-    TreatmentPlanPreparation,
-    TreatmentPlanPreparationRepository
-)
-from .planner import (
-    PlanPhase,
-    PlanPhaseRepository,
-    ResourceRequirement,
-    ResourceRequirementRepository,
-    PlanSimulation,
-    PlanSimulationRepository
-)
-from .vendor_product import (
-    VendorProduct,
-    VendorProductRepository,
-    ConsumableDefault,
-    ConsumableDefaultRepository
-)
-from .shipment import Shipment, ShipmentRepository
-from .treatment_plan_template import (
-    TreatmentPlanTemplate,
-    TreatmentPlanTemplateRepository,
-    TemplateBuilder
-)
+
+# Nome esportato → sottomodulo
+_EXPORTS = {
+    'BaseModel': 'base',
+    'Repository': 'base',
+    'Supplier': 'supplier',
+    'SupplierRepository': 'supplier',
+    'Peptide': 'peptide',
+    'PeptideRepository': 'peptide',
+    'Batch': 'batch',
+    'BatchRepository': 'batch',
+    'BatchComposition': 'batch_composition',
+    'BatchCompositionRepository': 'batch_composition',
+    'Preparation': 'preparation',
+    'PreparationRepository': 'preparation',
+    'PreparationEvent': 'preparation_event',
+    'PreparationEventRepository': 'preparation_event',
+    'Protocol': 'protocol',
+    'ProtocolRepository': 'protocol',
+    'Administration': 'administration',
+    'AdministrationRepository': 'administration',
+    'Certificate': 'certificate',
+    'CertificateDetail': 'certificate',
+    'CertificateRepository': 'certificate',
+    'ProtocolTemplate': 'protocol_template',
+    'ProtocolTemplateRepository': 'protocol_template',
+    'ProtocolTemplatePeptide': 'protocol_template',
+    'ProtocolTemplatePeptideRepository': 'protocol_template',
+    'TreatmentPlan': 'treatment_plan',
+    'TreatmentPlanRepository': 'treatment_plan',
+    'TreatmentPlanPreparation': 'treatment_plan',
+    'TreatmentPlanPreparationRepository': 'treatment_plan',
+    'PlanPhase': 'planner',
+    'PlanPhaseRepository': 'planner',
+    'ResourceRequirement': 'planner',
+    'ResourceRequirementRepository': 'planner',
+    'PlanSimulation': 'planner',
+    'PlanSimulationRepository': 'planner',
+    'VendorProduct': 'vendor_product',
+    'VendorProductRepository': 'vendor_product',
+    'ConsumableDefault': 'vendor_product',
+    'ConsumableDefaultRepository': 'vendor_product',
+    'Shipment': 'shipment',
+    'ShipmentRepository': 'shipment',
+    'TreatmentPlanTemplate': 'treatment_plan_template',
+    'TreatmentPlanTemplateRepository': 'treatment_plan_template',
+    'TemplateBuilder': 'treatment_plan_template',
+}
+
+
+def __getattr__(name):
+    import importlib
+
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
 
 __all__ = [
     'BaseModel',
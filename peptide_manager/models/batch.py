@@ -128,38 +128,137 @@ class BatchRepository(Repository):
         Returns:
             Lista di Batch
         """
-        query = 'SELECT * FROM batches WHERE 1=1'
-        params = []
+        where, params = self._filter_clause(
+            search=search,
+            supplier_id=supplier_id,
+            include_deleted=include_deleted,
+            only_available=only_available,
+            only_depleted=only_depleted,
+            only_expired=only_expired,
+        )
+        query = f'SELECT * FROM batches WHERE {where}'
+        
+        query += ' ORDER BY product_name'
         
+        rows = self._fetch_all(query, tuple(params))
+        return [Batch.from_row(row) for row in rows]
+
+    @staticmethod
+    def _filter_clause(
+        search: Optional[str] = None,
+        supplier_id: Optional[int] = None,
+        include_deleted: bool = False,
+        only_available: bool = False,
+        only_depleted: bool = False,
+        only_expired: bool = False,
+        alias: str = '',
+    ) -> tuple:
+        """Condizione WHERE (e parametri) comune a get_all e get_summaries."""
+        col = f'{alias}.' if alias else ''
+        clauses = ['1=1']
+        params = []
+
         # Filtro soft delete
         if not include_deleted:
-            query += ' AND deleted_at IS NULL'
-        
+            clauses.append(f'{col}deleted_at IS NULL')
+
         # Filtro ricerca
         if search:
-            query += ' AND (product_name LIKE ? OR batch_number LIKE ?)'
+            clauses.append(f'({col}product_name LIKE ? OR {col}batch_number LIKE ?)')
             params.extend([f'%{search}%', f'%{search}%'])
-        
+
         # Filtro fornitore
         if supplier_id:
-            query += ' AND supplier_id = ?'
+            clauses.append(f'{col}supplier_id = ?')
             params.append(supplier_id)
-        
+
         # Filtro disponibilità
         if only_available:
-            query += ' AND vials_remaining > 0'
-        
+            clauses.append(f'{col}vials_remaining > 0')
+
         if only_depleted:
-            query += ' AND vials_remaining = 0'
-        
+            clauses.append(f'{col}vials_remaining = 0')
+
         # Filtro scadenza
         if only_expired:
-            query += ' AND expiry_date < DATE("now")'
-        
-        query += ' ORDER BY product_name'
-        
-        rows = self._fetch_all(query, tuple(params))
-        return [Batch.from_row(row) for row in rows]
+            clauses.append(f"{col}expiry_date < DATE('now')")
+
+        return ' AND '.join(clauses), params
+
+    def get_summaries(
+        self,
+        search: Optional[str] = None,
+        supplier_id: Optional[int] = None,
+        include_deleted: bool = False,
+        only_available: bool = False,
+        only_depleted: bool = False,
+        only_expired: bool = False
+    ) -> List[dict]:
+        """
+        Elenco batches per le liste GUI in una sola query.
+
+        Oltre alle colonne del batch include nome fornitore, peptidi della
+        composizione (ordinati per nome) e conteggio preparazioni, calcolati
+        per insiemi (CTE aggregate) invece che con una query per batch.
+
+        Args:
+            stessi filtri di get_all()
+
+        Returns:
+            Lista di dict: colonne batches + supplier_name, peptide_names,
+            preparations_count, active_preparations_count
+        """
+        where, params = self._filter_clause(
+            search=search,
+            supplier_id=supplier_id,
+            include_deleted=include_deleted,
+            only_available=only_available,
+            only_depleted=only_depleted,
+            only_expired=only_expired,
+            alias='b',
+        )
+        # GROUP_CONCAT segue l'ordine della subquery (ORDER BY dentro
+        # l'aggregato richiede SQLite 3.44)
+        query = f'''
+            WITH comp AS (
+                SELECT batch_id, GROUP_CONCAT(name, char(31)) AS peptide_names
+                FROM (
+                    SELECT bc.batch_id, p.name
+                    FROM batch_composition bc
+                    JOIN peptides p ON p.id = bc.peptide_id
+                    ORDER BY bc.batch_id, p.name
+                )
+                GROUP BY batch_id
+            ),
+            preps AS (
+                SELECT batch_id,
+                       COUNT(*) AS preparations_count,
+                       SUM(CASE WHEN volume_remaining_ml > 0 THEN 1 ELSE 0 END)
+                           AS active_preparations_count
+                FROM preparations
+                WHERE deleted_at IS NULL
+                GROUP BY batch_id
+            )
+            SELECT b.*,
+                   COALESCE(s.name, 'Sconosciuto') AS supplier_name,
+                   comp.peptide_names,
+                   COALESCE(preps.preparations_count, 0) AS preparations_count,
+                   COALESCE(preps.active_preparations_count, 0)
+                       AS active_preparations_count
+            FROM batches b
+            LEFT JOIN suppliers s ON s.id = b.supplier_id
+            LEFT JOIN comp ON comp.batch_id = b.id
+            LEFT JOIN preps ON preps.batch_id = b.id
+            WHERE {where}
+            ORDER BY b.product_name
+        '''
+        result = []
+        for row in self._fetch_all(query, tuple(params)):
+            data = dict(row)
+            names = data['peptide_names']
+            data['peptide_names'] = names.split(chr(31)) if names else []
+            result.append(data)
+        return result
     
     def get_by_id(self, batch_id: int, include_deleted: bool = False) -> Optional[Batch]:
         """
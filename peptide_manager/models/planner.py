@@ -680,6 +680,123 @@ class ResourceRequirementRepository(Repository):
         self.db.conn.commit()
         return True
 
+    # Colonne confrontate/scritte da sync_plan (oltre alla chiave)
+    _SYNC_COLUMNS = (
+        'plan_phase_id', 'quantity_needed', 'quantity_unit', 'quantity_available',
+        'quantity_gap', 'needs_ordering', 'order_by_week', 'estimated_cost',
+        'currency', 'calculation_params', 'notes',
+    )
+
+    @classmethod
+    def _sync_values(cls, requirement: ResourceRequirement) -> tuple:
+        """Valori di una riga nel formato salvato in plan_resources."""
+        def num(value):
+            return float(value) if value is not None else None
+
+        return (
+            requirement.plan_phase_id,
+            float(requirement.quantity_needed),
+            requirement.quantity_unit,
+            float(requirement.quantity_available),
+            num(requirement.quantity_gap),
+            1 if requirement.needs_ordering else 0,
+            requirement.order_by_week,
+            num(requirement.estimated_cost),
+            requirement.currency,
+            requirement.calculation_params,
+            requirement.notes,
+        )
+
+    def sync_plan(
+        self,
+        treatment_plan_id: int,
+        requirements: List[ResourceRequirement],
+        commit: bool = True
+    ) -> Dict[str, int]:
+        """
+        Allinea i requisiti salvati di un piano al nuovo set calcolato.
+
+        Confronta le righe esistenti con quelle nuove per chiave
+        (resource_type, resource_id, resource_name) e applica insert, update
+        e delete con executemany in un'unica transazione. Le righe invariate
+        non vengono toccate.
+
+        Args:
+            treatment_plan_id: ID del piano
+            requirements: Nuovo set di requisiti
+            commit: Se False lascia la transazione aperta al chiamante
+                (ricalcolo batch di più piani)
+
+        Returns:
+            Dict con conteggi 'inserted', 'updated', 'deleted', 'unchanged'
+        """
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            "SELECT id, resource_type, resource_id, resource_name, "
+            + ", ".join(self._SYNC_COLUMNS)
+            + " FROM plan_resources WHERE treatment_plan_id = ? ORDER BY id",
+            (treatment_plan_id,)
+        )
+        existing: Dict[tuple, tuple] = {}
+        to_delete: List[tuple] = []
+        for row in cursor.fetchall():
+            key = (row[1], row[2], row[3])
+            if key in existing:
+                to_delete.append((row[0],))  # duplicato: tieni il primo
+            else:
+                existing[key] = (row[0], tuple(row[4:]))
+
+        to_insert: List[tuple] = []
+        to_update: List[tuple] = []
+        seen = set()
+        unchanged = 0
+        for req in requirements:
+            key = (req.resource_type, req.resource_id, req.resource_name)
+            if key in seen:
+                continue
+            seen.add(key)
+            values = self._sync_values(req)
+            current = existing.get(key)
+            if current is None:
+                to_insert.append((treatment_plan_id,) + key + values)
+            elif current[1] != values:
+                to_update.append(values + (current[0],))
+            else:
+                unchanged += 1
+        to_delete.extend((row_id,) for key, (row_id, _) in existing.items() if key not in seen)
+
+        assignments = ", ".join(f"{col} = ?" for col in self._SYNC_COLUMNS)
+        try:
+            if to_delete:
+                cursor.executemany("DELETE FROM plan_resources WHERE id = ?", to_delete)
+            if to_update:
+                cursor.executemany(
+                    f"UPDATE plan_resources SET {assignments}, "
+                    "calculation_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP "
+                    "WHERE id = ?",
+                    to_update
+                )
+            if to_insert:
+                columns = ("treatment_plan_id", "resource_type", "resource_id",
+                           "resource_name") + self._SYNC_COLUMNS
+                cursor.executemany(
+                    f"INSERT INTO plan_resources ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    to_insert
+                )
+            if commit:
+                self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+        return {
+            'inserted': len(to_insert),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+            'unchanged': unchanged,
+        }
+
 
 class PlanSimulationRepository(Repository):
     """Repository per simulazioni."""
@@ -693,6 +810,67 @@ class PlanSimulationRepository(Repository):
         from .planner import PlanSimulation
         return PlanSimulation.from_row(row_dict)
     
+    def create(self, simulation: PlanSimulation) -> int:
+        """
+        Crea una nuova simulazione.
+        
+        Args:
+            simulation: PlanSimulation da creare
+            
+        Returns:
+            ID della simulazione creata
+        """
+        cursor = self.db.conn.cursor()
+        cursor.execute("""
+            INSERT INTO plan_simulations (
+                name, description, base_plan_id, simulation_config,
+                results_summary, comparison_notes
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            simulation.name,
+            simulation.description,
+            simulation.base_plan_id,
+            simulation.simulation_config,
+            simulation.results_summary,
+            simulation.comparison_notes
+        ))
+        
+        self.db.conn.commit()
+        return cursor.lastrowid
+    
+    def get_by_id(self, simulation_id: int) -> Optional[PlanSimulation]:
+        """Recupera una simulazione per ID."""
+        cursor = self.db.conn.cursor()
+        cursor.execute("""
+            SELECT * FROM plan_simulations
+            WHERE id = ? AND deleted_at IS NULL
+        """, (simulation_id,))
+        
+        row = cursor.fetchone()
+        return self._row_to_entity(dict(row)) if row else None
+    
+    def update_results(self, simulation_id: int, results_summary: str) -> bool:
+        """
+        Aggiorna i risultati (JSON) di una simulazione.
+        
+        Args:
+            simulation_id: ID della simulazione
+            results_summary: JSON con risultati aggregati
+            
+        Returns:
+            True se successo
+        """
+        cursor = self.db.conn.cursor()
+        cursor.execute("""
+            UPDATE plan_simulations
+            SET results_summary = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (results_summary, simulation_id))
+        
+        self.db.conn.commit()
+        return cursor.rowcount > 0
+    
     def get_all_active(self) -> List[PlanSimulation]:
         """Recupera tutte le simulazioni non archiviate."""
         cursor = self.db.conn.cursor()
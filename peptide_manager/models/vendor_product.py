@@ -6,9 +6,11 @@ abilitando stime di costo accurate nei treatment plans.
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import date, datetime
-from decimal import Decimal
+from decimal import Decimal, ROUND_CEILING
+from itertools import combinations
+import sqlite3
 
 from .base import BaseModel, Repository
 
@@ -271,6 +273,319 @@ class VendorProductRepository(Repository):
         
         return sorted(comparisons, key=lambda x: x['price_per_mg'] or Decimal('999999'))
 
+    def get_peptide_products(self, peptide_ids: List[int], available_only: bool = True) -> List[VendorProduct]:
+        """
+        Recupera in una sola query i prodotti per più peptidi.
+        
+        Args:
+            peptide_ids: Lista ID peptidi
+            available_only: Se True, solo prodotti disponibili
+            
+        Returns:
+            Lista prodotti (solo con mg_per_vial valorizzato)
+        """
+        if not peptide_ids:
+            return []
+        
+        placeholders = ','.join('?' * len(peptide_ids))
+        query = f"""
+            SELECT vp.*, s.name as supplier_name, p.name as peptide_name
+            FROM vendor_products vp
+            LEFT JOIN suppliers s ON vp.supplier_id = s.id
+            LEFT JOIN peptides p ON vp.peptide_id = p.id
+            WHERE vp.product_type = 'peptide'
+              AND vp.peptide_id IN ({placeholders})
+              AND vp.mg_per_vial > 0
+        """
+        if available_only:
+            query += " AND vp.is_available = 1"
+        query += " ORDER BY vp.supplier_id, vp.peptide_id, vp.id"
+        
+        cursor = self.db.conn.cursor()
+        cursor.execute(query, list(peptide_ids))
+        return [self._row_to_entity(dict(row)) for row in cursor.fetchall()]
+    
+    def get_supplier_shipping_costs(self, currency: str = 'EUR') -> Dict[int, Decimal]:
+        """
+        Costo di spedizione medio per fornitore, dallo storico `shipments`.
+        
+        Nessun cambio valuta: contano solo le spedizioni nella valuta
+        richiesta (`shipments.currency` ha default 'USD', i prezzi catalogo 'EUR').
+        
+        Args:
+            currency: Valuta dei costi da considerare
+        
+        Returns:
+            Dict {supplier_id: costo medio}; vuoto se tabella assente
+        """
+        cursor = self.db.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT supplier_id, AVG(shipping_cost)
+                FROM shipments
+                WHERE shipping_cost IS NOT NULL AND currency = ?
+                GROUP BY supplier_id
+            """, (currency,))
+        except sqlite3.OperationalError:
+            return {}
+        return {
+            row[0]: Decimal(str(round(row[1], 2)))
+            for row in cursor.fetchall()
+            if row[1] is not None
+        }
+    
+    def optimize_purchase(
+        self,
+        mg_gaps: Dict[int, float],
+        shipping_costs: Optional[Dict[int, Decimal]] = None,
+        max_exact_suppliers: int = 12,
+        currency: Optional[str] = None
+    ) -> dict:
+        """
+        Trova il mix di SKU più economico per coprire i gap in mg di un intero piano.
+        
+        Per ogni (peptide, fornitore) risolve un bounded knapsack a copertura
+        minima sui prodotti del fornitore (mg_per_vial × units_per_pack per
+        confezione, minimum_order_qty in confezioni) con memoization; poi
+        sceglie l'insieme di fornitori che minimizza prodotti + spedizioni
+        (una spedizione per fornitore usato).
+        
+        I totali sono in una sola valuta: con `currency` si usano solo gli SKU
+        e le spedizioni in quella valuta; senza, il catalogo candidato deve
+        avere un'unica valuta, altrimenti ValueError.
+        
+        Args:
+            mg_gaps: {peptide_id: mg mancanti}
+            shipping_costs: {supplier_id: costo} nella valuta del risultato;
+                default = media da `shipments` nella stessa valuta
+            max_exact_suppliers: Oltre questo numero di fornitori candidati
+                la scelta dei fornitori diventa greedy invece che esaustiva
+            currency: Valuta dell'acquisto (default: quella del catalogo)
+                
+        Returns:
+            Dict con 'suppliers' (ordini per fornitore), 'unavailable'
+            (peptidi senza offerta), 'total_cost', 'currency'
+            
+        Raises:
+            ValueError: Se il catalogo ha più valute e `currency` non è indicata
+        """
+        gaps = {pid: float(mg) for pid, mg in mg_gaps.items() if mg and float(mg) > 0}
+        
+        products = self.get_peptide_products(list(gaps))
+        if currency is None:
+            currencies = sorted({p.currency or 'EUR' for p in products})
+            if len(currencies) > 1:
+                raise ValueError(
+                    f"Catalogo in più valute ({', '.join(currencies)}): "
+                    "indicare la valuta dell'acquisto"
+                )
+            currency = currencies[0] if currencies else 'EUR'
+        else:
+            products = [p for p in products if (p.currency or 'EUR') == currency]
+        
+        if shipping_costs is None:
+            shipping_costs = self.get_supplier_shipping_costs(currency)
+        shipping_cents = {
+            sid: _to_cents(cost) for sid, cost in shipping_costs.items() if cost
+        }
+        
+        by_pair: Dict[Tuple[int, int], List[VendorProduct]] = {}
+        for product in products:
+            by_pair.setdefault((product.peptide_id, product.supplier_id), []).append(product)
+        
+        # Costo minimo per ogni (peptide, fornitore)
+        options: Dict[int, Dict[int, Tuple[int, Tuple[int, ...], List[VendorProduct]]]] = {}
+        for (peptide_id, supplier_id), skus in by_pair.items():
+            need = _to_centi_mg(gaps[peptide_id])
+            packs = tuple(
+                (
+                    _to_centi_mg(sku.mg_per_vial * max(sku.units_per_pack or 1, 1)),
+                    _to_cents(sku.price),
+                    max(sku.minimum_order_qty or 1, 1),
+                )
+                for sku in skus
+            )
+            cost, counts = _cheapest_cover(packs, need)
+            if counts is not None:
+                options.setdefault(peptide_id, {})[supplier_id] = (cost, counts, skus)
+        
+        unavailable = sorted(pid for pid in gaps if pid not in options)
+        candidates = sorted({sid for per_sup in options.values() for sid in per_sup})
+        
+        def score(suppliers) -> Tuple[int, int]:
+            """(peptidi non coperti, costo totale in centesimi) per un set di fornitori."""
+            missing = 0
+            total = sum(shipping_cents.get(sid, 0) for sid in suppliers)
+            for per_sup in options.values():
+                best = min((per_sup[sid][0] for sid in suppliers if sid in per_sup), default=None)
+                if best is None:
+                    missing += 1
+                else:
+                    total += best
+            return missing, total
+        
+        chosen: Tuple[int, ...] = ()
+        if candidates:
+            if len(candidates) <= max_exact_suppliers:
+                best_score = None
+                for size in range(1, len(candidates) + 1):
+                    for subset in combinations(candidates, size):
+                        subset_score = score(subset)
+                        if subset_score[0] == 0 and (best_score is None or subset_score < best_score):
+                            best_score, chosen = subset_score, subset
+            else:
+                chosen = _greedy_suppliers(candidates, score)
+        
+        # Assegna ogni peptide al fornitore più economico tra quelli scelti
+        orders: Dict[int, dict] = {}
+        for peptide_id, per_sup in options.items():
+            supplier_id = min(
+                (sid for sid in chosen if sid in per_sup),
+                key=lambda sid: per_sup[sid][0]
+            )
+            cost, counts, skus = per_sup[supplier_id]
+            order = orders.setdefault(supplier_id, {
+                'supplier_id': supplier_id,
+                'supplier_name': skus[0].supplier_name,
+                'items': [],
+                'subtotal': Decimal('0'),
+                'shipping_cost': Decimal(shipping_cents.get(supplier_id, 0)) / 100,
+            })
+            for sku, n_packs in zip(skus, counts):
+                if not n_packs:
+                    continue
+                units = max(sku.units_per_pack or 1, 1)
+                line_cost = sku.price * n_packs
+                order['items'].append({
+                    'peptide_id': peptide_id,
+                    'peptide_name': sku.peptide_name,
+                    'product_id': sku.id,
+                    'product_name': sku.product_name,
+                    'sku': sku.sku,
+                    'packs': n_packs,
+                    'vials': n_packs * units,
+                    'mg_acquired': sku.mg_per_vial * units * n_packs,
+                    'mg_gap': gaps[peptide_id],
+                    'price': sku.price,
+                    'currency': sku.currency,
+                    'cost': line_cost,
+                    'lead_time_days': sku.lead_time_days,
+                })
+                order['subtotal'] += line_cost
+        
+        supplier_orders = []
+        for order in orders.values():
+            order['total'] = order['subtotal'] + order['shipping_cost']
+            supplier_orders.append(order)
+        supplier_orders.sort(key=lambda o: o['total'], reverse=True)
+        
+        return {
+            'suppliers': supplier_orders,
+            'unavailable': unavailable,
+            'total_cost': sum((o['total'] for o in supplier_orders), Decimal('0')),
+            'currency': currency,
+        }
+
+
+def _to_cents(value) -> int:
+    """Converte un prezzo in centesimi interi (per DP esatta)."""
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def _to_centi_mg(value) -> int:
+    """Converte mg in centesimi di mg, arrotondando per eccesso."""
+    return int((Decimal(str(value)) * 100).to_integral_value(rounding=ROUND_CEILING))
+
+
+_COVER_CACHE: Dict[Tuple[tuple, int], Tuple[int, Optional[Tuple[int, ...]]]] = {}
+_COVER_CACHE_MAX = 4096
+
+
+def _cheapest_cover(packs: Tuple[Tuple[int, int, int], ...], need: int) -> Tuple[int, Optional[Tuple[int, ...]]]:
+    """
+    Bounded knapsack a copertura minima: quante confezioni per ogni SKU
+    per coprire almeno `need` al costo minimo.
+    
+    Args:
+        packs: ((centi_mg per confezione, centesimi, ordine minimo), ...)
+        need: centi-mg da coprire
+        
+    Returns:
+        (costo in centesimi, conteggi per SKU) oppure (0, None) se impossibile
+    """
+    key = (packs, need)
+    cached = _COVER_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    memo: Dict[Tuple[int, int], Tuple[Optional[int], Tuple[int, ...]]] = {}
+    
+    def solve(i: int, remaining: int) -> Tuple[Optional[int], Tuple[int, ...]]:
+        if remaining <= 0:
+            return 0, (0,) * (len(packs) - i)
+        if i == len(packs):
+            return None, ()
+        state = (i, remaining)
+        if state in memo:
+            return memo[state]
+        
+        mg, price, moq = packs[i]
+        # Oltre questo numero di confezioni lo SKU copre già tutto da solo
+        max_count = max(moq, -(-remaining // mg)) if mg > 0 else 0
+        best: Tuple[Optional[int], Tuple[int, ...]] = (None, ())
+        
+        counts = [0] + list(range(moq, max_count + 1))
+        for count in counts:
+            rest_cost, rest_counts = solve(i + 1, remaining - count * mg)
+            if rest_cost is None:
+                continue
+            cost = count * price + rest_cost
+            if best[0] is None or cost < best[0]:
+                best = (cost, (count,) + rest_counts)
+        
+        memo[state] = best
+        return best
+    
+    cost, counts = solve(0, need)
+    result = (cost, counts) if cost is not None else (0, None)
+    
+    if len(_COVER_CACHE) >= _COVER_CACHE_MAX:
+        _COVER_CACHE.clear()
+    _COVER_CACHE[key] = result
+    return result
+
+
+def _greedy_suppliers(candidates: List[int], score) -> Tuple[int, ...]:
+    """
+    Scelta fornitori greedy per cataloghi grandi: aggiunge il fornitore che
+    migliora di più (prima copertura, poi costo), poi prova a rimuoverne.
+    """
+    chosen: List[int] = []
+    current = score(chosen)
+    while True:
+        best_sid, best_score = None, current
+        for sid in candidates:
+            if sid in chosen:
+                continue
+            candidate_score = score(chosen + [sid])
+            if candidate_score < best_score:
+                best_sid, best_score = sid, candidate_score
+        if best_sid is None:
+            break
+        chosen.append(best_sid)
+        current = best_score
+    
+    improved = True
+    while improved and len(chosen) > 1:
+        improved = False
+        for sid in list(chosen):
+            reduced = [s for s in chosen if s != sid]
+            reduced_score = score(reduced)
+            if reduced_score <= current:
+                chosen, current, improved = reduced, reduced_score, True
+                break
+    return tuple(chosen)
+
 
 class ConsumableDefaultRepository(Repository):
     """Repository per prezzi default consumabili."""
@@ -0,0 +1,287 @@
+"""
+Pianificazione fabbisogni time-phased (MRP) per i treatment plan.
+
+Calcola la domanda settimanale in mg per peptide su tutti i piani attivi e
+pianificati, la confronta con l'inventario proiettato (InventorySnapshot) e
+genera ordini sfasati del lead time dei fornitori (vendor_products), raccolti
+in un calendario ordini consolidato.
+
+Tutto il calcolo è su array cumulativi NumPy (peptidi x settimane): i dati
+arrivano in un numero fisso di query, quindi il ricalcolo completo dopo una
+modifica di inventario è abbastanza veloce da girare a ogni refresh di Oggi.
+"""
+
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .calculator import InventorySnapshot
+
+
+class RequirementsPlanner:
+    """
+    Motore MRP: domanda settimanale → netting → ordini con lead time.
+
+    Usage:
+        mrp = RequirementsPlanner(db)
+        result = mrp.plan(horizon_weeks=26)
+        for entry in result['calendar']:
+            print(entry['date'], [o['peptide_name'] for o in entry['orders']])
+    """
+
+    # Lead time usato quando nessun prodotto vendor lo specifica
+    # (equivale al vecchio buffer fisso di 2 settimane)
+    DEFAULT_LEAD_TIME_DAYS = 14
+    DEFAULT_MG_PER_VIAL = 5.0
+
+    def __init__(self, db, snapshot: Optional[InventorySnapshot] = None):
+        """
+        Args:
+            db: Database (oggetto con .conn)
+            snapshot: Snapshot inventario già caricato (opzionale)
+        """
+        self.db = db
+        self._snapshot = snapshot
+        self._lead_times: Optional[Dict[int, int]] = None
+
+    # ── Caricamento dati (query fisse) ──────────────────────────────
+
+    def _load_phases(self) -> List[Dict[str, Any]]:
+        """Fasi non concluse di tutti i piani attivi e pianificati (una query)."""
+        cursor = self.db.conn.cursor()
+        cursor.execute("""
+            SELECT tp.id AS plan_id, tp.name AS plan_name, tp.start_date AS plan_start,
+                   tp.status AS plan_status,
+                   ph.phase_number, ph.duration_weeks, ph.start_week,
+                   ph.peptides_config, ph.daily_frequency, ph.five_two_protocol,
+                   ph.status, ph.actual_start_date, ph.actual_end_date
+            FROM treatment_plans tp
+            JOIN plan_phases ph ON ph.treatment_plan_id = tp.id
+            WHERE tp.deleted_at IS NULL
+              AND ph.deleted_at IS NULL
+              AND tp.status IN ('active', 'planned')
+            ORDER BY tp.id, ph.phase_number
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def _load_lead_times(self) -> Dict[int, int]:
+        """Lead time minimo (giorni) per peptide tra i prodotti vendor disponibili."""
+        cursor = self.db.conn.cursor()
+        cursor.execute("""
+            SELECT peptide_id, MIN(lead_time_days)
+            FROM vendor_products
+            WHERE product_type = 'peptide'
+              AND peptide_id IS NOT NULL
+              AND is_available = 1
+              AND lead_time_days IS NOT NULL
+            GROUP BY peptide_id
+        """)
+        return {row[0]: int(row[1]) for row in cursor.fetchall()}
+
+    def get_lead_time_days(self, peptide_id: int) -> int:
+        """Lead time per un peptide (caricato una volta per istanza)."""
+        if self._lead_times is None:
+            self._lead_times = self._load_lead_times()
+        return self._lead_times.get(peptide_id, self.DEFAULT_LEAD_TIME_DAYS)
+
+    def get_inventory_snapshot(self) -> InventorySnapshot:
+        """Snapshot inventario (caricato una volta per istanza)."""
+        if self._snapshot is None:
+            self._snapshot = InventorySnapshot.load(self.db.conn)
+        return self._snapshot
+
+    # ── Date reali delle fasi ───────────────────────────────────────
+
+    @staticmethod
+    def _schedule_phases(rows: List[Dict[str, Any]], today: date) -> List[Dict[str, Any]]:
+        """
+        Assegna a ogni fase date reali di inizio/fine.
+
+        Fasi avviate usano actual_start_date; le successive partono alla fine
+        della precedente (non prima di oggi), così un ritardo nell'attivazione
+        sposta in avanti tutta la domanda residua del piano.
+        """
+        scheduled = []
+        cursor_by_plan: Dict[int, date] = {}
+        for row in rows:
+            plan_id = row['plan_id']
+            if plan_id not in cursor_by_plan:
+                cursor_by_plan[plan_id] = _to_date(row['plan_start']) or today
+            cursor = cursor_by_plan[plan_id]
+            weeks = row['duration_weeks'] or 0
+
+            if row['status'] in ('completed', 'skipped'):
+                end = _to_date(row['actual_end_date'])
+                cursor_by_plan[plan_id] = end or (cursor + timedelta(weeks=weeks))
+                continue
+
+            start = _to_date(row['actual_start_date'])
+            if start is None:
+                start = max(cursor, today)
+            end = start + timedelta(weeks=weeks)
+            cursor_by_plan[plan_id] = end
+
+            row = dict(row)
+            row['start'] = start
+            row['end'] = end
+            scheduled.append(row)
+        return scheduled
+
+    # ── Calcolo ─────────────────────────────────────────────────────
+
+    def plan(
+        self,
+        horizon_weeks: int = 26,
+        order_period_weeks: int = 4,
+        today: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """
+        Calcola domanda, inventario proiettato e calendario ordini.
+
+        Args:
+            horizon_weeks: Settimane di orizzonte (dalla settimana corrente)
+            order_period_weeks: Un ordine copre il fabbisogno netto di questo
+                numero di settimane (lotti consolidati invece di ordini settimanali)
+            today: Data di riferimento (default: oggi)
+
+        Returns:
+            Dict con 'week_starts', 'peptides' (serie settimanali), 'orders',
+            'calendar' (ordini raggruppati per data di emissione)
+        """
+        today = today or date.today()
+        week0 = today - timedelta(days=today.weekday())
+        n_days = horizon_weeks * 7
+        day_offset = (today - week0).days
+
+        phases = self._schedule_phases(self._load_phases(), today)
+        snapshot = self.get_inventory_snapshot()
+        if self._lead_times is None:
+            self._lead_times = self._load_lead_times()
+
+        # Indice peptidi e vettori di fase (una riga per fase x peptide)
+        pep_index: Dict[int, int] = {}
+        names: Dict[int, str] = {}
+        mg_per_vial: Dict[int, float] = {}
+        plans_by_pep: Dict[int, set] = {}
+        rows, rates, starts, ends = [], [], [], []
+
+        for ph in phases:
+            try:
+                peptides = json.loads(ph['peptides_config'] or '[]')
+            except json.JSONDecodeError:
+                continue
+            start_idx = max((ph['start'] - week0).days, day_offset)
+            end_idx = min((ph['end'] - week0).days, n_days)
+            if end_idx <= start_idx:
+                continue
+            for pep in peptides:
+                pid = pep.get('peptide_id')
+                if not pid:
+                    continue
+                if pid not in pep_index:
+                    pep_index[pid] = len(pep_index)
+                    names[pid] = pep.get('peptide_name') or f"#{pid}"
+                    mg_per_vial[pid] = float(pep.get('mg_per_vial') or self.DEFAULT_MG_PER_VIAL)
+                plans_by_pep.setdefault(pid, set()).add(ph['plan_name'])
+
+                weekdays = pep.get('weekdays')
+                if weekdays is not None:
+                    days_per_week = len(weekdays)
+                elif ph['five_two_protocol']:
+                    days_per_week = 5
+                else:
+                    days_per_week = 7
+                freq = pep.get('daily_frequency', ph['daily_frequency'] or 1)
+                rows.append(pep_index[pid])
+                rates.append(float(pep.get('dose_mcg') or 0) / 1000.0 * freq * days_per_week / 7.0)
+                starts.append(start_idx)
+                ends.append(end_idx)
+
+        keys = list(pep_index)
+        n_peps = len(keys)
+        week_starts = [(week0 + timedelta(weeks=w)).isoformat() for w in range(horizon_weeks)]
+        if n_peps == 0:
+            return {'week_starts': week_starts, 'peptides': [], 'orders': [], 'calendar': []}
+
+        # Domanda giornaliera via difference array + cumsum (nessun loop sui giorni)
+        delta = np.zeros((n_peps, n_days + 1))
+        rows_arr = np.asarray(rows)
+        rates_arr = np.asarray(rates)
+        np.add.at(delta, (rows_arr, np.asarray(starts)), rates_arr)
+        np.add.at(delta, (rows_arr, np.asarray(ends)), -rates_arr)
+        daily = np.cumsum(delta[:, :n_days], axis=1)
+        weekly = daily.reshape(n_peps, horizon_weeks, 7).sum(axis=2)
+
+        # La domanda parte da oggi: delle prep aperte conta solo il residuo
+        on_hand = np.array([snapshot.residual_mg_for(pid) for pid in keys])
+        cum_demand = np.cumsum(weekly, axis=1)
+        projected = on_hand[:, None] - cum_demand
+        # Fabbisogno netto settimanale (lot-for-lot) = incremento dello scoperto cumulato
+        shortage = np.maximum(0.0, -projected)
+        net = np.diff(shortage, axis=1, prepend=0.0)
+
+        lead_days = np.array([
+            self._lead_times.get(pid, self.DEFAULT_LEAD_TIME_DAYS) for pid in keys
+        ])
+
+        orders = []
+        peptides_out = []
+        for i, pid in enumerate(keys):
+            need_weeks = np.nonzero(net[i] > 1e-9)[0]
+            first_short = int(need_weeks[0]) if need_weeks.size else None
+            peptides_out.append({
+                'peptide_id': pid,
+                'peptide_name': names[pid],
+                'on_hand_mg': round(float(on_hand[i]), 2),
+                'weekly_demand_mg': np.round(weekly[i], 2).tolist(),
+                'projected_mg': np.round(projected[i], 2).tolist(),
+                'first_shortage_week': week_starts[first_short] if first_short is not None else None,
+                'lead_time_days': int(lead_days[i]),
+            })
+            if first_short is None:
+                continue
+
+            # Lotti consolidati: un ordine ogni order_period_weeks dal primo scoperto
+            lots = (need_weeks - first_short) // max(order_period_weeks, 1)
+            lot_mg = np.bincount(lots, weights=net[i][need_weeks])
+            lot_need_week = need_weeks[np.searchsorted(lots, np.arange(lot_mg.size))]
+            for need_week, mg in zip(lot_need_week, lot_mg):
+                if mg <= 1e-9:
+                    continue
+                need_date = week0 + timedelta(weeks=int(need_week))
+                release = need_date - timedelta(days=int(lead_days[i]))
+                orders.append({
+                    'peptide_id': pid,
+                    'peptide_name': names[pid],
+                    'mg': round(float(mg), 2),
+                    'vials': int(np.ceil(round(mg / mg_per_vial[pid], 6))),
+                    'mg_per_vial': mg_per_vial[pid],
+                    'need_date': need_date.isoformat(),
+                    'release_date': max(release, today).isoformat(),
+                    'late': release < today,
+                    'lead_time_days': int(lead_days[i]),
+                    'plans': sorted(plans_by_pep[pid]),
+                })
+
+        orders.sort(key=lambda o: (o['release_date'], o['peptide_name']))
+        calendar: Dict[str, List[dict]] = {}
+        for order in orders:
+            calendar.setdefault(order['release_date'], []).append(order)
+
+        return {
+            'week_starts': week_starts,
+            'peptides': peptides_out,
+            'orders': orders,
+            'calendar': [{'date': d, 'orders': o} for d, o in calendar.items()],
+        }
+
+
+def _to_date(value) -> Optional[date]:
+    """Converte str ISO / date in date (None se vuoto)."""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
@@ -0,0 +1,396 @@
+"""
+Cache materializzata dello schedule dosi (tabella ``schedule_cache``, migration 026).
+
+Una riga per dose prevista (giorno, ciclo, peptide, indice della dose nel
+giorno) da oggi a oggi + ``horizon_days`` - 1, calcolata dai cicli attivi
+con ``expand_cycle``: vista Oggi, export calendario, simulazione delle prep
+in esaurimento e CLI leggono tutti da qui con una range query.
+
+Aggiornamento incrementale con il journal ``change_log`` (migration 025)
+dopo il cursore salvato in ``schedule_cache_state``:
+
+- modifiche a ``cycles`` (ramp incluse): si ricalcolano solo i cicli toccati;
+- modifiche a somministrazioni, preparazioni, batch o composizione: si
+  ricalcola lo stato 'done' di tutte le righe in cache (una somministrazione
+  può anche lasciare un ciclo: il suo ciclo precedente non è più noto);
+- al cambio di giorno si eliminano le date passate e si estende l'orizzonte.
+
+Il PeptideManager principale chiama ``sync()`` all'avvio, dopo ogni commit
+sulle tabelle sorgente (e sugli eventi ``external``); la vista Oggi anche a
+ogni ricarica (cambio di giorno).
+
+``get_range()`` è il punto d'accesso dei lettori e non scrive mai: con cache
+aggiornata e intervallo nell'orizzonte è una query sull'indice primario;
+altrimenti (cache indietro, altro giorno, date fuori orizzonte) calcola lo
+stesso risultato in memoria.
+
+Il cursore è registrato anche tra i consumatori del journal
+(``change_log_consumers``, consumatore ``CONSUMER``): la compattazione non
+elimina modifiche che la cache non ha ancora elaborato.
+
+Usage:
+    cache = ScheduleCache(conn)
+    cache.sync()
+    rows = cache.get_range(date.today(), date.today() + timedelta(days=6))
+"""
+
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from .change_log import ChangeLog
+
+TABLE = 'schedule_cache'
+STATE_TABLE = 'schedule_cache_state'
+
+# Nome in change_log_consumers
+CONSUMER = 'schedule_cache'
+
+# Tabelle da cui dipende la cache, tutte nel journal (le ramp sono in cycles)
+SOURCE_TABLES = ('cycles', 'administrations', 'preparations', 'batches', 'batch_composition')
+
+# Tabelle che cambiano solo lo stato 'done'
+STATUS_TABLES = ('administrations', 'preparations', 'batches', 'batch_composition')
+
+PLANNED = 'planned'
+DONE = 'done'
+
+
+class ScheduledDose(NamedTuple):
+    date: date
+    cycle_id: int
+    peptide_id: int
+    dose_index: int
+    dose_mcg: float
+    status: str = PLANNED
+
+
+class CacheState(NamedTuple):
+    horizon_days: int
+    horizon_start: Optional[date]
+    horizon_end: Optional[date]
+    cursor: int
+
+
+class SyncResult(NamedTuple):
+    """Esito di ``sync()``."""
+    rebuilt: Set[int]     # cicli ricalcolati su tutto l'orizzonte
+    full: bool            # ricostruzione completa (prima volta, orizzonte cambiato)
+    rows: int             # righe scritte
+
+
+def _as_date(value) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _parse_json(raw):
+    """JSON del ciclo (gestisce la doppia codifica, come models/cycle.py)."""
+    if not raw or not isinstance(raw, str):
+        return raw
+    try:
+        result = json.loads(raw)
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result
+    except ValueError:
+        return None
+
+
+def expand_cycle(cycle: Dict, start: date, end: date) -> List[ScheduledDose]:
+    """
+    Dosi previste di un ciclo in [start, end], tutte 'planned'.
+
+    Stesse regole di ``get_scheduled_administrations``: days_on/days_off del
+    ciclo (fallback allo snapshot del protocollo) ancorati a ``resumed_at``
+    o ``start_date``, frequenza e giorni della settimana per peptide, dosi
+    personalizzate, ramp per settimana dall'inizio del ciclo. Nessuna dose
+    dopo ``planned_end_date``.
+    """
+    proto = _parse_json(cycle.get('protocol_snapshot'))
+    cycle_start = _as_date(cycle.get('start_date'))
+    anchor = _as_date(cycle.get('resumed_at')) or cycle_start
+    if not isinstance(proto, dict) or anchor is None:
+        return []
+    first = max(start, anchor)
+    planned_end = _as_date(cycle.get('planned_end_date'))
+    last = min(end, planned_end) if planned_end else end
+    if first > last:
+        return []
+
+    frequency_per_day = proto.get('frequency_per_day') or proto.get('daily_frequency', 1)
+    days_on = cycle.get('days_on') if cycle.get('days_on') is not None else proto.get('days_on')
+    days_off = cycle.get('days_off') if cycle.get('days_off') is not None else proto.get('days_off', 0)
+    if days_on is not None and int(days_on) > 0:
+        period, on_days = int(days_on) + int(days_off or 0), int(days_on)
+    else:
+        period, on_days = 1, 1
+
+    ramp_cycle = None
+    ramp = _parse_json(cycle.get('ramp_schedule'))
+    if ramp:
+        from .models.cycle import Cycle
+        ramp_cycle = Cycle(start_date=cycle_start, ramp_schedule=ramp)
+
+    days = []
+    current = first
+    while current <= last:
+        if (current - anchor).days % period < on_days:
+            days.append(current)
+        current += timedelta(days=1)
+
+    custom_doses = proto.get('custom_doses') or {}
+    cycle_id = cycle['id']
+    doses = []
+    for pep in proto.get('peptides', []):
+        peptide_id = pep.get('peptide_id')
+        if peptide_id is None:
+            continue
+        frequency = int(pep.get('daily_frequency', frequency_per_day) or 1)
+        weekdays = pep.get('weekdays')
+        if str(peptide_id) in custom_doses:
+            base = float(custom_doses[str(peptide_id)])
+        else:
+            base = float(pep.get('target_dose_mcg') or pep.get('dose_mcg') or 0)
+        for day in days:
+            if weekdays is not None and day.weekday() not in weekdays:
+                continue
+            dose = base
+            if ramp_cycle is not None:
+                exact = ramp_cycle.get_ramp_dose(peptide_id, day)
+                dose = float(exact) if exact is not None else base * ramp_cycle.get_ramp_percentage(day)
+            if dose <= 0:
+                continue
+            for dose_index in range(frequency):
+                doses.append(ScheduledDose(day, cycle_id, peptide_id, dose_index, dose))
+    return doses
+
+
+class ScheduleCache:
+    """Manutenzione e lettura di ``schedule_cache``."""
+
+    def __init__(self, conn: sqlite3.Connection, read_only: bool = False):
+        self.conn = conn
+        self.read_only = read_only
+        self.change_log = ChangeLog(conn)
+
+    def state(self) -> Optional[CacheState]:
+        """None su database senza la migration 026."""
+        try:
+            row = self.conn.execute(
+                f"SELECT horizon_days, horizon_start, horizon_end, cursor "
+                f"FROM {STATE_TABLE} WHERE id = 1"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is None:
+            return None
+        return CacheState(row[0], _as_date(row[1]), _as_date(row[2]), row[3])
+
+    def is_current(self, today: Optional[date] = None) -> bool:
+        """Orizzonte che parte da oggi e nessuna modifica dopo il cursore."""
+        state = self.state()
+        return (
+            state is not None and state.horizon_start == (today or date.today())
+            and state.cursor == self.change_log.head()
+        )
+
+    # ── Manutenzione ────────────────────────────────────────────────────
+
+    def set_horizon(self, days: int, today: Optional[date] = None) -> SyncResult:
+        """Cambia l'orizzonte (giorni da oggi) e riallinea la cache."""
+        if days < 1:
+            raise ValueError("L'orizzonte deve essere di almeno un giorno")
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE {STATE_TABLE} SET horizon_days = ? WHERE id = 1", (days,)
+            )
+        return self.sync(today)
+
+    def sync(self, today: Optional[date] = None) -> Optional[SyncResult]:
+        """
+        Porta la cache a [oggi, oggi + horizon_days - 1].
+
+        Returns:
+            None senza la migration 026 (nessuna cache)
+        """
+        today = today or date.today()
+        state = self.state()
+        if state is None:
+            return None
+        # Cursore letto PRIMA dei dati: una scrittura concorrente lo lascia
+        # indietro e il prossimo sync la ricalcola
+        head = self.change_log.head()
+        end = today + timedelta(days=state.horizon_days - 1)
+        if (state.horizon_start, state.horizon_end, state.cursor) == (today, end, head):
+            return SyncResult(set(), False, 0)
+
+        full = (
+            state.horizon_start is None or today < state.horizon_start
+            or state.horizon_end is None or state.horizon_end < today
+        )
+        changes = {} if full else self.change_log.changed_rows(state.cursor, tables=SOURCE_TABLES)
+        affected: Set[int] = set()
+        if 'cycles' in changes:
+            affected = changes['cycles'].upserted | changes['cycles'].deleted
+        refresh_status = any(tbl in changes for tbl in STATUS_TABLES)
+        extend = not full and state.horizon_end < end
+        if full or affected or extend:
+            cycles = {c['id']: c for c in self._active_cycles()}
+        else:
+            cycles = {}  # solo stati, modifiche irrilevanti o orizzonte accorciato
+
+        doses: List[ScheduledDose] = []
+        rebuilt: Set[int] = set()
+        with self.conn:
+            if full:
+                self.conn.execute(f"DELETE FROM {TABLE}")
+                rebuilt = set(cycles)
+            else:
+                self.conn.execute(
+                    f"DELETE FROM {TABLE} WHERE date < ? OR date > ?",
+                    (today.isoformat(), end.isoformat()),
+                )
+                rebuilt = affected
+                self.conn.executemany(
+                    f"DELETE FROM {TABLE} WHERE cycle_id = ?", [(cid,) for cid in affected]
+                )
+            for cycle_id in rebuilt & set(cycles):
+                doses += expand_cycle(cycles[cycle_id], today, end)
+            if extend:
+                # Nuovi giorni in fondo all'orizzonte per gli altri cicli
+                extension_start = state.horizon_end + timedelta(days=1)
+                for cycle_id in set(cycles) - rebuilt:
+                    doses += expand_cycle(cycles[cycle_id], extension_start, end)
+            doses = self._with_status(doses)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {TABLE} "
+                "(date, cycle_id, peptide_id, dose_index, dose_mcg, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(d.date.isoformat(), *d[1:]) for d in doses],
+            )
+            if refresh_status:
+                self._refresh_status()
+            self.conn.execute(
+                f"UPDATE {STATE_TABLE} SET horizon_start = ?, horizon_end = ?, cursor = ? "
+                "WHERE id = 1",
+                (today.isoformat(), end.isoformat(), head),
+            )
+            self.change_log.ack(CONSUMER, head)
+        return SyncResult(rebuilt, full, len(doses))
+
+    def _refresh_status(self) -> int:
+        """Ricalcola 'done'/'planned' delle righe in cache. Returns: righe cambiate."""
+        rows = self.conn.execute(
+            f"SELECT date, cycle_id, peptide_id, dose_index, dose_mcg, status FROM {TABLE}"
+        ).fetchall()
+        cached = [ScheduledDose(_as_date(r[0]), *r[1:]) for r in rows]
+        fresh = self._with_status([d._replace(status=PLANNED) for d in cached])
+        changed = [
+            (new.status, new.date.isoformat(), new.cycle_id, new.peptide_id, new.dose_index)
+            for old, new in zip(cached, fresh) if old.status != new.status
+        ]
+        self.conn.executemany(
+            f"UPDATE {TABLE} SET status = ? "
+            "WHERE date = ? AND cycle_id = ? AND peptide_id = ? AND dose_index = ?",
+            changed,
+        )
+        return len(changed)
+
+    def _active_cycles(self) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT id, start_date, planned_end_date, resumed_at, days_on, days_off, "
+            "protocol_snapshot, ramp_schedule FROM cycles "
+            "WHERE deleted_at IS NULL AND status = 'active'"
+        ).fetchall()
+        keys = ('id', 'start_date', 'planned_end_date', 'resumed_at', 'days_on',
+                'days_off', 'protocol_snapshot', 'ramp_schedule')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _with_status(self, doses: List[ScheduledDose]) -> List[ScheduledDose]:
+        """
+        'done' per le prime N dosi del giorno di (ciclo, peptide), con N =
+        somministrazioni registrate quel giorno nel ciclo che contengono il
+        peptide (come ``completed_today_count`` dello schedule di oggi).
+        """
+        if not doses:
+            return doses
+        cycle_ids = sorted({d.cycle_id for d in doses})
+        first = min(d.date for d in doses).isoformat()
+        last = max(d.date for d in doses).isoformat()
+        done = {
+            (day, cycle_id, peptide_id): count
+            for day, cycle_id, peptide_id, count in self.conn.execute(
+                """
+                SELECT DATE(a.administration_datetime), a.cycle_id, bc.peptide_id,
+                       COUNT(DISTINCT a.id)
+                FROM administrations a
+                JOIN preparations p ON p.id = a.preparation_id
+                JOIN batch_composition bc ON bc.batch_id = p.batch_id
+                WHERE a.deleted_at IS NULL
+                  AND a.cycle_id IN (SELECT value FROM json_each(?))
+                  AND DATE(a.administration_datetime) BETWEEN ? AND ?
+                GROUP BY 1, 2, 3
+                """,
+                (json.dumps(cycle_ids), first, last),
+            )
+        }
+        if not done:
+            return doses
+        return [
+            d._replace(status=DONE)
+            if d.dose_index < done.get((d.date.isoformat(), d.cycle_id, d.peptide_id), 0)
+            else d
+            for d in doses
+        ]
+
+    # ── Lettura ─────────────────────────────────────────────────────────
+
+    def get_range(self, start: date, end: date, today: Optional[date] = None) -> List[Dict]:
+        """
+        Dosi previste in [start, end], ordinate per giorno e peptide.
+
+        Returns:
+            Lista di dict: date (``datetime.date``), cycle_id, cycle_name,
+            peptide_id, peptide_name, dose_index, dose_mcg, status
+        """
+        today = today or date.today()
+        state = self.state()
+        cached = (
+            state is not None and state.horizon_start == today
+            and state.horizon_start <= start and end <= state.horizon_end
+            and state.cursor == self.change_log.head()
+        )
+        if cached:
+            rows = self.conn.execute(
+                f"SELECT date, cycle_id, peptide_id, dose_index, dose_mcg, status "
+                f"FROM {TABLE} WHERE date BETWEEN ? AND ?",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+            doses = [ScheduledDose(_as_date(r[0]), *r[1:]) for r in rows]
+        else:
+            doses = []
+            for cycle in self._active_cycles():
+                doses += expand_cycle(cycle, start, end)
+            doses = self._with_status(doses)
+        return self._named(doses)
+
+    def _named(self, doses: List[ScheduledDose]) -> List[Dict]:
+        cycle_names = dict(self.conn.execute("SELECT id, name FROM cycles").fetchall())
+        peptide_names = dict(self.conn.execute("SELECT id, name FROM peptides").fetchall())
+        items = [
+            {
+                **d._asdict(),
+                'cycle_name': cycle_names.get(d.cycle_id) or f'Ciclo #{d.cycle_id}',
+                'peptide_name': peptide_names.get(d.peptide_id) or f'Peptide #{d.peptide_id}',
+            }
+            for d in doses
+        ]
+        items.sort(key=lambda i: (i['date'], i['peptide_name'], i['cycle_id'], i['dose_index']))
+        return items
@@ -0,0 +1,197 @@
+"""
+Template dello schema finale (``migrations/schema/schema.sql``).
+
+Script SQL generato rigiocando una volta tutte le migration: DDL finale,
+dati iniziali inseriti dalle migration (registro ``schema_migrations``
+incluso) e ``PRAGMA user_version``. Un database nuovo si crea eseguendo
+lo script invece di 25+ migration (alcune ricreano intere tabelle).
+
+Il template si rigenera dopo ogni nuova migration; il test
+``tests/test_schema_template.py`` verifica che corrisponda al replay. Se è
+indietro, ``Migrator`` applica comunque le migration successive registrate
+come mancanti.
+
+Per i test, ``memory_database()`` clona in ``:memory:`` (backup API) un
+database già caricato dal template una volta per processo.
+
+Usage:
+    python -m peptide_manager.schema_template          # rigenera
+    python -m peptide_manager.schema_template --check  # exit 1 se obsoleto
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+TEMPLATE_FILE = Path('schema') / 'schema.sql'
+
+# Colonne valorizzate al momento dell'inserimento: non scritte nel template
+_VOLATILE_DEFAULTS = {'CURRENT_TIMESTAMP', 'CURRENT_DATE', 'CURRENT_TIME'}
+
+# Registro: solo nome e descrizione (applied_at = creazione del database)
+_DUMP_COLUMNS = {'schema_migrations': ['migration_name', 'description']}
+
+_HEADER = (
+    "-- Schema finale generato dalle migration: NON modificare a mano.\n"
+    "-- Rigenera con: python -m peptide_manager.schema_template\n"
+)
+
+# Database caricati dal template, per percorso e mtime del file
+_loaded: Dict[Tuple[str, int], sqlite3.Connection] = {}
+
+
+def template_path(migrations_dir: Optional[Path] = None) -> Path:
+    if migrations_dir is None:
+        from .paths import get_migrations_dir
+        migrations_dir = get_migrations_dir()
+    return Path(migrations_dir) / TEMPLATE_FILE
+
+
+def _literal(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bytes):
+        return f"X'{value.hex()}'"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def _dump_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    if table in _DUMP_COLUMNS:
+        return _DUMP_COLUMNS[table]
+    return [
+        col[1] for col in conn.execute(f'PRAGMA table_info("{table}")')
+        if str(col[4]).upper() not in _VOLATILE_DEFAULTS
+    ]
+
+
+def render_template(conn: sqlite3.Connection) -> str:
+    """
+    Script SQL equivalente allo schema (e ai dati iniziali) di ``conn``.
+
+    Ordine: tabelle, indici, trigger, viste (per rowid in ``sqlite_master``);
+    poi righe e contatori AUTOINCREMENT. Deterministico: nessun timestamp.
+    """
+    objects = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 "
+        "WHEN 'trigger' THEN 2 ELSE 3 END, rowid"
+    ).fetchall()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+    lines = [_HEADER, 'BEGIN;']
+    lines += [f'{sql};' for _, _, sql in objects]
+    for type_, table, _ in objects:
+        if type_ != 'table':
+            continue
+        columns = _dump_columns(conn, table)
+        names = ', '.join(f'"{c}"' for c in columns)
+        select = ', '.join(f'"{c}"' for c in columns)
+        for row in conn.execute(f'SELECT {select} FROM "{table}" ORDER BY rowid'):
+            values = ', '.join(_literal(v) for v in row)
+            lines.append(f'INSERT INTO "{table}" ({names}) VALUES ({values});')
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        lines.append('DELETE FROM sqlite_sequence;')
+        for name, seq in conn.execute('SELECT name, seq FROM sqlite_sequence ORDER BY name'):
+            lines.append(f'INSERT INTO sqlite_sequence (name, seq) VALUES ({_literal(name)}, {seq});')
+    lines.append(f'PRAGMA user_version = {version};')
+    lines.append('COMMIT;')
+    return '\n'.join(lines) + '\n'
+
+
+def build_template(migrations_dir: Optional[Path] = None) -> str:
+    """Rigioca tutte le migration in memoria e ne genera il template."""
+    from .migrator import Migrator
+
+    conn = sqlite3.connect(':memory:')
+    try:
+        Migrator(conn, migrations_dir, verbose=False).migrate(create=True, template=False)
+        return render_template(conn)
+    finally:
+        conn.close()
+
+
+def write_template(migrations_dir: Optional[Path] = None) -> Path:
+    path = template_path(migrations_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(build_template(migrations_dir), encoding='utf-8')
+    return path
+
+
+def template_database(migrations_dir: Optional[Path] = None) -> Optional[sqlite3.Connection]:
+    """
+    Database in memoria caricato dal template (una volta per processo).
+
+    Returns:
+        None se il template non esiste
+    """
+    path = template_path(migrations_dir)
+    try:
+        key = (str(path.resolve()), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    conn = _loaded.get(key)
+    if conn is None:
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.executescript(path.read_text(encoding='utf-8'))
+        _loaded[key] = conn
+    return conn
+
+
+def copy_template(target: sqlite3.Connection, migrations_dir: Optional[Path] = None) -> bool:
+    """
+    Copia il template in ``target`` (database vuoto) con la backup API.
+
+    Returns:
+        False se il template non esiste (``target`` invariato)
+    """
+    source = template_database(migrations_dir)
+    if source is None:
+        return False
+    if target.in_transaction:
+        target.commit()
+    source.backup(target)
+    return True
+
+
+def memory_database() -> sqlite3.Connection:
+    """
+    Database ``:memory:`` con lo schema completo, per i test.
+
+    Come ``init_database``: ``sqlite3.Row`` e foreign key attive.
+    """
+    conn = sqlite3.connect(':memory:')
+    if not copy_template(conn):
+        from .migrator import Migrator
+        Migrator(conn, verbose=False).migrate(create=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Genera il template dello schema finale')
+    parser.add_argument('--check', action='store_true',
+                        help='Verifica soltanto (exit 1 se il template è obsoleto)')
+    args = parser.parse_args(argv)
+
+    path = template_path()
+    if args.check:
+        current = path.read_text(encoding='utf-8') if path.exists() else None
+        if current != build_template():
+            print(f"❌ Template obsoleto: {path} (rigenera senza --check)")
+            return 1
+        print(f"✅ Template aggiornato: {path}")
+        return 0
+    write_template()
+    print(f"✅ Template scritto: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
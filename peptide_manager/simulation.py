@@ -0,0 +1,374 @@
+"""
+Motore what-if vettorizzato per simulazioni di piani di trattamento.
+
+Valuta in un'unica passata NumPy un lotto di scenari (dosi, durate,
+frequenze, dimensioni fiala) contro un solo InventorySnapshot, invece di
+chiamare ResourcePlanner.calculate_total_plan_resources una volta per scenario.
+
+Formato scenario (tutte le chiavi opzionali):
+    {
+        'name': 'Dose +20%',
+        'dose_factor': 1.2,                 # moltiplica tutte le dosi
+        'duration_factor': 1.0,             # moltiplica tutte le durate fase
+        'dose_mcg': {peptide_id: 300},      # dose assoluta per peptide
+        'duration_weeks': {phase_number: 6},
+        'daily_frequency': {peptide_id: 2},
+        'mg_per_vial': {peptide_id: 10},
+    }
+"""
+
+import itertools
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .calculator import InventorySnapshot
+
+
+class ScenarioBatch:
+    """
+    Scenari codificati come matrici (S scenari x L righe fase/peptide).
+
+    Ogni "riga" è una coppia (fase, peptide) del piano base; le righe dello
+    stesso peptide vengono sommate tramite la matrice one-hot ``line_peptide``.
+    """
+
+    def __init__(self, base_phases: List[Dict[str, Any]], scenarios: List[Dict[str, Any]]):
+        if not base_phases:
+            raise ValueError("Almeno una fase richiesta")
+        if not scenarios:
+            raise ValueError("Almeno uno scenario richiesto")
+
+        self.scenarios = scenarios
+        self.names = [
+            s.get('name') or f"Scenario {i}" for i, s in enumerate(scenarios, 1)
+        ]
+
+        # --- Righe del piano base -----------------------------------------
+        line_phase = []
+        line_key = []
+        base_dose = []
+        base_weeks = []
+        base_freq = []
+        days_per_week = []
+        line_vial = []
+
+        self.peptide_keys: List[Any] = []
+        self.peptide_names: Dict[Any, str] = {}
+        self.phase_count = len(base_phases)
+
+        for phase_idx, phase in enumerate(base_phases):
+            weeks = phase['duration_weeks']
+            phase_freq = phase.get('daily_frequency', 1)
+            five_two = phase.get('five_two_protocol', False)
+            for pep in phase['peptides']:
+                key = pep.get('peptide_id') or pep['peptide_name']
+                if key not in self.peptide_names:
+                    self.peptide_keys.append(key)
+                    self.peptide_names[key] = pep['peptide_name']
+                weekdays = pep.get('weekdays')
+                if weekdays is not None:
+                    dpw = len(weekdays)
+                elif five_two:
+                    dpw = 5
+                else:
+                    dpw = 7
+                line_phase.append(phase_idx)
+                line_key.append(key)
+                base_dose.append(float(pep['dose_mcg']))
+                base_weeks.append(float(weeks))
+                base_freq.append(float(pep.get('daily_frequency', phase_freq)))
+                days_per_week.append(float(dpw))
+                line_vial.append(float(pep.get('mg_per_vial', 5.0)))
+
+        n_lines = len(line_key)
+        n_peps = len(self.peptide_keys)
+        n_scen = len(scenarios)
+        pep_index = {k: i for i, k in enumerate(self.peptide_keys)}
+
+        self.line_phase = np.asarray(line_phase, dtype=np.int64)
+        self.line_peptide = np.zeros((n_lines, n_peps))
+        self.line_peptide[np.arange(n_lines), [pep_index[k] for k in line_key]] = 1.0
+        self.days_per_week = np.asarray(days_per_week)
+
+        # mg_per_vial per peptide: come ResourcePlanner, vale la prima occorrenza
+        first_line = self.line_peptide.argmax(axis=0)
+        base_vial = np.asarray(line_vial)[first_line]
+
+        # --- Parametri per scenario ------------------------------------------
+        dose_factor = np.array([s.get('dose_factor', 1.0) for s in scenarios], dtype=float)
+        duration_factor = np.array(
+            [s.get('duration_factor', 1.0) for s in scenarios], dtype=float
+        )
+
+        self.dose = np.outer(dose_factor, base_dose)
+        self.weeks = np.outer(duration_factor, base_weeks)
+        self.freq = np.tile(np.asarray(base_freq), (n_scen, 1))
+        self.mg_per_vial = np.tile(base_vial, (n_scen, 1))
+
+        # Override puntuali (sparse: al massimo poche chiavi per scenario)
+        line_keys = np.asarray([pep_index[k] for k in line_key])
+        for s_idx, scen in enumerate(scenarios):
+            for pid, dose in (scen.get('dose_mcg') or {}).items():
+                self.dose[s_idx, line_keys == pep_index[self._key(pid, pep_index)]] = dose
+            for pid, freq in (scen.get('daily_frequency') or {}).items():
+                self.freq[s_idx, line_keys == pep_index[self._key(pid, pep_index)]] = freq
+            for pid, mg in (scen.get('mg_per_vial') or {}).items():
+                self.mg_per_vial[s_idx, pep_index[self._key(pid, pep_index)]] = mg
+            for phase_number, weeks in (scen.get('duration_weeks') or {}).items():
+                self.weeks[s_idx, self.line_phase == int(phase_number) - 1] = weeks
+
+        if np.any(self.mg_per_vial <= 0):
+            raise ValueError("mg_per_vial deve essere > 0")
+
+    @staticmethod
+    def _key(pid, pep_index):
+        """Normalizza chiavi peptide arrivate come stringhe (es. da JSON)."""
+        if pid in pep_index:
+            return pid
+        try:
+            as_int = int(pid)
+        except (TypeError, ValueError):
+            as_int = None
+        if as_int in pep_index:
+            return as_int
+        raise ValueError(f"Peptide {pid} non presente nel piano base")
+
+
+class SimulationResults:
+    """Risultati vettorizzati di un lotto di scenari (matrici S x P)."""
+
+    def __init__(self, batch: ScenarioBatch, arrays: Dict[str, np.ndarray]):
+        self.batch = batch
+        self.names = batch.names
+        self.peptide_keys = batch.peptide_keys
+        for key, value in arrays.items():
+            setattr(self, key, value)
+
+    def __len__(self):
+        return len(self.names)
+
+    def best(self, metric: str = 'total_cost') -> int:
+        """
+        Indice dello scenario con il valore minimo per ``metric``.
+
+        Per ``total_cost`` gli scenari che acquistano peptidi senza prezzo
+        noto (costo sottostimato, vedi ``unpriced``) vengono per ultimi.
+        """
+        values = getattr(self, metric)
+        if metric == 'total_cost':
+            return int(np.lexsort((values, self.unpriced))[0])
+        return int(np.nanargmin(values))
+
+    def scenario_summary(self, idx: int) -> Dict[str, Any]:
+        """Riassunto JSON-serializzabile di un singolo scenario."""
+        peptides = []
+        for p_idx, key in enumerate(self.peptide_keys):
+            cost = self.cost[idx, p_idx]
+            peptides.append({
+                'resource_id': key if isinstance(key, int) else None,
+                'resource_name': self.batch.peptide_names[key],
+                'mg_needed': round(float(self.mg_needed[idx, p_idx]), 2),
+                'mg_available': round(float(self.mg_available[p_idx]), 2),
+                'mg_gap': round(float(self.mg_gap[idx, p_idx]), 2),
+                'mg_per_vial': float(self.mg_per_vial[idx, p_idx]),
+                'vials_needed': int(self.vials_needed[idx, p_idx]),
+                'vials_to_order': int(self.vials_to_order[idx, p_idx]),
+                'estimated_cost': None if np.isnan(cost) else round(float(cost), 2),
+            })
+        return {
+            'name': self.names[idx],
+            'params': self.batch.scenarios[idx],
+            'total_injections': int(self.total_injections[idx]),
+            'total_mg_gap': round(float(self.mg_gap[idx].sum()), 2),
+            'total_vials_to_order': int(self.vials_to_order[idx].sum()),
+            'total_cost': round(float(self.total_cost[idx]), 2),
+            'unpriced': int(self.unpriced[idx]),
+            'has_gaps': bool(self.mg_gap[idx].sum() > 0),
+            'peptides': peptides,
+        }
+
+    def to_summary(self) -> Dict[str, Any]:
+        """Riassunto completo, salvato in plan_simulations.results_summary."""
+        best_idx = self.best('total_cost')
+        return {
+            'engine': 'vectorized',
+            'scenario_count': len(self),
+            'best_scenario': self.names[best_idx],
+            'scenarios': [self.scenario_summary(i) for i in range(len(self))],
+        }
+
+
+class PlanSimulationEngine:
+    """
+    Valuta lotti di scenari what-if contro un unico snapshot inventario.
+
+    Usage:
+        engine = PlanSimulationEngine(db)
+        scenarios = engine.sweep(dose_factors=[0.8, 1.0, 1.2], duration_factors=[1, 1.5])
+        results = engine.evaluate(phases_config, scenarios)
+        engine.save('Dose sweep', phases_config, scenarios, results)
+    """
+
+    def __init__(self, db=None, snapshot: Optional[InventorySnapshot] = None):
+        """
+        Args:
+            db: Database (oggetto con .conn) per snapshot e salvataggio
+            snapshot: Snapshot già caricato (es. da ResourcePlanner), opzionale
+        """
+        self.db = db
+        self._snapshot = snapshot
+
+    def get_inventory_snapshot(self, refresh: bool = False) -> InventorySnapshot:
+        """Snapshot inventario condiviso da tutte le valutazioni dell'engine."""
+        if self._snapshot is None or refresh:
+            if self.db is None:
+                self._snapshot = InventorySnapshot()
+            else:
+                self._snapshot = InventorySnapshot.load(self.db.conn)
+        return self._snapshot
+
+    @staticmethod
+    def sweep(
+        dose_factors: Sequence[float] = (1.0,),
+        duration_factors: Sequence[float] = (1.0,),
+        daily_frequencies: Optional[Dict[Any, Sequence[int]]] = None,
+        mg_per_vial: Optional[Dict[Any, Sequence[float]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Genera il prodotto cartesiano di variazioni come lista di scenari.
+
+        Args:
+            dose_factors: Moltiplicatori dose globali
+            duration_factors: Moltiplicatori durata globali
+            daily_frequencies: {peptide_id: [1, 2]} frequenze alternative
+            mg_per_vial: {peptide_id: [5, 10]} dimensioni fiala alternative
+        """
+        freq_axes = [
+            [(pid, f) for f in values] for pid, values in (daily_frequencies or {}).items()
+        ]
+        vial_axes = [
+            [(pid, mg) for mg in values] for pid, values in (mg_per_vial or {}).items()
+        ]
+
+        scenarios = []
+        for dose_f, dur_f, *rest in itertools.product(
+            dose_factors, duration_factors, *freq_axes, *vial_axes
+        ):
+            freqs = dict(rest[:len(freq_axes)])
+            vials = dict(rest[len(freq_axes):])
+            label = [f"dose x{dose_f:g}", f"durata x{dur_f:g}"]
+            label += [f"freq[{pid}]={f}" for pid, f in freqs.items()]
+            label += [f"vial[{pid}]={mg:g}mg" for pid, mg in vials.items()]
+            scenario = {
+                'name': ', '.join(label),
+                'dose_factor': dose_f,
+                'duration_factor': dur_f,
+            }
+            if freqs:
+                scenario['daily_frequency'] = freqs
+            if vials:
+                scenario['mg_per_vial'] = vials
+            scenarios.append(scenario)
+        return scenarios
+
+    def evaluate(
+        self,
+        base_phases: List[Dict[str, Any]],
+        scenarios: List[Dict[str, Any]],
+        inventory_check: bool = True,
+    ) -> SimulationResults:
+        """
+        Calcola mg necessari, fiale, gap e costo per tutti gli scenari insieme.
+
+        Args:
+            base_phases: Configurazione fasi (stesso formato di ResourcePlanner)
+            scenarios: Lista scenari (vedi docstring del modulo)
+            inventory_check: Se False, considera inventario vuoto
+
+        Returns:
+            SimulationResults con matrici S x P
+        """
+        batch = ScenarioBatch(base_phases, scenarios)
+        snapshot = self.get_inventory_snapshot() if inventory_check else InventorySnapshot()
+
+        # Come ResourcePlanner: nessun arrotondamento per settimane frazionarie
+        on_days = batch.weeks * batch.days_per_week
+        injections = on_days * batch.freq                      # S x L
+        mg_lines = batch.dose / 1000.0 * injections              # S x L
+        mg_needed = mg_lines @ batch.line_peptide                # S x P
+
+        # Stesso arrotondamento per eccesso di ResourcePlanner
+        vials_needed = np.floor(mg_needed / batch.mg_per_vial + 0.9999)
+
+        keys = batch.peptide_keys
+        mg_available = np.array(
+            [snapshot.mg_for(k) if isinstance(k, int) else 0.0 for k in keys]
+        )
+        price = np.array([
+            float(snapshot.price_for(k)) if isinstance(k, int) and snapshot.price_for(k) is not None
+            else np.nan
+            for k in keys
+        ])
+
+        mg_gap = np.maximum(0.0, mg_needed - mg_available)
+        vials_to_order = np.ceil(np.round(mg_gap / batch.mg_per_vial, 6))
+        cost = vials_to_order * price
+        # Nessun gap → costo 0 anche senza prezzo noto
+        cost = np.where(vials_to_order == 0, 0.0, cost)
+        # Peptidi da ordinare senza prezzo: esclusi da total_cost, contati qui
+        unpriced = (np.isnan(cost)).sum(axis=1)
+
+        # Iniezioni totali: per fase il max tra i peptidi (1 siringa per evento)
+        total_injections = np.zeros(len(scenarios))
+        for phase_idx in range(batch.phase_count):
+            cols = batch.line_phase == phase_idx
+            if cols.any():
+                total_injections += injections[:, cols].max(axis=1)
+
+        return SimulationResults(batch, {
+            'injections': injections,
+            'mg_needed': mg_needed,
+            'mg_available': mg_available,
+            'mg_gap': mg_gap,
+            'mg_per_vial': batch.mg_per_vial,
+            'vials_needed': vials_needed,
+            'vials_to_order': vials_to_order,
+            'cost': cost,
+            'total_cost': np.nansum(cost, axis=1),
+            'unpriced': unpriced,
+            'total_injections': total_injections,
+        })
+
+    def save(
+        self,
+        name: str,
+        base_phases: List[Dict[str, Any]],
+        scenarios: List[Dict[str, Any]],
+        results: SimulationResults,
+        base_plan_id: Optional[int] = None,
+        description: Optional[str] = None,
+    ) -> int:
+        """
+        Salva configurazione e risultati in plan_simulations.
+
+        Returns:
+            ID della simulazione creata
+        """
+        from .models.planner import PlanSimulation, PlanSimulationRepository
+
+        if self.db is None:
+            raise ValueError("Database richiesto per salvare la simulazione")
+
+        simulation = PlanSimulation(
+            name=name,
+            description=description,
+            base_plan_id=base_plan_id,
+            simulation_config=json.dumps({
+                'phases': base_phases,
+                'scenarios': scenarios,
+            }),
+            results_summary=json.dumps(results.to_summary()),
+        )
+        return PlanSimulationRepository(self.db).create(simulation)
@@ -0,0 +1,332 @@
+"""
+"Cosa c'è da fare oggi" da riga di comando, senza GUI e senza manager.
+
+Le somministrazioni previste oggi e in ritardo
+(``PeptideManager.get_scheduled_administrations``) vengono materializzate in
+uno snapshot JSON accanto al database (``<db>.today.json``), insieme al
+giorno e al cursore del journal ``change_log`` (migration 025) al momento
+del calcolo. La CLI apre il database in sola lettura, legge il cursore con
+una query e, se giorno e cursore coincidono, stampa lo snapshot: niente
+pandas, Qt, modelli o repository.
+
+Snapshot obsoleto (altro giorno, scritture successive, database senza
+journal): calcolo completo con un PeptideManager in sola lettura e
+riscrittura dello snapshot. Una volta creato, lo snapshot viene tenuto
+aggiornato anche dall'app (vista Oggi, a ogni ricarica: dopo le modifiche
+via ChangeBus/data_version) e da ``PeptideManager.close()`` dopo scritture
+sulle tabelle dello schedule (script).
+
+Con ``--days N`` stampa anche le dosi dei prossimi N giorni dalla cache
+materializzata ``schedule_cache`` (migration 026, schedule_cache.py): una
+range query se la cache è aggiornata, altrimenti calcolo in memoria.
+
+Usage:
+    python -m peptide_manager.today                     # ambiente da .env
+    python -m peptide_manager.today --env production --json
+    python -m peptide_manager.today --db data/staging/peptide_management.db
+    python -m peptide_manager.today --days 7            # + prossimi 7 giorni
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .schedule_cache import SOURCE_TABLES
+
+SNAPSHOT_SUFFIX = '.today.json'
+SNAPSHOT_VERSION = 1
+
+# Tabelle da cui dipende lo schedule (tutte nel journal): quelle della cache
+# più gli eventi delle prep (volume residuo → prep suggerita)
+SCHEDULE_TABLES = frozenset(SOURCE_TABLES) | {'preparation_events'}
+
+# Campi JSON delle voci (il resto del dict di get_scheduled_administrations
+# serve solo alla GUI)
+_FIELDS = (
+    'cycle_id', 'cycle_name', 'peptide_id', 'peptide_name', 'protocol_name',
+    'target_dose_mcg', 'ramped_dose_mcg', 'suggested_dose_ml', 'preparation_id', 'status',
+    'schedule_status', 'days_overdue', 'next_due_date',
+)
+
+_STATUS_LABELS = {'overdue': 'In ritardo', 'due_today': 'Da fare oggi'}
+
+
+def snapshot_path(db_path) -> Path:
+    return Path(f'{db_path}{SNAPSHOT_SUFFIX}')
+
+
+def journal_cursor(conn: sqlite3.Connection) -> Optional[int]:
+    """
+    Cursore del journal in una query.
+
+    Returns:
+        None se il database non ha ``change_log`` (snapshot mai valido)
+    """
+    try:
+        row = conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'),"
+            " (SELECT seq FROM sqlite_sequence WHERE name = 'change_log')"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None  # nessuna tabella AUTOINCREMENT: niente journal
+    if not row[0]:
+        return None
+    return row[1] or 0
+
+
+def _connect_ro(db_path) -> sqlite3.Connection:
+    return sqlite3.connect(f'{Path(db_path).resolve().as_uri()}?mode=ro', uri=True)
+
+
+def _item(entry: Dict) -> Dict:
+    item = {key: entry.get(key) for key in _FIELDS}
+    if item['next_due_date'] is not None:
+        item['next_due_date'] = str(item['next_due_date'])
+    return item
+
+
+# ── Snapshot ────────────────────────────────────────────────────────────
+
+
+def write_snapshot(db_path, day: date, cursor: Optional[int], entries: List[Dict]) -> List[Dict]:
+    """
+    Salva lo snapshot (scrittura atomica). ``cursor`` va letto PRIMA del
+    calcolo: una scrittura concorrente lo rende obsoleto, mai sbagliato.
+
+    Returns:
+        Voci salvate
+    """
+    items = [_item(e) for e in entries]
+    path = snapshot_path(db_path)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'day': day.isoformat(),
+        'cursor': cursor,
+        'items': items,
+    }, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+    return items
+
+
+def read_snapshot(db_path, day: date, cursor: Optional[int]) -> Optional[List[Dict]]:
+    """Voci dello snapshot se valido per ``day`` e ``cursor``, altrimenti None."""
+    if cursor is None:
+        return None
+    try:
+        data = json.loads(snapshot_path(db_path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION
+        or data.get('day') != day.isoformat() or data.get('cursor') != cursor
+    ):
+        return None
+    return data.get('items')
+
+
+def refresh_snapshot(manager, day: Optional[date] = None) -> List[Dict]:
+    """
+    Calcola lo schedule con un PeptideManager già aperto e, se il database
+    ha già uno snapshot (creato dalla CLI), lo aggiorna.
+
+    Returns:
+        Voci complete di ``get_scheduled_administrations`` (per la GUI)
+    """
+    day = day or date.today()
+    if not snapshot_path(manager.db_path).exists():
+        return manager.get_scheduled_administrations(day)
+    cursor = journal_cursor(manager.conn)
+    entries = manager.get_scheduled_administrations(day)
+    try:
+        write_snapshot(manager.db_path, day, cursor, entries)
+    except OSError:
+        pass  # snapshot solo accelerazione: resta obsoleto
+    return entries
+
+
+def due_items(db_path, day: Optional[date] = None, refresh: bool = False) -> Tuple[List[Dict], str]:
+    """
+    Voci previste oggi / in ritardo.
+
+    Returns:
+        (voci, origine: 'snapshot' | 'computed')
+    """
+    day = day or date.today()
+    conn = _connect_ro(db_path)
+    try:
+        cursor = journal_cursor(conn)
+    finally:
+        conn.close()
+    if not refresh:
+        items = read_snapshot(db_path, day, cursor)
+        if items is not None:
+            return items, 'snapshot'
+
+    # Snapshot obsoleto: calcolo completo (import pesanti solo qui)
+    from .manager import PeptideManager
+
+    manager = PeptideManager(str(db_path), read_only=True)
+    try:
+        entries = manager.get_scheduled_administrations(day)
+    finally:
+        manager.close()
+    try:
+        items = write_snapshot(db_path, day, cursor, entries)
+    except OSError:
+        items = [_item(e) for e in entries]
+    return items, 'computed'
+
+
+def upcoming_items(db_path, start: date, end: date, today: Optional[date] = None) -> Tuple[List[Dict], str]:
+    """
+    Dosi previste in [start, end] dalla cache dello schedule.
+
+    Returns:
+        (voci con ``date`` ISO, origine: 'cache' | 'computed')
+    """
+    today = today or date.today()
+    conn = _connect_ro(db_path)
+    try:
+        cursor = journal_cursor(conn)
+        try:
+            state = conn.execute(
+                "SELECT horizon_start, horizon_end, cursor FROM schedule_cache_state WHERE id = 1"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            state = None
+        if (
+            state is not None and cursor is not None and state[2] == cursor
+            and state[0] == today.isoformat() and state[0] <= start.isoformat()
+            and end.isoformat() <= state[1]
+        ):
+            keys = ('date', 'cycle_id', 'cycle_name', 'peptide_id', 'peptide_name',
+                    'dose_index', 'dose_mcg', 'status')
+            rows = conn.execute(
+                """
+                SELECT s.date, s.cycle_id, c.name, s.peptide_id, p.name,
+                       s.dose_index, s.dose_mcg, s.status
+                FROM schedule_cache s
+                JOIN cycles c ON c.id = s.cycle_id
+                LEFT JOIN peptides p ON p.id = s.peptide_id
+                WHERE s.date BETWEEN ? AND ?
+                ORDER BY s.date, p.name, s.cycle_id, s.dose_index
+                """,
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+            return [dict(zip(keys, row)) for row in rows], 'cache'
+    finally:
+        conn.close()
+
+    # Cache indietro (nessuna app aperta dopo l'ultima modifica, nuovo giorno)
+    from .manager import PeptideManager
+
+    manager = PeptideManager(str(db_path), read_only=True)
+    try:
+        items = manager.get_schedule(start, end)
+    finally:
+        manager.close()
+    return [{**item, 'date': item['date'].isoformat()} for item in items], 'computed'
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+
+
+def _env_db_path(env_name: Optional[str]) -> Path:
+    """DB_PATH dal file .env dell'ambiente (come scripts/environment.py)."""
+    root = Path(__file__).resolve().parent.parent
+
+    def read(path: Path) -> Dict[str, str]:
+        values = {}
+        for line in path.read_text(encoding='utf-8').splitlines():
+            key, sep, value = line.partition('=')
+            if sep and not key.lstrip().startswith('#'):
+                values[key.strip()] = value.strip().strip('"\'')
+        return values
+
+    if env_name:
+        env_file = root / f'.env.{env_name}'
+    else:
+        default = root / '.env'
+        env_file = root / (read(default).get('ENV_FILE', '.env.development')
+                           if default.exists() else '.env.development')
+    if not env_file.exists():
+        raise FileNotFoundError(f"File configurazione non trovato: {env_file}")
+    return root / read(env_file)['DB_PATH']
+
+
+def format_items(items: List[Dict], day: date) -> str:
+    if not items:
+        return f"✅ {day.isoformat()}: nulla da fare"
+    lines = []
+    for status in ('overdue', 'due_today'):
+        group = [i for i in items if i.get('schedule_status') == status]
+        if not group:
+            continue
+        lines.append(f"{_STATUS_LABELS[status]} ({len(group)}):")
+        for i in group:
+            mcg = i.get('ramped_dose_mcg') or i.get('target_dose_mcg')
+            dose = f"{mcg:g} mcg" if mcg else '-'
+            ml = f" = {i['suggested_dose_ml']:.2f} ml" if i.get('suggested_dose_ml') else ''
+            late = f", {i['days_overdue']} gg" if i.get('days_overdue') else ''
+            prep = '' if i.get('preparation_id') else ' ⚠️ nessuna preparazione'
+            lines.append(f"  • {i.get('peptide_name')} {dose}{ml} — {i.get('cycle_name')}{late}{prep}")
+    return '\n'.join(lines)
+
+
+def format_upcoming(items: List[Dict]) -> str:
+    lines = []
+    for item in items:
+        day = date.fromisoformat(item['date'])
+        done = ' ✓' if item['status'] == 'done' else ''
+        lines.append(
+            f"  {day:%d/%m} {item['peptide_name']} {item['dose_mcg']:g} mcg — {item['cycle_name']}{done}"
+        )
+    return '\n'.join(lines) if lines else '  nessuna dose prevista'
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Somministrazioni previste oggi e in ritardo")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--db', type=Path, help='Percorso del database')
+    target.add_argument('--env', choices=['production', 'development', 'staging'],
+                        help='Ambiente (default: ENV_FILE in .env)')
+    parser.add_argument('--date', type=date.fromisoformat, help='Giorno (YYYY-MM-DD, default oggi)')
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    parser.add_argument('--refresh', action='store_true', help='Ignora lo snapshot e ricalcola')
+    parser.add_argument('--days', type=int, default=0,
+                        help='Mostra anche le dosi dei prossimi N giorni (cache dello schedule)')
+    args = parser.parse_args(argv)
+
+    db_path = args.db or _env_db_path(args.env)
+    if not Path(db_path).exists():
+        print(f"❌ Database non trovato: {db_path}", file=sys.stderr)
+        return 1
+    day = args.date or date.today()
+    items, source = due_items(db_path, day, refresh=args.refresh)
+    upcoming = None
+    if args.days > 0:
+        upcoming, upcoming_source = upcoming_items(
+            db_path, day + timedelta(days=1), day + timedelta(days=args.days)
+        )
+    if args.json:
+        result = {'day': day.isoformat(), 'source': source, 'items': items}
+        if upcoming is not None:
+            result.update(upcoming=upcoming, upcoming_source=upcoming_source)
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print(format_items(items, day))
+        if upcoming is not None:
+            print(f"Prossimi {args.days} giorni:")
+            print(format_upcoming(upcoming))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,6 +19,15 @@ def main():
         print("ERROR: 'pyinstaller' not found on PATH. Is the venv activated?")
         sys.exit(1)
 
+    # Pre-built compendium index: the installed app opens peptide details
+    # without parsing the markdown (its folder may not be writable)
+    prebuild = subprocess.run(
+        [sys.executable, "-m", "gui_qt.compendium"], cwd=str(project_root)
+    )
+    if prebuild.returncode != 0:
+        print("ERROR: compendium index build failed.")
+        sys.exit(prebuild.returncode)
+
     sep = ";"  # Windows path separator for --add-data
 
     cmd = [
@@ -33,11 +42,14 @@ def main():
         "--add-data", f"gui_qt/style.qss{sep}gui_qt",
         "--add-data", f"docs/COMPENDIO_PEPTIDI.md{sep}docs",
         "--add-data", f"docs/COMPENDIO_AAS_FARMACI.md{sep}docs",
+        "--add-data", f"docs/.compendium_cache.json{sep}docs",
         # Hidden imports — lazy / dynamic imports PyInstaller can't detect
         "--hidden-import", "peptide_manager.backup",
         "--hidden-import", "peptide_manager.calculator",
         "--hidden-import", "peptide_manager.paths",
         "--hidden-import", "peptide_manager.janoshik",
+        # Package import is lazy (PEP 562): manager, models and domains
+        "--collect-submodules", "peptide_manager",
         "--hidden-import", "qtawesome",
         "--hidden-import", "openai",
         "--hidden-import", "anthropic",
@@ -1,17 +1,23 @@
 """
 Confronta gli schemi dei database produzione e development.
+
+Una connessione per database; ``sqlite_master`` letto una volta per lato.
 """
 import sqlite3
+import sys
+from pathlib import Path
 from typing import Dict, List, Tuple, Set
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from peptide_manager.db_sync import read_schema, schema_diff
+
 
-def get_table_schema(db_path: str, table_name: str) -> str:
+def get_table_schema(conn: sqlite3.Connection, table_name: str) -> str:
     """Ottiene lo schema completo di una tabella."""
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute(f"PRAGMA table_info({table_name})")
     columns = cursor.fetchall()
-    conn.close()
     
     # Format: (cid, name, type, notnull, dflt_value, pk)
     schema = []
@@ -28,34 +34,17 @@ def get_table_schema(db_path: str, table_name: str) -> str:
     return "\n  ".join(schema)
 
 
-def get_all_tables(db_path: str) -> List[str]:
-    """Ottiene lista di tutte le tabelle."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT name FROM sqlite_master 
-        WHERE type='table' 
-        AND name NOT LIKE 'sqlite_%'
-        ORDER BY name
-    """)
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return tables
-
-
-def get_all_indexes(db_path: str) -> Dict[str, str]:
-    """Ottiene tutti gli indici."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT name, sql FROM sqlite_master 
-        WHERE type='index' 
-        AND sql IS NOT NULL
-        ORDER BY name
-    """)
-    indexes = {row[0]: row[1] for row in cursor.fetchall()}
-    conn.close()
-    return indexes
+def get_all_tables(master: Dict[Tuple[str, str], str]) -> List[str]:
+    """Ottiene lista di tutte le tabelle (da ``read_schema``)."""
+    return sorted(name for type_, name in master if type_ == 'table')
+
+
+def get_all_indexes(master: Dict[Tuple[str, str], str]) -> Dict[str, str]:
+    """Ottiene tutti gli indici (esclusi quelli automatici, senza SQL)."""
+    return {
+        name: sql for (type_, name), sql in sorted(master.items())
+        if type_ == 'index' and sql is not None
+    }
 
 
 def compare_databases(prod_path: str, dev_path: str):
@@ -68,13 +57,26 @@ def compare_databases(prod_path: str, dev_path: str):
     print(f"Development: {dev_path}")
     print()
     
+    prod_conn = sqlite3.connect(f"{Path(prod_path).resolve().as_uri()}?mode=ro", uri=True)
+    dev_conn = sqlite3.connect(f"{Path(dev_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        _compare(prod_conn, dev_conn)
+    finally:
+        prod_conn.close()
+        dev_conn.close()
+
+
+def _compare(prod_conn: sqlite3.Connection, dev_conn: sqlite3.Connection):
+    prod_master = read_schema(prod_conn)
+    dev_master = read_schema(dev_conn)
+
     # 1. Confronta tabelle
     print("-" * 80)
     print("TABELLE")
     print("-" * 80)
     
-    prod_tables = set(get_all_tables(prod_path))
-    dev_tables = set(get_all_tables(dev_path))
+    prod_tables = set(get_all_tables(prod_master))
+    dev_tables = set(get_all_tables(dev_master))
     
     print(f"Production: {len(prod_tables)} tabelle")
     print(f"Development: {len(dev_tables)} tabelle")
@@ -104,8 +106,8 @@ def compare_databases(prod_path: str, dev_path: str):
     
     schema_diffs = []
     for table in sorted(common_tables):
-        prod_schema = get_table_schema(prod_path, table)
-        dev_schema = get_table_schema(dev_path, table)
+        prod_schema = get_table_schema(prod_conn, table)
+        dev_schema = get_table_schema(dev_conn, table)
         
         if prod_schema != dev_schema:
             schema_diffs.append((table, prod_schema, dev_schema))
@@ -129,8 +131,8 @@ def compare_databases(prod_path: str, dev_path: str):
     print("INDICI")
     print("-" * 80)
     
-    prod_indexes = get_all_indexes(prod_path)
-    dev_indexes = get_all_indexes(dev_path)
+    prod_indexes = get_all_indexes(prod_master)
+    dev_indexes = get_all_indexes(dev_master)
     
     print(f"Production: {len(prod_indexes)} indici")
     print(f"Development: {len(dev_indexes)} indici")
@@ -157,19 +159,17 @@ def compare_databases(prod_path: str, dev_path: str):
     print("MIGRATIONS APPLICATE")
     print("-" * 80)
     
-    def get_migrations(db_path):
-        conn = sqlite3.connect(db_path)
+    def get_migrations(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("SELECT version, name, applied_at FROM schema_migrations ORDER BY version")
             migrations = cursor.fetchall()
         except sqlite3.OperationalError:
             migrations = []
-        conn.close()
         return migrations
     
-    prod_migrations = get_migrations(prod_path)
-    dev_migrations = get_migrations(dev_path)
+    prod_migrations = get_migrations(prod_conn)
+    dev_migrations = get_migrations(dev_conn)
     
     print(f"\nProduction: {len(prod_migrations)} migrations")
     if prod_migrations:
@@ -181,6 +181,24 @@ def compare_databases(prod_path: str, dev_path: str):
         for ver, name, applied in dev_migrations:
             print(f"   {ver}. {name} (applied: {applied})")
     
+    # Trigger e viste (stesso confronto di sqlite_master usato dal sync)
+    other_diff = [
+        (label, [(t, n) for t, n in items if t in ('trigger', 'view')])
+        for label, items in zip(
+            ("Solo in PRODUCTION", "Solo in DEVELOPMENT", "Diversi"),
+            schema_diff(prod_master, dev_master),
+        )
+    ]
+    other_diff = [(label, items) for label, items in other_diff if items]
+    if other_diff:
+        print("\n" + "-" * 80)
+        print("TRIGGER E VISTE")
+        print("-" * 80)
+        for label, items in other_diff:
+            print(f"\n❌ {label} ({len(items)}):")
+            for type_, name in items:
+                print(f"   - {type_} {name}")
+    
     # 5. Summary
     print("\n" + "=" * 80)
     print("RIEPILOGO")
@@ -191,7 +209,8 @@ def compare_databases(prod_path: str, dev_path: str):
         not only_dev and 
         not schema_diffs and 
         not only_prod_idx and 
-        not only_dev_idx
+        not only_dev_idx and
+        not other_diff
     )
     
     if is_identical:
@@ -206,6 +225,8 @@ def compare_databases(prod_path: str, dev_path: str):
             print(f"   - Schema tabelle diversi: {len(schema_diffs)}")
         if only_prod_idx or only_dev_idx:
             print(f"   - Indici diversi: {len(only_prod_idx) + len(only_dev_idx)}")
+        if other_diff:
+            print(f"   - Trigger/viste diversi: {sum(len(items) for _, items in other_diff)}")
         
         print("\n⚠️ AZIONE RICHIESTA:")
         if only_dev or schema_diffs or only_dev_idx:
@@ -1,58 +1,112 @@
 """
-Copia database da produzione a sviluppo
+Copia database da produzione a sviluppo (o staging)
+
+Default: sync incrementale (peptide_manager/db_sync.py): vengono riscritti
+solo gli intervalli di righe diversi, in un'unica transazione. Copia
+completa del file con ``--full``, se il database target non esiste ancora o
+se lo schema dei due database è diverso.
 """
 
 import shutil
 import os
+import sys
 from datetime import datetime
 from pathlib import Path
 from environment import get_environment
 
-def copy_prod_to_dev():
-    """Copia DB produzione in sviluppo."""
-    
-    # Carica ambienti (pulisci variabili tra chiamate per evitare conflitti)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from peptide_manager.db_sync import SchemaMismatchError, format_report, sync_database
+
+
+def _load_environments(target: str = "development"):
+    """Ambienti produzione e target (pulisce le variabili tra le chiamate)."""
     prod_env = get_environment("production")
-    
+
     # Pulisci variabili d'ambiente per evitare contaminazione
     for key in ['ENVIRONMENT', 'DB_PATH', 'BACKUP_DIR', 'AUTO_BACKUP', 'LOG_LEVEL']:
         os.environ.pop(key, None)
-    
-    dev_env = get_environment("development")
-    
+
+    return prod_env, get_environment(target)
+
+
+def _backup(env):
+    """Copia di sicurezza del DB di ``env`` accanto all'originale."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_path = env.db_path.with_suffix(f".backup_{timestamp}")
+    shutil.copy2(env.db_path, backup_path)
+    print(f"💾 Backup {env.name}: {backup_path}")
+
+
+def copy_prod_to_dev(target: str = "development", full: bool = False, backup: bool = None):
+    """
+    Copia DB produzione in sviluppo/staging.
+
+    Args:
+        target: Ambiente destinazione ('development' o 'staging')
+        full: True = copia l'intero file invece del sync incrementale
+        backup: Copia di sicurezza del DB target prima di scrivere
+            (default: solo con la copia completa, anche come ripiego per
+            schema diverso; il sync è transazionale)
+    """
+    prod_env, dev_env = _load_environments(target)
+
     # Verifica esistenza DB produzione
     if not prod_env.db_path.exists():
         print(f"❌ Database produzione non trovato: {prod_env.db_path}")
         return False
-    
+
+    full = full or not dev_env.db_path.exists()
+
     # Backup del DB sviluppo corrente
-    if dev_env.db_path.exists():
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = dev_env.db_path.with_suffix(f".backup_{timestamp}")
-        shutil.copy2(dev_env.db_path, backup_path)
-        print(f"💾 Backup sviluppo: {backup_path}")
-    
+    if (backup or (backup is None and full)) and dev_env.db_path.exists():
+        _backup(dev_env)
+
+    if not full:
+        print(f"🔄 Sync incrementale {prod_env.db_path} → {dev_env.db_path}...")
+        try:
+            report = sync_database(prod_env.db_path, dev_env.db_path)
+        except SchemaMismatchError as e:
+            for line in e.diff.describe():
+                print(f"  {line}")
+            print("   ⚠️  Schema diverso: passo alla copia completa")
+            if backup is None:
+                _backup(dev_env)
+        else:
+            print(format_report(report))
+            print(f"✅ Database {dev_env.name} aggiornato")
+            return True
+
     # Copia prod → dev
     print(f"📋 Copio {prod_env.db_path} → {dev_env.db_path}...")
     shutil.copy2(prod_env.db_path, dev_env.db_path)
-    
+
     # Verifica dimensione
     size_mb = dev_env.db_path.stat().st_size / (1024 * 1024)
-    print(f"✅ Database sviluppo aggiornato ({size_mb:.2f}MB)")
+    print(f"✅ Database {dev_env.name} aggiornato ({size_mb:.2f}MB)")
     print(f"   Ora puoi lavorare su: {dev_env.db_path}")
-    
+
     return True
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggiorna il DB sviluppo/staging da produzione")
+    parser.add_argument("--env", choices=["development", "staging"], default="development",
+                        help="Ambiente destinazione (default: development)")
+    parser.add_argument("--full", action="store_true", help="Copia completa del file")
+    parser.add_argument("--backup", action="store_true", help="Backup del DB destinazione anche nel sync")
+    args = parser.parse_args()
+
     print("="*60)
-    print("COPIA DATABASE: PRODUZIONE → SVILUPPO")
+    print(f"COPIA DATABASE: PRODUZIONE → {args.env.upper()}")
     print("="*60)
     print()
-    
-    response = input("⚠️  Il DB sviluppo corrente sarà sovrascritto. Continuare? (y/n): ")
-    
+
+    response = input(f"⚠️  I dati del DB {args.env} saranno sovrascritti. Continuare? (y/n): ")
+
     if response.lower() == 'y':
-        copy_prod_to_dev()
+        copy_prod_to_dev(args.env, full=args.full, backup=args.backup or None)
     else:
-        print("Operazione annullata.")
\ No newline at end of file
+        print("Operazione annullata.")
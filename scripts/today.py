@@ -0,0 +1,21 @@
+"""
+Somministrazioni previste oggi e in ritardo (sostituisce list_today_admins.py).
+
+Wrapper di ``python -m peptide_manager.today``: legge lo snapshot accanto
+al database e ricalcola solo se è obsoleto.
+
+Uso:
+    python scripts/today.py                  # ambiente da .env
+    python scripts/today.py --env staging
+    python scripts/today.py --env production --json
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from peptide_manager.today import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,6 +13,7 @@ setup(
     entry_points={
         'console_scripts': [
             'peptide-manager=cli.main:cli',
+            'peptide-today=peptide_manager.today:main',
         ],
     },
     author='Your Name',
@@ -0,0 +1,80 @@
+"""
+Test per il backup online (peptide_manager/backup.py).
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from peptide_manager.backup import DatabaseBackupManager, create_backup_on_exit
+
+
+class TestOnlineBackup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'app.db'
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)')
+        conn.executemany(
+            'INSERT INTO t (payload) VALUES (?)', [('x' * 500,) for _ in range(2000)]
+        )
+        conn.commit()
+        conn.close()
+        self.manager = DatabaseBackupManager(self.db_path, backup_dir=self.tmp / 'bk')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _rows(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_paged_backup_reports_progress_and_is_verified(self):
+        steps = []
+        path = self.manager.create_backup(
+            label='manual', progress=lambda done, total: steps.append((done, total)),
+            step_pages=16,
+        )
+        self.assertGreater(len(steps), 1)
+        self.assertEqual(steps[-1][0], steps[-1][1])
+        self.assertEqual(self._rows(path), 2000)
+        self.assertEqual(list(self.manager.backup_dir.glob('*.tmp')), [])
+
+    def test_uncommitted_writes_are_not_captured(self):
+        writer = sqlite3.connect(self.db_path)
+        writer.execute('DELETE FROM t WHERE id > 10')
+        try:
+            path = self.manager.create_backup(label='during_write')
+        finally:
+            writer.rollback()
+            writer.close()
+        self.assertEqual(self._rows(path), 2000)
+
+    def test_background_job(self):
+        job = self.manager.start_backup(label='bg', cleanup=True)
+        path = job.wait(timeout=30)
+        self.assertTrue(job.done)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self._rows(path), 2000)
+
+        job = create_backup_on_exit(self.db_path, wait=False, backup_dir=self.tmp / 'exit')
+        self.assertIsNotNone(job.wait(timeout=30))
+
+    def test_missing_database(self):
+        manager = DatabaseBackupManager(self.tmp / 'missing.db', backup_dir=self.tmp / 'bk')
+        with self.assertRaises(FileNotFoundError):
+            manager.create_backup()
+        job = manager.start_backup()
+        with self.assertRaises(FileNotFoundError):
+            job.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Test per il catalogo dei backup (peptide_manager/backup_catalog.py).
+"""
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from peptide_manager.backup import DatabaseBackupManager, _file_sha256
+from peptide_manager.backup_catalog import CATALOG_NAME, BackupCatalog
+
+
+def _legacy_keep(backups, now, daily_days=30, weekly_weeks=12, monthly_months=12):
+    """Retention calcolata come faceva il codice basato sui nomi file."""
+    daily_cutoff = now - timedelta(days=daily_days)
+    weekly_cutoff = now - timedelta(weeks=weekly_weeks)
+    monthly_cutoff = now - timedelta(days=monthly_months * 30)
+    keep, seen = set(), set()
+    for path, ts in backups:
+        if ts >= daily_cutoff:
+            key = ('d', ts.date())
+        elif ts >= weekly_cutoff:
+            key = ('w', ts.year, ts.isocalendar()[1])
+        elif ts >= monthly_cutoff:
+            key = ('m', ts.year, ts.month)
+        else:
+            continue
+        if key not in seen:
+            keep.add(path)
+            seen.add(key)
+    return keep
+
+
+class TestBackupCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'app.db'
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)')
+        conn.execute('CREATE TABLE schema_migrations (migration_name TEXT PRIMARY KEY)')
+        conn.executemany(
+            'INSERT INTO schema_migrations VALUES (?)',
+            [('001_create_base_schema',), ('024_add_preparation_events',)],
+        )
+        conn.executemany('INSERT INTO t (payload) VALUES (?)', [('x' * 100,)] * 200)
+        conn.commit()
+        conn.close()
+        self.backup_dir = self.tmp / 'bk'
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_backup_is_recorded_with_hash_schema_and_verification(self):
+        manager = DatabaseBackupManager(self.db_path, backup_dir=self.backup_dir)
+        path = Path(manager.create_backup(label='manual'))
+
+        entry = manager.catalog.entries()[0]
+        self.assertEqual(self.backup_dir / entry['path'], path)
+        self.assertEqual(entry['label'], 'manual')
+        self.assertEqual(entry['sha256'], _file_sha256(path))
+        self.assertEqual(entry['schema_version'], '024_add_preparation_events')
+        self.assertEqual(entry['verified'], 'ok')
+
+        stats = manager.get_backup_stats()
+        self.assertEqual(stats['total_count'], 1)
+        self.assertAlmostEqual(stats['total_size_mb'], path.stat().st_size / 1024 / 1024)
+
+    def test_legacy_directory_is_imported_and_rebuilt(self):
+        self.backup_dir.mkdir()
+        for stamp in ('20240101_080000_auto', '20240301_090000_manual'):
+            shutil.copy(self.db_path, self.backup_dir / f'peptide_management_backup_{stamp}.db')
+        (self.backup_dir / 'peptide_management_backup_broken.db').write_bytes(b'')
+
+        manager = DatabaseBackupManager(self.db_path, backup_dir=self.backup_dir)
+        self.assertTrue((self.backup_dir / CATALOG_NAME).exists())
+        backups = manager.get_all_backups()
+        self.assertEqual([ts for _, ts in backups],
+                         [datetime(2024, 3, 1, 9), datetime(2024, 1, 1, 8)])
+        self.assertIsNone(manager.catalog.entries()[0]['sha256'])
+
+        self.assertEqual(manager.rebuild_catalog(verify=True), 2)
+        entry = manager.catalog.entries()[0]
+        self.assertEqual(entry['label'], 'manual')
+        self.assertEqual(entry['verified'], 'ok')
+        self.assertEqual(entry['schema_version'], '024_add_preparation_events')
+
+        # Un secondo manager non reimporta: legge il catalogo
+        self.assertFalse(BackupCatalog(self.backup_dir).created)
+
+    def test_retention_query_matches_policy(self):
+        manager = DatabaseBackupManager(self.db_path, backup_dir=self.backup_dir)
+        now = datetime.now().replace(microsecond=0)
+        backups = []
+        for hours in range(0, 24 * 500, 17):
+            ts = now - timedelta(hours=hours)
+            path = self.backup_dir / f"peptide_management_backup_{ts:%Y%m%d_%H%M%S}_auto.db"
+            manager.catalog.record(path, ts, 'auto', stored_bytes=10)
+            backups.append((path, ts))
+
+        keep, delete = manager.catalog.retention(
+            now - timedelta(days=30), now - timedelta(weeks=12), now - timedelta(days=360)
+        )
+
+        self.assertEqual(set(keep), _legacy_keep(backups, now))
+        self.assertEqual(len(keep) + len(delete), len(backups))
+
+        result = manager.cleanup_old_backups()
+        self.assertEqual(result['deleted'], len(delete))
+        self.assertEqual(result['total_size_freed'], 10 * len(delete))
+        self.assertEqual(manager.get_backup_stats()['total_count'], len(keep))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Test per l'archivio backup deduplicato (peptide_manager/backup_store.py).
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from peptide_manager.backup import DatabaseBackupManager
+from peptide_manager.backup_store import BackupStore
+
+
+class TestBackupStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'app.db'
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)')
+        # Contenuto poco comprimibile: la dimensione riflette le pagine
+        conn.executemany(
+            'INSERT INTO t (payload) VALUES (?)',
+            [(os.urandom(200).hex(),) for _ in range(2000)],
+        )
+        conn.commit()
+        conn.close()
+        self.store = BackupStore(self.tmp / 'store')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _touch_one_row(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('UPDATE t SET payload = ? WHERE id = 1000', ('changed',))
+        conn.commit()
+        conn.close()
+
+    def test_second_snapshot_stores_only_changed_chunks(self):
+        first = self.store.add_snapshot(self.db_path, 'snap_1')
+        self._touch_one_row()
+        second = self.store.add_snapshot(self.db_path, 'snap_2')
+
+        db_size = self.db_path.stat().st_size
+        self.assertGreater(first['new_bytes'], db_size // 2)
+        # Una riga cambiata: pochi chunk nuovi, non l'intero database
+        self.assertLess(second['new_bytes'], db_size // 20)
+        self.assertEqual(len(first['chunks']), len(second['chunks']))
+
+    def test_restore_reassembles_identical_file(self):
+        self.store.add_snapshot(self.db_path, 'snap_1')
+        target = self.store.restore('snap_1', self.tmp / 'restored.db')
+
+        self.assertEqual(target.read_bytes(), self.db_path.read_bytes())
+
+    def test_restore_detects_corrupted_chunk(self):
+        manifest = self.store.add_snapshot(self.db_path, 'snap_1')
+        chunk = self.store._find_chunk(manifest['chunks'][0])
+        chunk.write_bytes(self.store._find_chunk(manifest['chunks'][1]).read_bytes())
+
+        with self.assertRaises(IOError):
+            self.store.restore('snap_1', self.tmp / 'restored.db')
+        self.assertFalse((self.tmp / 'restored.db').exists())
+
+    def test_gc_keeps_shared_chunks_and_frees_the_rest(self):
+        self.store.add_snapshot(self.db_path, 'snap_1')
+        self._touch_one_row()
+        self.store.add_snapshot(self.db_path, 'snap_2')
+
+        self.assertEqual(self.store.gc()['deleted'], 0)
+        self.store.delete('snap_1')
+        result = self.store.gc()
+
+        self.assertGreater(result['deleted'], 0)
+        self.assertEqual(self.store.list_snapshots(), ['snap_2'])
+        restored = self.store.restore('snap_2', self.tmp / 'restored.db')
+        self.assertEqual(restored.read_bytes(), self.db_path.read_bytes())
+
+    def test_lzma_codec_reads_zlib_chunks(self):
+        self.store.add_snapshot(self.db_path, 'snap_1')
+        store = BackupStore(self.tmp / 'store', codec='lzma')
+        self._touch_one_row()
+        store.add_snapshot(self.db_path, 'snap_2')
+
+        self.assertTrue(list(store.chunk_dir.glob('*/*.xz')))
+        restored = store.restore('snap_2', self.tmp / 'restored.db')
+        self.assertEqual(restored.read_bytes(), self.db_path.read_bytes())
+        with self.assertRaises(ValueError):
+            BackupStore(self.tmp / 'store', codec='zstd')
+
+
+class TestManagerWithStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'app.db'
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)')
+        conn.executemany(
+            'INSERT INTO t (payload) VALUES (?)', [('x' * 500,) for _ in range(500)]
+        )
+        conn.commit()
+        conn.close()
+        self.manager = DatabaseBackupManager(
+            self.db_path, backup_dir=self.tmp / 'bk', store=True
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_backup_is_a_manifest_and_restores(self):
+        path = Path(self.manager.create_backup(label='manual'))
+
+        self.assertEqual(path.suffix, '.json')
+        self.assertEqual(list((self.tmp / 'bk').glob('peptide_management_backup_*.db')), [])
+        self.assertEqual(self.manager.get_all_backups()[0][0], path)
+
+        target = self.tmp / 'restored.db'
+        self.assertTrue(self.manager.restore_backup(path, target))
+        conn = sqlite3.connect(target)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 500)
+        conn.close()
+
+    def test_retention_deletes_manifests_and_collects_chunks(self):
+        store = self.manager.store
+        old = datetime.now() - timedelta(days=400)
+        for days in (0, 1):
+            stamp = (old + timedelta(days=days)).strftime('%Y%m%d_%H%M%S')
+            store.add_snapshot(self.db_path, f'peptide_management_backup_{stamp}_auto')
+        self.manager.rebuild_catalog()
+        # Stesso contenuto: i due snapshot condividono tutti i chunk
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE t SET payload = 'y' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        self.manager.create_backup(label='recent')
+
+        result = self.manager.cleanup_old_backups()
+
+        self.assertEqual(result['kept'], 1)
+        self.assertEqual(result['deleted'], 2)
+        self.assertGreater(result['total_size_freed'], 0)
+        self.assertEqual(len(store.list_snapshots()), 1)
+        self.assertEqual(store.gc()['deleted'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Test per il bus di notifica modifiche (peptide_manager/events.py).
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from peptide_manager import PeptideManager
+from peptide_manager.database import init_database
+from peptide_manager.events import ChangeEvent
+
+
+class TestChangeBus(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        init_database(self.temp_db.name).close()
+        self.manager = PeptideManager(self.temp_db.name)
+        self.events = []
+        self.manager.changes.subscribe(self.events.extend)
+
+    def tearDown(self):
+        self.manager.close()
+        os.unlink(self.temp_db.name)
+
+    def test_commit_publishes_table_ids_and_op(self):
+        sid = self.manager.add_supplier('Lab')
+        self.assertEqual(self.events, [ChangeEvent('suppliers', frozenset({sid}), 'insert')])
+
+        self.events.clear()
+        conn = self.manager.conn
+        conn.execute("INSERT INTO suppliers (name) VALUES ('Other')")
+        conn.execute("UPDATE suppliers SET country = 'IT'")
+        conn.execute("DELETE FROM suppliers WHERE id = ?", (sid,))
+        conn.commit()
+        by_op = {e.op: e for e in self.events}
+        self.assertEqual(set(by_op), {'insert', 'update', 'delete'})
+        self.assertEqual(len(by_op['update'].ids), 2)
+        self.assertEqual(by_op['delete'].ids, frozenset({sid}))
+        self.assertTrue(all(e.table == 'suppliers' for e in self.events))
+
+    def test_rollback_publishes_nothing(self):
+        self.manager.conn.execute("INSERT INTO suppliers (name) VALUES ('X')")
+        self.manager.conn.rollback()
+        self.manager.conn.commit()
+        self.assertEqual(self.events, [])
+
+    def test_commit_without_changes_is_silent(self):
+        self.manager.get_suppliers()
+        self.manager.conn.commit()
+        self.assertEqual(self.events, [])
+
+    def test_subscription_filtered_by_table(self):
+        peptides = []
+        unsubscribe = self.manager.changes.subscribe(peptides.extend, tables={'peptides'})
+        self.manager.add_supplier('Lab')
+        self.assertEqual(peptides, [])
+        self.manager.conn.execute("INSERT INTO peptides (id, name) VALUES (101, 'BPC-157')")
+        self.manager.conn.commit()
+        self.assertEqual([e.table for e in peptides], ['peptides'])
+
+        unsubscribe()
+        self.manager.conn.execute("DELETE FROM peptides WHERE id = 101")
+        self.manager.conn.commit()
+        self.assertEqual(len(peptides), 1)
+
+    def test_external_write_detected_by_data_version(self):
+        self.assertFalse(self.manager.changes.poll_external())
+        other = sqlite3.connect(self.temp_db.name)
+        other.execute("INSERT INTO suppliers (name) VALUES ('Script')")
+        other.commit()
+        other.close()
+
+        self.assertTrue(self.manager.changes.poll_external())
+        self.assertEqual(self.events, [ChangeEvent(None, frozenset(), 'external')])
+        self.assertTrue(self.events[0].touches({'peptides'}))
+        # Le scritture proprie non contano come esterne
+        self.manager.add_supplier('Own')
+        self.assertFalse(self.manager.changes.poll_external())
+
+    def test_failing_subscriber_does_not_break_commit(self):
+        def broken(events):
+            raise RuntimeError('boom')
+
+        self.manager.changes.subscribe(broken)
+        with self.assertLogs('peptide_manager.events', level='ERROR'):
+            sid = self.manager.add_supplier('Lab')
+        self.assertIsNotNone(self.manager.get_supplier_by_id(sid))
+        self.assertEqual(len(self.events), 1)
+
+    def test_read_only_manager_has_no_tracking(self):
+        reader = PeptideManager(self.temp_db.name, read_only=True)
+        try:
+            tables = reader.conn.execute(
+                "SELECT name FROM sqlite_temp_master WHERE type = 'trigger'"
+            ).fetchall()
+            self.assertEqual(tables, [])
+        finally:
+            reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Test per il journal persistente delle modifiche (peptide_manager/change_log.py).
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from peptide_manager.change_log import CHANGE_LOG_TABLES, ChangeLog
+from peptide_manager.database import init_database
+
+
+class TestChangeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        # Connessione semplice: con un PeptideManager la schedule cache
+        # consumerebbe e compatterebbe il journal dopo ogni commit
+        self.conn = init_database(self.temp_db.name)
+        self.log = ChangeLog(self.conn)
+        self.supplier_id = self.conn.execute(
+            "INSERT INTO suppliers (name) VALUES ('Lab')"
+        ).lastrowid
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        os.unlink(self.temp_db.name)
+
+    def _add_batch(self, name='BPC-157 5mg'):
+        cur = self.conn.execute(
+            "INSERT INTO batches (supplier_id, product_name, vials_count, vials_remaining) "
+            "VALUES (?, ?, 5, 5)",
+            (self.supplier_id, name),
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def test_triggers_on_core_tables_only(self):
+        names = {
+            row[0] for row in self.conn.execute(
+                "SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' "
+                "AND name LIKE 'trg_change_log_%'"
+            )
+        }
+        self.assertEqual(names, set(CHANGE_LOG_TABLES))
+        # suppliers non è tracciata
+        self.assertEqual(self.log.since(0), [])
+
+    def test_since_cursor_returns_ordered_deltas(self):
+        batch_id = self._add_batch()
+        cursor = self.log.head()
+        self.conn.execute("UPDATE batches SET vials_remaining = 4 WHERE id = ?", (batch_id,))
+        other_id = self._add_batch('TB-500')
+        self.conn.execute("DELETE FROM batches WHERE id = ?", (other_id,))
+        self.conn.commit()
+
+        entries = self.log.since(cursor)
+        self.assertEqual(
+            [(e.table, e.row_id, e.op) for e in entries],
+            [('batches', batch_id, 'update'), ('batches', other_id, 'insert'),
+             ('batches', other_id, 'delete')],
+        )
+        self.assertEqual([e.seq for e in entries], sorted(e.seq for e in entries))
+        self.assertEqual(self.log.head(), entries[-1].seq)
+        self.assertEqual(len(self.log.since(cursor, limit=1)), 1)
+        self.assertEqual(self.log.since(cursor, tables={'cycles'}), [])
+
+        changed = self.log.changed_rows(cursor)
+        self.assertEqual(changed['batches'].upserted, {batch_id})
+        self.assertEqual(changed['batches'].deleted, {other_id})
+
+    def test_rollback_leaves_no_entries(self):
+        self.conn.execute(
+            "INSERT INTO batches (supplier_id, product_name, vials_count) VALUES (?, 'X', 1)",
+            (self.supplier_id,),
+        )
+        self.conn.rollback()
+        self.assertEqual(self.log.since(0), [])
+
+    def test_writes_from_other_connections_are_logged(self):
+        other = sqlite3.connect(self.temp_db.name)
+        other.execute(
+            "INSERT INTO batches (supplier_id, product_name, vials_count) VALUES (?, 'X', 1)",
+            (self.supplier_id,),
+        )
+        other.commit()
+        other.close()
+        self.assertEqual([e.op for e in self.log.since(0)], ['insert'])
+
+    def test_compact_keeps_latest_change_per_row(self):
+        batch_id = self._add_batch()
+        for remaining in (4, 3, 2):
+            self.conn.execute(
+                "UPDATE batches SET vials_remaining = ? WHERE id = ?", (remaining, batch_id)
+            )
+        self.conn.commit()
+        other_id = self._add_batch('TB-500')
+        head = self.log.head()
+        before = self.log.changed_rows(0)
+
+        self.assertEqual(self.log.compact(), 3)
+        self.assertEqual(self.log.changed_rows(0), before)
+        self.assertEqual(len(self.log.since(0)), 2)
+
+        # Tutto elaborato: journal vuoto, ma seq non riparte da capo
+        self.assertEqual(self.log.compact(upto=head), 2)
+        self.assertEqual(self.log.since(0), [])
+        self.assertEqual(self.log.head(), head)
+        self.conn.execute("DELETE FROM batches WHERE id = ?", (other_id,))
+        self.conn.commit()
+        self.assertEqual(self.log.since(0)[0].seq, head + 1)
+
+    def test_compact_consumed_stops_at_slowest_consumer(self):
+        self.assertEqual(self.log.compact_consumed(), 0)  # nessun consumatore
+        first = self._add_batch()
+        cursor = self.log.head()
+        self.log.ack('cache', self.log.head())
+        self.log.ack('export', cursor)
+        self._add_batch('TB-500')
+        self.log.ack('cache', self.log.head())
+        self.conn.commit()
+
+        self.assertEqual(self.log.consumers(), {'cache': self.log.head(), 'export': cursor})
+        self.assertEqual(self.log.compact_consumed(), 1)
+        self.assertNotIn(first, self.log.changed_rows(0)['batches'].upserted)
+        self.assertEqual(len(self.log.since(cursor)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for the cached compendium index (gui_qt/compendium.py).
+
+WHY this matters: the Archive details dialog reads the reference sections
+from a cache file. A cache that outlives an edit of the markdown would show
+stale dosing data; one invalidated by a mere checkout would re-parse on
+every launch.
+"""
+
+import json
+import os
+
+from gui_qt import compendium
+from gui_qt.compendium import Compendium, build_index, load_index
+
+_DOC = """# Compendio
+
+## Guarigione
+
+### BPC-157
+| Campo | Dettagli |
+|---|---|
+| **Dose** | 250 mcg |
+
+---
+
+### TB-500 (Thymosin Beta-4)
+- Recupero tessuti
+"""
+
+
+def _write(tmp_path, text=_DOC):
+    path = tmp_path / "COMPENDIO_PEPTIDI.md"
+    path.write_text(text, encoding="utf-8")
+    return [path]
+
+
+def test_index_covers_header_aliases_and_db_aliases(tmp_path):
+    files = _write(tmp_path)
+    comp = Compendium(build_index(files))
+
+    assert len(comp) == 2
+    assert comp.lookup("bpc 157").startswith("### BPC-157")
+    assert comp.lookup("Thymosin beta 4") == comp.lookup("TB-500")
+    # Alias dalla tabella peptide_aliases
+    assert comp.lookup("Pentadeca Arginate", aliases=["BPC157"]).startswith("### BPC-157")
+    # Fallback parziale
+    assert comp.lookup("BPC-157 Arginate").startswith("### BPC-157")
+    assert comp.lookup("Semaglutide") is None
+
+    html = comp.html("TB-500")
+    assert "<h3>TB-500 (Thymosin Beta-4)</h3>" in html
+    assert "<li>Recupero tessuti</li>" in html
+    assert "<b>Dose</b>" in comp.html("BPC-157")
+
+
+def test_cache_reused_until_content_changes(tmp_path, monkeypatch):
+    files = _write(tmp_path)
+    cache = tmp_path / "cache.json"
+    first = load_index(files, cache)
+    assert cache.exists()
+
+    builds = []
+    real_build = compendium.build_index
+    monkeypatch.setattr(
+        compendium, "build_index", lambda f=None: builds.append(1) or real_build(f)
+    )
+
+    # Stesso contenuto, mtime diverso (checkout): cache ancora valida
+    st = os.stat(files[0])
+    os.utime(files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert load_index(files, cache)["sections"] == first["sections"]
+    assert builds == []
+    # Stamp aggiornato su disco: al prossimo avvio niente hash
+    saved = json.loads(cache.read_text(encoding="utf-8"))["sources"][0]
+    assert saved["mtime_ns"] == os.stat(files[0]).st_mtime_ns
+
+    # Contenuto modificato: ricostruita
+    files[0].write_text(_DOC.replace("250 mcg", "500 mcg"), encoding="utf-8")
+    data = load_index(files, cache)
+    assert builds == [1]
+    assert "500 mcg" in Compendium(data).html("BPC-157")
+    assert json.loads(cache.read_text(encoding="utf-8"))["sources"] == data["sources"]
+
+
+def test_unwritable_cache_still_returns_index(tmp_path):
+    files = _write(tmp_path)
+    data = load_index(files, tmp_path / "missing_dir" / "cache.json")
+    assert Compendium(data).lookup("BPC-157")
@@ -0,0 +1,115 @@
+"""Tests for the model/view DataTable component.
+
+WHY this matters: every list in the GUI goes through DataTable. Views rely
+on ``selected_row()`` returning the *source* row dict even after the user
+sorts or filters, and History hands it a whole DataFrame.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import Qt  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from gui_qt.components.data_table import DataTable  # noqa: E402
+
+
+COLUMNS = [
+    {"key": "id", "label": "ID", "width": 50},
+    {"key": "name", "label": "Nome", "stretch": True},
+    {"key": "dose", "label": "ml", "format": lambda v: f"{v:.2f}"},
+]
+
+ROWS = [
+    {"id": 3, "name": "TB-500", "dose": 0.5},
+    {"id": 1, "name": "BPC-157", "dose": 0.25},
+    {"id": 2, "name": "GHK-Cu", "dose": 1.0},
+]
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+def _cell(table, row, col):
+    return table.model().index(row, col).data()
+
+
+def _select(table, row):
+    table.selectRow(row)
+    return table.selected_row()
+
+
+def test_lazy_format_and_source_order(qapp):
+    table = DataTable(COLUMNS)
+    table.load_data(ROWS)
+    assert table.rowCount() == 3
+    assert [_cell(table, r, 0) for r in range(3)] == ["3", "1", "2"]
+    assert _cell(table, 1, 2) == "0.25"
+    assert table.model().headerData(1, Qt.Horizontal) == "Nome"
+
+
+def test_selected_row_maps_through_sort_and_filter(qapp):
+    table = DataTable(COLUMNS)
+    table.load_data(ROWS)
+
+    table.sortByColumn(0, Qt.AscendingOrder)
+    assert [_cell(table, r, 0) for r in range(3)] == ["1", "2", "3"]
+    assert _select(table, 0) is ROWS[1]
+
+    table.set_filter_text("ghk")
+    assert table.rowCount() == 1
+    assert _select(table, 0) is ROWS[2]
+
+    table.set_filter_text("")
+    table.load_data(ROWS[:2])  # reload resets sorting to source order
+    assert [_cell(table, r, 0) for r in range(2)] == ["3", "1"]
+
+
+def test_numeric_sort_uses_raw_values(qapp):
+    table = DataTable(COLUMNS)
+    table.load_data([{"id": i, "name": "", "dose": 0} for i in (10, 9, 100)])
+    table.sortByColumn(0, Qt.AscendingOrder)
+    assert [_cell(table, r, 0) for r in range(3)] == ["9", "10", "100"]
+
+
+def test_dataframe_source(qapp):
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame(ROWS).assign(extra=[None, float("nan"), "x"])
+    table = DataTable(COLUMNS + [{"key": "extra", "label": "Extra"}])
+    table.load_data(df)
+
+    assert _cell(table, 0, 1) == "TB-500"
+    assert _cell(table, 1, 3) == ""  # NaN → vuoto
+    row = _select(table, 2)
+    assert row["name"] == "GHK-Cu" and row["extra"] == "x"
+
+
+def test_row_subset_combines_with_sort_and_filter(qapp):
+    table = DataTable(COLUMNS)
+    table.load_data(ROWS)
+    table.set_row_subset([0, 2])
+    assert [_cell(table, r, 1) for r in range(table.rowCount())] == ["TB-500", "GHK-Cu"]
+
+    table.sortByColumn(2, Qt.DescendingOrder)
+    assert [_cell(table, r, 1) for r in range(table.rowCount())] == ["GHK-Cu", "TB-500"]
+    table.set_filter_text("tb")
+    assert _select(table, 0) is ROWS[0]
+
+    table.set_filter_text("")
+    table.set_row_subset(None)
+    assert table.rowCount() == 3
+
+
+def test_double_click_emits_row(qapp):
+    table = DataTable(COLUMNS)
+    table.load_data(ROWS)
+    got = []
+    table.row_double_clicked.connect(got.append)
+    table.doubleClicked.emit(table.model().index(1, 1))
+    assert got == [ROWS[1]]
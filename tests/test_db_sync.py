@@ -0,0 +1,132 @@
+"""
+Test per il sync incrementale prod → dev (peptide_manager/db_sync.py).
+"""
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from peptide_manager.database import init_database
+from peptide_manager.db_sync import RangeTree, SchemaMismatchError, sync_database, table_tree
+
+
+class TestDbSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.prod = self.tmp / 'prod.db'
+        self.dev = self.tmp / 'dev.db'
+        conn = init_database(self.prod)
+        conn.execute("INSERT INTO suppliers (id, name) VALUES (1, 'Lab')")
+        conn.executemany(
+            "INSERT INTO batches (supplier_id, product_name, vials_count) VALUES (1, ?, 5)",
+            [(f'P{i}',) for i in range(2000)],
+        )
+        conn.commit()
+        conn.close()
+        shutil.copy(self.prod, self.dev)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _dump(self, path, table):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute(f'SELECT rowid, * FROM {table} ORDER BY rowid').fetchall()
+        finally:
+            conn.close()
+
+    def _prod_writes(self):
+        conn = sqlite3.connect(self.prod)
+        conn.execute("UPDATE batches SET vials_remaining = 3 WHERE id IN (10, 1500)")
+        conn.execute("DELETE FROM batches WHERE id = 700")
+        conn.execute("INSERT INTO batches (supplier_id, product_name, vials_count) VALUES (1, 'New', 1)")
+        conn.commit()
+        conn.close()
+
+    def test_only_changed_ranges_are_copied(self):
+        self._prod_writes()
+        # Modifica locale in dev: viene riallineata
+        conn = sqlite3.connect(self.dev)
+        conn.execute("UPDATE suppliers SET name = 'Dev' WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        report = sync_database(self.prod, self.dev, range_rows=64)
+
+        # 4 intervalli toccati su 32: 10, 700, 1500 e la nuova riga
+        self.assertEqual(report['tables']['batches']['ranges'], 4)
+        self.assertLess(report['tables']['batches']['rows'], 4 * 64)
+        self.assertIn('suppliers', report['tables'])
+        for table in ('batches', 'suppliers', 'change_log'):
+            self.assertEqual(self._dump(self.dev, table), self._dump(self.prod, table), table)
+        sequences = [sorted(r[1:] for r in self._dump(p, 'sqlite_sequence')) for p in (self.prod, self.dev)]
+        self.assertEqual(sequences[0], sequences[1])
+
+        again = sync_database(self.prod, self.dev, range_rows=64)
+        self.assertEqual(again['tables'], {})
+
+    def test_dry_run_writes_nothing(self):
+        self._prod_writes()
+        before = self._dump(self.dev, 'batches')
+        report = sync_database(self.prod, self.dev, dry_run=True)
+        self.assertIn('batches', report['tables'])
+        self.assertEqual(self._dump(self.dev, 'batches'), before)
+
+    def test_schema_difference_aborts_without_writing(self):
+        conn = sqlite3.connect(self.dev)
+        conn.execute("ALTER TABLE batches ADD COLUMN dev_only TEXT")
+        conn.execute("CREATE TABLE scratch (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+        self._prod_writes()
+        before = {t: self._dump(self.dev, t) for t in ('batches', 'suppliers')}
+
+        with self.assertRaises(SchemaMismatchError) as ctx:
+            sync_database(self.prod, self.dev)
+
+        self.assertIn(('table', 'batches'), ctx.exception.diff.changed)
+        self.assertIn(('table', 'scratch'), ctx.exception.diff.only_target)
+        self.assertEqual({t: self._dump(self.dev, t) for t in before}, before)
+
+    def test_migration_registry_and_schedule_cache_stay_local(self):
+        conn = sqlite3.connect(self.dev)
+        conn.execute("INSERT INTO schema_migrations (migration_name) VALUES ('999_dev_only')")
+        conn.execute("INSERT INTO schedule_cache (date, cycle_id, peptide_id, dose_mcg) "
+                     "VALUES ('2026-01-01', 1, 1, 250)")
+        conn.execute("UPDATE schedule_cache_state SET horizon_start = '2026-01-01', "
+                     "horizon_end = '2026-03-01', cursor = 5")
+        conn.execute("INSERT INTO change_log_consumers (name, cursor) VALUES ('schedule_cache', 5)")
+        conn.commit()
+        conn.close()
+        self._prod_writes()
+        migrations = self._dump(self.dev, 'schema_migrations')
+
+        report = sync_database(self.prod, self.dev)
+
+        self.assertIn('batches', report['tables'])
+        self.assertEqual(self._dump(self.dev, 'schema_migrations'), migrations)
+        self.assertEqual(len(self._dump(self.dev, 'schedule_cache')), 1)
+        # Cache invalidata: ricostruita dal prossimo sync
+        state = self._dump(self.dev, 'schedule_cache_state')[0]
+        self.assertEqual(state[3:], (None, None, 0))
+        self.assertEqual(self._dump(self.dev, 'change_log_consumers'), [])
+
+    def test_tree_diff_descends_to_changed_leaves(self):
+        leaves = {k: bytes([k % 256]) * 16 for k in range(1000)}
+        changed = {**leaves, 3: b'x' * 16, 999: b'y' * 16}
+        del changed[500]
+        self.assertEqual(RangeTree(leaves, 0).diff(RangeTree(changed, 0)), [3, 500, 999])
+        self.assertEqual(RangeTree(leaves, 0).diff(RangeTree(dict(leaves), 0)), [])
+
+        conn = sqlite3.connect(self.prod)
+        tree = table_tree(conn, 'main', 'batches', range_rows=100)
+        conn.close()
+        self.assertEqual(tree.rows, 2000)
+        self.assertEqual(len(tree.leaves), 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the Peptide Report charts (gui_qt/views/history_charts.py).
+
+WHY this matters: charts are rendered off the GUI thread and cached by a
+fingerprint of the report data; a key that ignores a data change would show
+(and export) an outdated chart, and a bad downsampling would hide peaks.
+"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+pytest.importorskip("matplotlib")
+np = pytest.importorskip("numpy")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from gui_qt.views import history_charts  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+def _data(n=3, dose=0.25):
+    admins = [
+        {"date": f"2025-01-{d + 1:02d}", "dose_ml": dose, "dose_mcg": 250.0,
+         "cycle_id": 1, "cycle_name": "C1"}
+        for d in range(n)
+    ]
+    cycles = [{"id": 1, "name": "C1", "status": "active", "start_date": "2025-01-01",
+               "end_date": "2025-01-10", "days_on": 5, "days_off": 2}]
+    return {"administrations": admins, "cycles": cycles}
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    idx = history_charts.lttb_indices(x, y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == 9_999
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx
+    assert len(history_charts.lttb_indices(x[:50], y[:50], 200)) == 50
+
+
+def test_chart_key_tracks_data():
+    base = history_charts.chart_key(1, None, None, _data())
+    assert base == history_charts.chart_key(1, None, None, _data())
+    assert base != history_charts.chart_key(1, None, None, _data(dose=0.3))
+    assert base != history_charts.chart_key(1, "2025-01-01", None, _data())
+
+
+def test_chart_rendered_in_background_and_cached(qapp):
+    data = _data()
+    key = history_charts.chart_key(99, None, None, data)
+    results = []
+    task = history_charts.start_chart(
+        key, data, lambda k, c: results.append((k, c)),
+        lambda k, m: results.append((k, m)),
+    )
+    deadline = time.monotonic() + 30
+    while not results:
+        assert time.monotonic() < deadline, "rendering did not complete"
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+    assert task is not None
+    got_key, chart = results[0]
+    assert got_key == key
+    assert chart.png.startswith(b"\x89PNG")
+    assert history_charts.cached_chart(key) is chart
+    assert chart.b64.startswith("iVBOR")
@@ -0,0 +1,100 @@
+"""Tests for the indexed filters of the History administrations tab.
+
+WHY this matters: filters are now boolean masks cached per value and
+combined by AND on a DataFrame loaded once; a stale or wrong mask would
+silently hide administrations from the history and its KPIs.
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PySide6")
+pd = pytest.importorskip("pandas")
+
+from PySide6.QtCore import QCoreApplication, QDate  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from gui_qt.views import history  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+def _df():
+    rows = [
+        (1, "2025-01-01 08:00:00", "BPC-157", "Addome", "SC", "Recovery", "Dolore (lieve)", 0.2, 500.0),
+        (2, "2025-01-02 08:00:00", "BPC-157, TB-500", "Coscia", "SC", "Recovery", None, 0.3, 750.0),
+        (3, "2025-01-05 21:00:00", "TB-500", "Addome", "IM", "Nessuno", "nota", 0.5, float("nan")),
+        (4, "2025-01-05 22:00:00", "GHK-Cu", None, "SC", "Skin", "DOLORE", 0.1, 200.0),
+    ]
+    df = pd.DataFrame(rows, columns=[
+        "id", "administration_datetime", "peptide_names", "injection_site",
+        "injection_method", "protocol_name", "notes", "dose_ml", "dose_mcg",
+    ])
+    df["date"] = pd.to_datetime(df["administration_datetime"]).dt.date
+    return df
+
+
+def test_masks_are_cached_and_combined(qapp):
+    history._has_pandas()
+    index = history._AdminFilterIndex(_df())
+
+    assert sorted(index.values("injection_site")) == ["Addome", "Coscia"]
+    notes = index.contains("notes", "dolore")
+    assert notes is index.contains("notes", "DOLORE")  # memorizzata
+    assert index.rows([notes]).tolist() == [0, 3]
+    # Sottostringa letterale, non regex
+    assert index.rows([index.contains("notes", "(lieve)")]).tolist() == [0]
+
+    rows = index.rows([
+        index.contains("peptide_names", "BPC-157"),
+        index.equals("injection_site", "Addome"),
+    ])
+    assert rows.tolist() == [0]
+    assert index.rows([index.equals("injection_site", "Altro")]).tolist() == []
+
+    rows = index.rows([index.date_from("2025-01-02"), index.date_to("2025-01-05")])
+    assert rows.tolist() == [1, 2, 3]
+    kpis = index.kpis(rows)
+    assert kpis["count"] == 3 and kpis["days"] == 2
+    assert kpis["total_ml"] == pytest.approx(0.9)
+    assert kpis["total_mcg"] == pytest.approx(950.0)
+    assert (kpis["first"], kpis["last"]) == ("2025-01-02", "2025-01-05")
+
+
+def test_tab_filters_without_reloading_and_debounces_search(qapp, monkeypatch):
+    app = SimpleNamespace(db_path=None, manager=None, edit_mode=False)
+    monkeypatch.setattr(history.AdministrationsTab, "refresh", lambda self: None)
+    tab = history.AdministrationsTab(app)
+    history._has_pandas()
+    tab.render(history._AdminFilterIndex(_df()))
+    assert tab._table.rowCount() == 4
+    assert tab._kpi_count.text() == "4"
+
+    loads = []
+    monkeypatch.setattr(tab._table, "load_data", loads.append)
+    tab._f_site.setCurrentIndex(tab._f_site.findData("Addome"))
+    assert tab._table.rowCount() == 2
+    assert tab._table.model().index(1, 0).data() == "3"
+
+    tab._f_notes.setText("dol")
+    assert tab._table.rowCount() == 2          # non ancora applicato
+    assert tab._search_timer.isActive()
+    tab._search_timer.timeout.emit()
+    QCoreApplication.processEvents()
+    assert tab._table.rowCount() == 1
+    assert tab._kpi_count.text() == "1"
+
+    tab._f_from_cb.setChecked(True)
+    tab._f_from.setDate(QDate(2025, 1, 3))
+    assert tab._table.rowCount() == 0
+    assert tab._lbl_range.text() == ""
+
+    tab._reset_filters()
+    assert tab._table.rowCount() == 4
+    assert loads == []                          # DataFrame caricato una volta
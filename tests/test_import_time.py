@@ -0,0 +1,90 @@
+"""
+Regressione sul tempo di import del package (``python -X importtime``).
+
+``import peptide_manager`` non deve caricare modelli, repository o moduli
+pesanti della stdlib; ``PeptideManager`` non deve caricare i domini poco
+usati (planner, template, certificati) finché non servono.
+
+I controlli sui moduli caricati girano sempre; il budget in millisecondi
+dipende dalla macchina e gira solo con ``PEPTIDE_BENCHMARK=1``.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from peptide_manager import manager
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Budget (ms) per ``import peptide_manager``: include la compilazione se il
+# bytecode non è in cache
+PACKAGE_BUDGET_MS = 50
+
+BENCHMARK = bool(os.environ.get('PEPTIDE_BENCHMARK'))
+
+
+def import_profile(statement: str):
+    """
+    Esegue ``statement`` in un interprete nuovo.
+
+    Returns:
+        (moduli caricati, ms cumulativi per modulo da -X importtime).
+        I moduli vengono da ``sys.modules``: quelli importati con
+        importlib.import_module (i lazy import) non compaiono in importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         statement + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return set(result.stdout.split()), times
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_package_import_is_lazy(self):
+        modules, _ = import_profile('import peptide_manager')
+        loaded = {name for name in modules if name.startswith('peptide_manager')}
+        self.assertEqual(loaded, {'peptide_manager'})
+        for heavy in ('decimal', 'dataclasses', 'sqlite3', 'json'):
+            self.assertNotIn(heavy, modules)
+
+    @unittest.skipUnless(BENCHMARK, 'benchmark: PEPTIDE_BENCHMARK=1')
+    def test_package_import_budget(self):
+        _, times = import_profile('import peptide_manager')
+        self.assertLess(times['peptide_manager'], PACKAGE_BUDGET_MS)
+
+    def test_manager_import_skips_models_and_domains(self):
+        modules, _ = import_profile('from peptide_manager import PeptideManager')
+        self.assertIn('peptide_manager.manager', modules)
+        loaded = [
+            name for name in sorted(modules)
+            if name.startswith(('peptide_manager.models', 'peptide_manager.domains'))
+            or name in ('peptide_manager.calculator', 'peptide_manager.mrp', 'decimal')
+        ]
+        self.assertEqual(loaded, [])
+
+    def test_domain_loaded_on_first_access(self):
+        modules, _ = import_profile(
+            'from peptide_manager import PeptideManager\n'
+            'PeptideManager.get_certificates'
+        )
+        domains = {name for name in modules if name.startswith('peptide_manager.domains.')}
+        self.assertEqual(domains, {'peptide_manager.domains.certificates'})
+
+    def test_domain_tables_match_modules(self):
+        for domain, names in manager._DOMAINS.items():
+            self.assertEqual(set(manager.load_domain(domain)), set(names), domain)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Tests for the opt-in refresh/dialog instrumentation (gui_qt/instrumentation.py).
+
+WHY this matters: the profile overlay is how slow tabs are found in real
+usage; SQL run by background fetches must be attributed to the view that
+asked for it, and the hooks must cost nothing when profiling is off.
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+from PySide6.QtWidgets import QApplication, QDialog  # noqa: E402
+
+from peptide_manager.database import init_database  # noqa: E402
+from gui_qt import instrumentation  # noqa: E402
+from gui_qt.views import base  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def profiling(tmp_path):
+    csv_path = tmp_path / "profile.csv"
+    instrumentation.enable(csv_path)
+    yield csv_path
+    instrumentation.disable()
+
+
+@pytest.fixture
+def db_path():
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+    tmp.close()
+    init_database(tmp.name).close()
+    yield tmp.name
+    base.shutdown_loaders()
+    os.unlink(tmp.name)
+
+
+def test_disabled_hooks_record_nothing():
+    assert instrumentation.start("x") is None
+    assert instrumentation.finish(None) is None
+    with instrumentation.measure("x"):
+        pass
+    assert instrumentation.records() == []
+
+
+def test_dialog_methods_are_measured(qapp, profiling):
+    class _ProbeDialog(QDialog):
+        def _build_ui(self):
+            self.items = [object() for _ in range(1000)]
+
+        def _submit(self):
+            return "ok"
+
+    instrumentation.instrument_dialogs()
+    dlg = _ProbeDialog()
+    dlg._build_ui()
+    assert dlg._submit() == "ok"
+
+    names = [r.name for r in instrumentation.records()]
+    assert names == ["_ProbeDialog._build_ui", "_ProbeDialog._submit"]
+    assert instrumentation.records()[0].alloc_kb > 0
+    # Idempotente: una seconda passata non annida i wrapper
+    instrumentation.instrument_dialogs()
+    dlg._submit()
+    assert len(instrumentation.records()) == 3
+
+
+def test_background_refresh_counts_worker_sql_and_updates_overlay(qapp, profiling, db_path):
+    from gui_qt.app import PeptideQtApp
+
+    window = PeptideQtApp(db_path)
+    today = next(window.iter_views())
+    deadline = time.monotonic() + 10
+    while today.is_loading or not instrumentation.records():
+        assert time.monotonic() < deadline, "refresh did not complete"
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+
+    record = instrumentation.records()[-1]
+    assert record.name == "TodayView.refresh"
+    assert record.sql > 0           # query del worker attribuite alla vista
+    assert record.wall_ms > 0
+    assert window._profile_label.text().startswith("TodayView.refresh")
+
+    with open(profiling, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    assert rows[-1]["name"] == "TodayView.refresh"
+    assert int(rows[-1]["sql"]) == record.sql
+
+    window._backup_done = True  # nessun backup su chiusura nel test
+    window.close()
+    window.manager.close()
@@ -0,0 +1,164 @@
+"""
+Test per il motore delle migration (peptide_manager/migrator.py).
+"""
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from peptide_manager import PeptideManager
+from peptide_manager.database import init_database
+from peptide_manager.migrator import BASELINE, MigrationError, Migrator, migration_files
+
+
+class TestMigrator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'test.db'
+        self.migrations = self.tmp / 'migrations'
+        shutil.copytree(migration_files()[0].parent, self.migrations,
+                        ignore=shutil.ignore_patterns('*.py', '__pycache__'))
+        init_database(self.db_path).close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def test_fresh_database_records_every_migration(self):
+        conn = self._connect()
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        self.assertEqual(migrator.applied(), {f.stem for f in migrator.files})
+        self.assertTrue(migrator.is_current())
+        conn.close()
+
+    def test_current_schema_costs_one_query(self):
+        conn = self._connect()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        self.assertEqual(Migrator(conn, self.migrations, verbose=False).migrate(), [])
+        # Le righe '--' sono il PRAGMA interno alla stessa SELECT
+        self.assertEqual(len([s for s in statements if not s.startswith('--')]), 1)
+        conn.close()
+
+    def test_only_pending_migration_is_applied(self):
+        (self.migrations / '999_add_note.sql').write_text(
+            "-- Add note column\nALTER TABLE suppliers ADD COLUMN note2 TEXT;\n"
+        )
+        conn = self._connect()
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        self.assertFalse(migrator.is_current())
+        self.assertEqual(migrator.migrate(), ['999_add_note'])
+        self.assertTrue(migrator.is_current())
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(suppliers)')}
+        self.assertIn('note2', columns)
+        description = conn.execute(
+            "SELECT description FROM schema_migrations WHERE migration_name = '999_add_note'"
+        ).fetchone()[0]
+        self.assertEqual(description, 'Add note column')
+        conn.close()
+
+    def test_failed_migration_rolls_back(self):
+        (self.migrations / '999_broken.sql').write_text(
+            "CREATE TABLE scratch (id INTEGER);\nINSERT INTO missing_table VALUES (1);\n"
+        )
+        conn = self._connect()
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        with self.assertRaises(MigrationError):
+            migrator.migrate()
+        self.assertIsNone(conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'scratch'"
+        ).fetchone())
+        self.assertNotIn('999_broken', migrator.applied())
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], version)
+        self.assertEqual(conn.execute('PRAGMA foreign_keys').fetchone()[0], 0)
+        conn.close()
+
+    def test_unversioned_database_gets_baseline(self):
+        # Database creato dal vecchio init_database: nessun registro, dati presenti
+        conn = self._connect()
+        conn.execute("INSERT INTO suppliers (name) VALUES ('Lab')")
+        conn.execute("DELETE FROM schema_migrations WHERE migration_name != '007_remove_protocol_dose_ml'")
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        baseline, pending = migrator.plan()
+        self.assertTrue(baseline)
+        self.assertTrue(all(f.stem > BASELINE for f in pending))
+
+        migrator.migrate()
+        self.assertTrue(migrator.is_current())
+        self.assertEqual(migrator.applied(), {f.stem for f in migrator.files})
+        self.assertEqual(conn.execute('SELECT name FROM suppliers').fetchone()[0], 'Lab')
+        conn.close()
+
+    def test_unversioned_database_with_script_registry_gets_baseline(self):
+        # Registro scritto da scripts/apply_critical_migrations.py (solo 012 e 015):
+        # 001-006 non vanno rigiocate sui dati esistenti
+        conn = self._connect()
+        conn.execute("INSERT INTO suppliers (name) VALUES ('Lab')")
+        conn.execute("DELETE FROM schema_migrations WHERE migration_name NOT IN "
+                     "('012_add_treatment_planner', '015_add_vendor_pricing')")
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        baseline, pending = migrator.plan()
+        self.assertTrue(baseline)
+        self.assertTrue(all(f.stem > BASELINE for f in pending))
+        conn.close()
+
+        manager = PeptideManager(str(self.db_path))
+        try:
+            self.assertTrue(Migrator(manager.conn, self.migrations, verbose=False).is_current())
+            self.assertEqual(manager.conn.execute('SELECT name FROM suppliers').fetchone()[0], 'Lab')
+        finally:
+            manager.close()
+
+    def test_tolerated_error_skips_only_that_statement(self):
+        (self.migrations / '999_add_columns.sql').write_text(
+            "ALTER TABLE suppliers ADD COLUMN name TEXT;\n"
+            "ALTER TABLE suppliers ADD COLUMN note3 TEXT;\n"
+        )
+        conn = self._connect()
+        migrator = Migrator(conn, self.migrations, verbose=False)
+        self.assertEqual(migrator.migrate(), ['999_add_columns'])
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(suppliers)')}
+        self.assertIn('note3', columns)
+        conn.close()
+
+    def test_manager_startup_migrates_legacy_database(self):
+        # Vecchio avvio: solo resumed_at aggiunto a ogni apertura
+        conn = self._connect()
+        conn.execute('ALTER TABLE cycles DROP COLUMN resumed_at')
+        conn.execute("DELETE FROM schema_migrations WHERE migration_name != '007_remove_protocol_dose_ml'")
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+        conn.close()
+
+        manager = PeptideManager(str(self.db_path))
+        try:
+            self.assertTrue(Migrator(manager.conn, verbose=False).is_current())
+            columns = {row[1] for row in manager.conn.execute('PRAGMA table_info(cycles)')}
+            self.assertIn('resumed_at', columns)
+            self.assertEqual(manager.conn.execute('PRAGMA foreign_keys').fetchone()[0], 1)
+        finally:
+            manager.close()
+
+    def test_init_database_is_idempotent(self):
+        conn = init_database(self.db_path)
+        count = conn.execute('SELECT COUNT(*) FROM schema_migrations').fetchone()[0]
+        conn.close()
+        conn = init_database(self.db_path)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM schema_migrations').fetchone()[0], count)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
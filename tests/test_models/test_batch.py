@@ -551,3 +551,60 @@ class TestBatchRepository:
         
         # Ma con include_deleted sì
         assert repo.count(include_deleted=True) == 1
+
+
+@pytest.fixture
+def full_repo(tmp_path):
+    """Repository su schema completo (composizione, peptidi, preparazioni)."""
+    from peptide_manager.database import init_database
+
+    conn = init_database(str(tmp_path / 'batches.db'))
+    conn.execute("INSERT INTO suppliers (id, name) VALUES (1, 'Lab')")
+    conn.executemany(
+        "INSERT INTO peptides (id, name) VALUES (?, ?)",
+        [(101, 'TB-500'), (102, 'BPC-157'), (103, 'GHK-Cu')],
+    )
+    conn.executemany(
+        "INSERT INTO batches (id, supplier_id, product_name, batch_number, "
+        "vials_count, vials_remaining) VALUES (?, 1, ?, ?, ?, ?)",
+        [(1, 'Blend', 'B1', 5, 3), (2, 'Solo', 'B2', 2, 0), (3, 'Vuoto', 'B3', 1, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO batch_composition (batch_id, peptide_id, mg_per_vial) VALUES (?, ?, ?)",
+        [(1, 101, 5.0), (1, 103, 5.0), (1, 102, 5.0), (2, 102, 10.0)],
+    )
+    conn.executemany(
+        "INSERT INTO preparations (batch_id, vials_used, volume_ml, preparation_date, "
+        "volume_remaining_ml, deleted_at) VALUES (?, 1, 2.0, '2025-01-01', ?, ?)",
+        [(1, 1.5, None), (1, 0.0, None), (1, 2.0, '2025-02-01'), (2, 1.0, None)],
+    )
+    conn.commit()
+    yield BatchRepository(conn)
+    conn.close()
+
+
+class TestBatchSummaries:
+    """Test per BatchRepository.get_summaries (lista batch in una query)."""
+
+    def test_summary_fields(self, full_repo):
+        rows = {r['id']: r for r in full_repo.get_summaries()}
+        assert rows[1]['supplier_name'] == 'Lab'
+        assert rows[1]['peptide_names'] == ['BPC-157', 'GHK-Cu', 'TB-500']
+        # Preparazione eliminata esclusa; una sola con volume residuo
+        assert rows[1]['preparations_count'] == 2
+        assert rows[1]['active_preparations_count'] == 1
+        assert rows[3]['peptide_names'] == []
+        assert rows[3]['preparations_count'] == 0
+
+    def test_single_statement(self, full_repo):
+        statements = []
+        full_repo.conn.set_trace_callback(statements.append)
+        full_repo.get_summaries()
+        full_repo.conn.set_trace_callback(None)
+        assert len(statements) == 1
+
+    def test_filters_match_get_all(self, full_repo):
+        for kwargs in ({}, {'only_available': True}, {'only_depleted': True},
+                       {'search': 'Bl'}, {'supplier_id': 1}):
+            expected = [b.id for b in full_repo.get_all(**kwargs)]
+            assert [r['id'] for r in full_repo.get_summaries(**kwargs)] == expected
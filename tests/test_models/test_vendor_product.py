@@ -236,5 +236,154 @@ class TestVendorProductRepository(unittest.TestCase):
         self.assertEqual(comparisons[1]['supplier_id'], sup_a)
 
 
+class TestPurchaseOptimizer(unittest.TestCase):
+    """Tests for VendorProductRepository.optimize_purchase."""
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.conn = sqlite3.connect(self.temp_db.name)
+        self.conn.row_factory = sqlite3.Row
+        TestVendorProductRepository._create_schema(self)
+        self.conn.executescript('''
+            CREATE TABLE shipments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                supplier_id INTEGER NOT NULL,
+                shipping_cost REAL,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                shipping_date DATE,
+                notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        ''')
+        self.repo = VendorProductRepository(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        os.unlink(self.temp_db.name)
+
+    def _add(self, supplier_id, peptide_id, mg, price, units=1, moq=1, name=None):
+        self.conn.execute("""
+            INSERT INTO vendor_products
+            (supplier_id, product_type, peptide_id, product_name, mg_per_vial,
+             units_per_pack, price, minimum_order_qty, is_available)
+            VALUES (?, 'peptide', ?, ?, ?, ?, ?, ?, 1)
+        """, (supplier_id, peptide_id, name or f"P{peptide_id} {mg}mg", mg, units, price, moq))
+
+    def _seed_catalog(self):
+        cur = self.conn.cursor()
+        ids = {}
+        for name in ('Supplier A', 'Supplier B'):
+            cur.execute("INSERT INTO suppliers (name) VALUES (?)", (name,))
+            ids[name] = cur.lastrowid
+        for name in ('BPC-157', 'TB-500'):
+            cur.execute("INSERT INTO peptides (name) VALUES (?)", (name,))
+            ids[name] = cur.lastrowid
+        return ids
+
+    def test_mixes_vial_sizes_within_supplier(self):
+        ids = self._seed_catalog()
+        sup, bpc = ids['Supplier A'], ids['BPC-157']
+        self._add(sup, bpc, 5.0, 20.0)
+        self._add(sup, bpc, 10.0, 30.0)
+        self.conn.commit()
+
+        # 15mg: 1x10mg + 1x5mg = 50 (vs 2x10mg = 60, 3x5mg = 60)
+        result = self.repo.optimize_purchase({bpc: 15}, shipping_costs={})
+        self.assertEqual(result['total_cost'], Decimal('50'))
+        items = result['suppliers'][0]['items']
+        self.assertEqual(sorted(i['vials'] for i in items), [1, 1])
+
+    def test_respects_pack_size_and_minimum_order(self):
+        ids = self._seed_catalog()
+        sup, bpc = ids['Supplier A'], ids['BPC-157']
+        # Confezione da 10 fiale, ordine minimo 2 confezioni
+        self._add(sup, bpc, 5.0, 100.0, units=10, moq=2)
+        self.conn.commit()
+
+        result = self.repo.optimize_purchase({bpc: 5}, shipping_costs={})
+        item = result['suppliers'][0]['items'][0]
+        self.assertEqual(item['packs'], 2)
+        self.assertEqual(item['vials'], 20)
+        self.assertEqual(result['total_cost'], Decimal('200'))
+
+    def test_shipping_consolidates_suppliers(self):
+        ids = self._seed_catalog()
+        sup_a, sup_b = ids['Supplier A'], ids['Supplier B']
+        bpc, tb = ids['BPC-157'], ids['TB-500']
+        self._add(sup_a, bpc, 5.0, 20.0)
+        self._add(sup_a, tb, 5.0, 30.0)
+        self._add(sup_b, tb, 5.0, 25.0)
+        self.conn.execute(
+            "INSERT INTO shipments (supplier_id, shipping_cost, currency) VALUES (?, 15.0, 'EUR')",
+            (sup_a,)
+        )
+        self.conn.execute(
+            "INSERT INTO shipments (supplier_id, shipping_cost, currency) VALUES (?, 15.0, 'EUR')",
+            (sup_b,)
+        )
+        self.conn.commit()
+
+        # B è più economico su TB (-5) ma una seconda spedizione costa 15
+        result = self.repo.optimize_purchase({bpc: 5, tb: 5})
+        self.assertEqual(len(result['suppliers']), 1)
+        self.assertEqual(result['suppliers'][0]['supplier_id'], sup_a)
+        self.assertEqual(result['total_cost'], Decimal('65'))
+
+        # Senza spedizioni conviene dividere
+        result = self.repo.optimize_purchase({bpc: 5, tb: 5}, shipping_costs={})
+        self.assertEqual(len(result['suppliers']), 2)
+        self.assertEqual(result['total_cost'], Decimal('45'))
+
+    def test_currencies_are_not_mixed(self):
+        ids = self._seed_catalog()
+        sup_a, sup_b = ids['Supplier A'], ids['Supplier B']
+        bpc = ids['BPC-157']
+        self._add(sup_a, bpc, 5.0, 20.0)
+        self.conn.execute(
+            "INSERT INTO shipments (supplier_id, shipping_cost) VALUES (?, 40.0)", (sup_a,)
+        )
+        self.conn.commit()
+
+        # Spedizione in USD (default shipments) ignorata per un catalogo EUR
+        self.assertEqual(self.repo.get_supplier_shipping_costs('EUR'), {})
+        self.assertEqual(self.repo.get_supplier_shipping_costs('USD'), {sup_a: Decimal('40')})
+        result = self.repo.optimize_purchase({bpc: 5})
+        self.assertEqual((result['total_cost'], result['currency']), (Decimal('20'), 'EUR'))
+
+        self._add(sup_b, bpc, 5.0, 10.0)
+        self.conn.execute("UPDATE vendor_products SET currency = 'USD' WHERE supplier_id = ?", (sup_b,))
+        self.conn.commit()
+        with self.assertRaises(ValueError):
+            self.repo.optimize_purchase({bpc: 5})
+        result = self.repo.optimize_purchase({bpc: 5}, currency='USD')
+        self.assertEqual(result['suppliers'][0]['supplier_id'], sup_b)
+        self.assertEqual(result['total_cost'], Decimal('10'))
+
+    def test_greedy_matches_exact_on_small_catalog(self):
+        ids = self._seed_catalog()
+        sup_a, sup_b = ids['Supplier A'], ids['Supplier B']
+        bpc, tb = ids['BPC-157'], ids['TB-500']
+        self._add(sup_a, bpc, 5.0, 20.0)
+        self._add(sup_b, tb, 5.0, 25.0)
+        self.conn.commit()
+
+        exact = self.repo.optimize_purchase({bpc: 10, tb: 10}, shipping_costs={})
+        greedy = self.repo.optimize_purchase(
+            {bpc: 10, tb: 10}, shipping_costs={}, max_exact_suppliers=0
+        )
+        self.assertEqual(exact['total_cost'], greedy['total_cost'])
+        self.assertEqual(exact['total_cost'], Decimal('90'))
+
+    def test_unavailable_peptides_reported(self):
+        ids = self._seed_catalog()
+        self._add(ids['Supplier A'], ids['BPC-157'], 5.0, 20.0)
+        self.conn.commit()
+
+        result = self.repo.optimize_purchase({ids['BPC-157']: 5, ids['TB-500']: 5, 999: 0})
+        self.assertEqual(result['unavailable'], [ids['TB-500']])
+        self.assertEqual(result['total_cost'], Decimal('20'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,188 @@
+"""
+Test per RequirementsPlanner (calendario ordini MRP).
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+from types import SimpleNamespace
+
+from peptide_manager import PeptideManager
+from peptide_manager.database import init_database
+from peptide_manager.mrp import RequirementsPlanner
+
+
+TODAY = date(2026, 1, 5)  # lunedì
+
+
+class TestRequirementsPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.conn = init_database(self.temp_db.name)
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO suppliers (id, name) VALUES (1, 'Lab')")
+        cur.executemany(
+            "INSERT INTO peptides (id, name) VALUES (?, ?)",
+            [(101, 'BPC-157'), (102, 'TB-500')],
+        )
+        # BPC in magazzino: 2 fiale da 5mg
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (1, 1, 'BPC 5mg', 2, 2, 20.0, '2025-12-01')"
+        )
+        cur.execute(
+            "INSERT INTO batch_composition (batch_id, peptide_id, mg_per_vial) "
+            "VALUES (1, 101, 5.0)"
+        )
+        cur.executemany(
+            "INSERT INTO vendor_products (supplier_id, product_type, peptide_id, "
+            "product_name, mg_per_vial, price, lead_time_days, is_available) "
+            "VALUES (1, 'peptide', ?, ?, ?, ?, ?, ?)",
+            [
+                (101, 'BPC 5mg', 5.0, 25.0, 10, 1),
+                (101, 'BPC 5mg slow', 5.0, 20.0, 30, 1),
+                (102, 'TB 10mg', 10.0, 40.0, 3, 0),  # non disponibile
+            ],
+        )
+        self.conn.commit()
+        self.db = SimpleNamespace(conn=self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        os.unlink(self.temp_db.name)
+
+    def _add_plan(self, name, start_date, phases, status='active'):
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT INTO treatment_plans (name, start_date, status) VALUES (?, ?, ?)",
+            (name, start_date, status),
+        )
+        plan_id = cur.lastrowid
+        for number, phase in enumerate(phases, start=1):
+            cur.execute(
+                "INSERT INTO plan_phases (treatment_plan_id, phase_number, phase_name, "
+                "duration_weeks, peptides_config, daily_frequency, status, "
+                "actual_start_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    plan_id, number, f'F{number}', phase['weeks'],
+                    json.dumps(phase['peptides']), phase.get('daily_frequency', 1),
+                    phase.get('status', 'planned'), phase.get('actual_start_date'),
+                ),
+            )
+        self.conn.commit()
+        return plan_id
+
+    def test_netting_against_inventory_and_consolidation(self):
+        # 1mg/giorno BPC per 4 settimane = 7mg/settimana, 10mg disponibili
+        self._add_plan('A', '2026-01-05', [
+            {'weeks': 4, 'peptides': [
+                {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 1000},
+            ]},
+        ])
+        result = RequirementsPlanner(self.db).plan(horizon_weeks=8, today=TODAY)
+
+        bpc = result['peptides'][0]
+        self.assertEqual(bpc['weekly_demand_mg'][:5], [7.0, 7.0, 7.0, 7.0, 0.0])
+        self.assertEqual(bpc['projected_mg'][:2], [3.0, -4.0])
+        self.assertEqual(bpc['first_shortage_week'], '2026-01-12')
+        # Lead time minimo tra i prodotti disponibili
+        self.assertEqual(bpc['lead_time_days'], 10)
+
+        # Un solo lotto copre le settimane 1-3: 4 + 7 + 7 = 18mg → 4 fiale
+        self.assertEqual(len(result['orders']), 1)
+        order = result['orders'][0]
+        self.assertAlmostEqual(order['mg'], 18.0)
+        self.assertEqual(order['vials'], 4)
+        self.assertEqual(order['need_date'], '2026-01-12')
+        # need - 10 giorni cade nel passato: ordine in ritardo, da emettere oggi
+        self.assertTrue(order['late'])
+        self.assertEqual(order['release_date'], '2026-01-05')
+        self.assertEqual(order['plans'], ['A'])
+
+    def test_lot_for_lot_orders(self):
+        self._add_plan('A', '2026-01-05', [
+            {'weeks': 4, 'peptides': [
+                {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 1000},
+            ]},
+        ])
+        result = RequirementsPlanner(self.db).plan(
+            horizon_weeks=8, order_period_weeks=1, today=TODAY
+        )
+        self.assertEqual([o['mg'] for o in result['orders']], [4.0, 7.0, 7.0])
+        self.assertEqual(
+            [o['release_date'] for o in result['orders']],
+            ['2026-01-05', '2026-01-09', '2026-01-16'],
+        )
+
+    def test_default_lead_time_and_future_plan(self):
+        # TB: nessun prodotto disponibile → lead time di default (14 giorni)
+        self._add_plan('B', '2026-03-02', [
+            {'weeks': 2, 'peptides': [
+                {'peptide_id': 102, 'peptide_name': 'TB-500', 'dose_mcg': 2000,
+                 'mg_per_vial': 10.0},
+            ]},
+        ], status='planned')
+        result = RequirementsPlanner(self.db).plan(horizon_weeks=12, today=TODAY)
+
+        order = result['orders'][0]
+        self.assertEqual(order['lead_time_days'], RequirementsPlanner.DEFAULT_LEAD_TIME_DAYS)
+        self.assertEqual(order['need_date'], '2026-03-02')
+        self.assertEqual(order['release_date'], '2026-02-16')
+        self.assertFalse(order['late'])
+        self.assertEqual(order['vials'], 3)  # 28mg / 10mg
+        self.assertEqual(result['calendar'][0]['date'], '2026-02-16')
+
+    def test_phase_not_started_shifts_demand(self):
+        # Piano iniziato in passato: fase 1 completata, fase 2 non ancora avviata
+        self._add_plan('C', '2025-11-03', [
+            {'weeks': 4, 'status': 'completed', 'peptides': [
+                {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 1000},
+            ]},
+            {'weeks': 2, 'peptides': [
+                {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 1000},
+            ]},
+        ])
+        result = RequirementsPlanner(self.db).plan(horizon_weeks=4, today=TODAY)
+        bpc = result['peptides'][0]
+        # La fase 2 parte oggi e non nel passato
+        self.assertEqual(bpc['weekly_demand_mg'], [7.0, 7.0, 0.0, 0.0])
+        self.assertEqual(result['orders'][0]['mg'], 4.0)
+
+    def test_open_preparation_counts_residual_only(self):
+        # Prep da 1 fiala (5mg) a metà: restano 2.5mg, non 5
+        self.conn.execute(
+            "INSERT INTO preparations (batch_id, vials_used, volume_ml, "
+            "volume_remaining_ml, preparation_date) VALUES (1, 1, 2.0, 1.0, '2026-01-01')"
+        )
+        self.conn.commit()
+        self._add_plan('A', '2026-01-05', [
+            {'weeks': 4, 'peptides': [
+                {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 1000},
+            ]},
+        ])
+        result = RequirementsPlanner(self.db).plan(horizon_weeks=8, today=TODAY)
+        bpc = result['peptides'][0]
+        self.assertEqual(bpc['on_hand_mg'], 12.5)
+        self.assertEqual(bpc['projected_mg'][:2], [5.5, -1.5])
+
+    def test_no_plans(self):
+        result = RequirementsPlanner(self.db).plan(horizon_weeks=4, today=TODAY)
+        self.assertEqual(result['orders'], [])
+        self.assertEqual(len(result['week_starts']), 4)
+
+    def test_manager_order_calendar(self):
+        pm = PeptideManager(self.temp_db.name)
+        try:
+            calendar = pm.get_order_calendar(horizon_weeks=4)
+        finally:
+            pm.close()
+        self.assertEqual(calendar['orders'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Test per la sincronizzazione diff-based di plan_resources.
+"""
+
+import os
+import tempfile
+import unittest
+
+from peptide_manager import PeptideManager
+from peptide_manager.database import init_database
+from peptide_manager.models.planner import (
+    ResourceRequirement,
+    ResourceRequirementRepository,
+)
+
+
+PHASES = [
+    {
+        'phase_name': 'Foundation',
+        'duration_weeks': 4,
+        'daily_frequency': 1,
+        'peptides': [
+            {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 250},
+            {'peptide_id': 102, 'peptide_name': 'TB-500', 'dose_mcg': 500},
+        ],
+    },
+]
+
+
+class TestPlanResourcesSync(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        conn = init_database(self.temp_db.name)
+        cur = conn.cursor()
+        cur.execute("INSERT INTO suppliers (id, name) VALUES (1, 'Lab')")
+        cur.executemany(
+            "INSERT INTO peptides (id, name) VALUES (?, ?)",
+            [(101, 'BPC-157'), (102, 'TB-500')],
+        )
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (1, 1, 'BPC 5mg', 2, 2, 20.0, '2025-01-01')"
+        )
+        cur.execute(
+            "INSERT INTO batch_composition (batch_id, peptide_id, mg_per_vial) "
+            "VALUES (1, 101, 5.0)"
+        )
+        conn.commit()
+        conn.close()
+
+        self.pm = PeptideManager(self.temp_db.name)
+        self.repo = ResourceRequirementRepository(self.pm.db)
+        self.plan_id = self.pm.create_treatment_plan('Plan', '2026-01-05', PHASES)['plan_id']
+
+    def tearDown(self):
+        self.pm.close()
+        os.unlink(self.temp_db.name)
+
+    def _rows(self):
+        return {
+            (r.resource_type, r.resource_name): r
+            for r in self.repo.get_by_plan(self.plan_id)
+        }
+
+    def test_recalculation_without_changes_is_noop(self):
+        before = {k: r.id for k, r in self._rows().items()}
+        self.assertIn(('peptide', 'BPC-157'), before)
+
+        requirements = self.pm._build_plan_requirements(
+            self.plan_id, self.pm.update_plan_resources(self.plan_id)
+        )
+        counts = self.repo.sync_plan(self.plan_id, requirements)
+
+        self.assertEqual(counts['inserted'] + counts['updated'] + counts['deleted'], 0)
+        self.assertEqual(counts['unchanged'], len(before))
+        self.assertEqual({k: r.id for k, r in self._rows().items()}, before)
+
+    def test_inventory_change_updates_in_place(self):
+        bpc_id = self._rows()[('peptide', 'BPC-157')].id
+        self.pm.db.conn.execute("UPDATE batches SET vials_remaining = 0 WHERE id = 1")
+        self.pm.db.conn.commit()
+
+        results = self.pm.update_all_plan_resources()
+
+        self.assertEqual(results[self.plan_id]['updated'], 1)
+        self.assertEqual(results[self.plan_id]['inserted'], 0)
+        bpc = self._rows()[('peptide', 'BPC-157')]
+        self.assertEqual(bpc.id, bpc_id)
+        self.assertEqual(float(bpc.quantity_available), 0.0)
+
+    def test_removed_and_new_resources(self):
+        requirements = [
+            r for r in self.pm._build_plan_requirements(
+                self.plan_id,
+                self.pm.update_plan_resources(self.plan_id)
+            )
+            if r.resource_name != 'TB-500'
+        ]
+        requirements.append(ResourceRequirement(
+            treatment_plan_id=self.plan_id, resource_type='peptide',
+            resource_name='GHK-Cu', quantity_needed=10, quantity_unit='mg',
+        ))
+
+        counts = self.repo.sync_plan(self.plan_id, requirements)
+
+        rows = self._rows()
+        self.assertEqual(counts['deleted'], 1)
+        self.assertEqual(counts['inserted'], 1)
+        self.assertNotIn(('peptide', 'TB-500'), rows)
+        self.assertTrue(rows[('peptide', 'GHK-Cu')].needs_ordering)
+
+    def test_sync_uses_single_commit_and_batched_statements(self):
+        self.pm.db.conn.execute("UPDATE batches SET vials_remaining = 1 WHERE id = 1")
+        self.pm.db.conn.commit()
+        requirements = self.pm._build_plan_requirements(
+            self.plan_id,
+            self.pm.update_plan_resources(self.plan_id)
+        )
+        requirements = [r for r in requirements if r.resource_type != 'peptide']
+
+        statements = []
+        self.pm.db.conn.set_trace_callback(statements.append)
+        counts = self.repo.sync_plan(self.plan_id, requirements)
+        self.pm.db.conn.set_trace_callback(None)
+
+        self.assertEqual(counts['deleted'], 2)
+        self.assertEqual(sum(1 for s in statements if s.startswith('COMMIT')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
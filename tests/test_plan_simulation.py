@@ -0,0 +1,177 @@
+"""
+Test per PlanSimulationEngine (what-if vettorizzato).
+"""
+
+import json
+import math
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from peptide_manager import PeptideManager
+from peptide_manager.calculator import ResourcePlanner
+from peptide_manager.database import init_database
+from peptide_manager.models.planner import PlanSimulationRepository
+from peptide_manager.simulation import PlanSimulationEngine
+
+
+PHASES = [
+    {
+        'phase_name': 'Foundation',
+        'duration_weeks': 4,
+        'daily_frequency': 1,
+        'peptides': [
+            {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 250},
+            {'peptide_id': 102, 'peptide_name': 'TB-500', 'dose_mcg': 500,
+             'mg_per_vial': 10.0},
+        ],
+    },
+    {
+        'phase_name': 'Maintenance',
+        'duration_weeks': 2,
+        'five_two_protocol': True,
+        'peptides': [
+            {'peptide_id': 101, 'peptide_name': 'BPC-157', 'dose_mcg': 500,
+             'daily_frequency': 2},
+        ],
+    },
+]
+
+
+class TestPlanSimulationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.conn = init_database(self.temp_db.name)
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO suppliers (name) VALUES ('Lab')")
+        cur.executemany(
+            "INSERT INTO peptides (id, name) VALUES (?, ?)",
+            [(101, 'BPC-157'), (102, 'TB-500')],
+        )
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (1, 1, 'BPC 5mg', 2, 2, 20.0, '2025-01-01')"
+        )
+        cur.execute(
+            "INSERT INTO batch_composition (batch_id, peptide_id, mg_per_vial) "
+            "VALUES (1, 101, 5.0)"
+        )
+        self.conn.commit()
+        self.db = SimpleNamespace(conn=self.conn)
+        self.engine = PlanSimulationEngine(self.db)
+
+    def tearDown(self):
+        self.conn.close()
+        os.unlink(self.temp_db.name)
+
+    def test_identity_scenario_matches_resource_planner(self):
+        expected = ResourcePlanner(self.db).calculate_total_plan_resources(PHASES)
+        results = self.engine.evaluate(PHASES, [{'name': 'base'}])
+        summary = results.scenario_summary(0)
+
+        self.assertEqual(summary['total_injections'], expected['summary']['total_injections'])
+        by_id = {p['resource_id']: p for p in summary['peptides']}
+        for pep in expected['total_peptides']:
+            got = by_id[pep['resource_id']]
+            self.assertAlmostEqual(got['mg_needed'], pep['mg_needed'], places=2)
+            self.assertAlmostEqual(got['mg_available'], pep['mg_available'], places=2)
+            self.assertAlmostEqual(got['mg_gap'], pep['mg_gap'], places=2)
+            self.assertEqual(got['vials_needed'], pep['vials_needed'])
+
+    def test_overrides_and_cost(self):
+        scenarios = [
+            {'name': 'base'},
+            {'name': 'half dose', 'dose_factor': 0.5},
+            {'name': 'long', 'duration_weeks': {1: 8}},
+            {'name': 'big vials', 'mg_per_vial': {101: 10}},
+            {'name': 'freq', 'daily_frequency': {'102': 2}},
+        ]
+        results = self.engine.evaluate(PHASES, scenarios)
+        bpc = results.peptide_keys.index(101)
+        tb = results.peptide_keys.index(102)
+
+        # base BPC: 28*0.25 + 10*2*0.5 = 17mg, disponibili 10mg → gap 7mg
+        self.assertAlmostEqual(results.mg_needed[0, bpc], 17.0)
+        self.assertAlmostEqual(results.mg_gap[0, bpc], 7.0)
+        self.assertEqual(results.vials_to_order[0, bpc], 2)
+        self.assertAlmostEqual(results.cost[0, bpc], 40.0)
+        # TB senza prezzo noto: costo ignoto, escluso dal totale
+        self.assertTrue(math.isnan(results.cost[0, tb]))
+        self.assertAlmostEqual(results.total_cost[0], 40.0)
+
+        self.assertAlmostEqual(results.mg_needed[1, bpc], 8.5)
+        self.assertEqual(results.vials_to_order[1, bpc], 0)
+        self.assertAlmostEqual(results.mg_needed[2, tb], 28.0)
+        self.assertEqual(results.vials_to_order[3, bpc], 1)
+        self.assertAlmostEqual(results.mg_needed[4, tb], 28.0)
+        self.assertEqual(results.best('total_cost'), 1)
+
+    def test_unpriced_purchases_rank_last(self):
+        scenarios = [
+            {'name': 'solo TB', 'dose_mcg': {101: 0}},   # compra solo TB (prezzo ignoto)
+            {'name': 'BPC', 'dose_mcg': {102: 0}},       # compra BPC a 20/fiala
+        ]
+        results = self.engine.evaluate(PHASES, scenarios)
+        self.assertEqual(list(results.unpriced), [1, 0])
+        self.assertAlmostEqual(results.total_cost[0], 0.0)
+        self.assertGreater(results.total_cost[1], 0.0)
+        self.assertEqual(results.best('total_cost'), 1)
+        self.assertEqual(results.scenario_summary(0)['unpriced'], 1)
+
+    def test_fractional_weeks_match_resource_planner(self):
+        phases = json.loads(json.dumps(PHASES))
+        phases[1]['duration_weeks'] = 1.3
+        expected = ResourcePlanner(self.db).calculate_total_plan_resources(phases)
+        results = self.engine.evaluate(PHASES, [{'duration_weeks': {2: 1.3}}])
+        summary = results.scenario_summary(0)
+        by_id = {p['resource_id']: p for p in summary['peptides']}
+        for pep in expected['total_peptides']:
+            self.assertAlmostEqual(by_id[pep['resource_id']]['mg_needed'], pep['mg_needed'], places=2)
+
+    def test_sweep_cartesian_product(self):
+        scenarios = self.engine.sweep(
+            dose_factors=[0.8, 1.0, 1.2],
+            duration_factors=[1.0, 1.5],
+            mg_per_vial={101: [5, 10]},
+        )
+        self.assertEqual(len(scenarios), 12)
+        results = self.engine.evaluate(PHASES, scenarios)
+        self.assertEqual(results.mg_needed.shape, (12, 2))
+
+    def test_unknown_peptide_override_raises(self):
+        with self.assertRaises(ValueError):
+            self.engine.evaluate(PHASES, [{'dose_mcg': {999: 100}}])
+
+    def test_save_persists_results(self):
+        scenarios = self.engine.sweep(dose_factors=[1.0, 2.0])
+        results = self.engine.evaluate(PHASES, scenarios)
+        sim_id = self.engine.save('Dose sweep', PHASES, scenarios, results)
+
+        saved = PlanSimulationRepository(self.db).get_by_id(sim_id)
+        self.assertEqual(saved.name, 'Dose sweep')
+        self.assertEqual(len(saved.get_config()['scenarios']), 2)
+        summary = saved.get_results()
+        self.assertEqual(summary['scenario_count'], 2)
+        self.assertEqual(summary['best_scenario'], scenarios[0]['name'])
+        json.dumps(summary)
+
+    def test_manager_simulates_saved_plan(self):
+        pm = PeptideManager(self.temp_db.name)
+        try:
+            plan = pm.create_treatment_plan('Plan', '2026-01-05', PHASES)
+            summary = pm.simulate_plan_scenarios(
+                plan['plan_id'], [{'name': 'base'}, {'dose_factor': 1.5}],
+                save_as='What-if'
+            )
+        finally:
+            pm.close()
+        self.assertEqual(summary['scenario_count'], 2)
+        self.assertIsNotNone(summary['simulation_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
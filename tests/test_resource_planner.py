@@ -0,0 +1,110 @@
+"""
+Test per ResourcePlanner e InventorySnapshot.
+"""
+
+import unittest
+from decimal import Decimal
+from types import SimpleNamespace
+
+from peptide_manager.calculator import InventorySnapshot, ResourcePlanner
+from peptide_manager.schema_template import memory_database
+
+
+class TestInventorySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = memory_database()
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO suppliers (name) VALUES ('Lab')")
+        cur.executemany(
+            "INSERT INTO peptides (id, name) VALUES (?, ?)",
+            [(101, 'BPC-157'), (102, 'TB-500'), (103, 'GHK-Cu')],
+        )
+        # Batch puro BPC: 4 fiale da 5mg
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (1, 1, 'BPC 5mg', 4, 4, 20.0, '2025-01-01')"
+        )
+        # Batch puro TB: 2 fiale da 10mg
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (2, 1, 'TB 10mg', 2, 2, 30.0, '2025-02-01')"
+        )
+        # Batch MIX BPC+TB: escluso dall'inventario disponibile
+        cur.execute(
+            "INSERT INTO batches (id, supplier_id, product_name, vials_count, "
+            "vials_remaining, price_per_vial, purchase_date) "
+            "VALUES (3, 1, 'BPC+TB', 5, 5, 40.0, '2025-03-01')"
+        )
+        cur.executemany(
+            "INSERT INTO batch_composition (batch_id, peptide_id, mg_per_vial) "
+            "VALUES (?, ?, ?)",
+            [(1, 101, 5.0), (2, 102, 10.0), (3, 101, 5.0), (3, 102, 5.0)],
+        )
+        # Preparazione attiva da batch BPC puro (1 fiala)
+        cur.execute(
+            "INSERT INTO preparations (batch_id, vials_used, volume_ml, "
+            "preparation_date, volume_remaining_ml) "
+            "VALUES (1, 1, 2.0, '2025-01-02', 1.5)"
+        )
+        self.conn.commit()
+        self.planner = ResourcePlanner(SimpleNamespace(conn=self.conn))
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_snapshot_excludes_blends(self):
+        snap = InventorySnapshot.load(self.conn)
+        self.assertEqual(snap.blend_batch_ids, {3})
+        self.assertTrue(snap.is_blend(3))
+        # 4 fiale * 5mg + prep 1 fiala * 5mg
+        self.assertAlmostEqual(snap.mg_for(101), 25.0)
+        self.assertAlmostEqual(snap.mg_for(102), 20.0)
+        self.assertEqual(snap.vials_for(101), 4)
+        self.assertEqual(snap.mg_for(103), 0.0)
+        self.assertEqual(snap.vials_for(103), 0)
+
+    def test_recent_price_average(self):
+        snap = InventorySnapshot.load(self.conn)
+        # BPC: batch puro 20 + MIX 40
+        self.assertEqual(snap.price_for(101), Decimal('30.0'))
+        self.assertIsNone(snap.price_for(103))
+        # TB: batch puro 30 + MIX 40 → 35 * 3
+        self.assertEqual(self.planner._estimate_peptide_cost(102, 3), Decimal('105.00'))
+
+    def test_query_count_independent_of_peptides(self):
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        phases = [
+            {
+                'phase_name': f'P{i}',
+                'duration_weeks': 4,
+                'peptides': [
+                    {'peptide_id': pid, 'peptide_name': f'P{pid}', 'dose_mcg': 250}
+                    for pid in (101, 102, 103)
+                ],
+            }
+            for i in range(5)
+        ]
+        result = self.planner.calculate_total_plan_resources(phases)
+        self.planner.check_inventory_coverage(result['total_peptides'])
+        self.conn.set_trace_callback(None)
+
+        # 4 query snapshot + 1 lead time fornitori
+        self.assertEqual(len(statements), 5)
+        bpc = next(p for p in result['total_peptides'] if p['resource_id'] == 101)
+        self.assertAlmostEqual(bpc['mg_available'], 25.0)
+
+    def test_refresh_reloads_snapshot(self):
+        first = self.planner.get_inventory_snapshot()
+        self.assertIs(self.planner.get_inventory_snapshot(), first)
+        self.conn.execute("UPDATE batches SET vials_remaining = 0 WHERE id = 2")
+        self.assertAlmostEqual(self.planner._get_available_mg(102), 20.0)
+        self.planner.get_inventory_snapshot(refresh=True)
+        self.assertAlmostEqual(self.planner._get_available_mg(102), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
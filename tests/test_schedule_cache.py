@@ -0,0 +1,292 @@
+"""
+Test per la cache materializzata dello schedule (peptide_manager/schedule_cache.py).
+"""
+
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from peptide_manager import PeptideManager
+from peptide_manager.database import init_database
+from peptide_manager.export import build_schedule
+from peptide_manager.schedule_cache import DONE, PLANNED, ScheduleCache, expand_cycle
+from peptide_manager.schema_template import memory_database
+
+TODAY = date(2026, 3, 2)  # lunedì
+
+
+def _cycle(cycle_id=1, peptides=None, **fields):
+    snapshot = {'peptides': peptides or [{'peptide_id': 7, 'target_dose_mcg': 250}]}
+    return {'id': cycle_id, 'start_date': TODAY.isoformat(),
+            'protocol_snapshot': json.dumps(snapshot), **fields}
+
+
+class TestExpandCycle(unittest.TestCase):
+
+    def days(self, cycle, days=14):
+        return sorted({d.date for d in expand_cycle(cycle, TODAY, TODAY + timedelta(days=days - 1))})
+
+    def test_days_on_off_from_cycle_or_resume(self):
+        cycle = _cycle(days_on=5, days_off=2)
+        self.assertEqual(len(self.days(cycle)), 10)
+        self.assertNotIn(TODAY + timedelta(days=5), self.days(cycle))
+        resumed = self.days(_cycle(days_on=5, days_off=2,
+                                   resumed_at=(TODAY + timedelta(days=3)).isoformat()))
+        self.assertEqual(resumed[0], TODAY + timedelta(days=3))
+        self.assertIn(TODAY + timedelta(days=7), resumed)
+
+    def test_end_date_weekdays_and_frequency(self):
+        cycle = _cycle(planned_end_date=(TODAY + timedelta(days=6)).isoformat())
+        self.assertEqual(self.days(cycle)[-1], TODAY + timedelta(days=6))
+        weekly = _cycle(peptides=[{'peptide_id': 7, 'target_dose_mcg': 250, 'weekdays': [0, 3]}])
+        self.assertEqual([d.weekday() for d in self.days(weekly)], [0, 3, 0, 3])
+        twice = _cycle(peptides=[{'peptide_id': 7, 'target_dose_mcg': 250, 'daily_frequency': 2}])
+        doses = expand_cycle(twice, TODAY, TODAY)
+        self.assertEqual([d.dose_index for d in doses], [0, 1])
+
+    def test_ramp_doses_by_week(self):
+        ramp = [{'week': 1, 'doses': [{'peptide_id': 7, 'dose_mcg': 100}]},
+                {'week': 2, 'doses': [{'peptide_id': 7, 'dose_mcg': 200}]}]
+        doses = expand_cycle(_cycle(ramp_schedule=json.dumps(ramp)),
+                             TODAY, TODAY + timedelta(days=20))
+        by_day = {d.date: d.dose_mcg for d in doses}
+        self.assertEqual(by_day[TODAY], 100)
+        self.assertEqual(by_day[TODAY + timedelta(days=7)], 200)
+        # Oltre l'ultima settimana definita resta l'ultima dose
+        self.assertEqual(by_day[TODAY + timedelta(days=14)], 200)
+
+
+class TestScheduleCacheSync(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = memory_database()
+        self.cache = ScheduleCache(self.conn)
+        self.conn.execute("INSERT INTO peptides (id, name) VALUES (7, 'BPC-157'), (8, 'TB-500')")
+        self.first = self.add_cycle('A', 7)
+        self.second = self.add_cycle('B', 8)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def add_cycle(self, name, peptide_id):
+        snapshot = {'peptides': [{'peptide_id': peptide_id, 'target_dose_mcg': 250}]}
+        cur = self.conn.execute(
+            "INSERT INTO cycles (name, start_date, protocol_snapshot, status) "
+            "VALUES (?, ?, ?, 'active')",
+            (name, TODAY.isoformat(), json.dumps(snapshot)),
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def rows(self, cycle_id):
+        return self.conn.execute(
+            "SELECT date, dose_mcg FROM schedule_cache WHERE cycle_id = ? ORDER BY date",
+            (cycle_id,),
+        ).fetchall()
+
+    def test_first_sync_builds_horizon(self):
+        result = self.cache.sync(TODAY)
+        self.assertTrue(result.full)
+        state = self.cache.state()
+        self.assertEqual((state.horizon_start, state.horizon_end),
+                         (TODAY, TODAY + timedelta(days=state.horizon_days - 1)))
+        self.assertEqual(len(self.rows(self.first)), state.horizon_days)
+        self.assertEqual(self.cache.sync(TODAY).rows, 0)
+        self.assertTrue(self.cache.is_current(TODAY))
+
+    def test_cycle_change_rebuilds_only_that_cycle(self):
+        self.cache.sync(TODAY)
+        untouched = self.rows(self.second)
+        ramp = [{'week': 1, 'doses': [{'peptide_id': 7, 'dose_mcg': 100}]}]
+        self.conn.execute("UPDATE cycles SET ramp_schedule = ? WHERE id = ?",
+                          (json.dumps(ramp), self.first))
+        self.conn.commit()
+        self.assertFalse(self.cache.is_current(TODAY))
+
+        result = self.cache.sync(TODAY)
+        self.assertEqual((result.rebuilt, result.full), ({self.first}, False))
+        self.assertEqual(self.rows(self.first)[0][1], 100)
+        self.assertEqual(self.rows(self.second), untouched)
+
+        self.conn.execute("UPDATE cycles SET status = 'paused' WHERE id = ?", (self.second,))
+        self.conn.commit()
+        self.assertEqual(self.cache.sync(TODAY).rebuilt, {self.second})
+        self.assertEqual(self.rows(self.second), [])
+
+    def test_next_day_prunes_and_extends(self):
+        self.cache.sync(TODAY)
+        state = self.cache.state()
+        result = self.cache.sync(TODAY + timedelta(days=1))
+        self.assertEqual((result.rebuilt, result.full, result.rows), (set(), False, 2))
+        days = [row[0] for row in self.rows(self.first)]
+        self.assertEqual(days[0], (TODAY + timedelta(days=1)).isoformat())
+        self.assertEqual(days[-1], (state.horizon_end + timedelta(days=1)).isoformat())
+
+    def test_set_horizon(self):
+        self.cache.sync(TODAY)
+        self.cache.set_horizon(7, TODAY)
+        self.assertEqual(len(self.rows(self.first)), 7)
+        self.cache.set_horizon(10, TODAY)
+        self.assertEqual(len(self.rows(self.first)), 10)
+        with self.assertRaises(ValueError):
+            self.cache.set_horizon(0, TODAY)
+
+    def test_range_query_matches_computation(self):
+        self.cache.sync(TODAY)
+        end = TODAY + timedelta(days=9)
+        cached = self.cache.get_range(TODAY, end, today=TODAY)
+        self.assertEqual(len(cached), 20)
+        self.assertEqual(cached[0]['peptide_name'], 'BPC-157')
+        # Fuori orizzonte: stesso formato, calcolato in memoria
+        later = TODAY + timedelta(days=400)
+        self.assertEqual(
+            [(i['cycle_id'], i['dose_mcg']) for i in self.cache.get_range(later, later, today=TODAY)],
+            [(self.first, 250), (self.second, 250)],
+        )
+
+
+class TestScheduleCacheManager(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        init_database(self.temp_db.name).close()
+        self.today = date.today()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.manager = PeptideManager(self.temp_db.name)
+            self.peptide_id = self.manager.add_peptide('BPC-157')
+            protocol_id = self.manager.add_protocol('P', peptides=[(self.peptide_id, 250)],
+                                                    days_on=5, days_off=2)
+            self.cycle_id = self.manager.start_cycle(
+                protocol_id, name='Ciclo', start_date=self.today.isoformat(),
+                days_on=5, days_off=2,
+            )
+
+    def tearDown(self):
+        self.manager.close()
+        os.unlink(self.temp_db.name)
+
+    def record_dose(self):
+        """Somministrazione di oggi registrata nel ciclo. Returns: (admin_id, batch_id)."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            supplier_id = self.manager.add_supplier('Lab')
+            batch_id = self.manager.add_batch(
+                supplier_id=supplier_id, product_name='BPC-157 5mg',
+                peptide_ids=[self.peptide_id], peptide_amounts={self.peptide_id: 5.0},
+                vials_count=2, mg_per_vial=5.0, total_price=50.0, purchase_date='2026-01-01',
+            )
+            prep_id = self.manager.add_preparation(batch_id=batch_id, vials_used=1, volume_ml=2.0)
+            admin_id = self.manager.add_administration(preparation_id=prep_id, dose_ml=0.1)
+            self.manager.record_cycle_administration(self.cycle_id, admin_id)
+        return admin_id, batch_id
+
+    def statuses(self):
+        return [r['status'] for r in self.manager.get_schedule(self.today, self.today)]
+
+    def test_writes_keep_cache_current(self):
+        cache = self.manager.db.schedule_cache
+        self.assertTrue(cache.is_current())
+        rows = self.manager.get_schedule(self.today, self.today + timedelta(days=6))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['status'], PLANNED)
+
+        self.record_dose()
+        self.assertTrue(cache.is_current())
+        self.assertEqual(self.statuses(), [DONE])
+
+    def test_status_follows_admin_unlink_and_batch_composition(self):
+        admin_id, batch_id = self.record_dose()
+        conn = self.manager.db.conn
+        cache = self.manager.db.schedule_cache
+
+        # Somministrazione tolta dal ciclo: il ciclo precedente torna 'planned'
+        conn.execute("UPDATE administrations SET cycle_id = NULL WHERE id = ?", (admin_id,))
+        conn.commit()
+        self.assertTrue(cache.is_current())
+        self.assertEqual(self.statuses(), [PLANNED])
+
+        conn.execute("UPDATE administrations SET cycle_id = ? WHERE id = ?", (self.cycle_id, admin_id))
+        conn.commit()
+        self.assertEqual(self.statuses(), [DONE])
+
+        # Composizione del batch corretta: la dose non è più di questo peptide
+        other_id = conn.execute("INSERT INTO peptides (name) VALUES ('TB-500')").lastrowid
+        conn.execute("UPDATE batch_composition SET peptide_id = ? WHERE batch_id = ?",
+                     (other_id, batch_id))
+        conn.commit()
+        self.assertTrue(cache.is_current())
+        self.assertEqual(self.statuses(), [PLANNED])
+
+    def test_reads_do_not_sync(self):
+        cache = self.manager.db.schedule_cache
+        other = sqlite3.connect(self.temp_db.name)
+        other.execute("UPDATE cycles SET days_on = 7, days_off = 0 WHERE id = ?", (self.cycle_id,))
+        other.commit()
+        other.close()
+        state = cache.state()
+
+        # Cache indietro (evento external non ancora ricevuto): calcolo in memoria
+        rows = cache.get_range(self.today, self.today + timedelta(days=6))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(cache.state(), state)
+        self.assertFalse(cache.is_current())
+
+    def test_journal_kept_for_slowest_consumer(self):
+        conn = self.manager.db.conn
+        log = self.manager.db.change_log
+        export_cursor = log.head()
+        log.ack('export', export_cursor)
+        conn.commit()
+        for days_on in range(1, 30):
+            conn.execute("UPDATE cycles SET days_on = ? WHERE id = ?", (days_on, self.cycle_id))
+            conn.commit()
+        self.assertTrue(self.manager.db.schedule_cache.is_current())
+        self.assertEqual(log.consumers()['schedule_cache'], log.head())
+        # Il sync non compatta: le modifiche restano per gli altri consumatori
+        self.assertEqual(len(log.since(export_cursor)), 29)
+
+        # Compattazione fino al consumatore più lento: resta l'ultima modifica
+        log.compact_consumed()
+        self.assertEqual(log.changed_rows(export_cursor)['cycles'].upserted, {self.cycle_id})
+        self.assertEqual(len(log.since(0)), 1)
+
+        log.ack('export', log.head())
+        conn.commit()
+        self.manager.close()  # compatta il journal letto da tutti
+        other = sqlite3.connect(self.temp_db.name)
+        self.assertEqual(other.execute("SELECT COUNT(*) FROM change_log").fetchone()[0], 0)
+        other.close()
+        self.manager = PeptideManager(self.temp_db.name)
+
+    def test_read_only_reader_computes_when_stale(self):
+        # Scrittura di un altro processo: la cache resta indietro
+        other = sqlite3.connect(self.temp_db.name)
+        other.execute("UPDATE cycles SET days_on = 7, days_off = 0 WHERE id = ?", (self.cycle_id,))
+        other.commit()
+        other.close()
+        end = self.today + timedelta(days=6)
+
+        reader = sqlite3.connect(self.temp_db.name)
+        stale = ScheduleCache(reader, read_only=True)
+        self.assertFalse(stale.is_current())
+        self.assertEqual(len(stale.get_range(self.today, end)), 7)
+        reader.close()
+
+        self.manager.changes.poll_external()  # evento external → sync
+        self.assertTrue(self.manager.db.schedule_cache.is_current())
+
+    def test_export_reads_cache(self):
+        schedule = build_schedule(self.manager, self.today, self.today + timedelta(days=6))
+        self.assertEqual(len(schedule), 5)
+        entry = schedule[self.today][0]
+        self.assertEqual((entry['peptide_name'], entry['dose_mcg'], entry['frequency']),
+                         ('BPC-157', 250, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
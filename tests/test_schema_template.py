@@ -0,0 +1,80 @@
+"""
+Test per il template dello schema finale (peptide_manager/schema_template.py).
+"""
+
+import contextlib
+import io
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from peptide_manager.database import init_database
+from peptide_manager.db_sync import read_schema
+from peptide_manager.migrator import Migrator, migration_files
+from peptide_manager.schema_template import (
+    build_template, memory_database, template_path, write_template,
+)
+
+
+class TestSchemaTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_template_matches_migrations(self):
+        self.assertEqual(
+            template_path().read_text(encoding='utf-8'), build_template(),
+            'Template obsoleto: python -m peptide_manager.schema_template',
+        )
+
+    def test_template_schema_equals_replay(self):
+        replay = sqlite3.connect(':memory:')
+        Migrator(replay, verbose=False).migrate(create=True, template=False)
+        clone = memory_database()
+        self.assertEqual(read_schema(clone), read_schema(replay))
+        self.assertEqual(
+            Migrator(clone, verbose=False).applied(), Migrator(replay, verbose=False).applied()
+        )
+        self.assertTrue(Migrator(clone, verbose=False).is_current())
+        self.assertEqual(clone.execute('PRAGMA foreign_keys').fetchone()[0], 1)
+        replay.close()
+        clone.close()
+
+    def test_memory_databases_are_independent(self):
+        first, second = memory_database(), memory_database()
+        first.execute("INSERT INTO suppliers (name) VALUES ('Lab')")
+        first.commit()
+        self.assertEqual(second.execute('SELECT COUNT(*) FROM suppliers').fetchone()[0], 0)
+        first.close()
+        second.close()
+
+    def test_init_database_skips_replay(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            conn = init_database(self.tmp / 'new.db')
+        self.assertNotIn('migration:', output.getvalue())
+        self.assertTrue(Migrator(conn, verbose=False).is_current())
+        conn.close()
+
+    def test_stale_template_applies_newer_migrations(self):
+        migrations = self.tmp / 'migrations'
+        shutil.copytree(migration_files()[0].parent, migrations,
+                        ignore=shutil.ignore_patterns('*.py', '__pycache__'))
+        write_template(migrations)
+        (migrations / '999_add_note.sql').write_text(
+            "ALTER TABLE suppliers ADD COLUMN note2 TEXT;\n"
+        )
+        conn = sqlite3.connect(self.tmp / 'new.db')
+        migrator = Migrator(conn, migrations, verbose=False)
+        self.assertEqual(migrator.migrate(create=True), ['999_add_note'])
+        self.assertTrue(migrator.is_current())
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
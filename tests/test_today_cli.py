@@ -0,0 +1,137 @@
+"""
+Test per la CLI "oggi" su snapshot (peptide_manager/today.py).
+
+Il budget in millisecondi dipende dalla macchina: gira solo con
+``PEPTIDE_BENCHMARK=1`` (i controlli sui moduli caricati girano sempre).
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+from peptide_manager.database import init_database
+from peptide_manager.manager import PeptideManager
+from peptide_manager.today import due_items, main, snapshot_path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Budget (ms) della CLI con snapshot valido, interprete escluso
+FRESH_BUDGET_MS = 100
+
+BENCHMARK = bool(os.environ.get('PEPTIDE_BENCHMARK'))
+
+
+class TestTodayCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.db_path = self.tmp / 'test.db'
+        init_database(self.db_path).close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.manager = PeptideManager(str(self.db_path))
+            peptide_id = self.manager.add_peptide('BPC-157')
+            protocol_id = self.manager.add_protocol(
+                'Protocollo', peptides=[(peptide_id, 250)], days_on=5, days_off=2
+            )
+            self.cycle_id = self.manager.start_cycle(
+                protocol_id, name='Ciclo', start_date=date.today().isoformat(),
+                days_on=5, days_off=2,
+            )
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def run_main(self, *args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['--db', str(self.db_path), '--json', *args]), 0)
+        return json.loads(output.getvalue())
+
+    def test_first_run_computes_then_uses_snapshot(self):
+        first = self.run_main()
+        self.assertEqual(first['source'], 'computed')
+        self.assertTrue(snapshot_path(self.db_path).exists())
+        self.assertEqual(
+            [(i['cycle_id'], i['schedule_status']) for i in first['items']],
+            [(self.cycle_id, 'due_today')],
+        )
+        second = self.run_main()
+        self.assertEqual(second['source'], 'snapshot')
+        self.assertEqual(second['items'], first['items'])
+
+    def test_write_makes_snapshot_stale(self):
+        self.run_main()
+        self.manager.update_cycle_status(self.cycle_id, 'paused')
+        result = self.run_main()
+        self.assertEqual((result['source'], result['items']), ('computed', []))
+
+    def test_other_day_recomputes(self):
+        self.run_main()
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.run_main('--date', tomorrow)['source'], 'computed')
+
+    def test_manager_close_refreshes_existing_snapshot(self):
+        self.run_main()
+        self.manager.update_cycle_status(self.cycle_id, 'paused')
+        self.manager.close()
+        items, source = due_items(self.db_path)
+        self.assertEqual((source, items), ('snapshot', []))
+
+    def test_upcoming_days_from_schedule_cache(self):
+        result = self.run_main('--days', '6')
+        self.assertEqual(result['upcoming_source'], 'cache')
+        self.assertEqual(len(result['upcoming']), 4)  # 5 giorni on, 2 off
+        self.assertEqual(result['upcoming'][0]['date'],
+                         (date.today() + timedelta(days=1)).isoformat())
+
+    def fresh_run(self):
+        """(ms, moduli caricati) della CLI con snapshot valido in un interprete nuovo."""
+        self.run_main()
+        statement = (
+            'import contextlib, io, sys, time\n'
+            'start = time.perf_counter()\n'
+            'from peptide_manager.today import main\n'
+            'with contextlib.redirect_stdout(io.StringIO()):\n'
+            f'    main(["--db", {str(self.db_path)!r}])\n'
+            'print((time.perf_counter() - start) * 1000)\n'
+            'print("\\n".join(sys.modules))\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', statement], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        )
+        elapsed, *modules = result.stdout.split()
+        return float(elapsed), modules
+
+    def test_fresh_snapshot_is_light(self):
+        _, modules = self.fresh_run()
+        heavy = [
+            name for name in modules
+            if name.split('.')[0] in ('pandas', 'PySide6', 'numpy')
+            or name.startswith(('peptide_manager.models', 'peptide_manager.manager',
+                                'peptide_manager.database'))
+        ]
+        self.assertEqual(heavy, [])
+
+    @unittest.skipUnless(BENCHMARK, 'benchmark: PEPTIDE_BENCHMARK=1')
+    def test_fresh_snapshot_budget(self):
+        elapsed, _ = self.fresh_run()
+        self.assertLess(elapsed, FRESH_BUDGET_MS)
+
+        start = time.perf_counter()
+        self.run_main()
+        self.assertLess((time.perf_counter() - start) * 1000, FRESH_BUDGET_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,329 @@
+"""Tests for the background data-loading framework in gui_qt/views/base.py.
+
+WHY this matters: view refreshes run off the Qt main thread on per-thread
+read-only connections. A stale result delivered after a newer refresh would
+overwrite fresh data, and a fetch that writes would silently bypass the
+main-thread manager.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+from PySide6.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+from peptide_manager import PeptideManager  # noqa: E402
+from peptide_manager.database import init_database  # noqa: E402
+from gui_qt.views import base  # noqa: E402
+from gui_qt.views.base import BaseView  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def db_path():
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+    tmp.close()
+    init_database(tmp.name).close()
+    yield tmp.name
+    base.shutdown_loaders()
+    os.unlink(tmp.name)
+
+
+def _wait(views, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while any(v.is_loading for v in views):
+        assert time.monotonic() < deadline, "fetch did not complete"
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+    QCoreApplication.processEvents()
+
+
+class _ProbeView(BaseView):
+    def __init__(self, app, fetch_fn):
+        super().__init__(app)
+        self._fetch_fn = fetch_fn
+        self.rendered = []
+        self.errors = []
+
+    def fetch(self, manager, params):
+        return self._fetch_fn(manager, params)
+
+    def render(self, data):
+        self.rendered.append(data)
+
+    def on_load_error(self, message):
+        self.errors.append(message)
+
+
+def _app(db_path):
+    return SimpleNamespace(db_path=db_path, manager=PeptideManager(db_path), edit_mode=False)
+
+
+def test_fetch_runs_off_main_thread_on_read_only_connection(qapp, db_path):
+    main = threading.get_ident()
+
+    def fetch(manager, params):
+        count = manager.conn.execute("SELECT COUNT(*) FROM peptides").fetchone()[0]
+        return threading.get_ident(), count, manager is not app.manager
+
+    app = _app(db_path)
+    view = _ProbeView(app, fetch)
+    view.refresh()
+    _wait([view])
+
+    thread, count, separate = view.rendered[-1]
+    assert thread != main
+    assert count == 2  # peptidi seed di init_database
+    assert separate
+    app.manager.close()
+
+
+def test_fetch_cannot_write(qapp, db_path):
+    def fetch(manager, params):
+        manager.conn.execute("INSERT INTO suppliers (name) VALUES ('X')")
+
+    app = _app(db_path)
+    view = _ProbeView(app, fetch)
+    view.refresh()
+    _wait([view])
+
+    assert view.rendered == []
+    assert "readonly" in view.errors[0] or "read-only" in view.errors[0]
+    app.manager.close()
+
+
+def test_newer_refresh_drops_stale_result(qapp, db_path):
+    release = threading.Event()
+    calls = []
+
+    def fetch(manager, params):
+        calls.append(params["n"])
+        if params["n"] == 1:
+            release.wait(5)
+        return params["n"]
+
+    app = _app(db_path)
+    view = _ProbeView(app, fetch)
+    counter = iter(range(1, 10))
+    view.fetch_params = lambda: {"n": next(counter)}
+
+    view.refresh()
+    time.sleep(0.05)
+    view.refresh()
+    release.set()
+    _wait([view])
+    base._loader_pool().waitForDone(5000)
+    QCoreApplication.processEvents()
+
+    assert view.rendered == [2]
+    assert view.errors == []
+    app.manager.close()
+
+
+def test_cancel_interrupts_running_query():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    ticket = base._LoadTicket(1)
+    ticket.conn = conn
+    errors = []
+
+    def slow():
+        try:
+            conn.execute(
+                "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+                "SELECT COUNT(*) FROM c"
+            ).fetchone()
+        except sqlite3.OperationalError as exc:
+            errors.append(str(exc))
+
+    worker = threading.Thread(target=slow)
+    worker.start()
+    time.sleep(0.1)
+    ticket.cancel()
+    worker.join(5)
+
+    assert ticket.cancelled
+    assert errors == ["interrupted"]
+    conn.close()
+
+
+def test_inline_fetch_without_db_file(qapp):
+    app = SimpleNamespace(manager=object(), edit_mode=False)
+    view = _ProbeView(app, lambda manager, params: "inline")
+    view.refresh()
+    assert view.rendered == ["inline"]
+    assert not view.is_loading
+
+
+def test_main_window_tabs_load_in_background(qapp, db_path, monkeypatch):
+    from PySide6.QtWidgets import QTabWidget
+    from gui_qt.app import PeptideQtApp
+
+    warnings = []
+    monkeypatch.setattr(
+        QMessageBox, "warning", lambda *args, **kw: warnings.append(args[2])
+    )
+    window = PeptideQtApp(db_path)
+    # Only the Today section is built at startup; the rest on first show
+    assert [type(v).__name__ for v in window.iter_views()] == ["TodayView"]
+
+    for i in range(window.stack.count()):
+        window.sidebar.setCurrentRow(i)
+        widget = window.stack.widget(i)
+        if isinstance(widget, QTabWidget):
+            for t in range(widget.count()):
+                widget.setCurrentIndex(t)
+    window.refresh_all_views()
+
+    views = list(window.iter_views())
+    views = [v for v in views if isinstance(v, BaseView)]
+    _wait(views)
+
+    assert warnings == []
+    assert len(views) >= 12
+    peptidi = next(v for v in views if type(v).__name__ == "PeptidiTab")
+    assert peptidi._table.rowCount() == 2
+    window._backup_done = True  # nessun backup su chiusura nel test
+    window.close()
+    window.manager.close()
+
+
+def test_gui_startup_defers_heavy_imports():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys; import gui_qt.app; "
+        "print(','.join(m for m in ('pandas', 'matplotlib', 'qtawesome') "
+        "if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout.strip()
+    assert out == ""
+
+
+class _WatchingView(_ProbeView):
+    watch_tables = ("peptides",)
+
+    def fetch_params(self):
+        return {"changes": self.pending_changes}
+
+
+def test_change_notification_refreshes_only_watching_visible_views(qapp, db_path):
+    app = _app(db_path)
+    view = _WatchingView(app, lambda manager, params: params["changes"])
+    app.manager.changes.subscribe(view.notify_changes)
+    view.show()
+    view.refresh()
+    _wait([view])
+    assert view.rendered == [()] and not view.is_stale
+
+    app.manager.add_supplier("Lab")          # tabella non osservata
+    QCoreApplication.processEvents()
+    assert not view.is_stale and len(view.rendered) == 1
+
+    app.manager.conn.execute("INSERT INTO peptides (id, name) VALUES (101, 'X')")
+    app.manager.conn.commit()
+    app.manager.conn.execute("UPDATE peptides SET name = 'Y' WHERE id = 101")
+    app.manager.conn.commit()
+    assert view.is_stale
+    QCoreApplication.processEvents()         # i due commit → un solo refresh
+    _wait([view])
+    assert len(view.rendered) == 2
+    assert [(e.table, e.op) for e in view.rendered[-1]] == [
+        ("peptides", "insert"), ("peptides", "update"),
+    ]
+    assert view.pending_changes == () and not view.is_stale
+
+    # Nascosta: solo marcata obsoleta, ricarica quando torna visibile
+    view.hide()
+    app.manager.conn.execute("DELETE FROM peptides WHERE id = 101")
+    app.manager.conn.commit()
+    QCoreApplication.processEvents()
+    assert view.is_stale and len(view.rendered) == 2
+    view.refresh_if_stale()
+    _wait([view])
+    view.refresh_if_stale()
+    assert len(view.rendered) == 3
+    app.manager.close()
+
+
+def _today_data(today, n=2):
+    from datetime import timedelta
+
+    forecast = {
+        today + timedelta(days=offset): [
+            (f"Pep{i}", 250, f"C{i}", 101 + i, i, 0) for i in range(n)
+        ]
+        for offset in range(1, 7)
+    }
+    pending = [{
+        "peptide_id": 101 + i, "peptide_name": f"Pep{i}", "cycle_id": i,
+        "cycle_name": f"C{i}", "preparation_id": i, "dose_number": 1,
+        "daily_frequency": 1, "status": "ready", "schedule_status": "pending",
+        "target_dose_mcg": 250, "suggested_dose_ml": 0.1,
+    } for i in range(n)]
+    return {
+        "selected_date": today, "days_ahead": 7, "today": today,
+        "today_pending": pending, "conc_map": {101 + i: 1000.0 for i in range(n)},
+        "prep_map": {(101 + i, i): i for i in range(n)}, "done_by_date": {},
+        "forecast": forecast, "shortfall": set(), "first_short": {}, "due_orders": [],
+    }
+
+
+def _row_widgets(view):
+    return {
+        (d, key): row
+        for d, section in view._sections.items()
+        for key, row in section.rows.items()
+    }
+
+
+def test_today_patches_rows_in_place(qapp, db_path):
+    from datetime import date
+    from gui_qt.views.today import TodayView
+
+    # Senza db_path la vista carica inline (sincrono)
+    app = SimpleNamespace(db_path=None, manager=PeptideManager(db_path), edit_mode=False)
+    view = TodayView(app)
+    today = date.today()
+    data = _today_data(today)
+    view.render(data)
+    before = _row_widgets(view)
+    sections = dict(view._sections)
+    assert len(sections) == 7
+    assert (today, ("pending", 0, 0, 1)) in before
+
+    # Registrata la dose di Pep0: nasce solo la riga "fatto", sparisce solo
+    # la riga in attesa; tutto il resto (sezioni e righe) è riusato
+    admin = {"id": 7, "peptide_name": "Pep0", "dose_ml": 0.1, "protocol_name": ""}
+    pending = [p for p in data["today_pending"] if p["cycle_id"] != 0]
+    pending[0] = {**pending[0], "status": "insufficient_volume"}
+    view.render({**data, "today_pending": pending, "done_by_date": {today: [admin]}})
+    after = _row_widgets(view)
+    assert set(after) - set(before) == {(today, ("done", 7))}
+    assert set(before) - set(after) == {(today, ("pending", 0, 0, 1))}
+    assert all(after[k] is before[k] for k in set(after) & set(before))
+    assert all(view._sections[d] is sections[d] for d in sections)
+    # Stato aggiornato in place: stesso widget, pulsante "parziale"
+    row = after[(today, ("pending", 1, 1, 1))]
+    assert row._btn.text() == "Registra ⚠"
+
+    # Giorni futuri dalla cache dello schedule (una riga per iniezione)
+    forecast_days = {d for d, key in after if key[0] == "forecast"}
+    assert forecast_days == set(data["forecast"])
+    app.manager.close()